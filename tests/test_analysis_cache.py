@@ -0,0 +1,63 @@
+import json
+import os
+import time
+
+from vlinker.analysis_cache import AnalysisCache, cached_analysis, file_digest
+
+
+def test_cached_analysis_keys_on_content_not_path(tmp_path):
+    cache = AnalysisCache(tmp_path / 'cache')
+    calls = []
+
+    def compute(path):
+        calls.append(path)
+        return {'size': os.path.getsize(path)}
+
+    a = tmp_path / 'a.log'
+    a.write_bytes(b'x' * 100)
+    b = tmp_path / 'b.log'
+    b.write_bytes(b'x' * 100)
+    assert cached_analysis(str(a), 'test', '1', compute, cache=cache) == {'size': 100}
+    # same content under another name, then a new analyzer version
+    assert cached_analysis(str(b), 'test', '1', compute, cache=cache) == {'size': 100}
+    assert len(calls) == 1
+    cached_analysis(str(b), 'test', '2', compute, cache=cache)
+    assert len(calls) == 2
+
+
+def test_put_evicts_least_recently_used_entries(tmp_path):
+    cache = AnalysisCache(tmp_path / 'cache', max_bytes=3000)
+    blob = 'x' * 900
+    for i in range(3):
+        cache.put(f'{i:040x}', 'test', '1', blob)
+        time.sleep(0.01)
+    # touch the oldest entry so the second one becomes least recently used
+    assert cache.get(f'{0:040x}', 'test', '1') == blob
+    time.sleep(0.01)
+    cache.put(f'{3:040x}', 'test', '1', blob)
+    assert cache.size() <= 3000
+    assert cache.get(f'{1:040x}', 'test', '1') is None
+    assert cache.get(f'{0:040x}', 'test', '1') == blob
+    assert cache.get(f'{3:040x}', 'test', '1') == blob
+
+
+def test_digest_memo_is_pruned_and_counted(tmp_path):
+    cache = AnalysisCache(tmp_path / 'cache', max_bytes=10_000_000)
+    kept = tmp_path / 'kept.log'
+    kept.write_bytes(b'kept')
+    cached_analysis(str(kept), 'test', '1', lambda p: 1, cache=cache)
+    # uploads: a new temp file per request, deleted afterwards
+    for i in range(20):
+        tmp = tmp_path / f'upload{i}.tmp'
+        tmp.write_bytes(b'%d' % i)
+        file_digest(str(tmp), cache.root)
+        tmp.unlink()
+    memo = cache.root / 'digests.json'
+    assert cache.size() == sum(p.stat().st_size for p in cache.root.iterdir())
+    before = memo.stat().st_size
+    cache.evict()
+    assert json.loads(memo.read_text()).keys() == {str(kept)}
+    assert memo.stat().st_size < before
+    # no result left: the memo entry goes too
+    cache.clear()
+    assert json.loads(memo.read_text()) == {}
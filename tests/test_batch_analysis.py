@@ -0,0 +1,44 @@
+from vlinker.batch_analysis import analyze_corpus
+from vlinker.capture_format import CaptureWriter
+
+
+def _write(path, seeds, block_records=64):
+    ms = 1_000_000
+    with CaptureWriter(str(path), block_records=block_records) as w:
+        t = 0
+        for seed in seeds:
+            w.record('T', bytes.fromhex('2701'), can_id=0x7E0, ts_ns=t)
+            w.record('R', bytes.fromhex('6701') + seed, can_id=0x7E8, ts_ns=t + 20 * ms)
+            w.record('T', bytes.fromhex('2702') + seed[::-1], can_id=0x7E0, ts_ns=t + 30 * ms)
+            w.record('R', bytes.fromhex('6702'), can_id=0x7E8, ts_ns=t + 40 * ms)
+            w.record('T', bytes.fromhex('3E00'), can_id=0x7E0, ts_ns=t + 50 * ms)
+            w.record('R', bytes.fromhex('7E00'), can_id=0x7E8, ts_ns=t + 55 * ms)
+            t += 100 * ms
+
+
+def test_corpus_report_merges_files_and_uses_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv('VLINKER_CACHE_DIR', str(tmp_path / 'cache'))
+    caps = tmp_path / 'caps'
+    caps.mkdir()
+    for i in range(3):
+        _write(caps / f'trip{i}.vlcap', [bytes([i, j, 0x10, 0x20]) for j in range(1, 5)])
+    rep = analyze_corpus([str(caps)], workers=2)
+    assert rep['files'] == 3 and rep['cached_units'] == 0
+    assert rep['transactions'] == 36 and len(rep['seed_pairs']) == 12
+    assert rep['by_service']['27']['max_ms'] == 20.0 and rep['by_service']['3E']['max_ms'] == 5.0
+    assert rep['candidates'][0] == {'name': 'reverse', 'matches': 12, 'pairs': 12}
+    again = analyze_corpus([str(caps / '*.vlcap')], workers=2)
+    assert again['cached_units'] == again['units'] == 3
+    assert again['by_service'] == rep['by_service']
+
+
+def test_large_file_split_by_index_matches_whole_file(tmp_path, monkeypatch):
+    monkeypatch.setenv('VLINKER_CACHE_DIR', str(tmp_path / 'cache'))
+    path = tmp_path / 'big.vlcap'
+    _write(path, [bytes([j & 0xFF, j >> 8, 1, 2]) for j in range(300)], block_records=50)
+    whole = analyze_corpus([str(path)], use_cache=False)
+    split = analyze_corpus([str(path)], use_cache=False, workers=1, split_bytes=4096)
+    assert split['units'] > 1
+    assert split['transactions'] == whole['transactions'] == 900
+    assert len(split['seed_pairs']) == 300
+    assert split['by_service'] == whole['by_service']
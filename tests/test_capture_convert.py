@@ -0,0 +1,59 @@
+import pytest
+
+from vlinker.capture_convert import convert, detect_format, read_records
+from vlinker.capture_format import CaptureWriter
+
+BASE = 1_760_000_000 * 1_000_000_000
+
+
+def _frames():
+    out = []
+    for i in range(50):
+        t = BASE + i * 1_234_567_000
+        out.append((t, 'T', 0, 0x7E0, bytes([0x03, 0x22, 0xF1, i])))
+        out.append((t + 5_000_000, 'R', 1, 0x18DAF110, bytes([0x10, 0x14, 0x62, 0xF1, i, 0x57, 0x56, 0x57])))
+    out.append((BASE + 90 * 1_000_000_000, 'R', 0, 0x7E8, bytes(range(20))))  # CAN FD frame
+    return out
+
+
+def _vlcap(path, frames, extra=()):
+    # header maps the capture clock 1:1 onto Unix time
+    with CaptureWriter(str(path), header={'start_wall': 0.0, 'start_ns': 0}) as w:
+        for ts, d, ch, cid, data in frames:
+            w.record(d, data, ch, cid, ts)
+        for ts, d, data in extra:
+            w.record(d, data, ts_ns=ts)
+    return str(path)
+
+
+@pytest.mark.parametrize('fmt,directions,us', [('candump', True, True), ('asc', True, True),
+                                                ('pcap', False, False), ('pcapng', True, False)])
+def test_round_trip_through_can_formats(tmp_path, fmt, directions, us):
+    src = _vlcap(tmp_path / 'in.vlcap', _frames(), extra=[(BASE, 'T', b'0100\r')])
+    stats = convert(src, str(tmp_path / f'out.{fmt}'))
+    assert stats == {'records': 101, 'skipped': 1}
+    assert detect_format(str(tmp_path / f'out.{fmt}')) == fmt
+    back = convert(str(tmp_path / f'out.{fmt}'), str(tmp_path / 'back.vlcap'))
+    assert back['records'] == 101
+    got = [tuple(r) for r in read_records(str(tmp_path / 'back.vlcap'))]
+    want = sorted(_frames())
+    got.sort()
+    for g, w in zip(got, want):
+        assert g[0] == (w[0] // 1000 * 1000 if us else w[0])
+        assert g[1] == (w[1] if directions else 'R')
+        assert (g[3], bytes(g[4])) == (w[3], w[4])
+        if fmt != 'pcap':
+            assert g[2] == w[2]
+
+
+def test_elm_header_lines_become_frames(tmp_path):
+    src = _vlcap(tmp_path / 'elm.vlcap', [], extra=[
+        (BASE, 'T', b'22F190\r'),
+        (BASE + 40_000_000, 'R', b'7E8 10 14 62 F1 90 57 56 57\r7E8 21 5A 5A 5A 31 4B 5A\r\r>'),
+        (BASE + 80_000_000, 'R', b'41 0C 1A F8\r\r>'),
+    ])
+    stats = convert(src, str(tmp_path / 'out.log'))
+    assert stats == {'records': 2, 'skipped': 2}
+    text = (tmp_path / 'out.log').read_text().splitlines()
+    assert text[0] == '(1760000000.040000) can0 7E8#101462F190575657 R'
+    assert text[1].endswith('7E8#215A5A5A314B5A R')
@@ -0,0 +1,59 @@
+from vlinker.capture_format import CaptureReader, CaptureWriter, index_path, read_capture, service_id
+from vlinker.capture_parser import find_seed_requests, parse_capture_file
+
+
+def _write_sample(path, n=3000):
+    with CaptureWriter(str(path), block_records=256) as w:
+        for i in range(n):
+            ts = 1_000_000_000 + i * 1_000_000
+            if i % 100 == 0:
+                w.record('T', bytes([0x27, 0x01]), can_id=0x7E0, ts_ns=ts)
+            else:
+                w.record('T', b'010C\r', ts_ns=ts)
+            w.record('R', b'41 0C 1A F8\r\r>', ts_ns=ts + 500)
+    return path
+
+
+def test_roundtrip_direction_timestamps_and_dictionary(tmp_path):
+    path = _write_sample(tmp_path / 'cap.vlcap')
+    recs = read_capture(str(path))
+    assert len(recs) == 6000
+    assert recs[0].direction == 'T' and recs[0].can_id == 0x7E0 and recs[0].data == b"\x27\x01"
+    assert recs[1] == (1_000_000_500, 'R', 0, None, b'41 0C 1A F8\r\r>')
+    assert recs[-1].ts_ns == 1_000_000_000 + 2999 * 1_000_000 + 500
+    # repeated frames are stored as references: far smaller than the hex text format
+    assert path.stat().st_size < 6000 * 16
+
+
+def test_seek_by_time_and_service_id_with_and_without_sidecar(tmp_path):
+    path = _write_sample(tmp_path / 'cap.vlcap')
+    for _ in range(2):
+        with CaptureReader(str(path)) as r:
+            assert len(r.index) > 1
+            window = list(r.records(start_ns=2_000_000_000, end_ns=2_010_000_000))
+            assert len(window) == 20 and window[0].ts_ns == 2_000_000_000
+            seeds = list(r.records(sid=0x27))
+            assert len(seeds) == 30 and all(rec.data[0] == 0x27 for rec in seeds)
+        # second pass: index rebuilt by scanning
+        (tmp_path / 'cap.vlcap.idx').unlink(missing_ok=True)
+    assert not (tmp_path / 'cap.vlcap.idx').exists() and index_path(str(path)).endswith('.idx')
+
+
+def test_parser_reads_binary_and_legacy_text(tmp_path):
+    path = _write_sample(tmp_path / 'cap.vlcap', n=100)
+    parsed = parse_capture_file(str(path))
+    assert parsed[0][1] == 'T' and len(parsed) == 200
+    assert len(find_seed_requests(parsed)) == 1
+    legacy = tmp_path / 'old.log'
+    legacy.write_text('# vlinker capture\n2024-01-01T00:00:00\tR\t2701\n')
+    assert parse_capture_file(str(legacy)) == [('2024-01-01T00:00:00', 'R', b'\x27\x01')]
+
+
+def test_service_id_does_not_hex_decode_raw_frames():
+    # raw frames that happen to be printable or all hex digits stay binary
+    assert service_id(bytes.fromhex('7F2235')) == 0x7F
+    assert service_id(b'\x62\x41') == 0x62
+    assert service_id(b'7F', can_id=0x7E8) == ord('7')
+    # ELM text is decoded
+    assert service_id(b'7F 22 35\r\r>') == 0x7F
+    assert service_id(b'010C\r') == 0x01
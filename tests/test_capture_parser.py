@@ -0,0 +1,42 @@
+import types
+
+from vlinker.capture_format import CaptureWriter
+from vlinker.capture_parser import find_seed_requests, iter_capture
+from vlinker.profile_builder import analyze_capture
+
+
+def _text_capture(path):
+    path.write_text('# vlinker capture\n'
+                    '2024-01-01T00:00:00\tR\t2701\n'
+                    '2024-01-01T00:00:01\tT\t0100\n'
+                    '2024-01-01T00:00:01\tR\t6701AABB\n'
+                    '2024-01-01T00:00:02\tR\t2701\n')
+    return path
+
+
+def test_iter_capture_is_lazy_and_filters_text(tmp_path):
+    path = str(_text_capture(tmp_path / 'cap.log'))
+    it = iter_capture(path)
+    assert isinstance(it, types.GeneratorType)
+    assert next(it) == ('2024-01-01T00:00:00', 'R', b'\x27\x01')
+    # 2024-01-01T00:00:01Z .. 00:00:02Z
+    window = list(iter_capture(path, start=1704067201, end=1704067202, direction='R'))
+    assert window == [('2024-01-01T00:00:01', 'R', bytes.fromhex('6701AABB'))]
+
+
+def test_iter_capture_binary_time_window(tmp_path):
+    path = str(tmp_path / 'cap.vlcap')
+    with CaptureWriter(path) as w:
+        base_ns, base_wall = w.header['start_ns'], w.header['start_wall']
+        for i in range(100):
+            w.record('T' if i % 2 else 'R', bytes([i]), ts_ns=base_ns + i * 10_000_000)
+    recs = list(iter_capture(path, start=base_wall + 0.2, end=base_wall + 0.4, direction='T'))
+    assert [r[2][0] for r in recs] == list(range(21, 40, 2))
+
+
+def test_seed_search_streams_and_matches_window(tmp_path):
+    path = str(_text_capture(tmp_path / 'cap.log'))
+    seeds = find_seed_requests(iter_capture(path))
+    assert seeds == [('2024-01-01T00:00:00', b'\x27\x01', bytes.fromhex('6701AABB')),
+                     ('2024-01-01T00:00:02', b'\x27\x01', b'')]
+    assert analyze_capture(path)[0]['seed_hex'] == 'aabb'
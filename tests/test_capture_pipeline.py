@@ -0,0 +1,50 @@
+import threading
+
+from vlinker.capture import CapturePipeline
+from vlinker.capture_format import CaptureWriter, read_capture
+
+
+def test_pipeline_keeps_every_frame_from_concurrent_producers(tmp_path):
+    pipe = CapturePipeline(str(tmp_path / 'cap.vlcap')).start()
+
+    def produce(direction):
+        for i in range(5000):
+            pipe.put(direction, b'41 0C %04X\r\r>' % i)
+
+    threads = [threading.Thread(target=produce, args=(d,)) for d in 'TR']
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = pipe.stop()
+    assert stats['records'] == 10000 and stats['segments'] == [str(tmp_path / 'cap.vlcap')]
+    recs = read_capture(stats['segments'][0])
+    assert sum(1 for r in recs if r.direction == 'T') == 5000
+
+
+def test_rotation_and_compression(tmp_path):
+    pipe = CapturePipeline(str(tmp_path / 'cap.vlcap'), max_bytes=4096, compression='gzip', batch=64).start()
+    for i in range(3000):
+        pipe.put('R', b'%06d' % i, ts_ns=i * 1000)
+    stats = pipe.stop()
+    assert len(stats['segments']) > 1 and not stats['errors']
+    assert all(s.endswith('.vlcap.gz') for s in stats['segments'])
+    recs = [r for seg in stats['segments'] for r in read_capture(seg)]
+    assert [r.data for r in recs] == [b'%06d' % i for i in range(3000)]
+
+
+def test_writer_failure_is_reported_and_stop_returns(tmp_path, monkeypatch):
+    class FullDisk(CaptureWriter):
+        def flush(self):
+            raise OSError('No space left on device')
+
+    monkeypatch.setattr('vlinker.capture_format.CaptureWriter', FullDisk)
+    pipe = CapturePipeline(str(tmp_path / 'cap.vlcap'), compression='gzip', flush_interval=0.0).start()
+    for i in range(100):
+        pipe.put('R', b'%06d' % i)
+    result = []
+    stopper = threading.Thread(target=lambda: result.append(pipe.stop()), daemon=True)
+    stopper.start()
+    stopper.join(5)
+    assert result, 'stop() hung after a writer failure'
+    assert 'No space left on device' in result[0]['errors']
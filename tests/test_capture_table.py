@@ -0,0 +1,38 @@
+import pytest
+
+from vlinker import capture_table
+from vlinker.capture_format import CaptureWriter
+from vlinker.capture_table import CaptureTable
+
+
+def _table():
+    t = CaptureTable()
+    for i in range(1000):
+        t.append(i * 1000, 'T', bytes([0x22, 0xF1, 0x90]), can_id=0x7E0)
+        t.append(i * 1000 + 500, 'R', bytes([0x62, 0xF1, 0x90, i & 0xFF]), can_id=0x7E8)
+    return t
+
+
+@pytest.mark.parametrize('use_numpy', [True, False])
+def test_filters_return_views_over_shared_storage(monkeypatch, use_numpy):
+    if not use_numpy:
+        monkeypatch.setattr(capture_table, '_numpy', lambda: None)
+    t = _table()
+    responses = t.by_sid(0x62)
+    assert len(responses) == 1000
+    assert responses._c is t._c
+    window = responses.between(10_000, 20_000).by_can_id(0x7E8)
+    assert [r.ts_ns for r in window] == [i * 1000 + 500 for i in range(10, 20)]
+    assert window[0].data == bytes([0x62, 0xF1, 0x90, 10])
+    assert len(t.by_direction('T')) == 1000 and len(t.by_can_id(0x123)) == 0
+
+
+def test_from_binary_capture_and_compact_storage(tmp_path):
+    path = str(tmp_path / 'cap.vlcap')
+    with CaptureWriter(path) as w:
+        for i in range(500):
+            w.record('R', b'41 0C 1A F8\r\r>', ts_ns=i)
+    t = CaptureTable.from_capture(path)
+    assert len(t) == 500 and t[-1] == (499, 'R', 0, None, b'41 0C 1A F8\r\r>')
+    assert t.by_sid(0x41)[0].ts_ns == 0
+    assert t.nbytes < 500 * (24 + 15) + 16
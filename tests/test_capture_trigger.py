@@ -0,0 +1,58 @@
+import pytest
+
+from vlinker.capture import start_capture
+from vlinker.capture_format import CaptureRecord, read_capture
+from vlinker.capture_trigger import TriggerCapture, make_trigger, parse_trigger_spec
+
+
+def test_incident_contains_pre_and_post_windows(tmp_path):
+    cap = TriggerCapture(str(tmp_path / 'trip'), [parse_trigger_spec('nrc=35')], pre_seconds=1.0,
+                         post_seconds=0.5).start()
+    ms = 1_000_000
+    for i in range(5000):
+        cap.put('R', b'41 0C 1A F8\r\r>', ts_ns=i * 10 * ms)
+        if i == 3000:
+            cap.put('R', b'7F 27 35\r\r>', ts_ns=i * 10 * ms + 1)
+    stats = cap.stop()
+    assert len(stats['incidents']) == 1 and stats['incidents'][0]['data_hex'] == '7f2735'
+    recs = read_capture(stats['incidents'][0]['path'])
+    trigger_ts = 30_000 * ms + 1
+    assert recs[0].ts_ns >= trigger_ts - 1_000 * ms - 1
+    assert recs[-1].ts_ns <= trigger_ts + 500 * ms
+    assert any(r.data == b'7F 27 35\r\r>' for r in recs)
+    assert 140 < len(recs) < 160
+    assert stats['discarded'] > 4000
+
+
+def test_byte_cap_and_predicates(tmp_path):
+    cap = TriggerCapture(str(tmp_path / 'x'), [make_trigger(can_id=0x7E8, sid=0x67)], pre_seconds=100,
+                         post_seconds=0, pre_bytes=40).start()
+    for i in range(100):
+        cap.put('T', bytes([0x27, 0x01]), can_id=0x7E0, ts_ns=i)
+    cap.put('R', bytes([0x67, 0x01, 0xAA]), can_id=0x7E8, ts_ns=100)
+    stats = cap.stop()
+    recs = read_capture(stats['incidents'][0]['path'])
+    assert len(recs) == 21 and recs[-1].can_id == 0x7E8
+    with pytest.raises(ValueError):
+        parse_trigger_spec('bogus=1')
+
+
+def test_raw_negative_response_frames_match():
+    rec = CaptureRecord(0, 'R', 0, 0x7E8, bytes.fromhex('7F2735'))
+    assert make_trigger(nrc=0x35)(rec)
+    assert make_trigger(sid=0x7F)(rec)
+    assert make_trigger(nrc=0x35, sid=0x27)(rec)
+    assert make_trigger(pattern=bytes.fromhex('2735'))(rec)
+    assert not make_trigger(nrc=0x33)(rec)
+
+
+def test_unsupported_capture_options_are_refused(tmp_path):
+    trig = [make_trigger(nrc=0x35)]
+    out = str(tmp_path / 'cap')
+    with pytest.raises(ValueError):
+        start_capture('/dev/null', out, fmt='text', triggers=trig)
+    with pytest.raises(ValueError):
+        start_capture('/dev/null', out, fmt='text', max_bytes=1024)
+    for kwargs in ({'max_bytes': 1024}, {'max_seconds': 60}, {'compression': 'gzip'}):
+        with pytest.raises(ValueError):
+            start_capture('/dev/null', out, triggers=trig, **kwargs)
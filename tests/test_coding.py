@@ -0,0 +1,61 @@
+import pytest
+
+from vlinker.coding import CodingError, apply_coding
+from vlinker.uds import UdsSession
+
+
+class DidEcu:
+    """Transport with a DID store answering 0x22 (several DIDs) and 0x2E."""
+
+    def __init__(self, dids, multi=True, refuse_write=(), ignore_write=()):
+        self.dids = dict(dids)
+        self.multi = multi
+        self.refuse_write = set(refuse_write)
+        self.ignore_write = set(ignore_write)
+        self.sent = []
+
+    def send_hex(self, hexstr):
+        req = bytes.fromhex(hexstr)
+        self.sent.append(req)
+        if req[0] == 0x22:
+            ids = [int.from_bytes(req[i:i + 2], 'big') for i in range(1, len(req), 2)]
+            if len(ids) > 1 and not self.multi:
+                return b'\x7f\x22\x13'
+            if any(d not in self.dids for d in ids):
+                return b'\x7f\x22\x31'
+            return b'\x62' + b''.join(d.to_bytes(2, 'big') + self.dids[d] for d in ids)
+        if req[0] == 0x2E:
+            did = int.from_bytes(req[1:3], 'big')
+            if did in self.refuse_write:
+                return b'\x7f\x2e\x31'
+            if did not in self.ignore_write:
+                self.dids[did] = req[3:]
+            return b'\x6e' + req[1:3]
+        return b'\x7f' + req[:1] + b'\x11'
+
+
+def test_minimal_diff_batched_read_and_verify():
+    ecu = DidEcu({0x0600: b'\x01\x02', 0x0601: b'\x00', 0x0602: b'\x10\x20\x30'})
+    rep = apply_coding(UdsSession('dev', conn=ecu),
+                       {'0600': b'\x01\x02', 0x0601: b'\x05', '0x0602': b'\x10\x20\x31'})
+    assert rep['changed'] == ['0601', '0602'] and rep['unchanged'] == ['0600'] and rep['verified']
+    assert rep['original'] == {'0601': '00', '0602': '102030'}
+    # one batched read, two writes, one batched read-back
+    assert [r[0] for r in ecu.sent] == [0x22, 0x2E, 0x2E, 0x22]
+    assert ecu.dids[0x0602] == b'\x10\x20\x31'
+
+
+def test_failed_write_rolls_back():
+    ecu = DidEcu({0x0600: b'\x01', 0x0601: b'\x02'}, refuse_write={0x0601})
+    with pytest.raises(CodingError) as e:
+        apply_coding(UdsSession('dev', conn=ecu), {0x0600: b'\xaa', 0x0601: b'\xbb'})
+    assert e.value.report['rollback'] == {'restored': ['0600'], 'failed': []}
+    assert ecu.dids == {0x0600: b'\x01', 0x0601: b'\x02'}
+
+
+def test_readback_mismatch_and_single_did_fallback():
+    ecu = DidEcu({0x0600: b'\x01', 0x0601: b'\x02'}, multi=False, ignore_write={0x0601})
+    session = UdsSession('dev', conn=ecu)
+    with pytest.raises(CodingError, match='0601'):
+        apply_coding(session, {0x0600: b'\xaa', 0x0601: b'\xbb'})
+    assert not session.multi_did and ecu.dids[0x0600] == b'\x01'
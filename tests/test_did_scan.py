@@ -0,0 +1,61 @@
+import pytest
+
+from vlinker import did_scan
+from vlinker.did_scan import parse_ranges, scan_dids
+from vlinker.ecu_sim import SimulatedEcu
+from vlinker.uds import UdsSession
+
+DIDS = {0xF190: b'WVWZZZ1KZ', 0xF187: b'5G0', 0x0600: b'\x01\x02', 0x0601: b'\x03'}
+REFUSE = {0x0610: 0x33, 0xF1A0: 0x22}
+
+
+def test_batched_scan_classifies_and_skips_empty_ranges():
+    ecu = SimulatedEcu(dids=DIDS, refuse=REFUSE)
+    state = scan_dids(UdsSession('sim', conn=ecu), parse_ranges('0000-FFFF'))
+    assert state['multi'] and state['done'] == 0x10000
+    assert state['results'] == {
+        '0600': {'class': 'positive', 'value': '0102'}, '0601': {'class': 'positive', 'value': '03'},
+        '0610': {'class': 'security'}, 'F187': {'class': 'positive', 'value': '354730'},
+        'F190': {'class': 'positive', 'value': DIDS[0xF190].hex().upper()}, 'F1A0': {'class': 'conditions'}}
+    assert state['counts']['out_of_range'] == 0x10000 - 6
+    # empty stretches are cleared many DIDs per request
+    assert state['requests'] < 0x10000 // 20
+
+
+def test_single_did_ecu_and_resume(tmp_path):
+    ecu = SimulatedEcu(dids=DIDS, refuse=REFUSE, multi_did=False)
+    path = str(tmp_path / 'scan.json')
+
+    def stop(done, total, rate):
+        if done == 0x10:
+            raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        scan_dids(UdsSession('sim', conn=ecu), parse_ranges('05F0-061F'), state_path=path, progress=stop)
+    ecu.requests.clear()
+    state = scan_dids(UdsSession('sim', conn=ecu), parse_ranges('05F0-061F'), state_path=path)
+    assert not state['multi'] and state['done'] == 0x30
+    assert set(state['results']) == {'0600', '0601', '0610'}
+    # only the remaining DIDs were requested
+    assert len(ecu.requests) == 0x30 - 0x10
+
+
+def test_interrupt_inside_a_batch_counts_nothing_twice(tmp_path, monkeypatch):
+    path = str(tmp_path / 'scan.json')
+    classify = did_scan.classify
+    fired = []
+
+    def flaky(session, did):
+        if did == 0x0601 and not fired:
+            fired.append(did)
+            raise KeyboardInterrupt
+        return classify(session, did)
+
+    monkeypatch.setattr(did_scan, 'classify', flaky)
+    ranges = parse_ranges('0500-06FF')
+    with pytest.raises(KeyboardInterrupt):
+        scan_dids(UdsSession('sim', conn=SimulatedEcu(dids=DIDS, refuse=REFUSE)), ranges, state_path=path)
+    state = scan_dids(UdsSession('sim', conn=SimulatedEcu(dids=DIDS, refuse=REFUSE)), ranges, state_path=path)
+    assert fired and state['done'] == 0x200
+    assert sum(state['counts'].values()) == 0x200
+    assert set(state['results']) == {'0600', '0601', '0610'}
@@ -0,0 +1,51 @@
+from vlinker.dtc_db import DtcDatabase, dtc_category
+from vlinker.uds import parse_dtc_bytes
+
+
+def test_batch_lookup_with_manufacturer_and_profile_overrides(tmp_path):
+    src = tmp_path / 'dtc.tsv'
+    src.write_text('# manufacturer\tcode\tdescription\n'
+                   '\tP0301\tCylinder 1 Misfire Detected\n'
+                   '\tP1128\tgeneric text\n'
+                   'VW\tP1128\tLong Term Fuel Trim too Lean\n', encoding='utf-8')
+    db = DtcDatabase(db_path=tmp_path / 'dtc.sqlite', sources=[src])
+    found = db.describe_many(['P0301', 'p1128', 'U1234'], manufacturer='vw',
+                             overrides={'U1234': 'Gateway lost'})
+    assert found['P0301']['description'] == 'Cylinder 1 Misfire Detected'
+    assert found['P1128'] == {'code': 'P1128', 'description': 'Long Term Fuel Trim too Lean',
+                              'source': 'VW', 'category': 'Powertrain (manufacturer specific)'}
+    assert found['U1234']['source'] == 'profile'
+    assert db.describe('P1128') == 'generic text'
+    db.close()
+
+
+def test_database_rebuilt_when_source_changes(tmp_path):
+    src = tmp_path / 'dtc.tsv'
+    src.write_text('\tP0420\told\n', encoding='utf-8')
+    db = DtcDatabase(db_path=tmp_path / 'dtc.sqlite', sources=[src])
+    assert db.describe('P0420') == 'old'
+    db.close()
+    src.write_text('\tP0420\tCatalyst System Efficiency Below Threshold\n', encoding='utf-8')
+    db = DtcDatabase(db_path=tmp_path / 'dtc.sqlite', sources=[src])
+    assert db.describe('P0420') == 'Catalyst System Efficiency Below Threshold'
+    db.close()
+
+
+def test_parse_dtc_bytes_gives_j2012_codes(tmp_path, monkeypatch):
+    monkeypatch.setenv('VLINKER_CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr('vlinker.dtc_db._DB', None)
+    parsed = parse_dtc_bytes(bytes([0x03, 0x01, 0x00, 0x10, 0xC1, 0x00, 0x87]))
+    assert [e['code'] for e in parsed] == ['P0301', 'U0100']
+    assert parsed[0]['ftb'] == '00' and parsed[0]['status'] == '0x10'
+    assert parsed[0]['description'] == 'Cylinder 1 Misfire Detected'
+
+
+def test_dtc_category_scope_depends_on_system():
+    assert dtc_category('P0301') == 'Powertrain (generic)'
+    assert dtc_category('P2187') == 'Powertrain (generic)'
+    assert dtc_category('P3000') == 'Powertrain (manufacturer specific)'
+    assert dtc_category('P3400') == 'Powertrain (generic)'
+    assert dtc_category('B2100') == 'Body (manufacturer specific)'
+    assert dtc_category('C3000') == 'Chassis (reserved)'
+    assert dtc_category('U0100') == 'Network (generic)'
+    assert dtc_category('U2100') == 'Network (manufacturer specific)'
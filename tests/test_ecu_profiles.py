@@ -0,0 +1,55 @@
+import os
+
+from vlinker import ecu_profiles
+from vlinker.ecu_profiles import ProfileRegistry
+
+SRC = '''from ..ecu_profiles import xor_with_constant
+
+PROFILE = {
+    'name': 'Test ECU',
+    'manufacturer': 'ACME',
+    'ecu_ids': ['7E0'],
+    'seed_key_algo': xor_with_constant(%d),
+}
+'''
+
+
+def _write(path, const, mtime_ns):
+    path.write_text(SRC % const)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_index_without_import_then_lazy_load_and_reload(tmp_path):
+    pdir = tmp_path / 'profiles'
+    pdir.mkdir()
+    prof = pdir / 'acme_test.py'
+    _write(prof, 0x11, 1_000_000_000_000_000_000)
+    reg = ProfileRegistry({'manual': {'name': 'Manual'}}, dirs=[pdir], index_path=tmp_path / 'index.json')
+    meta = reg.index()['acme_test']
+    assert (meta['name'], meta['manufacturer'], meta['ecu_ids'], meta['algo']) == \
+        ('Test ECU', 'ACME', ['7E0'], 'xor_with_constant()')
+    assert reg.names() == ['manual', 'acme_test']
+    assert reg.get('acme_test')['seed_key_algo'](b'\x00') == b'\x11'
+    # same size, new content and mtime: re-executed on the next lookup
+    _write(prof, 0x22, 1_000_000_000_000_000_001)
+    assert reg.get('acme_test')['seed_key_algo'](b'\x00') == b'\x22'
+    # new files show up without a restart
+    _write(pdir / 'acme_other.py', 0x33, 1_000_000_000_000_000_000)
+    assert reg.get('acme_other')['seed_key_algo'](b'\x00') == b'\x33'
+
+
+def test_persisted_index_skips_parsing_unchanged_files(tmp_path, monkeypatch):
+    pdir = tmp_path / 'profiles'
+    pdir.mkdir()
+    _write(pdir / 'acme_test.py', 0x11, 1_000_000_000_000_000_000)
+    ProfileRegistry({}, dirs=[pdir], index_path=tmp_path / 'index.json').index()
+    parsed = []
+    real = ecu_profiles.read_profile_metadata
+    monkeypatch.setattr(ecu_profiles, 'read_profile_metadata', lambda p: parsed.append(p) or real(p))
+    fresh = ProfileRegistry({}, dirs=[pdir], index_path=tmp_path / 'index.json')
+    assert list(fresh.index()) == ['acme_test'] and parsed == []
+
+
+def test_package_profiles_are_registered():
+    assert 'vw_golf_mk7' in ecu_profiles.list_profiles()
+    assert ecu_profiles.get_profile('vw_golf_mk7')['manufacturer'] == 'VW'
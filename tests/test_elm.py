@@ -0,0 +1,54 @@
+from vlinker import elm
+
+
+class FakeElm:
+    """Pipelining ELM fake: answers queued commands one prompt at a time."""
+
+    def __init__(self, protocol_answer=b'A6'):
+        self.lines = []
+        self._answers = []
+        self.protocol_answer = protocol_answer
+
+    def write(self, data: bytes):
+        for line in data.decode('ascii').split('\r'):
+            if not line:
+                continue
+            self.lines.append(line)
+            if line.startswith('AT'):
+                ans = self.protocol_answer if line == 'ATDPN' else b'OK'
+            else:
+                ans = b'41 0C 1A F8'
+            self._answers.append(ans + b'\r\r>')
+
+    def read_until(self, terminator=b'>'):
+        return self._answers.pop(0) if self._answers else b''
+
+
+def test_session_sends_setup_once_and_memoises_protocol(tmp_path):
+    memo = tmp_path / 'memo.json'
+    elm._ADAPTER_STATE.clear()
+    fake = FakeElm()
+    with elm.ElmSession('devA', conn=fake, memo_path=memo) as s:
+        assert s.command('010C') == b'41 0C 1A F8'
+        first = list(fake.lines)
+        s.command('010C')
+    assert first == ['ATE0', 'ATL0', 'ATH0', 'ATSP0', '010C', 'ATDPN']
+    # second command in the same session costs exactly one command
+    assert fake.lines[len(first):] == ['010C']
+    assert elm.load_protocol_memo(memo) == {'devA': '6'}
+
+    # a later session reuses adapter state and the learned protocol
+    fake2 = FakeElm()
+    with elm.ElmSession('devA', conn=fake2, memo_path=memo) as s:
+        s.command('03')
+    assert fake2.lines == ['03']
+
+
+def test_new_device_selects_memoised_protocol(tmp_path):
+    memo = tmp_path / 'memo.json'
+    elm.save_protocol_memo('devB', '6', memo)
+    elm._ADAPTER_STATE.clear()
+    fake = FakeElm()
+    with elm.ElmSession('devB', conn=fake, memo_path=memo) as s:
+        s.command('0100')
+    assert fake.lines == ['ATE0', 'ATL0', 'ATH0', 'ATSP6', '0100']
@@ -0,0 +1,88 @@
+import os
+
+from vlinker.ecu_sim import SimulatedEcu
+from vlinker.flash import download
+from vlinker.uds import UdsSession
+
+
+def _image(tmp_path, size):
+    path = tmp_path / 'image.bin'
+    path.write_bytes(os.urandom(size))
+    return path
+
+
+def test_download_negotiates_block_length_and_quiets_bus(tmp_path):
+    path = _image(tmp_path, 10_000)
+    ecu = SimulatedEcu(memory_size=0x4000, memory_base=0x80000, max_block_length=0x402, pending=1)
+    seen = []
+    res = download(UdsSession('sim', conn=ecu), str(path), 0x80000, progress=lambda *a: seen.append(a))
+    assert ecu.memory[:10_000] == path.read_bytes()
+    assert (res['bytes'], res['block_length'], res['blocks']) == (10_000, 0x402, 10)
+    assert seen[-1][:2] == (10_000, 10_000)
+    # DTC setting and communication were off during the transfer and are back on
+    sids = [r[:2] for r in ecu.requests]
+    assert sids[:2] == [b'\x85\x02', b'\x28\x03'] and sids[-2:] == [b'\x28\x00', b'\x85\x01']
+    assert ecu.dtc_setting and ecu.communication == 0
+
+
+def test_block_sequence_counter_wraps(tmp_path):
+    path = _image(tmp_path, 300 * 32)
+    ecu = SimulatedEcu(memory_size=0x4000, max_block_length=34)
+    res = download(UdsSession('sim', conn=ecu), str(path), 0, quiet_bus=False)
+    assert res['blocks'] == 300 and ecu.memory[:9600] == path.read_bytes()
+    counters = [r[1] for r in ecu.requests if r[0] == 0x36]
+    assert counters[254:258] == [0xFF, 0x00, 0x01, 0x02]
+
+
+class IsoTpEcu:
+    """Raw-CAN transport: ISO-TP frames in and out of a SimulatedEcu."""
+
+    def __init__(self, ecu):
+        self.ecu = ecu
+        self.frames = []
+        self._rx = bytearray()
+        self._rx_len = 0
+        self._out = []
+
+    def _answer(self, resp):
+        if len(resp) <= 7:
+            return [bytes([len(resp)]) + resp]
+        frames = [bytes([0x10 | len(resp) >> 8, len(resp) & 0xFF]) + resp[:6]]
+        for i, pos in enumerate(range(6, len(resp), 7)):
+            frames.append(bytes([0x20 | (i + 1) & 0x0F]) + resp[pos:pos + 7])
+        return frames
+
+    def send_bytes(self, frame):
+        self.frames.append(bytes(frame))
+        kind = frame[0] >> 4
+        if kind == 1:
+            self._rx_len = (frame[0] & 0x0F) << 8 | frame[1]
+            self._rx[:] = frame[2:]
+            return bytes([0x30, 0x00, 0x00])
+        if kind == 2:
+            self._rx += frame[1:]
+            if len(self._rx) < self._rx_len:
+                return b''
+            req = bytes(self._rx[:self._rx_len])
+        else:
+            req = bytes(frame[1:1 + frame[0]])
+        self._out = self._answer(self.ecu.send_bytes(req))
+        return self._out.pop(0)
+
+    def read_all(self):
+        if not self._out:
+            queued = self.ecu.read_all()
+            self._out = self._answer(queued) if queued else []
+        return self._out.pop(0) if self._out else b''
+
+
+def test_download_over_iso_tp_frames(tmp_path):
+    path = _image(tmp_path, 9000)
+    ecu = SimulatedEcu(memory_size=0x4000, max_block_length=0x1002, pending=1)
+    link = IsoTpEcu(ecu)
+    res = download(UdsSession('sim', conn=link, iso_tp=True), str(path), 0)
+    assert ecu.memory[:9000] == path.read_bytes()
+    # the ECU offers 4098 bytes per block, a First Frame announces at most 4095
+    assert res['block_length'] == 4095 and res['blocks'] == 3
+    assert max(len(f) for f in link.frames) <= 8
+    assert [r[0] for r in ecu.requests].count(0x36) == 3
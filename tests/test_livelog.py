@@ -0,0 +1,38 @@
+from vlinker.livelog import LiveLogger, read_live_log, read_live_log_stats
+
+
+class FakeSession:
+    """Answers mode 01 requests; supports PIDs 0C and 0D only."""
+
+    def __init__(self):
+        self.commands = []
+
+    def command(self, cmd: str) -> bytes:
+        self.commands.append(cmd)
+        if cmd == '0100':
+            # bitmap: PIDs 0C and 0D supported, no further ranges
+            return b'41 00 00 18 00 00\r'
+        parts = [b'41']
+        pids = [cmd[i:i + 2] for i in range(2, len(cmd), 2)]
+        for pid in pids:
+            if pid == '0C':
+                parts.append(b'0C 1A F8')
+            elif pid == '0D':
+                parts.append(b'0D 32')
+        return b' '.join(parts) + b'\r'
+
+
+def test_logger_packs_pids_and_skips_unsupported(tmp_path):
+    out = tmp_path / 'drive.vll'
+    sess = FakeSession()
+    stats = LiveLogger(sess, {'0C': 200, '0D': 50, '05': 10}, str(out), chunk_size=8).run(duration=0.2)
+    assert stats['unsupported'] == ['05']
+    # both signals travel in one request when due together
+    assert '010C0D' in sess.commands
+    assert stats['signals']['0C']['samples'] > stats['signals']['0D']['samples'] > 0
+    cols = read_live_log(str(out))
+    times, values = cols['0C']
+    assert len(times) == stats['signals']['0C']['samples']
+    assert set(values) == {0x1AF8}
+    assert list(times) == sorted(times)
+    assert read_live_log_stats(str(out))['requests'] == stats['requests']
@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+from vlinker.ecu_sim import SimulatedEcu
+from vlinker.memread import STATE_SUFFIX, read_memory
+from vlinker.uds import UdsSession
+
+
+def _ecu(**kwargs):
+    ecu = SimulatedEcu(memory_size=0x8000, memory_base=0x10000, **kwargs)
+    ecu.memory[:] = os.urandom(0x8000)
+    return ecu
+
+
+def test_read_finds_and_holds_largest_block(tmp_path):
+    ecu = _ecu(max_read=0x123, read_nrc=0x13)
+    out = str(tmp_path / 'dump.bin')
+    res = read_memory(UdsSession('sim', conn=ecu), 0x10000, 0x8000, out)
+    assert open(out, 'rb').read() == bytes(ecu.memory)
+    assert res['block_size'] == 0x123 and not os.path.exists(out + STATE_SUFFIX)
+    sizes = [int.from_bytes(r[-2:], 'big') for r in ecu.requests]
+    # after the limit is found every read uses it
+    assert sizes[-10:-1] == [0x123] * 9
+
+
+def test_interrupted_read_resumes(tmp_path):
+    ecu = _ecu(max_read=0x100)
+    out = str(tmp_path / 'dump.bin')
+
+    def stop(done, total, rate):
+        if done >= 0x3000:
+            raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        read_memory(UdsSession('sim', conn=ecu), 0x10000, 0x8000, out, progress=stop)
+    assert os.path.exists(out + STATE_SUFFIX)
+    ecu.requests.clear()
+    res = read_memory(UdsSession('sim', conn=ecu), 0x10000, 0x8000, out)
+    assert res['resumed_at'] >= 0x3000 and open(out, 'rb').read() == bytes(ecu.memory)
+    # the learned block size is reused without probing again
+    assert {int.from_bytes(r[-2:], 'big') for r in ecu.requests[:-1]} == {0x100}
+
+
+def test_upload(tmp_path):
+    ecu = _ecu(max_block_length=0x202, pending=1)
+    out = str(tmp_path / 'dump.bin')
+    res = read_memory(UdsSession('sim', conn=ecu), 0x10000, 0x8000, out, method='upload')
+    assert open(out, 'rb').read() == bytes(ecu.memory) and res['block_size'] == 0x200
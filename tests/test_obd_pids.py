@@ -0,0 +1,53 @@
+from array import array
+
+import pytest
+
+from vlinker.obd_pids import (
+    compile_formula,
+    compile_measures,
+    decode_column,
+    decode_measure,
+    decode_mode01_response,
+    decode_pid,
+    parse_support_bitmap,
+)
+
+
+def test_decode_single_samples():
+    assert decode_pid(0x0C, b'\x1a\xf8')['value'] == 1726.0
+    assert decode_pid(0x05, b'\x00')['value'] == -40
+    vals = decode_mode01_response(bytes.fromhex('410C1AF80D32'))
+    assert vals['0D'] == {'name': 'speed', 'value': 0x32, 'units': 'km/h'}
+
+
+def test_support_bitmap():
+    assert parse_support_bitmap(0x00, bytes.fromhex('00180001')) == {0x0C, 0x0D, 0x20}
+
+
+def test_decode_column_vectorised():
+    np = pytest.importorskip('numpy')
+    raw = np.array([0x1AF8, 0x0000, 0xFFFF] * 1000, dtype=np.uint64)
+    rpm = decode_column(0x0C, raw)
+    assert rpm.dtype == np.float64
+    assert list(rpm[:3]) == [1726.0, 0.0, 16383.75]
+    # logger columns (array('Q')) decode without copying into Python objects
+    temps = decode_column(0x05, array('Q', [0, 40, 255]))
+    assert list(temps) == [-40.0, 0.0, 215.0]
+
+
+def test_profile_formulas_are_validated():
+    measures = compile_measures({'measures': {'f40c': {'name': 'boost', 'units': 'mbar', 'formula': '256*A+B-1000'}}})
+    assert decode_measure(measures['F40C'], b'\x04\x00')['value'] == 24
+    with pytest.raises(ValueError):
+        compile_formula('__import__("os").system("x")')
+    # no operators that can blow up the result size
+    for expr in ('A**A**A', '2**2**40', '1<<(A<<B)', 'A<<1000'):
+        with pytest.raises(ValueError):
+            compile_formula(expr)
+    assert compile_formula('(A<<8)|B')(A=1, B=2) == 258
+
+
+def test_formula_arithmetic_errors_decode_as_none():
+    measures = compile_measures({'measures': {'22AA': {'name': 'ratio', 'formula': 'A/B'}}})
+    assert decode_measure(measures['22AA'], b'\x04\x02')['value'] == 2
+    assert decode_measure(measures['22AA'], b'\x04\x00')['value'] is None
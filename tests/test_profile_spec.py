@@ -0,0 +1,57 @@
+import json
+import os
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from vlinker.ecu_profiles import ProfileRegistry
+from vlinker.profile_builder import save_profile_from_suggestion
+from vlinker.profile_spec import KeyPipeline, steps_for_candidate, steps_from_search
+from vlinker.seedkey_search import compile_algorithm
+from vlinker.webapp.main_safe import app
+
+SEEDS = [bytes([i, (i * 7) & 0xFF, (i * 13) & 0xFF, 0xA5 ^ i]) for i in range(100)]
+
+
+def test_pipeline_matches_search_result_and_batches():
+    ops, final = [['xorb', 0x5A], ['rotlb', 3], ['rotl', 7]], ['add', 0x1234ABCD]
+    ref = compile_algorithm(ops, final, 4)
+    pipe = KeyPipeline(steps_from_search(ops, final), width=4)
+    # consecutive byte ops fuse into one translate table, word ops into one stage
+    assert [kind for kind, _a in pipe._stages] == ['table', 'word']
+    assert [pipe(s) for s in SEEDS] == [ref(s) for s in SEEDS]
+    assert pipe.compute_keys(SEEDS) == [ref(s) for s in SEEDS]
+    assert pipe.compute_keys(SEEDS[:3]) == [ref(s) for s in SEEDS[:3]]
+
+
+def test_registry_loads_json_spec(tmp_path):
+    spec = {'name': 'Spec ECU', 'ecu_ids': ['7E0'], 'seed_key': {'steps': [{'op': 'xor', 'value': '0x11'}]}}
+    (tmp_path / 'acme_spec.json').write_text(json.dumps(spec))
+    reg = ProfileRegistry({}, dirs=[tmp_path], index_path=tmp_path / 'index.json')
+    meta = reg.index()['acme_spec']
+    assert (meta['name'], meta['ecu_ids'], meta['algo']) == ('Spec ECU', ['7E0'], 'spec:xor')
+    assert reg.get('acme_spec')['seed_key_algo'](b'\x00\x01') == b'\x00\x10'
+
+
+def test_save_profile_from_suggestion_writes_loadable_spec(tmp_path):
+    suggestion = {'seed_hex': '0102', 'candidates': [{'name': 'xor_5A', 'const': 0x5A}]}
+    path = save_profile_from_suggestion('acme_saved', suggestion, 'xor_5A', out_dir=str(tmp_path))
+    assert os.path.basename(path) == 'acme_saved.json'
+    reg = ProfileRegistry({}, dirs=[tmp_path], index_path=tmp_path / 'index.json')
+    assert reg.get('acme_saved')['seed_key_algo'](b'\x01\x02') == b'\x5b\x58'
+
+
+def test_steps_for_candidate_rejects_malformed_names():
+    assert steps_for_candidate('xor_5A') == [{'op': 'xorb', 'value': 0x5A}]
+    assert steps_for_candidate('xor_zz', {'const': 0x11}) == [{'op': 'xorb', 'value': 0x11}]
+    assert steps_for_candidate('rotl_3') == [{'op': 'rotlb', 'bits': 3}]
+    for name in ('xor_zz', 'rotl_x', 'xor_1FF', 'rotl_9', 'rep_xor_4', 'bogus'):
+        assert steps_for_candidate(name) is None
+
+
+def test_build_endpoint_answers_400_for_malformed_algo():
+    capture = Path(__file__).resolve().parents[1] / 'README.md'
+    client = TestClient(app)
+    for algo in ('xor_zz', 'rotl_x'):
+        r = client.post('/api/profile/build', json={'path': str(capture), 'name': 'acme_bad', 'algo': algo})
+        assert r.status_code == 400
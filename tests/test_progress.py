@@ -0,0 +1,23 @@
+import io
+
+from vlinker.progress import load_checkpoint, progress_printer, save_checkpoint
+
+
+def test_checkpoint_only_resumes_the_same_job(tmp_path):
+    path = str(tmp_path / 'state.json')
+    assert load_checkpoint(path, {'a': 1}) is None
+    save_checkpoint(path, {'job': {'a': 1}, 'done': 5})
+    assert load_checkpoint(path, {'a': 1}) == {'job': {'a': 1}, 'done': 5}
+    assert load_checkpoint(path, {'a': 2}) is None
+    (tmp_path / 'state.json').write_text('{broken')
+    assert load_checkpoint(path, {'a': 1}) is None
+    save_checkpoint(None, {'job': 1})
+
+
+def test_progress_printer_scales_rate():
+    out = io.StringIO()
+    show = progress_printer('KiB/s', 1024, stream=out)
+    show(512, 1024, 2048.0)
+    show(1024, 1024, 2048.0)
+    text = out.getvalue()
+    assert ' 50.0%' in text and '2.0 KiB/s' in text and 'ETA 0m00s' in text and text.endswith('\n')
@@ -1,5 +1,5 @@
 import pytest
-from vlinker.protocols import parse_obd_03_response
+from vlinker.protocols import ElmResponseParser, parse_elm_response, parse_obd_03_response, parse_obd_dtcs_by_ecu
 
 
 def test_parse_obd_03_empty():
@@ -16,4 +16,27 @@ def test_parse_obd_03_sample_ascii():
 def test_parse_obd_03_binary():
     resp = bytes([0x43, 0x01, 0x33, 0x00, 0x00])
     dtcs = parse_obd_03_response(resp)
-    assert isinstance(dtcs, list)
\ No newline at end of file
+    assert isinstance(dtcs, list)
+
+
+def test_elm_parser_keeps_ecus_apart():
+    resp = b'7E8 06 41 00 BE 3F A8 13\r7E9 06 41 00 98 18 80 11\r\r>'
+    parsed = parse_elm_response(resp, headers=True)
+    assert parsed['messages'] == {
+        '7E8': [bytes.fromhex('4100BE3FA813')],
+        '7E9': [bytes.fromhex('410098188011')],
+    }
+
+
+def test_elm_parser_multiframe_and_errors():
+    parser = ElmResponseParser()
+    done = parser.feed(b'014\r0: 49 02 01 31 4A 31\r1: 4A 43 35 34 34 34 52\r2: 37 32 35')
+    assert done == []
+    done = parser.feed(b' 32 33 36 37\r\r>SEARCHING...\rNO DATA\r\r>')
+    assert done[0]['messages'][''] == [bytes.fromhex('490201314A314A43353434345237323532333637')]
+    assert done[1]['messages'] == {} and done[1]['errors'] == ['NO DATA']
+
+
+def test_obd_dtcs_by_ecu():
+    resp = b'7E8 10 08 43 03 01 33 02 20\r7E8 21 C1 05 00 00 00 00 00\r7E9 02 43 00\r>'
+    assert parse_obd_dtcs_by_ecu(resp) == {'7E8': ['P0133', 'P0220', 'U0105'], '7E9': []}
@@ -0,0 +1,41 @@
+import time
+
+from vlinker import elm
+from vlinker.capture_format import CaptureWriter
+from vlinker.replay import parse_replay_device, replay_records
+from vlinker.serial_comm import SerialComm
+
+
+def _elm_capture(path, n=20):
+    ms = 1_000_000
+    with CaptureWriter(str(path)) as w:
+        for i in range(n):
+            t = i * 100 * ms
+            w.record('T', b'010C\r', ts_ns=t)
+            w.record('R', b'41 0C %02X F8\r\r>' % i, ts_ns=t + 50 * ms)
+    return str(path)
+
+
+def test_elm_session_runs_against_replay_at_max_speed(tmp_path):
+    path = _elm_capture(tmp_path / 'cap.vlcap')
+    elm._ADAPTER_STATE['replay-test'] = dict(elm.DEFAULT_SETTINGS, SP='6')
+    sc = SerialComm(f'replay:{path}?speed=max', timeout=0.5)
+    sc.open()
+    t0 = time.monotonic()
+    with elm.ElmSession('replay-test', conn=sc, protocol='6', memo_path=tmp_path / 'm.json') as s:
+        answers = [s.command('010C') for _ in range(20)]
+    assert answers == [b'41 0C %02X F8' % i for i in range(20)]
+    assert sc._ser.mismatches == 0
+    # 2 s of recorded traffic replays in a fraction of that
+    assert time.monotonic() - t0 < 0.5
+
+
+def test_timed_replay_scales_inter_frame_gaps(tmp_path):
+    path = _elm_capture(tmp_path / 'cap.vlcap', n=5)
+    t0 = time.monotonic()
+    recs = list(replay_records(path, speed=10))
+    elapsed = time.monotonic() - t0
+    assert len(recs) == 10
+    # last record at 450 ms of capture time -> ~45 ms at x10
+    assert 0.04 <= elapsed < 0.3
+    assert parse_replay_device('replay:/x.vlcap?speed=max&free=1') == ('/x.vlcap', float('inf'), False)
@@ -0,0 +1,98 @@
+import pytest
+
+from vlinker.advanced import security_unlock
+from vlinker.uds import NegativeResponse, UdsSession
+
+
+class FakeEcu:
+    """Transport answering SecurityAccess like an ECU with key = seed ^ 0xFF."""
+
+    def __init__(self, seed=b'\x12\x34', pending=False):
+        self.seed = seed
+        self.pending = pending
+        self.sent = []
+        self._queued = b''
+
+    def send_hex(self, hexstr):
+        req = bytes.fromhex(hexstr)
+        self.sent.append(req)
+        if req[1] % 2:
+            resp = b'\x67' + req[1:2] + self.seed
+        elif req[2:] == bytes(b ^ 0xFF for b in self.seed):
+            resp = b'\x67' + req[1:2]
+        else:
+            resp = b'\x7f\x27\x35'
+        if self.pending:
+            # answer after a response-pending on the next read
+            self._queued = resp
+            return b'\x7f\x27\x78'
+        return resp
+
+    def read_all(self):
+        resp, self._queued = self._queued, b''
+        return resp
+
+
+def _algo(seed):
+    return bytes(b ^ 0xFF for b in seed)
+
+
+def test_unlock_in_one_session_with_response_pending(tmp_path):
+    ecu = FakeEcu(pending=True)
+    s = UdsSession('dev', conn=ecu, ecu='ecu1')
+    res = security_unlock(s, _algo, state_path=tmp_path / 'state.json')
+    assert res['unlocked'] and res['key'] == b'\xed\xcb'
+    assert ecu.sent == [b'\x27\x01', b'\x27\x02\xed\xcb']
+    # already unlocked in this session: nothing is sent
+    assert security_unlock(s, _algo, state_path=tmp_path / 'state.json')['mode'] == 'session'
+    assert len(ecu.sent) == 2
+
+
+def test_zero_seed_sends_no_key(tmp_path):
+    ecu = FakeEcu(seed=b'\x00\x00')
+    res = security_unlock(UdsSession('dev', conn=ecu), _algo, state_path=tmp_path / 'state.json')
+    assert res['unlocked'] and res['key'] is None and ecu.sent == [b'\x27\x01']
+
+
+def test_attempts_and_delay_are_tracked(tmp_path):
+    state = tmp_path / 'state.json'
+    ecu = FakeEcu()
+    s = UdsSession('dev', conn=ecu, ecu='ecu1')
+    for _ in range(3):
+        with pytest.raises(NegativeResponse) as e:
+            security_unlock(s, lambda seed: b'\x00\x00', state_path=state)
+        assert e.value.nrc == 0x35
+    # the ECU's limit of rejected keys is reached: refused before contacting the ECU
+    with pytest.raises(RuntimeError, match='lock it out'):
+        security_unlock(s, _algo, state_path=state)
+    assert len(ecu.sent) == 6
+    # another session of the same ECU sees the counter; 0x37 starts the delay timer
+    ecu.send_hex = lambda hexstr: b'\x7f\x27\x37'
+    with pytest.raises(NegativeResponse):
+        security_unlock(UdsSession('dev', conn=ecu, ecu='ecu2'), _algo, state_path=state)
+    with pytest.raises(RuntimeError, match='security delay'):
+        security_unlock(UdsSession('dev', conn=ecu, ecu='ecu2'), _algo, state_path=state)
+
+
+def test_last_allowed_attempt_is_sent(tmp_path):
+    state = tmp_path / 'state.json'
+    res = security_unlock(UdsSession('dev', conn=FakeEcu(), ecu='ecu1'), _algo, max_attempts=1, state_path=state)
+    assert res['unlocked']
+    with pytest.raises(NegativeResponse):
+        security_unlock(UdsSession('dev', conn=FakeEcu(), ecu='ecu2'), lambda seed: b'\x00\x00',
+                        max_attempts=1, state_path=state)
+    with pytest.raises(RuntimeError, match='limit of 1'):
+        security_unlock(UdsSession('dev', conn=FakeEcu(), ecu='ecu2'), _algo, max_attempts=1, state_path=state)
+
+
+def test_replies_for_another_sub_function_are_rejected(tmp_path):
+    state = tmp_path / 'state.json'
+    ecu = FakeEcu()
+    ecu.send_hex = lambda hexstr: b'\x67\x03\x12\x34'
+    with pytest.raises(RuntimeError, match='another level'):
+        security_unlock(UdsSession('dev', conn=ecu), _algo, state_path=state)
+    ecu = FakeEcu()
+    answer = ecu.send_hex
+    ecu.send_hex = lambda hexstr: answer(hexstr) if hexstr.startswith('2701') else b'\x67\x04'
+    with pytest.raises(RuntimeError, match='another sub-function'):
+        security_unlock(UdsSession('dev', conn=ecu), _algo, state_path=state)
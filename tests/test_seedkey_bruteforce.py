@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from vlinker.seedkey_bruteforce import bruteforce, key_for  # noqa: E402
+
+SEEDS = [0x1A2B3C4D, 0xDEADBEEF, 0x00C0FFEE, 0x7F000001]
+SPACE = 1 << 24
+
+
+def _pairs(family, const, rotate=0):
+    return [(s.to_bytes(4, 'big'), key_for(family, s, const, rotate).to_bytes(4, 'big')) for s in SEEDS]
+
+
+@pytest.mark.parametrize('family,rotate', [('mul_xor', 0), ('xor_rotl_add', 11), ('add_rotl_xor', 3)])
+def test_sweep_recovers_secret_constant(family, rotate):
+    res = bruteforce(_pairs(family, 0x00ED1234, rotate), family, rotate=rotate, workers=1, space=SPACE,
+                     chunk=1 << 22)
+    assert res['complete'] and res['searched'] == SPACE
+    assert 0x00ED1234 in res['constants']
+    for c in res['constants']:
+        assert all(key_for(family, s, c, rotate) == int.from_bytes(k, 'big')
+                   for s, (_sb, k) in zip(SEEDS, _pairs(family, 0x00ED1234, rotate)))
+
+
+def test_checkpoint_resumes_and_skips_finished_chunks(tmp_path):
+    ckpt = str(tmp_path / 'sweep.json')
+    pairs = _pairs('mul_xor', 0x00ABCDEF)
+    first = bruteforce(pairs, 'mul_xor', workers=1, space=SPACE, chunk=1 << 22, checkpoint=ckpt)
+    state = json.loads(open(ckpt).read())
+    assert len(state['done']) == 4 and 0x00ABCDEF in state['found']
+    # pretend the sweep was interrupted after the first chunk
+    state['done'] = state['done'][:1]
+    state['found'] = []
+    open(ckpt, 'w').write(json.dumps(state))
+    seen = []
+    again = bruteforce(pairs, 'mul_xor', workers=1, space=SPACE, chunk=1 << 22, checkpoint=ckpt,
+                       progress=lambda done, total, rate: seen.append(done))
+    assert seen[0] == 1 << 22 and seen[-1] == SPACE
+    assert again['constants'] == first['constants']
+
+
+def test_checkpoint_of_a_smaller_space_is_not_resumed(tmp_path):
+    ckpt = str(tmp_path / 'sweep.json')
+    pairs = _pairs('mul_xor', 0x00012345)
+    bruteforce(pairs, 'mul_xor', workers=1, space=1 << 22, chunk=1 << 22, checkpoint=ckpt)
+    state = json.loads(open(ckpt).read())
+    state['found'] = []
+    open(ckpt, 'w').write(json.dumps(state))
+    # a wider sweep must start over instead of skipping the chunk marked done
+    res = bruteforce(pairs, 'mul_xor', workers=1, space=SPACE, chunk=1 << 22, checkpoint=ckpt)
+    assert res['searched'] == SPACE and 0x00012345 in res['constants']
@@ -0,0 +1,39 @@
+from vlinker.capture_format import CaptureWriter
+from vlinker.seedkey_search import compile_algorithm, pairs_from_capture, search
+
+SEEDS = [bytes.fromhex(h) for h in ('1A2B3C4D', 'DEADBEEF', '00C0FFEE', '7F000001', '31415926')]
+
+
+def test_search_finds_only_algorithms_consistent_with_every_pair():
+    algo = compile_algorithm([('rotl', 7)], ('xor', 0x5EED1234), 4)
+    pairs = [(s, algo(s)) for s in SEEDS]
+    res = search(pairs, max_depth=1, workers=1)
+    assert res['pairs'] == 5 and res['width'] == 4
+    names = [a['name'] for a in res['algorithms']]
+    assert names[0] == 'rotl(7) -> xor(0x5EED1234)'
+    for a in res['algorithms']:
+        f = compile_algorithm(a['ops'], a['final'], a['width'])
+        assert all(f(s) == k for s, k in pairs)
+
+
+def test_multiply_constant_solved_even_when_first_value_is_even():
+    algo = compile_algorithm([('addb', 0x21), ('bswap', 0)], ('mul', 0x9E3779B1), 4)
+    pairs = [({'seed_hex': s.hex(), 'key_hex': algo(s).hex()}) for s in SEEDS]
+    res = search(pairs, workers=2)
+    assert 'addb(0x21) -> bswap -> mul(0x9E3779B1)' in [a['name'] for a in res['algorithms']]
+
+
+def test_pairs_from_capture_keeps_accepted_keys_only(tmp_path):
+    path = str(tmp_path / 'sa.vlcap')
+    ms = 1_000_000
+    with CaptureWriter(path) as w:
+        for i, seed in enumerate(SEEDS[:3]):
+            t = i * 1000 * ms
+            key = seed[::-1]
+            w.record('T', bytes.fromhex('2701'), can_id=0x7E0, ts_ns=t)
+            w.record('R', bytes.fromhex('6701') + seed, can_id=0x7E8, ts_ns=t + 10 * ms)
+            w.record('T', bytes.fromhex('2702') + key, can_id=0x7E0, ts_ns=t + 20 * ms)
+            # the second key is rejected (invalid key)
+            w.record('R', bytes.fromhex('7F2735') if i == 1 else bytes.fromhex('6702'), can_id=0x7E8,
+                     ts_ns=t + 30 * ms)
+    assert pairs_from_capture(path) == [(SEEDS[0], SEEDS[0][::-1]), (SEEDS[2], SEEDS[2][::-1])]
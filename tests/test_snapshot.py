@@ -0,0 +1,34 @@
+from vlinker.ecu_sim import SimulatedEcu
+from vlinker.snapshot import diff_snapshots, load_snapshot, restore_snapshot, save_snapshot, take_snapshot
+from vlinker.uds import UdsSession
+
+DIDS = {0x0600: b'\x01\x02\x03', 0x0601: b'\x10', 0x0602: b'ABCD', 0xF190: b'WVWZZZ1KZ'}
+
+
+def test_snapshot_roundtrip_batches_after_first_read(tmp_path):
+    lengths = tmp_path / 'lengths.json'
+    ecu = SimulatedEcu(dids=DIDS)
+    snap = take_snapshot(UdsSession('sim', conn=ecu, ecu='ecu1'), ['0600', 0x0601, '0602', 'F190', '0603'],
+                         lengths_path=lengths)
+    assert snap['dids']['0602'] == '41424344' and snap['errors'] == {'0603': '0x31'}
+    path = save_snapshot(snap, str(tmp_path / 'snap.json.gz'))
+    assert load_snapshot(path) == snap
+    # lengths are known now: one multi-DID request for the whole module
+    ecu.requests.clear()
+    again = take_snapshot(UdsSession('sim', conn=ecu, ecu='ecu1'), ['0600', '0601', '0602', 'F190'],
+                          lengths_path=lengths)
+    assert again['dids'] == snap['dids'] and len(ecu.requests) == 1
+
+
+def test_diff_and_restore_only_changed(tmp_path):
+    ecu = SimulatedEcu(dids=DIDS)
+    session = UdsSession('sim', conn=ecu, ecu='ecu1')
+    before = take_snapshot(session, DIDS, lengths_path=tmp_path / 'l.json')
+    ecu.dids[0x0600] = b'\x01\x06\x03'
+    after = take_snapshot(session, DIDS, lengths_path=tmp_path / 'l.json')
+    diff = diff_snapshots(before, after)
+    assert diff == [{'did': '0600', 'a': '010203', 'b': '010603', 'bytes': [{'index': 1, 'a': '02', 'b': '06', 'bits': [2]}]}]
+    ecu.requests.clear()
+    rep = restore_snapshot(session, before)
+    assert rep['written'] == ['0600'] and rep['verified'] and ecu.dids[0x0600] == b'\x01\x02\x03'
+    assert [r[0] for r in ecu.requests].count(0x2E) == 1
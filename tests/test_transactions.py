@@ -0,0 +1,62 @@
+from vlinker.capture_format import CaptureRecord
+from vlinker.transactions import iter_transactions, latency_stats, seed_pairs
+
+
+def _rec(ms, direction, data, can_id=None):
+    return CaptureRecord(ms * 1_000_000, direction, 0, can_id, data)
+
+
+def test_binary_pending_chain_negative_and_timeout():
+    recs = [
+        _rec(0, 'T', bytes.fromhex('22F190'), 0x7E0),
+        _rec(5, 'R', bytes.fromhex('7F2278'), 0x7E8),
+        _rec(40, 'R', bytes.fromhex('62F190414243'), 0x7E8),
+        _rec(50, 'T', bytes.fromhex('2701'), 0x7E0),
+        _rec(60, 'R', bytes.fromhex('6701AABBCCDD'), 0x7E8),
+        _rec(70, 'T', bytes.fromhex('2E0100FF'), 0x7E0),
+        _rec(75, 'R', bytes.fromhex('7F2E33'), 0x7E8),
+        _rec(80, 'T', bytes.fromhex('3E00'), 0x7E0),
+    ]
+    txs = list(iter_transactions(recs))
+    assert [(t.sid, t.status) for t in txs] == [(0x22, 'positive'), (0x27, 'positive'), (0x2E, 'negative'),
+                                                 (0x3E, 'timeout')]
+    assert txs[0].ecu == '7E8' and txs[0].pending == 1 and txs[0].latency_ns == 40_000_000
+    assert txs[2].nrc == 0x33
+    assert seed_pairs(txs) == [(50_000_000, bytes.fromhex('2701'), bytes.fromhex('AABBCCDD'))]
+
+
+def test_elm_text_functional_request_answers_per_ecu_and_stats():
+    recs = []
+    for i in range(10):
+        t = i * 100
+        recs.append(_rec(t, 'T', b'0100\r'))
+        recs.append(_rec(t + 20 + i, 'R', b'7E8 06 41 00 BE 3F A8 13\r'))
+        recs.append(_rec(t + 30 + i, 'R', b'7E9 06 41 00 98 18 80 11\r\r>'))
+    txs = list(iter_transactions(recs, headers=True))
+    assert len(txs) == 20 and {t.ecu for t in txs} == {'7E8', '7E9'}
+    # the whole response is parsed when the prompt arrives
+    stats = latency_stats(txs)
+    s = stats['by_service']['01']
+    assert s['count'] == 20 and s['positive'] == 20
+    assert s['p50_ms'] == 34.0 and s['max_ms'] == 39.0
+    assert stats['by_ecu']['7E8']['count'] == 10
+
+
+def test_elm_pipelined_write_matches_each_command_to_its_prompt():
+    # ElmSession sends pending settings and the request in one write
+    recs = [
+        _rec(0, 'T', b'ATE0\rATL0\rATH0\rATSP0\r010C\r'),
+        _rec(5, 'R', b'OK\r\r>OK\r\r>OK\r\r>OK\r\r>'),
+        _rec(30, 'R', b'41 0C 1A F8\r\r>'),
+        # plain pipelined OBD requests, same service
+        _rec(100, 'T', b'010C\r010D\r'),
+        _rec(120, 'R', b'41 0C 1B 00\r\r>41 0D 32\r\r>'),
+        # NO DATA closes its request at the prompt
+        _rec(200, 'T', b'0146\r'),
+        _rec(210, 'R', b'NO DATA\r\r>'),
+    ]
+    txs = list(iter_transactions(recs))
+    assert [(t.request.hex(), t.status) for t in txs] == [
+        ('010c', 'positive'), ('010c', 'positive'), ('010d', 'positive'), ('0146', 'timeout')]
+    assert txs[0].response == bytes.fromhex('410C1AF8') and txs[0].latency_ns == 30_000_000
+    assert txs[2].response == bytes.fromhex('410D32') and txs[2].ts_ns == 100_000_000
@@ -6,10 +6,27 @@ generic: real vehicle-specific key algorithms are not implemented here — the
 module provides the messaging scaffolding so you can plug in a key algorithm
 or enter the key manually during testing.
 """
-from .serial_comm import SerialComm
+import json
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from . import serial_comm
+from .cache import cache_dir
+from .logger import get_logger
 from .protocols import parse_elm_echo_strip
 from .ecu_profiles import get_profile
-import time
+from .uds import NegativeResponse, UdsSession
+
+logger = get_logger(__name__)
+
+NRC_INVALID_KEY = 0x35
+NRC_EXCEEDED_ATTEMPTS = 0x36
+NRC_DELAY_NOT_EXPIRED = 0x37
+
+# used when the profile does not give the ECU's own values
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_SECURITY_DELAY = 10.0
 
 
 def request_seed(device, sub_function=0x01, baud=115200, timeout=1.0):
@@ -18,7 +35,7 @@ def request_seed(device, sub_function=0x01, baud=115200, timeout=1.0):
     Sends ASCII hex '27 XX' and returns raw response bytes (seed) or None.
     """
     cmd = f"27{int(sub_function):02X}"
-    with SerialComm(device, baud=baud, timeout=timeout) as s:
+    with serial_comm.SerialComm(device, baud=baud, timeout=timeout) as s:
         resp = s.send_hex(cmd)
         # normalize ELM ascii to binary when possible
         raw = parse_elm_echo_strip(resp)
@@ -32,45 +49,157 @@ def send_key(device, key_bytes: bytes, sub_function=0x02, baud=115200, timeout=1
     """
     hexstr = ''.join(f"{b:02X}" for b in key_bytes)
     cmd = f"27{int(sub_function):02X}{hexstr}"
-    with SerialComm(device, baud=baud, timeout=timeout) as s:
+    with serial_comm.SerialComm(device, baud=baud, timeout=timeout) as s:
         resp = s.send_hex(cmd)
         raw = parse_elm_echo_strip(resp)
         return raw
 
 
-def security_access_with_profile(device, profile_name: str, sub_function=0x01, baud=115200, timeout=1.0):
+def _state_path() -> Path:
+    return cache_dir() / 'security_state.json'
+
+
+def load_security_state(path: Optional[Path] = None) -> Dict[str, Dict[str, float]]:
+    """Return the stored ``'<ecu>:<level>' -> {'attempts', 'locked_until'}`` map (empty on error)."""
+    try:
+        p = Path(path) if path else _state_path()
+        with p.open('r', encoding='utf-8') as f:
+            data = json.load(f)
+        return {str(k): dict(v) for k, v in data.items() if isinstance(v, dict)}
+    except Exception:
+        return {}
+
+
+def _save_security_entry(key: str, entry: Optional[Dict[str, float]], path: Optional[Path] = None):
+    """Store (or with None forget) one ECU/level entry. Best-effort."""
+    try:
+        p = Path(path) if path else _state_path()
+        state = load_security_state(p)
+        if entry:
+            state[key] = entry
+        else:
+            state.pop(key, None)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_suffix('.tmp')
+        tmp.write_text(json.dumps(state, indent=2))
+        tmp.replace(p)
+    except Exception as e:
+        logger.debug('could not store security state: %s', e)
+
+
+def security_unlock(session: UdsSession, algo: Optional[Callable[[bytes], bytes]], level: int = 0x01,
+                    max_attempts: int = DEFAULT_MAX_ATTEMPTS, delay: float = DEFAULT_SECURITY_DELAY,
+                    wait: bool = False, force: bool = False, state_path: Optional[Path] = None) -> Dict[str, Any]:
+    """Unlock security `level` (the odd requestSeed sub-function) on an open session.
+
+    The seed request and the key go out on the same held connection. The
+    ECU's delay timer and the count of rejected keys are tracked per ECU
+    and level (persisted in the cache dir), so:
+
+    - a request while the delay timer runs raises RuntimeError without
+      touching the ECU (or sleeps it out with `wait`);
+    - once `max_attempts` keys (the ECU's limit) have been rejected, no
+      further key is sent unless `force` is set;
+    - NRC 0x36/0x37 start the `delay` timer.
+
+    A level already unlocked in this session is not requested again, and an
+    all-zero seed (ECU already unlocked) sends no key. Without `algo` the
+    seed is returned for the operator (``mode='manual'``); the key must then
+    go out on the same `session` (sub-function ``level + 1``), since the
+    ECU drops the seed when the session ends. Replies echoing another
+    sub-function raise RuntimeError. Returns a dict with `seed`, `key`,
+    `response`, `mode` and `unlocked`.
+    """
+    result: Dict[str, Any] = {'seed': None, 'key': None, 'response': None, 'mode': 'manual', 'unlocked': False}
+    if level in session.unlocked:
+        result.update(mode='session', unlocked=True)
+        return result
+    key_id = f'{session.ecu}:{level:02X}'
+    entry = dict(load_security_state(state_path).get(key_id) or {'attempts': 0, 'locked_until': 0.0})
+    remaining = entry.get('locked_until', 0.0) - time.time()
+    if remaining > 0:
+        if not wait:
+            raise RuntimeError(f'security delay for {key_id} runs for another {remaining:.1f}s')
+        logger.debug('waiting %.1fs for the security delay of %s', remaining, key_id)
+        time.sleep(remaining)
+    if algo is not None and entry.get('attempts', 0) >= max_attempts and not force:
+        raise RuntimeError(f'{key_id} rejected {entry["attempts"]} keys, the limit of {max_attempts}; '
+                           f'another invalid key would lock it out (pass force=True to try anyway)')
+
+    def lock(nrc: int):
+        entry.update(attempts=0, locked_until=time.time() + delay)
+        _save_security_entry(key_id, entry, state_path)
+        logger.debug('%s: NRC 0x%02X, delay timer %.1fs', key_id, nrc, delay)
+
+    try:
+        resp = session.request(bytes([0x27, level]))
+    except NegativeResponse as e:
+        if e.nrc in (NRC_EXCEEDED_ATTEMPTS, NRC_DELAY_NOT_EXPIRED):
+            lock(e.nrc)
+        raise
+    if resp[1:2] != bytes([level]):
+        raise RuntimeError(f'seed request for level 0x{level:02X} answered for another level')
+    seed = resp[2:]
+    result['seed'] = seed
+    if not any(seed):
+        # a zero seed means the level is already unlocked
+        session.unlocked.add(level)
+        result.update(mode='unlocked', unlocked=True)
+        return result
+    if algo is None:
+        return result
+    try:
+        key = algo(seed)
+    except Exception as e:
+        raise RuntimeError('Profile algorithm failed: ' + str(e))
+    result.update(key=key, mode='auto')
+    try:
+        resp = session.request(bytes([0x27, level + 1]) + bytes(key))
+    except NegativeResponse as e:
+        if e.nrc == NRC_INVALID_KEY:
+            entry['attempts'] = entry.get('attempts', 0) + 1
+            _save_security_entry(key_id, entry, state_path)
+        elif e.nrc in (NRC_EXCEEDED_ATTEMPTS, NRC_DELAY_NOT_EXPIRED):
+            lock(e.nrc)
+        raise
+    if resp[1:2] != bytes([level + 1]):
+        raise RuntimeError(f'key for level 0x{level:02X} answered for another sub-function')
+    result['response'] = resp
+    _save_security_entry(key_id, None, state_path)
+    result['unlocked'] = True
+    return result
+
+
+def security_access_with_profile(device, profile_name: str, sub_function=0x01, baud=115200, timeout=1.0,
+                                 session: Optional[UdsSession] = None, wait: bool = False, force: bool = False):
     """Perform seed/key security access using a named profile.
 
     If the profile defines `seed_key_algo`, it's called with the seed bytes to
     produce the key which is then sent. If the profile's algo is None, the
-    function returns the seed so the operator can compute and call `send_key`.
-    Returns a dict with keys: `seed`, `key`, `response`, `mode`.
+    function returns the seed so the operator can compute the key. Seed and
+    key use one held `UdsSession` (pass `session` to keep it open for the
+    requests that need the unlock); without `session` the connection closes
+    right after the seed, so in manual mode pass one and send the key on it
+    rather than with `send_key`. See `security_unlock`. The
+    profile may set `security_max_attempts` and `security_delay`.
+    Returns a dict with keys: `seed`, `key`, `response`, `mode`, `unlocked`.
     """
     profile = get_profile(profile_name)
     if not profile:
         raise ValueError('Unknown profile: ' + profile_name)
-    seed = request_seed(device, sub_function=sub_function, baud=baud, timeout=timeout)
-    result = {'seed': seed, 'key': None, 'response': None, 'mode': 'manual'}
+    opts = dict(level=sub_function, wait=wait, force=force,
+                max_attempts=int(profile.get('security_max_attempts', DEFAULT_MAX_ATTEMPTS)),
+                delay=float(profile.get('security_delay', DEFAULT_SECURITY_DELAY)))
     algo = profile.get('seed_key_algo')
-    if algo:
-        # compute key and send
-        try:
-            key = algo(seed or b'')
-        except Exception as e:
-            raise RuntimeError('Profile algorithm failed: ' + str(e))
-        result['key'] = key
-        resp = send_key(device, key, sub_function=sub_function, baud=baud, timeout=timeout)
-        result['response'] = resp
-        result['mode'] = 'auto'
-    else:
-        # manual mode; return seed and let user compute key
-        result['mode'] = 'manual'
-    return result
+    if session is not None:
+        return security_unlock(session, algo, **opts)
+    with UdsSession(device, baud=baud, timeout=timeout, ecu=f'{device}/{profile_name}') as s:
+        return security_unlock(s, algo, **opts)
 
 
 def send_uds_raw(device, hex_payload: str, baud=115200, timeout=1.0):
     """Send a raw UDS hex payload (no spaces) and return normalized response bytes."""
-    with SerialComm(device, baud=baud, timeout=timeout) as s:
+    with serial_comm.SerialComm(device, baud=baud, timeout=timeout) as s:
         resp = s.send_hex(hex_payload)
         raw = parse_elm_echo_strip(resp)
         return raw
@@ -0,0 +1,229 @@
+"""On-disk cache for capture analysis results.
+
+Results are keyed by the capture's content hash (BLAKE2b), the analyzer name
+and its version, so renamed or copied captures hit the cache and a changed
+analyzer never serves stale results. Entries are JSON files under
+``<cache_dir>/analysis``.
+
+Hashing a large capture means reading it; `file_digest` therefore remembers
+digests per (path, size, mtime) in ``digests.json`` and only re-hashes files
+that changed.
+
+The store is bounded (``$VLINKER_ANALYSIS_CACHE_MB``, default 256 MB): a hit
+refreshes the entry's mtime and `put` evicts least recently used entries
+once the total grows past the bound. The digest memo counts towards the
+bound: eviction drops its entries for deleted files and for digests without
+a cached result, and `file_digest` forgets deleted files once the memo holds
+more than `_MEMO_MAX_ENTRIES` paths. `cached_analysis` wraps the whole
+lookup for callers that analyze one capture file.
+"""
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .cache import cache_dir
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+_CHUNK = 1 << 20
+_lock = threading.Lock()
+
+_MEMO = 'digests.json'
+_MEMO_MAX_ENTRIES = 4096
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# eviction frees down to this fraction of the bound so it does not run on every put
+_LOW_WATER = 0.9
+
+
+def _default_max_bytes() -> int:
+    try:
+        return int(float(os.environ['VLINKER_ANALYSIS_CACHE_MB']) * 1024 * 1024)
+    except (KeyError, ValueError):
+        return DEFAULT_MAX_BYTES
+
+
+def _root(root: Optional[Path] = None) -> Path:
+    p = Path(root) if root else cache_dir() / 'analysis'
+    p.mkdir(parents=True, exist_ok=True)
+    return p
+
+
+def hash_file(path: str) -> str:
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _load_json(path: Path) -> Dict[str, Any]:
+    try:
+        with path.open('r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def _store_json(path: Path, data: Any):
+    tmp = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    tmp.write_text(json.dumps(data))
+    tmp.replace(path)
+
+
+def file_digest(path: str, root: Optional[Path] = None) -> str:
+    """Content hash of `path`, re-using the stored digest while size and mtime are unchanged."""
+    st = os.stat(path)
+    stamp = f'{st.st_size}:{st.st_mtime_ns}'
+    memo_path = _root(root) / _MEMO
+    apath = os.path.abspath(path)
+    with _lock:
+        memo = _load_json(memo_path)
+        entry = memo.get(apath)
+        if entry and entry.get('stamp') == stamp:
+            return entry['digest']
+    digest = hash_file(path)
+    with _lock:
+        memo = _load_json(memo_path)
+        memo[apath] = {'stamp': stamp, 'digest': digest}
+        if len(memo) > _MEMO_MAX_ENTRIES:
+            # one entry per path ever hashed (e.g. upload temp files): forget deleted ones
+            memo = {p: e for p, e in memo.items() if os.path.exists(p)}
+        try:
+            _store_json(memo_path, memo)
+        except OSError as e:
+            logger.debug('could not store digest memo: %s', e)
+    return digest
+
+
+def _digest_of(result_path: str) -> str:
+    # result files are named '<digest>-<analyzer>-<version>[-<extra>].json'
+    return os.path.basename(result_path).split('-', 1)[0]
+
+
+class AnalysisCache:
+    """JSON result store keyed by (content digest, analyzer, version, extra), LRU-bounded."""
+
+    def __init__(self, root: Optional[Path] = None, max_bytes: Optional[int] = None):
+        self.root = _root(root)
+        self.max_bytes = _default_max_bytes() if max_bytes is None else int(max_bytes)
+        self._size: Optional[int] = None
+
+    def _path(self, digest: str, analyzer: str, version: str, extra: str = '') -> Path:
+        name = f'{digest}-{analyzer}-{version}'
+        if extra:
+            name += '-' + hashlib.blake2b(extra.encode('utf-8'), digest_size=8).hexdigest()
+        return self.root / f'{name}.json'
+
+    def _entries(self) -> List[Tuple[int, int, str]]:
+        """(mtime_ns, size, path) of every cached result."""
+        out = []
+        with os.scandir(self.root) as it:
+            for e in it:
+                if e.name.endswith('.json') and e.name != _MEMO:
+                    try:
+                        st = e.stat()
+                    except OSError:
+                        continue
+                    out.append((st.st_mtime_ns, st.st_size, e.path))
+        return out
+
+    def _memo_size(self) -> int:
+        try:
+            return (self.root / _MEMO).stat().st_size
+        except OSError:
+            return 0
+
+    def _prune_memo(self, live: set) -> int:
+        """Drop memo entries for deleted files or digests not in `live`; return the memo size."""
+        memo_path = self.root / _MEMO
+        with _lock:
+            memo = _load_json(memo_path)
+            kept = {p: e for p, e in memo.items()
+                    if isinstance(e, dict) and e.get('digest') in live and os.path.exists(p)}
+            if len(kept) != len(memo):
+                try:
+                    _store_json(memo_path, kept)
+                except OSError as e:
+                    logger.debug('could not prune digest memo: %s', e)
+        return self._memo_size()
+
+    def size(self) -> int:
+        """Total bytes of cached results and the digest memo."""
+        return sum(size for _m, size, _p in self._entries()) + self._memo_size()
+
+    def get(self, digest: str, analyzer: str, version: str, extra: str = '') -> Optional[Any]:
+        p = self._path(digest, analyzer, version, extra)
+        if not p.exists():
+            return None
+        data = _load_json(p)
+        if not data:
+            return None
+        try:
+            # mark as recently used
+            os.utime(p)
+        except OSError:
+            pass
+        return data.get('result')
+
+    def put(self, digest: str, analyzer: str, version: str, result: Any, extra: str = ''):
+        p = self._path(digest, analyzer, version, extra)
+        try:
+            _store_json(p, {'result': result})
+        except (OSError, TypeError) as e:
+            logger.debug('could not cache %s result: %s', analyzer, e)
+            return
+        if self._size is None:
+            self._size = self.size()
+        else:
+            try:
+                self._size += p.stat().st_size
+            except OSError:
+                pass
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def evict(self, target: Optional[int] = None) -> int:
+        """Drop least recently used results until at most `target` bytes remain; return the count."""
+        target = int(self.max_bytes * _LOW_WATER) if target is None else target
+        entries = sorted(self._entries())
+        memo_size = self._prune_memo({_digest_of(p) for _m, _s, p in entries})
+        total = sum(size for _m, size, _p in entries) + memo_size
+        removed = set()
+        for _mtime, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed.add(path)
+        if removed:
+            live = {_digest_of(p) for _m, _s, p in entries if p not in removed}
+            total += self._prune_memo(live) - memo_size
+        self._size = total
+        return len(removed)
+
+    def clear(self) -> int:
+        return self.evict(0)
+
+
+def cached_analysis(path: str, analyzer: str, version: str, compute: Callable[[str], Any],
+                    extra: str = '', cache: Optional[AnalysisCache] = None) -> Any:
+    """`compute(path)`, served from the cache while the capture content is unchanged."""
+    try:
+        cache = cache or AnalysisCache()
+        digest = file_digest(path, cache.root)
+    except OSError as e:
+        logger.debug('analysis cache unavailable for %s: %s', path, e)
+        return compute(path)
+    hit = cache.get(digest, analyzer, version, extra)
+    if hit is not None:
+        return hit
+    result = compute(path)
+    cache.put(digest, analyzer, version, result, extra)
+    return result
@@ -0,0 +1,216 @@
+"""Parallel analysis of capture corpora.
+
+`analyze_corpus` takes directories, globs or files, splits the work into
+units (whole files, and block ranges of large binary captures via their
+index) and runs them on a process pool. Each unit correlates transactions
+and extracts seed/key pairs; the partial results are merged into one report
+with per-service and per-ECU latency percentiles, all seed/key pairs and
+the seed/key candidates consistent with the observed keys.
+
+Unit results are cached by capture content hash (`analysis_cache`), so
+re-running an unchanged corpus only hashes files (and skips even that for
+files whose size and mtime are unchanged).
+"""
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+ANALYZER = 'batch'
+ANALYZER_VERSION = '1'
+
+CAPTURE_PATTERNS = ('*.vlcap', '*.vlcap.gz', '*.vlcap.xz', '*.log', '*.cap')
+
+# binary captures larger than this are split into block ranges
+SPLIT_BYTES = 64 * 1024 * 1024
+
+
+def collect_captures(sources: Iterable[str]) -> List[str]:
+    """Expand directories (recursively) and glob patterns into capture file paths."""
+    out: List[str] = []
+    seen = set()
+    for src in sources:
+        if os.path.isdir(src):
+            found = []
+            for pattern in CAPTURE_PATTERNS:
+                found.extend(glob.glob(os.path.join(src, '**', pattern), recursive=True))
+        elif any(c in src for c in '*?['):
+            found = glob.glob(src, recursive=True)
+        else:
+            found = [src]
+        for f in sorted(found):
+            if os.path.isfile(f) and not f.endswith('.idx') and f not in seen:
+                seen.add(f)
+                out.append(f)
+    return out
+
+
+def _units_for(path: str, split_bytes: int) -> List[Tuple[str, int, Optional[int]]]:
+    """(path, first_block, end_block) work units; (path, 0, None) is the whole file."""
+    from .capture_format import CaptureReader, is_binary_capture
+    if os.path.getsize(path) <= split_bytes or path.endswith(('.gz', '.xz')) or not is_binary_capture(path):
+        return [(path, 0, None)]
+    with CaptureReader(path) as r:
+        blocks = r.index
+        if len(blocks) < 2:
+            return [(path, 0, None)]
+        per_block = max(1, os.path.getsize(path) // len(blocks))
+        step = max(1, split_bytes // per_block)
+    return [(path, i, min(i + step, len(blocks))) for i in range(0, len(blocks), step)]
+
+
+def _group_add(groups: Dict[str, Dict[str, Any]], key: str, t):
+    g = groups.setdefault(key, {'count': 0, 'positive': 0, 'negative': 0, 'timeout': 0, 'pending': 0,
+                                'latencies_ns': []})
+    g['count'] += 1
+    g[t.status] += 1
+    g['pending'] += t.pending
+    if t.latency_ns is not None:
+        g['latencies_ns'].append(t.latency_ns)
+
+
+def analyze_unit(unit: Tuple[str, int, Optional[int]], headers: bool = False) -> Dict[str, Any]:
+    """Correlate one work unit into a mergeable partial result (JSON-serialisable)."""
+    from .transactions import iter_transactions, seed_key_pairs
+    path, first, end = unit
+    if end is None:
+        from .capture_parser import iter_capture_records
+        records = iter_capture_records(path)
+        end_ts = None
+    else:
+        records, end_ts = _iter_block_range(path, first, end)
+    by_service: Dict[str, Dict[str, Any]] = {}
+    by_ecu: Dict[str, Dict[str, Any]] = {}
+    txs = []
+    count = 0
+    for t in iter_transactions(records, headers=headers):
+        if t.sid == 0x27:
+            # keys may fall in the overlap; pairs are filtered by seed time below
+            txs.append(t)
+        # requests in the overlap belong to the next unit
+        if end_ts is not None and t.ts_ns >= end_ts:
+            continue
+        count += 1
+        _group_add(by_service, f'{t.sid:02X}', t)
+        _group_add(by_ecu, t.ecu, t)
+    pairs = [{'file': path, 'ts_ns': p['ts_ns'], 'ecu': p['ecu'], 'level': p['level'], 'seed_hex': p['seed'].hex(),
+              'key_hex': p.get('key', b'').hex(), 'accepted': p.get('accepted')}
+             for p in seed_key_pairs(txs) if end_ts is None or p['ts_ns'] < end_ts]
+    return {'transactions': count, 'by_service': by_service, 'by_ecu': by_ecu, 'seed_pairs': pairs}
+
+
+def _iter_block_range(path: str, first: int, end: int):
+    from .capture_format import CaptureReader
+    reader = CaptureReader(path)
+    blocks = reader.index
+    end_ts = blocks[end].ts_ns if end < len(blocks) else None
+
+    def gen():
+        try:
+            # one extra block so answers to requests near the end are still seen
+            yield from reader.block_records(first, end + 1)
+        finally:
+            reader.close()
+
+    return gen(), end_ts
+
+
+def _run_unit(args) -> Dict[str, Any]:
+    unit, headers = args
+    return analyze_unit(unit, headers=headers)
+
+
+def merge_partials(partials: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    merged: Dict[str, Any] = {'transactions': 0, 'by_service': {}, 'by_ecu': {}, 'seed_pairs': []}
+    for part in partials:
+        merged['transactions'] += part['transactions']
+        merged['seed_pairs'].extend(part['seed_pairs'])
+        for group in ('by_service', 'by_ecu'):
+            for key, g in part[group].items():
+                m = merged[group].setdefault(key, {'count': 0, 'positive': 0, 'negative': 0, 'timeout': 0,
+                                                   'pending': 0, 'latencies_ns': []})
+                for field in ('count', 'positive', 'negative', 'timeout', 'pending'):
+                    m[field] += g[field]
+                m['latencies_ns'].extend(g['latencies_ns'])
+    return merged
+
+
+def _finalise_group(g: Dict[str, Any]) -> Dict[str, Any]:
+    from .transactions import _percentile
+    lat = sorted(g['latencies_ns'])
+    out = {k: v for k, v in g.items() if k != 'latencies_ns'}
+    for q in (50, 90, 99):
+        out[f'p{q}_ms'] = _percentile(lat, q) * 1e-6
+    out['max_ms'] = (lat[-1] if lat else 0) * 1e-6
+    return out
+
+
+def rank_candidates(pairs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Score `profile_builder` transforms against every pair with a known key."""
+    from .profile_builder import _propose_from_seed
+    known = [p for p in pairs if p.get('key_hex') and p.get('accepted') is not False]
+    scores: Dict[str, Dict[str, Any]] = {}
+    for p in known:
+        for cand in _propose_from_seed(bytes.fromhex(p['seed_hex'])):
+            s = scores.setdefault(cand['name'], {'name': cand['name'], 'matches': 0, 'pairs': len(known)})
+            if cand['key_hex'] == p['key_hex'].lower():
+                s['matches'] += 1
+    ranked = sorted(scores.values(), key=lambda s: -s['matches'])
+    return [s for s in ranked if s['matches']]
+
+
+def analyze_corpus(sources: Iterable[str], workers: Optional[int] = None, use_cache: bool = True,
+                   headers: bool = False, split_bytes: int = SPLIT_BYTES) -> Dict[str, Any]:
+    """Analyze every capture under `sources` in parallel and return one merged report."""
+    from .analysis_cache import AnalysisCache, file_digest
+    files = collect_captures(sources)
+    cache = AnalysisCache() if use_cache else None
+    partials: List[Dict[str, Any]] = []
+    # (unit, content digest, cache key extra) for units that still need work
+    todo: List[Tuple[Tuple[str, int, Optional[int]], str, str]] = []
+    cached_units = 0
+    for path in files:
+        try:
+            units = _units_for(path, split_bytes)
+            digest = file_digest(path) if cache else ''
+        except (OSError, ValueError) as e:
+            logger.debug('skipping %s: %s', path, e)
+            continue
+        for unit in units:
+            extra = f'{unit[1]}:{unit[2]}:{int(headers)}'
+            hit = cache.get(digest, ANALYZER, ANALYZER_VERSION, extra) if cache else None
+            if hit is None:
+                todo.append((unit, digest, extra))
+                continue
+            # the same content may have been cached under another file name
+            for p in hit['seed_pairs']:
+                p['file'] = path
+            partials.append(hit)
+            cached_units += 1
+    if todo:
+        args = [(unit, headers) for unit, _digest, _extra in todo]
+        if workers == 1 or len(todo) == 1:
+            results = [_run_unit(a) for a in args]
+        else:
+            n = workers or os.cpu_count() or 1
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_run_unit, args, chunksize=max(1, len(args) // (4 * n))))
+        for (_unit, digest, extra), res in zip(todo, results):
+            partials.append(res)
+            if cache:
+                cache.put(digest, ANALYZER, ANALYZER_VERSION, res, extra)
+    merged = merge_partials(partials)
+    return {
+        'files': len(files),
+        'units': len(partials),
+        'cached_units': cached_units,
+        'transactions': merged['transactions'],
+        'by_service': {k: _finalise_group(v) for k, v in sorted(merged['by_service'].items())},
+        'by_ecu': {k: _finalise_group(v) for k, v in sorted(merged['by_ecu'].items())},
+        'seed_pairs': merged['seed_pairs'],
+        'candidates': rank_candidates(merged['seed_pairs']),
+    }
@@ -0,0 +1,14 @@
+"""On-disk cache locations shared by the CLI, webapp and batch tools.
+
+Everything lives under ``$VLINKER_CACHE_DIR`` (default ``~/.cache/vlinker``).
+"""
+import os
+from pathlib import Path
+
+
+def cache_dir() -> Path:
+    """Return the cache directory, creating it if needed."""
+    root = os.environ.get('VLINKER_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'vlinker')
+    p = Path(root)
+    p.mkdir(parents=True, exist_ok=True)
+    return p
@@ -1,19 +1,204 @@
-import time
+import os
+import queue
+import shutil
 import signal
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .logger import get_logger
 from .serial_comm import SerialComm
 
+logger = get_logger(__name__)
+
+_STOP = object()
+
 
 def _hexify(b: bytes) -> str:
     return b.hex().upper()
 
 
-def start_capture(device: str, out_file: str, baud: int = 115200, timeout: float = 1.0, duration: float = None):
-    """Start capturing serial traffic from `device` and write timestamped hex lines to `out_file`.
+def compress_file(path: str, method: str = 'gzip') -> str:
+    """Compress `path` to `path.gz`/`path.xz` with the stdlib and remove the original."""
+    if method == 'gzip':
+        import gzip
+        out, opener = path + '.gz', gzip.open
+    elif method == 'lzma':
+        import lzma
+        out, opener = path + '.xz', lzma.open
+    else:
+        raise ValueError(f'unknown compression: {method}')
+    with open(path, 'rb') as src, opener(out + '.tmp', 'wb') as dst:
+        shutil.copyfileobj(src, dst, 1 << 20)
+    os.replace(out + '.tmp', out)
+    os.remove(path)
+    return out
+
+
+class CapturePipeline:
+    """Queue-backed capture writer.
+
+    `put` (the `SerialComm.tap` signature) only timestamps the frame and
+    queues it, so the thread reading the adapter never waits on disk I/O. A
+    writer thread drains the queue in batches into binary capture segments,
+    starting a new segment after `max_bytes` or `max_seconds`. Closed
+    segments are compressed (`compression='gzip'` or `'lzma'`) on a third
+    thread. The queue is unbounded: a slow disk costs memory, not frames.
+    """
+
+    def __init__(self, out_path: str, max_bytes: Optional[int] = None, max_seconds: Optional[float] = None,
+                 compression: Optional[str] = None, header: Optional[Dict[str, Any]] = None,
+                 batch: int = 1024, flush_interval: float = 1.0):
+        if compression not in (None, 'gzip', 'lzma'):
+            raise ValueError(f'unknown compression: {compression}')
+        self.out_path = out_path
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.compression = compression
+        self.header = header or {}
+        self.batch = int(batch)
+        self.flush_interval = flush_interval
+        self.segments: List[str] = []
+        self.records = 0
+        self.max_queue = 0
+        self.errors: List[str] = []
+        self._q: 'queue.Queue' = queue.Queue()
+        self._cq: 'queue.Queue' = queue.Queue()
+        self._writer = None
+        self._threads: List[threading.Thread] = []
+
+    def _segment_path(self, n: int) -> str:
+        if not self.max_bytes and not self.max_seconds:
+            return self.out_path
+        root, ext = os.path.splitext(self.out_path)
+        return f'{root}-{n:04d}{ext or ".vlcap"}'
 
-    Format: ISO8601<TAB>DIRECTION<TAB>HEX
-    DIRECTION is 'R' (read). Currently no write tracing is done.
+    def put(self, direction: str, data: bytes, channel: int = 0, can_id: Optional[int] = None,
+            ts_ns: Optional[int] = None):
+        """Queue one frame; safe to call from any thread."""
+        self._q.put((time.monotonic_ns() if ts_ns is None else ts_ns, direction, bytes(data), channel, can_id))
+
+    def start(self):
+        self._threads = [threading.Thread(target=self._write_loop, name='capture-writer', daemon=True),
+                         threading.Thread(target=self._compress_loop, name='capture-compress', daemon=True)]
+        for t in self._threads:
+            t.start()
+        return self
+
+    def _open_segment(self):
+        from .capture_format import CaptureWriter
+        path = self._segment_path(len(self.segments) + 1)
+        self._writer = CaptureWriter(path, header=dict(self.header, segment=len(self.segments) + 1))
+        self._segment_start = time.monotonic()
+        self.segments.append(path)
+
+    def _close_segment(self):
+        if self._writer is None:
+            return
+        self._writer.close()
+        if self.compression:
+            self._cq.put(self._writer.path)
+        self._writer = None
+
+    def _write_loop(self):
+        try:
+            self._open_segment()
+            last_flush = time.monotonic()
+            running = True
+            while running:
+                try:
+                    items = [self._q.get(timeout=self.flush_interval)]
+                except queue.Empty:
+                    items = []
+                # drain whatever else is waiting so one wake-up writes a whole batch
+                while items and len(items) < self.batch:
+                    try:
+                        items.append(self._q.get_nowait())
+                    except queue.Empty:
+                        break
+                self.max_queue = max(self.max_queue, self._q.qsize() + len(items))
+                for item in items:
+                    if item is _STOP:
+                        running = False
+                        continue
+                    ts_ns, direction, data, channel, can_id = item
+                    try:
+                        self._writer.record(direction, data, channel, can_id, ts_ns)
+                        self.records += 1
+                    except Exception as e:
+                        self.errors.append(str(e))
+                        logger.debug('capture write failed: %s', e)
+                now = time.monotonic()
+                if ((self.max_bytes and self._writer.size >= self.max_bytes)
+                        or (self.max_seconds and now - self._segment_start >= self.max_seconds)):
+                    self._close_segment()
+                    self._open_segment()
+                elif now - last_flush >= self.flush_interval:
+                    self._writer.flush()
+                    last_flush = now
+            self._close_segment()
+        except Exception as e:
+            # segment could not be opened, flushed or closed (disk full, permissions)
+            self.errors.append(str(e))
+            logger.debug('capture writer stopped: %s', e)
+            if self._writer is not None:
+                try:
+                    self._writer.close()
+                except Exception:
+                    pass
+                self._writer = None
+        finally:
+            # the compress thread must always see the end, or `stop` never returns
+            self._cq.put(_STOP)
+
+    def _compress_loop(self):
+        while True:
+            path = self._cq.get()
+            if path is _STOP:
+                return
+            try:
+                out = compress_file(path, self.compression)
+                self.segments[self.segments.index(path)] = out
+            except Exception as e:
+                self.errors.append(str(e))
+                logger.debug('compressing %s failed: %s', path, e)
+
+    def stop(self) -> Dict[str, Any]:
+        """Write out everything queued, compress the last segment and return stats."""
+        self._q.put(_STOP)
+        for t in self._threads:
+            t.join()
+        return {'records': self.records, 'segments': list(self.segments), 'max_queue': self.max_queue,
+                'errors': list(self.errors)}
+
+
+def start_capture(device: str, out_file: str, baud: int = 115200, timeout: float = 1.0, duration: float = None,
+                  fmt: str = 'binary', max_bytes: Optional[int] = None, max_seconds: Optional[float] = None,
+                  compression: Optional[str] = None, triggers: Optional[List[Any]] = None,
+                  pre_seconds: float = 10.0, post_seconds: float = 5.0, pre_bytes: Optional[int] = None):
+    """Start capturing serial traffic from `device` into `out_file`.
+
+    `fmt='binary'` writes the indexed binary format of `capture_format`
+    (nanosecond timestamps, direction, sidecar ``.idx``). `fmt='text'` writes
+    the legacy line format ISO8601<TAB>DIRECTION<TAB>HEX.
+    Binary captures go through a `CapturePipeline`; `max_bytes`/`max_seconds`
+    rotate segments and `compression` ('gzip'/'lzma') compresses closed ones.
+    With `triggers` (see `capture_trigger`) only incidents are kept: the last
+    `pre_seconds`/`pre_bytes` before each match and `post_seconds` after it.
+    Returns the pipeline stats for binary captures.
     Stops after `duration` seconds if provided, otherwise until Ctrl-C.
+    Raises ValueError for options the chosen mode does not support
+    (triggers or rotation/compression with the text format, rotation or
+    compression together with triggers).
     """
+    if fmt not in ('binary', 'text'):
+        raise ValueError(f'unknown capture format: {fmt}')
+    rotating = [name for name, value in (('max_bytes', max_bytes), ('max_seconds', max_seconds),
+                                         ('compression', compression)) if value]
+    if fmt == 'text' and (triggers or rotating):
+        raise ValueError(f'{", ".join(rotating or ["triggers"])} need the binary capture format')
+    if triggers and rotating:
+        raise ValueError(f'{", ".join(rotating)} cannot be combined with triggers (incidents are single files)')
     stop = False
 
     def _sigint(signum, frame):
@@ -22,6 +207,29 @@ def start_capture(device: str, out_file: str, baud: int = 115200, timeout: float
 
     signal.signal(signal.SIGINT, _sigint)
 
+    if fmt == 'binary':
+        if triggers:
+            from .capture_trigger import TriggerCapture, incident_prefix
+            pipe = TriggerCapture(incident_prefix(out_file), triggers, pre_seconds=pre_seconds,
+                                  post_seconds=post_seconds, pre_bytes=pre_bytes, header={'device': device})
+        else:
+            pipe = CapturePipeline(out_file, max_bytes=max_bytes, max_seconds=max_seconds, compression=compression,
+                                   header={'device': device})
+        start_t = time.monotonic()
+        # short read timeout keeps Ctrl-C and `duration` responsive; no sleep between reads
+        with SerialComm(device, baud=baud, timeout=min(timeout, 0.05)) as s:
+            # every read (and any write made through `s`) lands in the capture
+            s.tap = pipe.put
+            pipe.start()
+            try:
+                while not stop:
+                    if duration and (time.monotonic() - start_t) > duration:
+                        break
+                    s.read_chunk()
+            finally:
+                stats = pipe.stop()
+        return stats
+
     start_t = time.time()
     with SerialComm(device, baud=baud, timeout=timeout) as s, open(out_file, 'wb') as f:
         # header
@@ -48,7 +256,7 @@ def capture_once(device: str, duration: float = 1.0, **kwargs):
     Not robust for production; intended for interactive use.
     """
     import tempfile
-    td = tempfile.NamedTemporaryFile(prefix='vlinker-capture-', suffix='.log', delete=False)
+    td = tempfile.NamedTemporaryFile(prefix='vlinker-capture-', suffix='.vlcap', delete=False)
     td.close()
     start_capture(device, td.name, duration=duration, **kwargs)
     return td.name
@@ -0,0 +1,598 @@
+"""Streaming conversion between vlinker captures and CAN tool formats.
+
+Supported formats (`FORMATS`):
+
+- ``vlcap``: the binary capture format (`capture_format`)
+- ``text``: the legacy ``ISO<TAB>dir<TAB>hex`` capture lines
+- ``candump``: can-utils log files (``candump -L``), ``(ts) can0 7E8#0322F190 R``
+- ``asc``: Vector ASCII logs
+- ``pcap`` / ``pcapng``: Wireshark captures with the SocketCAN link type (227)
+
+Records are streamed one at a time with buffered output, so memory does not
+grow with the capture. Timestamps are carried as Unix time in nanoseconds.
+
+CAN formats hold frames, so only records that are frames are converted: raw
+records with up to 8 (classic) or 64 bytes (CAN FD) and ELM answer lines that
+carry a CAN header (``ATH1``). ELM commands, prompts and header-less answers
+have no CAN ID and are counted as skipped. Record direction is kept where the
+target format has one (candump, ASC, pcapng); pcap has no direction, so its
+frames read back as received.
+"""
+import itertools
+import mmap
+import os
+import re
+import struct
+import time
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from .capture_format import CaptureReader, CaptureRecord, CaptureWriter, is_binary_capture
+from .logger import get_logger
+from .protocols import is_ascii_text
+
+logger = get_logger(__name__)
+
+FORMATS = ('vlcap', 'text', 'candump', 'asc', 'pcap', 'pcapng')
+
+LINKTYPE_CAN_SOCKETCAN = 227
+CAN_EFF_FLAG = 0x80000000
+CAN_RTR_FLAG = 0x40000000
+CAN_ERR_FLAG = 0x20000000
+CAN_EFF_MASK = 0x1FFFFFFF
+CANFD_FDF = 0x04
+CAN_MAX_DLEN = 8
+CANFD_MAX_DLEN = 64
+
+_EXTENSIONS = {
+    '.vlcap': 'vlcap', '.log': 'candump', '.candump': 'candump', '.asc': 'asc',
+    '.pcap': 'pcap', '.pcapng': 'pcapng', '.txt': 'text', '.cap': 'text',
+}
+
+_FLUSH_RECORDS = 4096
+
+# pcap magic for ns and us timestamps
+_PCAP_MAGIC_NS = 0xA1B23C4D
+_PCAP_MAGIC_US = 0xA1B2C3D4
+# SocketCAN frame header: can_id (network order), len, flags, res0, len8_dlc
+_SOCKETCAN = struct.Struct('>IBBBB')
+
+# pcapng block types and the EPB direction flags
+_SHB = 0x0A0D0D0A
+_IDB = 0x00000001
+_SPB = 0x00000003
+_EPB = 0x00000006
+_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+_EPB_INBOUND = 1
+_EPB_OUTBOUND = 2
+
+# ELM answer lines with a header: '7E8 06 41 00 ..' or '18DAF110 03 7F 22 31'
+_HEX = re.compile(rb'^[0-9A-Fa-f]+$')
+
+
+def detect_format(path: str) -> str:
+    """Guess the format of `path` from its magic bytes, then its extension."""
+    if is_binary_capture(path):
+        return 'vlcap'
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(4)
+    except OSError:
+        head = b''
+    if len(head) == 4:
+        magic_le, = struct.unpack('<I', head)
+        magic_be, = struct.unpack('>I', head)
+        if magic_le == _SHB:
+            return 'pcapng'
+        if _PCAP_MAGIC_NS in (magic_le, magic_be) or _PCAP_MAGIC_US in (magic_le, magic_be):
+            return 'pcap'
+    name = path[:-3] if path.endswith(('.gz', '.xz')) else path
+    ext = os.path.splitext(name)[1].lower()
+    if ext in _EXTENSIONS:
+        return _EXTENSIONS[ext]
+    raise ValueError(f'cannot tell the capture format of {path}')
+
+
+def _channel_number(name: str, names: Dict[str, int]) -> int:
+    # 'can0', 'vcan1', 'slcan2' -> trailing number; otherwise order of appearance
+    m = re.search(r'(\d+)$', name)
+    if m:
+        return int(m.group(1)) & 0xFF
+    return names.setdefault(name, len(names))
+
+
+# ---------------------------------------------------------------- readers
+
+def _elm_frames(data: bytes, can_29bit: bool) -> Iterator[Tuple[int, bytes]]:
+    """(can_id, payload) for the header-carrying lines of an ELM answer."""
+    for line in data.replace(b'\n', b'\r').split(b'\r'):
+        tokens = line.replace(b'>', b' ').split()
+        if len(tokens) < 2 or not all(_HEX.match(t) for t in tokens):
+            continue
+        if len(tokens[0]) in (3, 8):
+            head, body = tokens[0], tokens[1:]
+        elif can_29bit and len(tokens) > 4 and all(len(t) == 2 for t in tokens[:4]):
+            head, body = b''.join(tokens[:4]), tokens[4:]
+        else:
+            continue
+        if not all(len(t) == 2 for t in body) or len(body) > CAN_MAX_DLEN:
+            continue
+        yield int(head, 16), bytes.fromhex(b''.join(body).decode('ascii'))
+
+
+def iter_frames(records: Iterable[CaptureRecord], can_29bit: bool = False,
+                stats: Optional[Dict[str, int]] = None) -> Iterator[CaptureRecord]:
+    """Turn capture records into one record per CAN frame (see module docstring).
+
+    Records that are not frames increment ``stats['skipped']``.
+    """
+    skipped = 0
+    try:
+        for rec in records:
+            data = rec.data
+            if rec.can_id is not None:
+                if len(data) <= CANFD_MAX_DLEN:
+                    yield rec
+                else:
+                    skipped += 1
+                continue
+            found = False
+            if rec.direction == 'R' and is_ascii_text(data):
+                for can_id, payload in _elm_frames(bytes(data), can_29bit):
+                    found = True
+                    yield CaptureRecord(rec.ts_ns, 'R', rec.channel, can_id, payload)
+            if not found:
+                skipped += 1
+    finally:
+        if stats is not None:
+            stats['skipped'] = stats.get('skipped', 0) + skipped
+
+
+def _read_vlcap(path: str) -> Iterator[CaptureRecord]:
+    with CaptureReader(path) as r:
+        # monotonic capture clock -> Unix ns
+        offset = int(r.header.get('start_wall', 0.0) * 1e9) - r.header.get('start_ns', 0)
+        if not offset:
+            yield from r
+            return
+        for rec in r:
+            yield CaptureRecord(rec.ts_ns + offset, rec.direction, rec.channel, rec.can_id, rec.data)
+
+
+def _read_text(path: str) -> Iterator[CaptureRecord]:
+    from .capture_parser import iter_capture_records
+    return iter_capture_records(path)
+
+
+def _read_candump(path: str) -> Iterator[CaptureRecord]:
+    names: Dict[str, int] = {}
+    with open(path, 'r', encoding='ascii', errors='replace') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) < 3 or not parts[0].startswith('('):
+                continue
+            frame = parts[2]
+            ident, sep, body = frame.partition('#')
+            if not sep or body[:1] == 'R':
+                continue  # not a frame, or remote frame
+            if body[:1] == '#':
+                body = body[2:]  # CAN FD: '##<flags><data>'
+            try:
+                secs, _dot, frac = parts[0][1:-1].partition('.')
+                ts_ns = int(secs) * 1_000_000_000 + int((frac + '000000000')[:9])
+                can_id = int(ident, 16)
+                data = bytes.fromhex(body.replace('.', ''))
+            except ValueError:
+                continue
+            direction = 'T' if len(parts) > 3 and parts[3] == 'T' else 'R'
+            yield CaptureRecord(ts_ns, direction, _channel_number(parts[1], names), can_id, data)
+
+
+_ASC_DATE_FORMATS = ('%a %b %d %I:%M:%S.%f %p %Y', '%a %b %d %H:%M:%S.%f %Y', '%a %b %d %I:%M:%S %p %Y',
+                     '%a %b %d %H:%M:%S %Y')
+
+
+def _asc_base_ns(text: str) -> int:
+    from datetime import datetime
+    for fmt in _ASC_DATE_FORMATS:
+        try:
+            return round(datetime.strptime(text.strip(), fmt).timestamp() * 1000) * 1_000_000
+        except ValueError:
+            continue
+    return 0
+
+
+def _read_asc(path: str) -> Iterator[CaptureRecord]:
+    base = 0
+    with open(path, 'r', encoding='ascii', errors='replace') as f:
+        for line in f:
+            parts = line.split()
+            if not parts:
+                continue
+            if parts[0] == 'date':
+                base = _asc_base_ns(line.strip()[5:])
+                continue
+            try:
+                ts_ns = base + int(round(float(parts[0]) * 1e9))
+            except ValueError:
+                continue
+            try:
+                if parts[1] == 'CANFD':
+                    # ts CANFD ch dir id [name] brs esi dlc len data...
+                    ch, direction, ident = parts[2], parts[3], parts[4]
+                    rest = parts[5:]
+                    if rest and rest[0] not in ('0', '1'):
+                        rest = rest[1:]
+                    length = int(rest[3])
+                    data = bytes.fromhex(''.join(rest[4:4 + length]))
+                else:
+                    # ts ch id dir d dlc data...
+                    ch, ident, direction = parts[1], parts[2], parts[3]
+                    if len(parts) < 6 or parts[4].lower() != 'd':
+                        continue  # remote frames, error frames, events
+                    length = int(parts[5], 16)
+                    data = bytes.fromhex(''.join(parts[6:6 + length]))
+                if not ch.isdigit():
+                    continue
+                can_id = int(ident.rstrip('xX'), 16)
+            except (ValueError, IndexError):
+                continue
+            yield CaptureRecord(ts_ns, 'T' if direction.lower() == 'tx' else 'R', max(0, int(ch) - 1) & 0xFF,
+                                can_id, data)
+
+
+def _mapped(path: str):
+    """Read-only mmap of `path` (None for an empty file)."""
+    with open(path, 'rb') as f:
+        try:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return None
+
+
+def _read_pcap(path: str) -> Iterator[CaptureRecord]:
+    mm = _mapped(path)
+    if mm is None or len(mm) < 24:
+        return
+    try:
+        for order in '<>':
+            magic, = struct.unpack_from(order + 'I', mm)
+            if magic in (_PCAP_MAGIC_NS, _PCAP_MAGIC_US):
+                break
+        else:
+            raise ValueError('not a pcap file')
+        linktype = struct.unpack_from(order + 'I', mm, 20)[0] & 0xFFFF
+        if linktype != LINKTYPE_CAN_SOCKETCAN:
+            raise ValueError(f'pcap link type {linktype} is not SocketCAN')
+        scale = 1 if magic == _PCAP_MAGIC_NS else 1000
+        unpack_rec = struct.Struct(order + 'III').unpack_from
+        unpack_can = _SOCKETCAN.unpack_from
+        pos, size = 24, len(mm)
+        while pos + 16 <= size:
+            sec, frac, incl = unpack_rec(mm, pos)
+            pos += 16
+            if incl >= 8 and pos + incl <= size:
+                raw_id, length, _f, _r0, _r1 = unpack_can(mm, pos)
+                if not raw_id & (CAN_RTR_FLAG | CAN_ERR_FLAG):
+                    yield CaptureRecord(sec * 1_000_000_000 + frac * scale, 'R', 0, raw_id & CAN_EFF_MASK,
+                                        mm[pos + 8:pos + 8 + length])
+            pos += incl
+    finally:
+        mm.close()
+
+
+def _pcapng_options(body: bytes, order: str) -> Iterator[Tuple[int, bytes]]:
+    pos = 0
+    while pos + 4 <= len(body):
+        code, length = struct.unpack_from(order + 'HH', body, pos)
+        if code == 0:
+            return
+        yield code, bytes(body[pos + 4:pos + 4 + length])
+        pos += 4 + ((length + 3) & ~3)
+
+
+def _read_pcapng(path: str) -> Iterator[CaptureRecord]:
+    mm = _mapped(path)
+    if mm is None:
+        return
+    order = '<'
+    # per interface: (link type, ns per tick, channel)
+    interfaces = []
+    names: Dict[str, int] = {}
+    unpack_block = struct.Struct('<II').unpack_from
+    unpack_epb = struct.Struct('<IIIII').unpack_from
+    unpack_flags = struct.Struct('<HHI').unpack_from
+    unpack_can = _SOCKETCAN.unpack_from
+    pos, size = 0, len(mm)
+    try:
+        while pos + 12 <= size:
+            btype, = struct.unpack_from('<I', mm, pos)
+            if btype == _SHB:
+                bom, = struct.unpack_from('<I', mm, pos + 8)
+                order = '<' if bom == _BYTE_ORDER_MAGIC else '>'
+                unpack_block = struct.Struct(order + 'II').unpack_from
+                unpack_epb = struct.Struct(order + 'IIIII').unpack_from
+                unpack_flags = struct.Struct(order + 'HHI').unpack_from
+                interfaces = []
+            btype, total = unpack_block(mm, pos)
+            if total < 12 or pos + total > size:
+                return  # truncated
+            body = pos + 8
+            if btype == _EPB:
+                iface, hi, lo, cap_len, _orig = unpack_epb(mm, body)
+                if iface < len(interfaces) and interfaces[iface][0] == LINKTYPE_CAN_SOCKETCAN and cap_len >= 8:
+                    _lt, tick, channel = interfaces[iface]
+                    pkt = body + 20
+                    raw_id, length, _f, _r0, _r1 = unpack_can(mm, pkt)
+                    if not raw_id & (CAN_RTR_FLAG | CAN_ERR_FLAG):
+                        direction = 'R'
+                        opt = pkt + ((cap_len + 3) & ~3)
+                        end = pos + total - 4
+                        first = unpack_flags(mm, opt) if opt + 8 <= end else (0, 0, 0)
+                        if first[:2] == (2, 4):
+                            # epb_flags first, as written by `_write_pcapng`
+                            if first[2] & 0x3 == _EPB_OUTBOUND:
+                                direction = 'T'
+                        elif opt < end:
+                            for code, value in _pcapng_options(mm[opt:end], order):
+                                if code == 2 and len(value) == 4:  # epb_flags
+                                    if struct.unpack(order + 'I', value)[0] & 0x3 == _EPB_OUTBOUND:
+                                        direction = 'T'
+                        ts = (hi << 32) | lo
+                        yield CaptureRecord(ts * tick if tick == 1 else int(ts * tick), direction, channel,
+                                            raw_id & CAN_EFF_MASK, mm[pkt + 8:pkt + 8 + length])
+            elif btype == _IDB:
+                linktype, = struct.unpack_from(order + 'H', mm, body)
+                tick, channel = 1000, len(interfaces)
+                for code, value in _pcapng_options(mm[body + 8:pos + total - 4], order):
+                    if code == 9 and value:  # if_tsresol
+                        res = value[0]
+                        tick = 2 ** -(res & 0x7F) * 1e9 if res & 0x80 else 10 ** (9 - res)
+                    elif code == 2:  # if_name
+                        channel = _channel_number(value.decode('utf-8', 'replace'), names)
+                interfaces.append((linktype, tick, channel))
+            elif btype == _SPB and interfaces and interfaces[0][0] == LINKTYPE_CAN_SOCKETCAN:
+                # simple packets carry no timestamp
+                raw_id, length, _f, _r0, _r1 = unpack_can(mm, body + 4)
+                if not raw_id & (CAN_RTR_FLAG | CAN_ERR_FLAG):
+                    yield CaptureRecord(0, 'R', interfaces[0][2], raw_id & CAN_EFF_MASK,
+                                        mm[body + 12:body + 12 + length])
+            pos += total
+    finally:
+        mm.close()
+
+
+_READERS = {
+    'vlcap': _read_vlcap, 'text': _read_text, 'candump': _read_candump, 'asc': _read_asc,
+    'pcap': _read_pcap, 'pcapng': _read_pcapng,
+}
+
+
+def read_records(path: str, fmt: Optional[str] = None) -> Iterator[CaptureRecord]:
+    """Stream the records of `path` (any of `FORMATS`) with Unix-ns timestamps."""
+    fmt = fmt or detect_format(path)
+    if fmt not in _READERS:
+        raise ValueError(f'unknown capture format: {fmt}')
+    return _READERS[fmt](path)
+
+
+# ---------------------------------------------------------------- writers
+
+def _write_vlcap(records: Iterable[CaptureRecord], path: str) -> int:
+    n = 0
+    # record timestamps are already Unix ns
+    with CaptureWriter(path, header={'start_wall': 0.0, 'start_ns': 0, 'converted': True}) as w:
+        add = w.record
+        for rec in records:
+            add(rec.direction, rec.data, rec.channel, rec.can_id, rec.ts_ns)
+            n += 1
+    return n
+
+
+def _write_lines(path: str, lines: Iterator[str], header: str = '', footer: str = '') -> int:
+    n = 0
+    buf = []
+    with open(path, 'w', encoding='ascii', newline='\n') as f:
+        f.write(header)
+        for line in lines:
+            buf.append(line)
+            if len(buf) >= _FLUSH_RECORDS:
+                f.write(''.join(buf))
+                n += len(buf)
+                buf.clear()
+        f.write(''.join(buf))
+        n += len(buf)
+        f.write(footer)
+    return n
+
+
+def _write_text(records: Iterable[CaptureRecord], path: str) -> int:
+    def lines():
+        last_sec, stamp = None, ''
+        for rec in records:
+            sec = rec.ts_ns // 1_000_000_000
+            if sec != last_sec:
+                last_sec, stamp = sec, time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(sec))
+            yield f'{stamp}\t{rec.direction}\t{rec.data.hex().upper()}\n'
+    return _write_lines(path, lines())
+
+
+def _can_id_text(can_id: int) -> str:
+    return f'{can_id:03X}' if can_id <= 0x7FF else f'{can_id:08X}'
+
+
+def _write_candump(records: Iterable[CaptureRecord], path: str) -> int:
+    def lines():
+        for rec in records:
+            sec, ns = divmod(rec.ts_ns, 1_000_000_000)
+            data = bytes(rec.data).hex().upper()
+            sep = '#' if len(rec.data) <= CAN_MAX_DLEN else '##0'
+            yield f'({sec}.{ns // 1000:06d}) can{rec.channel} {_can_id_text(rec.can_id)}{sep}{data} {rec.direction}\n'
+    return _write_lines(path, lines())
+
+
+def _asc_date(ts_ns: int) -> str:
+    lt = time.localtime(ts_ns // 1_000_000_000)
+    ms = (ts_ns // 1_000_000) % 1000
+    return time.strftime('%a %b %d %I:%M:%S', lt) + f'.{ms:03d} ' + time.strftime('%p %Y', lt).lower()
+
+
+def _write_asc(records: Iterable[CaptureRecord], path: str) -> int:
+    it = iter(records)
+    first = next(it, None)
+    base = first.ts_ns if first is not None else time.time_ns()
+    # the date line has millisecond resolution; offsets are relative to it
+    base -= base % 1_000_000
+    date = _asc_date(base)
+    header = (f'date {date}\nbase hex  timestamps absolute\ninternal events logged\n'
+              f'Begin Triggerblock {date}\n')
+
+    def lines():
+        if first is None:
+            return
+        for r in itertools.chain((first,), it):
+            ts = (r.ts_ns - base) / 1e9
+            ident = f'{r.can_id:X}' + ('x' if r.can_id > 0x7FF else '')
+            direction = 'Tx' if r.direction == 'T' else 'Rx'
+            data = bytes(r.data).hex(' ').upper()
+            n = len(r.data)
+            if n <= CAN_MAX_DLEN:
+                yield f'{ts:11.6f} {r.channel + 1}  {ident:<15} {direction}   d {n:X} {data}\n'
+            else:
+                yield (f'{ts:11.6f} CANFD {r.channel + 1:>3} {direction:<4} {ident:>8} 0 0 {_fd_dlc(n):X} '
+                       f'{n:>2} {data} 0 0 1000 0 0 0 0 0\n')
+    return _write_lines(path, lines(), header, 'End TriggerBlock\n')
+
+
+def _fd_dlc(length: int) -> int:
+    if length <= 8:
+        return length
+    for dlc, size in enumerate((12, 16, 20, 24, 32, 48, 64), start=9):
+        if length <= size:
+            return dlc
+    return 15
+
+
+def _fd_size(length: int) -> int:
+    # CAN FD payloads are padded up to the next valid DLC size
+    return length if length <= 8 else (12, 16, 20, 24, 32, 48, 64)[_fd_dlc(length) - 9]
+
+
+def _socketcan_packet(rec: CaptureRecord) -> bytes:
+    can_id = rec.can_id | (CAN_EFF_FLAG if rec.can_id > 0x7FF else 0)
+    n = len(rec.data)
+    if n <= CAN_MAX_DLEN:
+        return _SOCKETCAN.pack(can_id, n, 0, 0, 0) + bytes(rec.data).ljust(CAN_MAX_DLEN, b'\0')
+    return _SOCKETCAN.pack(can_id, n, CANFD_FDF, 0, 0) + bytes(rec.data).ljust(_fd_size(n), b'\0')
+
+
+def _write_binary(path: str, header: bytes, blocks: Iterator[bytes]) -> int:
+    n = 0
+    buf = []
+    with open(path, 'wb') as f:
+        f.write(header)
+        for block in blocks:
+            buf.append(block)
+            if len(buf) >= _FLUSH_RECORDS:
+                f.write(b''.join(buf))
+                n += len(buf)
+                buf.clear()
+        f.write(b''.join(buf))
+        n += len(buf)
+    return n
+
+
+# pcap and pcapng are written big-endian (both formats record their byte
+# order), so a classic frame - record header, SocketCAN header and padded
+# data - is a single struct pack
+_PCAP_CAN = struct.Struct('>IIIIIBBBB8s')
+_EPB_CAN = struct.Struct('>IIIIIIIIBBBB8sHHIII')
+_EPB_CAN_TOTAL = _EPB_CAN.size
+
+
+def _write_pcap(records: Iterable[CaptureRecord], path: str) -> int:
+    header = struct.pack('>IHHiIII', _PCAP_MAGIC_NS, 2, 4, 0, 0, 0xFFFF, LINKTYPE_CAN_SOCKETCAN)
+
+    def blocks():
+        pack = _PCAP_CAN.pack
+        for ts, _d, _ch, can_id, data in records:
+            sec, ns = divmod(ts, 1_000_000_000)
+            n = len(data)
+            if n <= CAN_MAX_DLEN:
+                yield pack(sec, ns, 16, 16, can_id | CAN_EFF_FLAG if can_id > 0x7FF else can_id, n, 0, 0, 0,
+                           data)
+            else:
+                pkt = _socketcan_packet(CaptureRecord(ts, _d, _ch, can_id, data))
+                yield struct.pack('>IIII', sec, ns, len(pkt), len(pkt)) + pkt
+    return _write_binary(path, header, blocks())
+
+
+def _pcapng_block(btype: int, body: bytes) -> bytes:
+    total = 12 + len(body)
+    return struct.pack('>II', btype, total) + body + struct.pack('>I', total)
+
+
+def _pcapng_option(code: int, value: bytes) -> bytes:
+    return struct.pack('>HH', code, len(value)) + value + b'\0' * (-len(value) % 4)
+
+
+def _write_pcapng(records: Iterable[CaptureRecord], path: str) -> int:
+    shb = _pcapng_block(_SHB, struct.pack('>IHHq', _BYTE_ORDER_MAGIC, 1, 0, -1))
+    flags = {'T': _EPB_OUTBOUND, 'R': _EPB_INBOUND}
+    ifaces: Dict[int, int] = {}
+
+    def blocks():
+        pack = _EPB_CAN.pack
+        for ts, direction, channel, can_id, data in records:
+            iface = ifaces.get(channel)
+            if iface is None:
+                # one interface per channel, ns timestamps
+                iface = ifaces[channel] = len(ifaces)
+                opts = (_pcapng_option(2, f'can{channel}'.encode('ascii')) + _pcapng_option(9, b'\x09')
+                        + b'\0\0\0\0')
+                yield _pcapng_block(_IDB, struct.pack('>HHI', LINKTYPE_CAN_SOCKETCAN, 0, 0) + opts)
+            n = len(data)
+            if n <= CAN_MAX_DLEN:
+                # EPB header, frame, epb_flags option, end of options, trailing length
+                yield pack(_EPB, _EPB_CAN_TOTAL, iface, ts >> 32, ts & 0xFFFFFFFF, 16, 16,
+                           can_id | CAN_EFF_FLAG if can_id > 0x7FF else can_id, n, 0, 0, 0, data,
+                           2, 4, flags[direction], 0, _EPB_CAN_TOTAL)
+                continue
+            pkt = _socketcan_packet(CaptureRecord(ts, direction, channel, can_id, data))
+            total = 28 + len(pkt) + 12 + 4
+            yield (struct.pack('>IIIIIII', _EPB, total, iface, ts >> 32, ts & 0xFFFFFFFF, len(pkt), len(pkt))
+                   + pkt + struct.pack('>HHIII', 2, 4, flags[direction], 0, total))
+    # interface blocks are not records
+    return _write_binary(path, shb, blocks()) - len(ifaces)
+
+
+_WRITERS = {
+    'vlcap': _write_vlcap, 'text': _write_text, 'candump': _write_candump, 'asc': _write_asc,
+    'pcap': _write_pcap, 'pcapng': _write_pcapng,
+}
+
+_FRAME_FORMATS = ('candump', 'asc', 'pcap', 'pcapng')
+
+
+def write_records(records: Iterable[CaptureRecord], path: str, fmt: Optional[str] = None,
+                  can_29bit: bool = False) -> Dict[str, Any]:
+    """Write `records` (Unix-ns timestamps) to `path`; return {'records', 'skipped'}."""
+    fmt = fmt or _EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if fmt not in _WRITERS:
+        raise ValueError(f'unknown capture format: {fmt}')
+    stats = {'skipped': 0}
+    if fmt in _FRAME_FORMATS:
+        records = iter_frames(records, can_29bit=can_29bit, stats=stats)
+    n = _WRITERS[fmt](records, path)
+    return {'records': n, 'skipped': stats['skipped']}
+
+
+def convert(src: str, dst: str, src_format: Optional[str] = None, dst_format: Optional[str] = None,
+            can_29bit: bool = False) -> Dict[str, Any]:
+    """Stream-convert `src` to `dst`; formats default to detection by content/extension."""
+    records = read_records(src, src_format)
+    try:
+        return write_records(records, dst, dst_format, can_29bit=can_29bit)
+    finally:
+        close = getattr(records, 'close', None)
+        if close:
+            close()
@@ -0,0 +1,409 @@
+"""Binary capture format with nanosecond timestamps and a seek index.
+
+A capture file starts with ``MAGIC``, a u32 header length and a JSON header,
+followed by length-prefixed records (little endian)::
+
+    u8 flags, u8 channel, u32 can_id, u32 dt_ns, u16 length, length bytes
+
+``flags`` holds the record kind (data, dictionary reference, sync) and the
+direction bit (set = TX). ``dt_ns`` is the time since the previous record on
+the monotonic clock. A sync record carries the absolute u64 timestamp and
+resets the dictionary, so decoding can start at any sync record. Payloads of
+four bytes or more enter a per-block dictionary; repeats (the same ELM answer
+polled over and over) are stored as a 12-byte reference instead.
+
+The writer starts a new block (sync record) every `block_records` records,
+every `block_ns` nanoseconds and before time gaps that do not fit in u32. Each
+block gets an entry in the sidecar index ``<capture>.idx``::
+
+    u64 ts_ns, u64 offset, u32 records, 32 bytes service ID bitmap
+
+which allows seeking by time and skipping blocks without a given service ID.
+`CaptureReader` maps the file with `mmap` and rebuilds the index by scanning
+sync records if the sidecar is missing.
+"""
+import json
+import mmap
+import struct
+import time
+from collections import namedtuple
+from typing import Any, Dict, Iterator, List, Optional
+
+from .logger import get_logger
+from .protocols import hex_to_bytes, is_elm_text
+
+logger = get_logger(__name__)
+
+MAGIC = b'VLCAP\x01'
+INDEX_MAGIC = b'VLIDX\x01'
+
+KIND_DATA = 0
+KIND_REF = 1
+KIND_SYNC = 2
+_KIND_MASK = 0x03
+FLAG_TX = 0x04
+
+NO_CAN_ID = 0xFFFFFFFF
+MAX_PAYLOAD = 0xFFFF
+DICT_MIN_LEN = 4
+DICT_MAX = 4096
+
+_U32 = struct.Struct('<I')
+_U64 = struct.Struct('<Q')
+_REC = struct.Struct('<BBIIH')
+_IDX = struct.Struct('<QQI32s')
+_MAX_DT = 0xFFFFFFFF
+
+# ts_ns: monotonic nanoseconds; direction: 'T' (to the adapter) or 'R' (from it)
+CaptureRecord = namedtuple('CaptureRecord', 'ts_ns direction channel can_id data')
+IndexEntry = namedtuple('IndexEntry', 'ts_ns offset records sids')
+
+
+def service_id(data: bytes, can_id: Optional[int] = None) -> Optional[int]:
+    """Best-effort service ID of a payload (first byte; ELM text is hex-decoded).
+
+    `can_id` is the frame's CAN ID; payloads with one are never ELM text
+    (see `protocols.is_elm_text`).
+    """
+    if not data:
+        return None
+    if is_elm_text(data, can_id):
+        data = hex_to_bytes(data.split(b'\r', 1)[0])
+        if not data:
+            return None
+    return data[0]
+
+
+COMPRESSED_SUFFIXES = {'.gz': 'gzip', '.xz': 'lzma'}
+
+
+def _compression(path: str) -> Optional[str]:
+    for suffix, name in COMPRESSED_SUFFIXES.items():
+        if str(path).endswith(suffix):
+            return name
+    return None
+
+
+def _open_raw(path: str):
+    kind = _compression(path)
+    if kind == 'gzip':
+        import gzip
+        return gzip.open(path, 'rb')
+    if kind == 'lzma':
+        import lzma
+        return lzma.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def index_path(path: str) -> str:
+    """Sidecar index of `path` (compressed segments share the uncompressed name's index)."""
+    path = str(path)
+    for suffix in COMPRESSED_SUFFIXES:
+        if path.endswith(suffix):
+            path = path[:-len(suffix)]
+    return path + '.idx'
+
+
+def is_binary_capture(path: str) -> bool:
+    """True if `path` starts with the binary capture magic."""
+    try:
+        with _open_raw(path) as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except (OSError, EOFError):
+        return False
+
+
+class CaptureWriter:
+    """Append records to a binary capture and its sidecar index.
+
+    `record` has the signature of the `SerialComm.tap` hook, so a writer can
+    be attached to a live connection with ``sc.tap = writer.record``.
+    """
+
+    def __init__(self, path: str, compress: bool = True, block_records: int = 1024,
+                 block_ns: int = 1_000_000_000, header: Optional[Dict[str, Any]] = None):
+        self.path = str(path)
+        self.compress = compress
+        self.block_records = int(block_records)
+        self.block_ns = int(block_ns)
+        self.records = 0
+        self._f = open(self.path, 'wb', buffering=1 << 16)
+        self._idx = open(index_path(self.path), 'wb')
+        self._idx.write(INDEX_MAGIC)
+        self._last_ns: Optional[int] = None
+        self._block_start_ns = 0
+        self._block_offset = 0
+        self._block_records = 0
+        self._block_sids = 0
+        self._dict: Dict[bytes, int] = {}
+        meta = {'version': 1, 'start_wall': time.time(), 'start_ns': time.monotonic_ns(), 'compress': compress}
+        if header:
+            meta.update(header)
+        self.header = meta
+        blob = json.dumps(meta).encode('utf-8')
+        self._f.write(MAGIC + _U32.pack(len(blob)) + blob)
+
+    def _close_block(self):
+        if self._last_ns is None:
+            return
+        self._idx.write(_IDX.pack(self._block_start_ns, self._block_offset, self._block_records,
+                                  self._block_sids.to_bytes(32, 'little')))
+
+    def _sync(self, ts_ns: int):
+        self._close_block()
+        self._block_offset = self._f.tell()
+        self._block_start_ns = ts_ns
+        self._block_records = 0
+        self._block_sids = 0
+        self._dict.clear()
+        self._f.write(_REC.pack(KIND_SYNC, 0, NO_CAN_ID, 0, 8) + _U64.pack(ts_ns))
+        self._last_ns = ts_ns
+
+    def record(self, direction: str, data: bytes, channel: int = 0, can_id: Optional[int] = None,
+               ts_ns: Optional[int] = None):
+        """Append one frame. `direction` is 'T'/'TX' or 'R'/'RX'."""
+        if ts_ns is None:
+            ts_ns = time.monotonic_ns()
+        data = bytes(data)
+        if len(data) > MAX_PAYLOAD:
+            for i in range(0, len(data), MAX_PAYLOAD):
+                self.record(direction, data[i:i + MAX_PAYLOAD], channel, can_id, ts_ns)
+            return
+        last = self._last_ns
+        if (last is None or ts_ns < last or ts_ns - last > _MAX_DT
+                or self._block_records >= self.block_records or ts_ns - self._block_start_ns >= self.block_ns):
+            self._sync(ts_ns)
+            last = ts_ns
+        flags = FLAG_TX if direction[:1].upper() == 'T' else 0
+        cid = NO_CAN_ID if can_id is None else int(can_id)
+        dt = ts_ns - last
+        ref = self._dict.get(data) if self.compress and len(data) >= DICT_MIN_LEN else None
+        if ref is not None:
+            self._f.write(_REC.pack(flags | KIND_REF, channel, cid, dt, ref))
+        else:
+            self._f.write(_REC.pack(flags | KIND_DATA, channel, cid, dt, len(data)))
+            self._f.write(data)
+            if self.compress and len(data) >= DICT_MIN_LEN and len(self._dict) < DICT_MAX:
+                self._dict[data] = len(self._dict)
+        sid = service_id(data, can_id)
+        if sid is not None:
+            self._block_sids |= 1 << sid
+        self._last_ns = ts_ns
+        self._block_records += 1
+        self.records += 1
+
+    @property
+    def size(self) -> int:
+        """Bytes written so far (including buffered data)."""
+        return self._f.tell()
+
+    def flush(self):
+        self._f.flush()
+        self._idx.flush()
+
+    def close(self):
+        if self._f.closed:
+            return
+        self._close_block()
+        self._f.close()
+        self._idx.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _read_index(path: str, data_size: int) -> Optional[List[IndexEntry]]:
+    try:
+        with open(index_path(path), 'rb') as f:
+            blob = f.read()
+    except OSError:
+        return None
+    if not blob.startswith(INDEX_MAGIC):
+        return None
+    body = blob[len(INDEX_MAGIC):]
+    # ignore a partially written last entry
+    body = body[:len(body) - len(body) % _IDX.size]
+    out = []
+    for ts_ns, offset, records, sids in _IDX.iter_unpack(body):
+        if offset >= data_size:
+            return None
+        out.append(IndexEntry(ts_ns, offset, records, int.from_bytes(sids, 'little')))
+    return out
+
+
+class CaptureReader:
+    """Memory-mapped reader for binary captures.
+
+    Segments compressed by the capture pipeline (``.gz``/``.xz``) are
+    decompressed into memory instead of being mapped.
+    """
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        if _compression(self.path):
+            self._f = _open_raw(self.path)
+            self._mm = self._f.read()
+        else:
+            self._f = open(self.path, 'rb')
+            try:
+                self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                self._f.close()
+                raise ValueError('empty capture file')
+        mm = self._mm
+        if mm[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError('not a vlinker binary capture')
+        (hlen,) = _U32.unpack_from(mm, len(MAGIC))
+        start = len(MAGIC) + 4
+        self.header: Dict[str, Any] = json.loads(mm[start:start + hlen])
+        self.data_offset = start + hlen
+        self._index: Optional[List[IndexEntry]] = None
+
+    @property
+    def index(self) -> List[IndexEntry]:
+        """Block index from the sidecar file, or rebuilt by scanning."""
+        if self._index is None:
+            idx = _read_index(self.path, len(self._mm))
+            if idx is None or (not idx and len(self._mm) > self.data_offset):
+                idx = self._scan_index()
+            self._index = idx
+        return self._index
+
+    def _scan_index(self) -> List[IndexEntry]:
+        out: List[IndexEntry] = []
+        block = None
+        for offset, rec in self._iter_raw(self.data_offset, with_sync=True):
+            if rec is None:
+                if block and block[2]:
+                    out.append(IndexEntry(*block))
+                block = [None, offset, 0, 0]
+                continue
+            if block[0] is None:
+                block[0] = rec.ts_ns
+            block[2] += 1
+            sid = service_id(rec.data, rec.can_id)
+            if sid is not None:
+                block[3] |= 1 << sid
+        if block and block[2]:
+            out.append(IndexEntry(*block))
+        return out
+
+    def wall_time(self, ts_ns: int) -> float:
+        """Convert a record timestamp to Unix time."""
+        return self.header.get('start_wall', 0.0) + (ts_ns - self.header.get('start_ns', 0)) / 1e9
+
+    def _iter_raw(self, offset: int, end: Optional[int] = None, with_sync: bool = False):
+        mm = self._mm
+        size = len(mm) if end is None else min(end, len(mm))
+        unpack = _REC.unpack_from
+        hsize = _REC.size
+        table: List[bytes] = []
+        ts = None
+        while offset + hsize <= size:
+            flags, channel, cid, dt, length = unpack(mm, offset)
+            pos = offset + hsize
+            kind = flags & _KIND_MASK
+            if kind == KIND_SYNC:
+                if pos + 8 > len(mm):
+                    return
+                (ts,) = _U64.unpack_from(mm, pos)
+                table = []
+                if with_sync:
+                    yield offset, None
+                offset = pos + length
+                continue
+            if ts is None:
+                raise ValueError(f'capture record at {offset} precedes first sync record')
+            ts += dt
+            if kind == KIND_REF:
+                data = table[length]
+                offset = pos
+            else:
+                if pos + length > len(mm):
+                    # truncated tail (capture still being written or interrupted)
+                    return
+                data = mm[pos:pos + length]
+                offset = pos + length
+                if self.header.get('compress', True) and length >= DICT_MIN_LEN and len(table) < DICT_MAX:
+                    table.append(data)
+            yield offset, CaptureRecord(ts, 'T' if flags & FLAG_TX else 'R', channel,
+                                        None if cid == NO_CAN_ID else cid, data)
+
+    def block_records(self, first: int, end: Optional[int] = None) -> Iterator[CaptureRecord]:
+        """Yield the records of index blocks [first, end)."""
+        blocks = self.index
+        if first >= len(blocks):
+            return
+        stop = blocks[end].offset if end is not None and end < len(blocks) else None
+        for _offset, rec in self._iter_raw(blocks[first].offset, stop):
+            yield rec
+
+    def __iter__(self) -> Iterator[CaptureRecord]:
+        for _offset, rec in self._iter_raw(self.data_offset):
+            yield rec
+
+    def records(self, start_ns: Optional[int] = None, end_ns: Optional[int] = None,
+                sid: Optional[int] = None) -> Iterator[CaptureRecord]:
+        """Yield records in [start_ns, end_ns), optionally only those with service ID `sid`.
+
+        The index is used to start at the right block and to skip blocks that
+        never saw `sid`.
+        """
+        if start_ns is None and sid is None:
+            offset = self.data_offset
+            blocks = None
+        else:
+            blocks = self.index
+            first = 0
+            if start_ns is not None:
+                for i, e in enumerate(blocks):
+                    if e.ts_ns <= start_ns:
+                        first = i
+                    else:
+                        break
+            blocks = blocks[first:]
+            offset = blocks[0].offset if blocks else len(self._mm)
+        if blocks is not None and sid is not None:
+            bit = 1 << sid
+            for i, e in enumerate(blocks):
+                if not e.sids & bit:
+                    continue
+                if end_ns is not None and e.ts_ns >= end_ns:
+                    return
+                end = blocks[i + 1].offset if i + 1 < len(blocks) else None
+                for _o, rec in self._iter_raw(e.offset, end):
+                    if start_ns is not None and rec.ts_ns < start_ns:
+                        continue
+                    if end_ns is not None and rec.ts_ns >= end_ns:
+                        return
+                    if service_id(rec.data, rec.can_id) == sid:
+                        yield rec
+            return
+        for _o, rec in self._iter_raw(offset):
+            if start_ns is not None and rec.ts_ns < start_ns:
+                continue
+            if end_ns is not None and rec.ts_ns >= end_ns:
+                return
+            yield rec
+
+    def close(self):
+        mm = getattr(self, '_mm', None)
+        if isinstance(mm, mmap.mmap) and not mm.closed:
+            mm.close()
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def read_capture(path: str) -> List[CaptureRecord]:
+    """Load every record of a binary capture (payloads copied out of the map)."""
+    with CaptureReader(path) as r:
+        return list(r)
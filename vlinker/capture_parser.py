@@ -1,48 +1,159 @@
-from typing import List, Tuple
+"""Capture file parsing.
 
+`iter_capture` streams records from binary or legacy text captures without
+loading the file: both are memory-mapped and decoded one record at a time,
+with time-range and direction filters applied during the scan.
+"""
+import calendar
+import mmap
+import time
+from collections import deque
+from typing import Iterable, Iterator, List, Optional, Tuple
 
-def parse_capture_file(path: str) -> List[Tuple[str, str, bytes]]:
+from .capture_format import CaptureReader, CaptureRecord, is_binary_capture
+
+CaptureTuple = Tuple[str, str, bytes]
+
+
+def _iso_ns(reader: CaptureReader, ts_ns: int) -> str:
+    wall_ns = int(reader.wall_time(ts_ns) * 1e9)
+    secs, frac = divmod(wall_ns, 1_000_000_000)
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(secs)) + f'.{frac:09d}'
+
+
+def _iso_to_unix(ts: str) -> Optional[float]:
+    base, _sep, frac = ts.partition('.')
+    try:
+        secs = calendar.timegm(time.strptime(base, '%Y-%m-%dT%H:%M:%S'))
+    except ValueError:
+        return None
+    return secs + (float('0.' + frac) if frac.isdigit() else 0.0)
+
+
+def _iter_binary(path: str, start: Optional[float], end: Optional[float],
+                 direction: Optional[str]) -> Iterator[CaptureTuple]:
+    with CaptureReader(path) as r:
+        offset = r.header.get('start_ns', 0) - int(r.header.get('start_wall', 0.0) * 1e9)
+        start_ns = None if start is None else int(start * 1e9) + offset
+        end_ns = None if end is None else int(end * 1e9) + offset
+        for rec in r.records(start_ns=start_ns, end_ns=end_ns):
+            if direction is None or rec.direction == direction:
+                yield _iso_ns(r, rec.ts_ns), rec.direction, rec.data
+
+
+def _iter_text(path: str, start: Optional[float], end: Optional[float],
+               direction: Optional[str]) -> Iterator[CaptureTuple]:
+    with open(path, 'rb') as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return  # empty file
+        try:
+            pos, size = 0, len(mm)
+            last_ts, last_unix = None, None
+            while pos < size:
+                nl = mm.find(b'\n', pos)
+                if nl < 0:
+                    nl = size
+                line = mm[pos:nl].decode('ascii', errors='ignore').strip()
+                pos = nl + 1
+                if not line or line.startswith('#'):
+                    continue
+                parts = line.split('\t')
+                if len(parts) != 3:
+                    continue
+                ts, d, hexstr = parts
+                if direction is not None and d != direction:
+                    continue
+                if start is not None or end is not None:
+                    # text timestamps repeat for a whole second; convert each one once
+                    if ts != last_ts:
+                        last_ts, last_unix = ts, _iso_to_unix(ts)
+                    if last_unix is not None:
+                        if start is not None and last_unix < start:
+                            continue
+                        if end is not None and last_unix >= end:
+                            return
+                try:
+                    data = bytes.fromhex(hexstr)
+                except Exception:
+                    data = b''
+                yield ts, d, data
+        finally:
+            mm.close()
+
+
+def iter_capture(path: str, start: Optional[float] = None, end: Optional[float] = None,
+                 direction: Optional[str] = None) -> Iterator[CaptureTuple]:
+    """Lazily yield (timestamp_str, direction, data_bytes) records from a capture.
+
+    `start`/`end` are Unix times (end exclusive); `direction` keeps only 'R'
+    or 'T' records. Binary captures use the block index to jump to `start`.
+    """
+    if is_binary_capture(path):
+        return _iter_binary(path, start, end, direction)
+    return _iter_text(path, start, end, direction)
+
+
+def iter_capture_records(path: str, start: Optional[float] = None, end: Optional[float] = None,
+                         direction: Optional[str] = None) -> Iterator[CaptureRecord]:
+    """Like `iter_capture` but yields `CaptureRecord`s with integer ns timestamps.
+
+    Binary captures give monotonic ns; text captures give Unix-time ns
+    (one-second resolution).
+    """
+    if is_binary_capture(path):
+        with CaptureReader(path) as r:
+            offset = r.header.get('start_ns', 0) - int(r.header.get('start_wall', 0.0) * 1e9)
+            start_ns = None if start is None else int(start * 1e9) + offset
+            end_ns = None if end is None else int(end * 1e9) + offset
+            for rec in r.records(start_ns=start_ns, end_ns=end_ns):
+                if direction is None or rec.direction == direction:
+                    yield rec
+        return
+    last_ts, last_ns = None, 0
+    for ts, d, data in _iter_text(path, start, end, direction):
+        if ts != last_ts:
+            unix = _iso_to_unix(ts)
+            last_ts, last_ns = ts, int(unix * 1e9) if unix is not None else 0
+        yield CaptureRecord(last_ns, d, 0, None, data)
+
+
+def parse_capture_file(path: str) -> List[CaptureTuple]:
     """Parse a capture file created by `capture.start_capture`.
 
-    Returns a list of tuples (timestamp_str, direction, data_bytes).
+    Both the binary format and the legacy text format are accepted. Returns a
+    list of tuples (timestamp_str, direction, data_bytes); direction is 'R'
+    (from the adapter) or 'T' (to the adapter). Prefer `iter_capture` for
+    large files.
     """
-    out = []
-    with open(path, 'rb') as f:
-        for raw in f:
-            line = raw.decode('ascii', errors='ignore').strip()
-            if not line or line.startswith('#'):
-                continue
-            parts = line.split('\t')
-            if len(parts) != 3:
-                continue
-            ts, direction, hexstr = parts
-            try:
-                data = bytes.fromhex(hexstr)
-            except Exception:
-                data = b''
-            out.append((ts, direction, data))
-    return out
-
-
-def find_seed_requests(parsed: List[Tuple[str, str, bytes]]) -> List[Tuple[str, bytes, bytes]]:
+    return list(iter_capture(path))
+
+
+def find_seed_requests(parsed: Iterable[CaptureTuple], window: int = 5) -> List[Tuple[str, bytes, bytes]]:
     """Find UDS/seed requests (service 0x27) and their immediate responses.
 
     Returns a list of tuples (timestamp_request, seed_bytes, response_bytes).
-    This is a heuristic: looks for read entries where data starts with 0x27.
+    This is a heuristic: looks for entries (read, or written in binary
+    captures) where data starts with 0x27 and takes the first non-empty read
+    among the next `window` records. `parsed` may be any iterable, e.g.
+    `iter_capture(path)`; only the open requests are kept in memory.
     """
     results = []
-    for i, (ts, dir, data) in enumerate(parsed):
-        if dir != 'R' or not data:
+    # open requests: [ts, data, records left to look at]
+    pending: deque = deque()
+    for ts, dir, data in parsed:
+        if pending:
+            resolved = dir == 'R' and bool(data)
+            for p in pending:
+                p[2] -= 1
+            while pending and (resolved or pending[0][2] <= 0):
+                p = pending.popleft()
+                results.append((p[0], p[1], data if resolved else b''))
+        if dir not in ('R', 'T') or not data:
             continue
         # check for seed request 0x27 XX (seed request subfunc)
         if data[0] == 0x27:
-            # find next non-empty read response
-            resp = b''
-            for j in range(i + 1, min(i + 6, len(parsed))):
-                _ts, _dir, _data = parsed[j]
-                if _dir == 'R' and _data:
-                    resp = _data
-                    break
-            # seed is likely in response; return pair
-            results.append((ts, data, resp))
+            pending.append([ts, data, window])
+    results.extend((p[0], p[1], b'') for p in pending)
     return results
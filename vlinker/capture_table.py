@@ -0,0 +1,161 @@
+"""Columnar in-memory capture table.
+
+`CaptureTable` keeps a whole capture in a handful of typed arrays instead of
+one tuple and one `bytes` object per frame: timestamps (``array('q')``, ns),
+direction, channel, CAN ID and service ID columns, and all payloads in one
+contiguous `bytearray` addressed by an offsets column. That is about 24 bytes
+per frame plus the payload itself.
+
+Filters (`by_sid`, `by_can_id`, `by_direction`, `between`) return a new table
+over the same storage with a row index, so nothing is copied. With NumPy
+installed they run vectorised over the columns (zero-copy `np.frombuffer`);
+otherwise they fall back to plain loops.
+"""
+from array import array
+from typing import Iterator, Optional
+
+from .capture_format import NO_CAN_ID, CaptureRecord, service_id
+
+_NO_SID = -1
+
+
+def _numpy():
+    try:
+        import numpy as np
+    except ImportError:
+        return None
+    return np
+
+
+class _Columns:
+    """Backing storage shared by a table and all of its filtered views."""
+
+    def __init__(self):
+        self.ts = array('q')
+        self.direction = array('B')  # 1 = TX
+        self.channel = array('B')
+        self.can_id = array('I')
+        self.sid = array('h')
+        self.offsets = array('Q', [0])
+        self.blob = bytearray()
+
+
+class CaptureTable:
+    """Columnar capture storage; see the module docstring."""
+
+    def __init__(self, _columns: Optional[_Columns] = None, _rows=None):
+        self._c = _columns if _columns is not None else _Columns()
+        # None: every row of the storage; otherwise an index array into it
+        self._rows = _rows
+
+    # building ---------------------------------------------------------
+
+    def append(self, ts_ns: int, direction: str, data: bytes, channel: int = 0, can_id: Optional[int] = None):
+        """Add one frame. Only valid on the base table, not on a filtered view."""
+        if self._rows is not None:
+            raise ValueError('cannot append to a filtered view')
+        c = self._c
+        c.ts.append(ts_ns)
+        c.direction.append(1 if direction[:1].upper() == 'T' else 0)
+        c.channel.append(channel)
+        c.can_id.append(NO_CAN_ID if can_id is None else can_id)
+        sid = service_id(data, can_id)
+        c.sid.append(_NO_SID if sid is None else sid)
+        c.blob += data
+        c.offsets.append(len(c.blob))
+
+    @classmethod
+    def from_capture(cls, path: str, **filters) -> 'CaptureTable':
+        """Load a binary or text capture; `filters` are those of `iter_capture_records`."""
+        from .capture_parser import iter_capture_records
+        table = cls()
+        for rec in iter_capture_records(path, **filters):
+            table.append(rec.ts_ns, rec.direction, rec.data, rec.channel, rec.can_id)
+        return table
+
+    # access -----------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self._c.ts) if self._rows is None else len(self._rows)
+
+    def _row(self, i: int) -> int:
+        if self._rows is None:
+            return i
+        return int(self._rows[i])
+
+    def payload(self, i: int) -> bytes:
+        c = self._c
+        r = self._row(i)
+        return bytes(c.blob[c.offsets[r]:c.offsets[r + 1]])
+
+    def __getitem__(self, i: int) -> CaptureRecord:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        c = self._c
+        r = self._row(i)
+        cid = c.can_id[r]
+        return CaptureRecord(c.ts[r], 'T' if c.direction[r] else 'R', c.channel[r],
+                             None if cid == NO_CAN_ID else cid, bytes(c.blob[c.offsets[r]:c.offsets[r + 1]]))
+
+    def __iter__(self) -> Iterator[CaptureRecord]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def row_indices(self):
+        """Rows of the backing storage selected by this table (a view's index)."""
+        if self._rows is not None:
+            return self._rows
+        np = _numpy()
+        return np.arange(len(self._c.ts)) if np is not None else range(len(self._c.ts))
+
+    def column(self, name: str):
+        """Column ('ts', 'direction', 'channel', 'can_id', 'sid') for the selected rows.
+
+        Returns a zero-copy NumPy view for the base table (a gathered copy for
+        filtered views), or a list without NumPy.
+        """
+        col = getattr(self._c, name)
+        np = _numpy()
+        if np is None:
+            return list(col) if self._rows is None else [col[r] for r in self._rows]
+        arr = np.frombuffer(col, dtype=col.typecode) if len(col) else np.zeros(0, dtype=col.typecode)
+        return arr if self._rows is None else arr[self._rows]
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the backing storage."""
+        c = self._c
+        cols = (c.ts, c.direction, c.channel, c.can_id, c.sid, c.offsets)
+        return sum(a.itemsize * len(a) for a in cols) + len(c.blob)
+
+    # filters ----------------------------------------------------------
+
+    def _filter(self, name: str, test) -> 'CaptureTable':
+        np = _numpy()
+        col = getattr(self._c, name)
+        if np is not None:
+            values = self.column(name)
+            mask = test(values)
+            rows = np.flatnonzero(mask) if self._rows is None else self._rows[mask]
+            return CaptureTable(self._c, rows.astype(np.int64, copy=False))
+        rows = array('q', (r for r in (self._rows if self._rows is not None else range(len(col)))
+                           if test(col[r])))
+        return CaptureTable(self._c, rows)
+
+    def by_sid(self, sid: int) -> 'CaptureTable':
+        return self._filter('sid', lambda v: v == sid)
+
+    def by_can_id(self, can_id: int) -> 'CaptureTable':
+        return self._filter('can_id', lambda v: v == can_id)
+
+    def by_direction(self, direction: str) -> 'CaptureTable':
+        flag = 1 if direction[:1].upper() == 'T' else 0
+        return self._filter('direction', lambda v: v == flag)
+
+    def between(self, start_ns: Optional[int] = None, end_ns: Optional[int] = None) -> 'CaptureTable':
+        """Rows with start_ns <= ts < end_ns."""
+        lo = -(1 << 63) if start_ns is None else start_ns
+        hi = (1 << 63) - 1 if end_ns is None else end_ns
+        return self._filter('ts', lambda v: (v >= lo) & (v < hi))
@@ -0,0 +1,204 @@
+"""Trigger-based capture with a pre-trigger ring buffer.
+
+`TriggerCapture` keeps only the last `pre_seconds` (and at most `pre_bytes`)
+of traffic in memory. When a trigger matches, the buffered frames, the
+matching frame and everything up to `post_seconds` later are written to a new
+incident file (binary capture format); a match inside that window extends it.
+Everything else is dropped, so a capture can run on a car for days and only
+keep the incidents.
+
+Triggers are predicates over `CaptureRecord`s; `make_trigger` builds them
+from a byte pattern, service ID, NRC or CAN ID and `parse_trigger_spec`
+reads the CLI form (``sid=27``, ``nrc=35``, ``can=7E8``, ``pattern=7F2735``).
+"""
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from .capture_format import CaptureRecord, CaptureWriter, service_id
+from .logger import get_logger
+from .protocols import hex_to_bytes, is_elm_text
+
+logger = get_logger(__name__)
+
+Trigger = Callable[[CaptureRecord], bool]
+
+_STOP = object()
+
+
+def _binary(rec: CaptureRecord) -> bytes:
+    # ELM text is matched on its hex content so 'pattern=7F2735' works for both
+    return hex_to_bytes(rec.data) if is_elm_text(rec.data, rec.can_id) else rec.data
+
+
+def make_trigger(pattern: Optional[bytes] = None, sid: Optional[int] = None, nrc: Optional[int] = None,
+                 can_id: Optional[int] = None) -> Trigger:
+    """Predicate matching when every given condition holds.
+
+    `nrc` matches a negative response ``7F <sid> <nrc>`` anywhere in the frame
+    (with `sid` also given, only for that service).
+    """
+    if pattern is None and sid is None and nrc is None and can_id is None:
+        raise ValueError('trigger needs at least one condition')
+
+    def match(rec: CaptureRecord) -> bool:
+        if can_id is not None and rec.can_id != can_id:
+            return False
+        data = _binary(rec) if (pattern is not None or nrc is not None) else b''
+        if pattern is not None and pattern not in data:
+            return False
+        if nrc is not None:
+            i = data.find(b'\x7f')
+            while i >= 0:
+                if i + 2 < len(data) and data[i + 2] == nrc and (sid is None or data[i + 1] == sid):
+                    return True
+                i = data.find(b'\x7f', i + 1)
+            return False
+        if sid is not None and service_id(rec.data, rec.can_id) != sid:
+            return False
+        return True
+
+    return match
+
+
+def parse_trigger_spec(spec: str) -> Trigger:
+    """Build a trigger from 'key=value[,key=value...]' (keys: sid, nrc, can, pattern; hex values)."""
+    kwargs: Dict[str, Any] = {}
+    for part in spec.split(','):
+        key, sep, value = part.partition('=')
+        key = key.strip().lower()
+        value = value.strip()
+        if not sep or not value:
+            raise ValueError(f'invalid trigger: {spec}')
+        if key == 'pattern':
+            kwargs['pattern'] = bytes.fromhex(value)
+        elif key in ('sid', 'nrc'):
+            kwargs[key] = int(value, 16)
+        elif key in ('can', 'can_id'):
+            kwargs['can_id'] = int(value, 16)
+        else:
+            raise ValueError(f'unknown trigger key: {key}')
+    return make_trigger(**kwargs)
+
+
+class TriggerCapture:
+    """Ring-buffered capture that writes only triggered incidents.
+
+    `put` has the `SerialComm.tap` signature. Incident files are named
+    ``<out_prefix>-0001.vlcap`` and written on a background thread.
+    """
+
+    def __init__(self, out_prefix: str, triggers: List[Trigger], pre_seconds: float = 10.0,
+                 post_seconds: float = 5.0, pre_bytes: Optional[int] = None,
+                 header: Optional[Dict[str, Any]] = None):
+        if not triggers:
+            raise ValueError('at least one trigger required')
+        self.out_prefix = out_prefix
+        self.triggers = list(triggers)
+        self.pre_ns = int(pre_seconds * 1e9)
+        self.post_ns = int(post_seconds * 1e9)
+        self.pre_bytes = pre_bytes
+        self.header = header or {}
+        self.incidents: List[Dict[str, Any]] = []
+        self.records = 0
+        self.discarded = 0
+        self._ring: deque = deque()
+        self._ring_bytes = 0
+        self._post_until: Optional[int] = None
+        self._q: 'queue.Queue' = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._write_loop, name='capture-trigger', daemon=True)
+        self._thread.start()
+        return self
+
+    def _write_loop(self):
+        writer = None
+        while True:
+            item = self._q.get()
+            if item is _STOP:
+                break
+            kind, value = item
+            try:
+                if kind == 'open':
+                    if writer is not None:
+                        writer.close()
+                    writer = CaptureWriter(value, header=self.header)
+                elif kind == 'close':
+                    if writer is not None:
+                        writer.close()
+                        writer = None
+                elif writer is not None:
+                    writer.record(value.direction, value.data, value.channel, value.can_id, value.ts_ns)
+            except Exception as e:
+                logger.debug('incident write failed: %s', e)
+        if writer is not None:
+            writer.close()
+
+    def _matches(self, rec: CaptureRecord) -> bool:
+        for trig in self.triggers:
+            try:
+                if trig(rec):
+                    return True
+            except Exception as e:
+                logger.debug('trigger raised: %s', e)
+        return False
+
+    def put(self, direction: str, data: bytes, channel: int = 0, can_id: Optional[int] = None,
+            ts_ns: Optional[int] = None):
+        """Feed one frame (thread-safe)."""
+        rec = CaptureRecord(time.monotonic_ns() if ts_ns is None else ts_ns,
+                            'T' if direction[:1].upper() == 'T' else 'R', channel, can_id, bytes(data))
+        with self._lock:
+            self._add(rec)
+
+    def _add(self, rec: CaptureRecord):
+        self.records += 1
+        hit = self._matches(rec)
+        if self._post_until is not None:
+            if rec.ts_ns <= self._post_until or hit:
+                self._q.put(('rec', rec))
+                if hit:
+                    self._post_until = rec.ts_ns + self.post_ns
+                    self.incidents[-1]['triggers'] += 1
+                return
+            # post-trigger window over
+            self._q.put(('close', None))
+            self._post_until = None
+        if hit:
+            path = f'{self.out_prefix}-{len(self.incidents) + 1:04d}.vlcap'
+            self.incidents.append({'path': path, 'trigger_ts_ns': rec.ts_ns, 'pre_records': len(self._ring),
+                                   'triggers': 1, 'data_hex': _binary(rec)[:32].hex()})
+            self._q.put(('open', path))
+            for old in self._ring:
+                self._q.put(('rec', old))
+            self._q.put(('rec', rec))
+            self._ring.clear()
+            self._ring_bytes = 0
+            self._post_until = rec.ts_ns + self.post_ns
+            return
+        self._ring.append(rec)
+        self._ring_bytes += len(rec.data)
+        ring = self._ring
+        while ring and (rec.ts_ns - ring[0].ts_ns > self.pre_ns
+                        or (self.pre_bytes is not None and self._ring_bytes > self.pre_bytes)):
+            self._ring_bytes -= len(ring.popleft().data)
+            self.discarded += 1
+
+    def stop(self) -> Dict[str, Any]:
+        """Close the current incident (if any) and return stats."""
+        self._q.put(_STOP)
+        if self._thread is not None:
+            self._thread.join()
+        return {'records': self.records, 'discarded': self.discarded, 'incidents': list(self.incidents)}
+
+
+def incident_prefix(out_file: str) -> str:
+    """Incident file prefix for a capture output path ('trip.vlcap' -> 'trip')."""
+    root, ext = os.path.splitext(out_file)
+    return root if ext else out_file
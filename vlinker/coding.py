@@ -0,0 +1,131 @@
+"""Transactional coding: write a set of DID changes as one unit.
+
+`apply_coding` takes the wanted values of several DIDs (long coding,
+adaptation values, ...) and, on one held `UdsSession`:
+
+1. reads the current values of all of them in as few ReadDataByIdentifier
+   requests as the ECU accepts;
+2. writes only the DIDs whose value actually differs;
+3. reads the written DIDs back in one batch and compares;
+4. if a write is refused or the read-back differs, writes the original
+   values back to every DID it already changed (rollback).
+
+The caller opens the session (and enters the extended session / unlocks
+security as the ECU requires) — see `code_ecu` for the usual sequence.
+"""
+from typing import Any, Dict, List, Optional, Union
+
+from .logger import get_logger
+from .uds import NegativeResponse, UdsSession, read_dids, write_did
+
+logger = get_logger(__name__)
+
+DidKey = Union[int, str]
+
+
+class CodingError(RuntimeError):
+    """A coding transaction failed; `report` says what was written and rolled back."""
+
+    def __init__(self, message: str, report: Dict[str, Any]):
+        super().__init__(message)
+        self.report = report
+
+
+def parse_did(did: DidKey) -> int:
+    """DID as int from an int or a hex string like 'F190' / '0x0600'."""
+    if isinstance(did, int):
+        value = did
+    else:
+        value = int(str(did).strip(), 16)
+    if not 0 <= value <= 0xFFFF:
+        raise ValueError(f'DID out of range: {did}')
+    return value
+
+
+def plan_coding(current: Dict[int, bytes], changes: Dict[int, bytes]) -> Dict[int, bytes]:
+    """The subset of `changes` whose value differs from `current`."""
+    return {did: value for did, value in changes.items() if current.get(did) != value}
+
+
+def _rollback(session: UdsSession, written: List[int], original: Dict[int, bytes]) -> Dict[str, List[str]]:
+    restored, failed = [], []
+    # undo in reverse order of writing
+    for did in reversed(written):
+        try:
+            write_did(session, did, original[did])
+            restored.append(f'{did:04X}')
+        except Exception as e:
+            logger.debug('rollback of DID %04X failed: %s', did, e)
+            failed.append(f'{did:04X}')
+    return {'restored': restored, 'failed': failed}
+
+
+def apply_coding(session: UdsSession, changes: Dict[DidKey, bytes], verify: bool = True,
+                 rollback: bool = True, dry_run: bool = False, batch: int = 8) -> Dict[str, Any]:
+    """Apply DID `changes` (DID -> wanted bytes) as one transaction.
+
+    Returns a report dict with the DIDs (as hex strings) that were
+    `changed`, `unchanged` and `written`, the `original` values (hex) of
+    the changed DIDs, and `verified`. With `dry_run` nothing is written.
+    Raises `CodingError` (carrying the report, including the `rollback`
+    outcome) when a write or the verification fails.
+    """
+    wanted = {parse_did(d): bytes(v) for d, v in changes.items()}
+    lengths = {d: len(v) for d, v in wanted.items()}
+    current = read_dids(session, wanted, lengths=lengths, batch=batch)
+    diff = plan_coding(current, wanted)
+    report: Dict[str, Any] = {
+        'changed': [f'{d:04X}' for d in diff],
+        'unchanged': [f'{d:04X}' for d in wanted if d not in diff],
+        'original': {f'{d:04X}': current[d].hex() for d in diff},
+        'written': [],
+        'verified': False,
+        'rollback': None,
+    }
+    if dry_run or not diff:
+        report['verified'] = not diff
+        return report
+
+    written: List[int] = []
+
+    def fail(message: str):
+        if rollback and written:
+            report['rollback'] = _rollback(session, written, current)
+        raise CodingError(message, report)
+
+    for did, value in diff.items():
+        try:
+            write_did(session, did, value)
+        except (NegativeResponse, RuntimeError) as e:
+            fail(f'write of DID {did:04X} failed: {e}')
+        written.append(did)
+        report['written'].append(f'{did:04X}')
+    if verify:
+        try:
+            readback = read_dids(session, written, lengths=lengths, batch=batch)
+        except (NegativeResponse, RuntimeError) as e:
+            fail(f'read-back failed: {e}')
+        bad = [f'{d:04X}' for d in written if readback.get(d) != diff[d]]
+        if bad:
+            fail('read-back differs for DID ' + ', '.join(bad))
+        report['verified'] = True
+    return report
+
+
+def code_ecu(device: str, changes: Dict[DidKey, bytes], profile: Optional[str] = None,
+             session_type: Optional[int] = 0x03, security_level: int = 0x01, baud: int = 115200,
+             timeout: float = 2.0, **kwargs) -> Dict[str, Any]:
+    """Open one session on `device`, prepare it and run `apply_coding`.
+
+    `session_type` is sent with DiagnosticSessionControl first (None skips
+    it); with a `profile` the ECU is unlocked at `security_level` using the
+    profile's key algorithm. Extra keyword arguments go to `apply_coding`.
+    """
+    with UdsSession(device, baud=baud, timeout=timeout,
+                    ecu=f'{device}/{profile}' if profile else None) as session:
+        if session_type is not None:
+            session.diagnostic_session(session_type)
+        if profile and not kwargs.get('dry_run'):
+            from .advanced import security_access_with_profile
+            security_access_with_profile(device, profile, sub_function=security_level, session=session)
+        return apply_coding(session, changes, **kwargs)
@@ -3,6 +3,7 @@ import time
 import binascii
 from typing import List, Dict, Any, Optional
 
+from .elm import ElmSession
 from .logger import get_logger
 from .serial_comm import SerialComm
 
@@ -145,49 +146,32 @@ def read_measures(ecu: str, pids: Optional[List[str]] = None, device: Optional[s
     dev = device or _find_device()
     if not dev:
         raise RuntimeError('no serial device found')
-    sc = SerialComm(dev, baud=baud, timeout=timeout)
     out = {}
-    try:
-        sc.open()
+    # one held session: adapter setup is sent at most once, then one command per PID
+    with ElmSession(dev, baud=baud, timeout=timeout) as s:
         if not pids:
             # ask for supported PIDs
-            resp = sc.send_ascii_line('0100')
-            out['0100'] = _hexdump(resp)
+            out['0100'] = _hexdump(s.command('0100'))
             return out
         for pid in pids:
-            cmd = '01' + pid
-            resp = sc.send_ascii_line(cmd)
-            out[pid] = _hexdump(resp)
-            time.sleep(0.05)
+            out[pid] = _hexdump(s.command('01' + pid))
         return out
-    finally:
-        sc.close()
 import time
 import binascii
 from .serial_comm import SerialComm
-from .protocols import parse_obd_03_response, parse_elm_echo_strip
+from .protocols import parse_obd_03_response, parse_elm_echo_strip, parse_obd_dtcs_by_ecu
 
 
 def elm_send_obd(device, cmd, baud=115200, timeout=1.0):
     """Send an OBD hex command via an ELM327-like ASCII interface (e.g., '0100' or '03').
 
+    Adapter setup (echo/linefeeds off, protocol) is handled by `ElmSession`,
+    which only sends AT commands whose values differ from the adapter's known
+    state and reuses the protocol found by an earlier auto search.
     Returns raw bytes response or empty bytes.
     """
-    with SerialComm(device, baud=baud, timeout=timeout) as s:
-        # ensure ELM in a reasonable state
-        s.send_ascii_line('ATZ')
-        time.sleep(0.2)
-        s.send_ascii_line('ATE0')
-        time.sleep(0.05)
-        s.send_ascii_line('ATL0')
-        time.sleep(0.05)
-        # set automatic protocol selection
-        s.send_ascii_line('ATSP0')
-        time.sleep(0.05)
-        # send OBD command
-        resp = s.send_ascii_line(cmd)
-        # try to normalize ELM ASCII hex to binary
-        return resp
+    with ElmSession(device, baud=baud, timeout=timeout) as s:
+        return s.command(cmd)
 
 
 def scan_ecus(device, mode='elm', baud=115200, timeout=1.0):
@@ -221,6 +205,17 @@ def read_dtc(device, mode='elm', baud=115200, timeout=1.0):
         return b''
 
 
+def read_dtc_by_ecu(device, baud=115200, timeout=1.0, can_29bit=False):
+    """Read stored DTCs with a functional mode 03 request, keeping ECUs apart.
+
+    Headers are switched on (``ATH1``) so each answer can be attributed to its
+    sender. Returns {header: [dtc, ...]}, e.g. {'7E8': ['P0133'], '7E9': []}.
+    """
+    with ElmSession(device, baud=baud, timeout=timeout, settings={'H': '1'}) as s:
+        resp = s.command('03')
+    return parse_obd_dtcs_by_ecu(resp, can_29bit=can_29bit)
+
+
 def clear_dtc(device, mode='elm', baud=115200, timeout=1.0):
     """Clear stored DTCs. In ELM/OBD use service 04 (reset DTCs). Returns True on ACK-like response."""
     if mode == 'elm':
@@ -0,0 +1,185 @@
+"""Resumable DID range scanner.
+
+`scan_dids` sweeps DID ranges (up to 0x0000-0xFFFF) with
+ReadDataByIdentifier (0x22) on an open `UdsSession` and classifies every
+answer:
+
+    positive      value returned (stored as hex)
+    out_of_range  NRC 0x31 (not supported)
+    security      NRC 0x33 (supported, needs security access)
+    conditions    NRC 0x22 (supported, conditions not correct)
+    other         any other NRC (stored)
+    no_response   no answer
+
+Like `uds.read_dids`, the scanner saves round trips with multi-DID
+requests. ISO 14229 ECUs answer such a request with the supported DIDs
+only, and with NRC 0x31 when none of them is supported, so one request
+clears a whole batch of empty DIDs. The scanner first checks that the ECU
+behaves that way (a supported and an unsupported DID together must return
+just the supported one); if it does, the batch doubles (up to
+`max_batch`) for every batch that comes back empty and the DIDs of a batch
+with hits are classified one by one. Other ECUs are scanned DID by DID.
+
+Progress is stored in a JSON state file (`state_path`) every few seconds
+and on interrupt; the same scan started again resumes where it stopped.
+"""
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .logger import get_logger
+from .progress import load_checkpoint, save_checkpoint
+from .uds import UdsSession
+
+logger = get_logger(__name__)
+
+CLASSES = {0x31: 'out_of_range', 0x33: 'security', 0x22: 'conditions'}
+
+# DIDs most ECUs implement (identification) or almost none do, used to
+# find one supported and one unsupported DID for the multi-DID check
+_CALIBRATION = (0xF190, 0xF187, 0xF18C, 0xF189, 0xF18A, 0xF197, 0x0000, 0xFFFF, 0xFEFE)
+
+Range = Tuple[int, int]
+
+
+def parse_ranges(spec: str) -> List[Range]:
+    """'F180-F1FF,0600-06FF,F190' -> [(0xF180, 0xF1FF), ...] (inclusive)."""
+    out = []
+    for part in spec.replace(' ', '').split(','):
+        if not part:
+            continue
+        lo, _sep, hi = part.partition('-')
+        lo_i, hi_i = int(lo, 16), int(hi or lo, 16)
+        if not 0 <= lo_i <= hi_i <= 0xFFFF:
+            raise ValueError(f'invalid DID range: {part}')
+        out.append((lo_i, hi_i))
+    if not out:
+        raise ValueError('no DID ranges given')
+    return out
+
+
+def _did_at(ranges: Sequence[Range], index: int) -> int:
+    for lo, hi in ranges:
+        if index <= hi - lo:
+            return lo + index
+        index -= hi - lo + 1
+    raise IndexError(index)
+
+
+def classify(session: UdsSession, did: int) -> Dict[str, Any]:
+    """Read one DID and classify the answer (see module docstring)."""
+    try:
+        resp = session.exchange(b'\x22' + did.to_bytes(2, 'big'))
+    except TimeoutError:
+        resp = b''
+    if resp[:3] == b'\x62' + did.to_bytes(2, 'big'):
+        return {'class': 'positive', 'value': resp[3:].hex().upper()}
+    if len(resp) >= 3 and resp[:2] == b'\x7f\x22':
+        entry = {'class': CLASSES.get(resp[2], 'other')}
+        if entry['class'] == 'other':
+            entry['nrc'] = f'0x{resp[2]:02X}'
+        return entry
+    return {'class': 'no_response'}
+
+
+def _check_multi(session: UdsSession, hit: int, miss: int) -> bool:
+    """True if a multi-DID read answers only the supported DID of [hit, miss]."""
+    try:
+        resp = session.exchange(b'\x22' + hit.to_bytes(2, 'big') + miss.to_bytes(2, 'big'))
+    except TimeoutError:
+        return False
+    ok = resp[:3] == b'\x62' + hit.to_bytes(2, 'big') and miss.to_bytes(2, 'big') not in resp[3:5]
+    logger.debug('multi-DID reads %s', 'usable' if ok else 'not usable')
+    return ok
+
+
+def scan_dids(session: UdsSession, ranges: Sequence[Range] = ((0x0000, 0xFFFF),), state_path: Optional[str] = None,
+              max_batch: int = 64, save_every: float = 2.0,
+              progress: Optional[Callable[[int, int, float], None]] = None) -> Dict[str, Any]:
+    """Scan `ranges` of DIDs; returns the scan state.
+
+    The result has `results` (DID hex -> classification, DIDs answering
+    0x31 are only counted), `counts` per class, `done`/`total` DIDs,
+    `multi` (whether batched requests were used) and `requests`.
+    """
+    ranges = [(int(lo), int(hi)) for lo, hi in ranges]
+    job = {'ranges': [list(r) for r in ranges]}
+    total = sum(hi - lo + 1 for lo, hi in ranges)
+    state = load_checkpoint(state_path, job) or {'job': job, 'done': 0, 'results': {}, 'counts': {},
+                                            'multi': None, 'requests': 0}
+    state['total'] = total
+    results, counts = state['results'], state['counts']
+    last_save = time.monotonic()
+    t0 = time.monotonic()
+    start_done = state['done']
+
+    def record(did: int, entry: Dict[str, Any]):
+        counts[entry['class']] = counts.get(entry['class'], 0) + 1
+        if entry['class'] != 'out_of_range':
+            results[f'{did:04X}'] = entry
+
+    def calibrate():
+        # needs one supported and one unsupported DID; outside the scanned ranges
+        # the calibration reads are not recorded
+        hit = next((int(d, 16) for d, e in results.items() if e['class'] == 'positive'), None)
+        miss = None
+        for did in _CALIBRATION:
+            if hit is not None and miss is not None:
+                break
+            entry = classify(session, did)
+            state['requests'] += 1
+            if entry['class'] == 'positive' and hit is None:
+                hit = did
+            elif entry['class'] == 'out_of_range' and miss is None:
+                miss = did
+        if hit is not None and miss is not None:
+            state['requests'] += 1
+            state['multi'] = _check_multi(session, hit, miss)
+        else:
+            state['multi'] = False
+
+    if state['multi'] is None:
+        calibrate()
+    batch = 1
+    try:
+        while state['done'] < total:
+            n = min(batch if state['multi'] else 1, total - state['done'])
+            dids = [_did_at(ranges, state['done'] + i) for i in range(n)]
+            # a batch is recorded only once it is complete, so an interrupt in the
+            # middle of one leaves the state at its start and nothing is counted twice
+            entries = []
+            if n == 1:
+                entry = classify(session, dids[0])
+                state['requests'] += 1
+                entries.append((dids[0], entry))
+                batch = min(max_batch, 2 * batch) if entry['class'] == 'out_of_range' else 1
+            else:
+                try:
+                    resp = session.exchange(b'\x22' + b''.join(d.to_bytes(2, 'big') for d in dids))
+                except TimeoutError:
+                    resp = b''
+                state['requests'] += 1
+                if resp == b'\x7f\x22\x31':
+                    # none of them is supported
+                    entries = [(did, {'class': 'out_of_range'}) for did in dids]
+                    batch = min(max_batch, 2 * batch)
+                else:
+                    if resp[:2] == b'\x7f\x22' and resp[2:3] in (b'\x13', b'\x14'):
+                        # request or answer too long for the ECU: stay below this size
+                        max_batch = max(2, n // 2)
+                    for did in dids:
+                        entries.append((did, classify(session, did)))
+                        state['requests'] += 1
+                    batch = 1
+            for did, entry in entries:
+                record(did, entry)
+            state['done'] += n
+            now = time.monotonic()
+            if progress:
+                progress(state['done'], total, (state['done'] - start_done) / max(now - t0, 1e-9))
+            if now - last_save >= save_every:
+                save_checkpoint(state_path, state)
+                last_save = now
+    finally:
+        save_checkpoint(state_path, state)
+    return state
+
@@ -0,0 +1,176 @@
+"""Indexed DTC description database.
+
+Descriptions for SAE J2012 generic codes and manufacturer overrides (e.g.
+VW) ship as a TSV file in `vlinker/data`. On first lookup they are compiled
+into an SQLite database in the cache directory, keyed by (manufacturer,
+code); later lookups only open that file, so importing this module or
+starting the CLI costs nothing. The database is rebuilt automatically when
+the source files change.
+"""
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from .cache import cache_dir
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+SCHEMA_VERSION = '1'
+_DEFAULT_SOURCES = [Path(__file__).resolve().parent / 'data' / 'dtc_descriptions.tsv']
+
+_CATEGORY = {'P': 'Powertrain', 'C': 'Chassis', 'B': 'Body', 'U': 'Network'}
+
+
+# SAE J2012 scope by system letter and second character; P3 is split on the
+# third character (P30-P33 manufacturer specific, P34-P39 generic)
+_SCOPE = {
+    'P': {'0': 'generic', '1': 'manufacturer specific', '2': 'generic'},
+    'C': {'0': 'generic', '1': 'manufacturer specific', '2': 'manufacturer specific', '3': 'reserved'},
+    'B': {'0': 'generic', '1': 'manufacturer specific', '2': 'manufacturer specific', '3': 'reserved'},
+    'U': {'0': 'generic', '1': 'manufacturer specific', '2': 'manufacturer specific', '3': 'reserved'},
+}
+
+
+def dtc_category(code: str) -> str:
+    """Best-effort category for a J2012 code, e.g. 'Powertrain (manufacturer specific)'."""
+    if len(code) < 2:
+        return ''
+    letter = code[0].upper()
+    system = _CATEGORY.get(letter, '')
+    if not system:
+        return ''
+    if letter == 'P' and code[1] == '3':
+        scope = 'manufacturer specific' if code[2:3] in ('0', '1', '2', '3') else 'generic'
+    else:
+        scope = _SCOPE[letter].get(code[1])
+    return f'{system} ({scope})' if scope else system
+
+
+class DtcDatabase:
+    """Lazy SQLite-backed DTC description store."""
+
+    def __init__(self, db_path: Optional[Path] = None, sources: Optional[List[Path]] = None):
+        self._db_path = Path(db_path) if db_path else None
+        self.sources = [Path(p) for p in (sources or _DEFAULT_SOURCES)]
+        self._conn = None
+
+    def _signature(self) -> str:
+        parts = [SCHEMA_VERSION]
+        for src in self.sources:
+            try:
+                st = src.stat()
+                parts.append(f'{src}:{st.st_size}:{int(st.st_mtime)}')
+            except OSError:
+                parts.append(f'{src}:missing')
+        return '|'.join(parts)
+
+    def _connect(self):
+        if self._conn is not None:
+            return self._conn
+        import sqlite3
+        path = self._db_path or cache_dir() / 'dtc_descriptions.sqlite'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(path), check_same_thread=False)
+        sig = self._signature()
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'signature'").fetchone()
+        except sqlite3.Error:
+            row = None
+        if not row or row[0] != sig:
+            self._build(conn, sig)
+        self._conn = conn
+        return conn
+
+    def _build(self, conn, sig: str):
+        logger.debug('building DTC database from %s', ', '.join(str(s) for s in self.sources))
+        with conn:
+            conn.execute('DROP TABLE IF EXISTS dtc')
+            conn.execute('DROP TABLE IF EXISTS meta')
+            conn.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)')
+            conn.execute('CREATE TABLE dtc (manufacturer TEXT NOT NULL, code TEXT NOT NULL, '
+                         'description TEXT NOT NULL, PRIMARY KEY (manufacturer, code)) WITHOUT ROWID')
+            conn.executemany('INSERT OR REPLACE INTO dtc VALUES (?, ?, ?)', self._read_sources())
+            conn.execute("INSERT INTO meta VALUES ('signature', ?)", (sig,))
+
+    def _read_sources(self):
+        for src in self.sources:
+            try:
+                f = src.open('r', encoding='utf-8')
+            except OSError as e:
+                logger.debug('DTC source %s unavailable: %s', src, e)
+                continue
+            with f:
+                for line in f:
+                    if not line.strip() or line.startswith('#'):
+                        continue
+                    parts = line.rstrip('\n').split('\t')
+                    if len(parts) != 3:
+                        continue
+                    manufacturer, code, desc = parts
+                    yield manufacturer.strip().upper(), code.strip().upper(), desc.strip()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def describe(self, code: str, manufacturer: Optional[str] = None) -> Optional[str]:
+        """Return the description of one code, or None if unknown."""
+        return self.describe_many([code], manufacturer=manufacturer).get(code.upper(), {}).get('description')
+
+    def describe_many(self, codes: Iterable[str], manufacturer: Optional[str] = None,
+                      overrides: Optional[Dict[str, str]] = None) -> Dict[str, Dict[str, str]]:
+        """Look up a whole vehicle report in one query.
+
+        Manufacturer entries win over generic ones; `overrides` (e.g. from a
+        profile's `dtc_descriptions`) win over both. Returns {code: {'code',
+        'description', 'source', 'category'}} for every requested code;
+        unknown codes get an empty description.
+        """
+        wanted = sorted({c.strip().upper() for c in codes if c})
+        out: Dict[str, Dict[str, str]] = {
+            c: {'code': c, 'description': '', 'source': '', 'category': dtc_category(c)} for c in wanted
+        }
+        if not wanted:
+            return out
+        mfr = (manufacturer or '').upper()
+        scopes = ['', mfr] if mfr else ['']
+        conn = self._connect()
+        # generic first, manufacturer second, so manufacturer rows overwrite
+        for scope in scopes:
+            for i in range(0, len(wanted), 500):
+                batch = wanted[i:i + 500]
+                marks = ','.join('?' * len(batch))
+                rows = conn.execute(f'SELECT code, description FROM dtc WHERE manufacturer = ? AND code IN ({marks})',
+                                    [scope] + batch)
+                for code, desc in rows:
+                    out[code]['description'] = desc
+                    out[code]['source'] = scope or 'SAE'
+        for code, desc in (overrides or {}).items():
+            code = code.upper()
+            if code in out:
+                out[code]['description'] = desc
+                out[code]['source'] = 'profile'
+        return out
+
+
+_DB: Optional[DtcDatabase] = None
+
+
+def get_dtc_db() -> DtcDatabase:
+    """Return the process-wide database (created lazily)."""
+    global _DB
+    if _DB is None:
+        _DB = DtcDatabase(db_path=os.environ.get('VLINKER_DTC_DB') or None)
+    return _DB
+
+
+def describe_dtcs(codes: Iterable[str], manufacturer: Optional[str] = None,
+                  profile: Optional[Dict] = None) -> Dict[str, Dict[str, str]]:
+    """Batch description lookup; `profile` may supply 'manufacturer' and 'dtc_descriptions'."""
+    overrides = None
+    if profile:
+        manufacturer = manufacturer or profile.get('manufacturer')
+        overrides = profile.get('dtc_descriptions')
+    return get_dtc_db().describe_many(codes, manufacturer=manufacturer, overrides=overrides)
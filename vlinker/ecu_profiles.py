@@ -4,10 +4,31 @@ This module provides a registry of ECU profiles. Each profile can include a
 `seed_key_algo` callable that takes seed bytes and returns key bytes. If the
 algorithm is None, the CLI will fall back to manual key entry.
 
+Besides the built-in profiles below, every module under `vlinker/profiles/`
+(and under the directories in ``$VLINKER_PROFILE_PATH``) that defines a
+``PROFILE`` dict, and every declarative ``.json``/``.toml`` spec
+(`profile_spec`) there, is a profile named after its file. `ProfileRegistry` keeps a
+metadata index of those files (name, manufacturer, ECU IDs, algorithm kind,
+mtime) read with `ast` rather than by importing them, persisted in the cache
+directory so a restart only has to stat the files. A profile module is
+imported (a spec compiled) on first use and reloaded when its mtime changes, so new or
+edited profiles are picked up without a restart.
+
 IMPORTANT: Provided algorithms are placeholders for testing only. Real
 algorithms for specific ECUs require reverse engineering or vendor data.
 """
-from typing import Callable, Optional, Dict
+import ast
+import json
+import os
+import sys
+import threading
+import types
+from pathlib import Path
+from typing import Any, Callable, Optional, Dict, List
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
 
 
 def demo_reverse_seed_algo(seed: bytes) -> bytes:
@@ -50,9 +71,211 @@ _PROFILES.update({
 })
 
 
+PROFILES_DIR = Path(__file__).resolve().parent / 'profiles'
+# metadata taken from the PROFILE literal without importing the module
+_META_KEYS = ('name', 'manufacturer', 'year_range', 'ecu_ids', 'notes')
+_INDEX_VERSION = 1
+_PROFILE_SUFFIXES = ('.py', '.json', '.toml')
+
+
+def _algo_kind(node: Optional[ast.AST]) -> Optional[str]:
+    if node is None or (isinstance(node, ast.Constant) and node.value is None):
+        return None
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    if isinstance(node, ast.Lambda):
+        return 'lambda'
+    if isinstance(node, ast.Call):
+        return (_algo_kind(node.func) or 'call') + '()'
+    return type(node).__name__.lower()
+
+
+def read_profile_metadata(path: str) -> Optional[Dict[str, Any]]:
+    """Metadata of the ``PROFILE = {...}`` literal in `path` (None if there is none)."""
+    try:
+        with open(path, 'rb') as f:
+            tree = ast.parse(f.read(), filename=path)
+    except (OSError, SyntaxError, ValueError) as e:
+        logger.debug('cannot parse profile %s: %s', path, e)
+        return None
+    for node in tree.body:
+        if (isinstance(node, ast.Assign) and isinstance(node.value, ast.Dict)
+                and any(isinstance(t, ast.Name) and t.id == 'PROFILE' for t in node.targets)):
+            break
+    else:
+        return None
+    meta: Dict[str, Any] = {'ecu_ids': [], 'algo': None}
+    for k, v in zip(node.value.keys, node.value.values):
+        if not isinstance(k, ast.Constant) or not isinstance(k.value, str):
+            continue
+        if k.value == 'seed_key_algo':
+            meta['algo'] = _algo_kind(v)
+        elif k.value in _META_KEYS:
+            try:
+                value = ast.literal_eval(v)
+            except ValueError:
+                continue
+            meta[k.value] = list(value) if isinstance(value, tuple) else value
+    return meta
+
+
+def _read_spec_metadata(path: str) -> Optional[Dict[str, Any]]:
+    from .profile_spec import load_spec, spec_metadata
+    try:
+        return spec_metadata(load_spec(path))
+    except (OSError, ValueError, RuntimeError) as e:
+        logger.debug('cannot read profile spec %s: %s', path, e)
+        return None
+
+
+class ProfileRegistry:
+    """Built-in profiles plus lazily imported profile modules (see module docstring)."""
+
+    def __init__(self, builtins: Dict[str, Dict], dirs: Optional[List[Path]] = None,
+                 index_path: Optional[Path] = None):
+        self.builtins = builtins
+        self._dirs = dirs
+        self._index_path = index_path
+        self._index: Optional[Dict[str, Dict[str, Any]]] = None
+        # key -> (mtime_ns, PROFILE dict)
+        self._loaded: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+
+    def dirs(self) -> List[Path]:
+        if self._dirs is not None:
+            return list(self._dirs)
+        extra = [Path(p) for p in os.environ.get('VLINKER_PROFILE_PATH', '').split(os.pathsep) if p]
+        return [PROFILES_DIR] + extra
+
+    def _index_file(self) -> Path:
+        if self._index_path is not None:
+            return self._index_path
+        from .cache import cache_dir
+        return cache_dir() / 'profile_index.json'
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with self._index_file().open('r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == _INDEX_VERSION:
+                return data.get('profiles', {})
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def _store_index(self, index: Dict[str, Dict[str, Any]]):
+        path = self._index_file()
+        tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+        try:
+            tmp.write_text(json.dumps({'version': _INDEX_VERSION, 'profiles': index}))
+            tmp.replace(path)
+        except OSError as e:
+            logger.debug('could not store profile index: %s', e)
+
+    def refresh(self) -> Dict[str, Dict[str, Any]]:
+        """Re-stat the profile directories; only new or changed files are parsed."""
+        with self._lock:
+            old = self._index if self._index is not None else self._load_index()
+            index: Dict[str, Dict[str, Any]] = {}
+            for d in self.dirs():
+                try:
+                    entries = sorted(os.scandir(d), key=lambda e: e.name)
+                except OSError:
+                    continue
+                for e in entries:
+                    key, ext = os.path.splitext(e.name)
+                    if ext not in _PROFILE_SUFFIXES or e.name.startswith('_') or not e.is_file():
+                        continue
+                    if key in index:
+                        continue  # earlier directories win
+                    st = e.stat()
+                    prev = old.get(key)
+                    if prev and prev['path'] == e.path and prev['mtime_ns'] == st.st_mtime_ns \
+                            and prev['size'] == st.st_size:
+                        index[key] = prev
+                        continue
+                    meta = read_profile_metadata(e.path) if ext == '.py' else _read_spec_metadata(e.path)
+                    if meta is None:
+                        continue
+                    meta.update({'key': key, 'path': e.path, 'mtime_ns': st.st_mtime_ns, 'size': st.st_size})
+                    index[key] = meta
+            if index != old or self._index is None:
+                self._store_index(index)
+            self._index = index
+            return index
+
+    def index(self) -> Dict[str, Dict[str, Any]]:
+        """Metadata of every profile file, keyed by profile name."""
+        return self.refresh()
+
+    def names(self) -> List[str]:
+        return list(self.builtins) + [k for k in self.refresh() if k not in self.builtins]
+
+    def _import(self, key: str, path: str) -> Optional[Dict]:
+        if not path.endswith('.py'):
+            from .profile_spec import load_spec, profile_from_spec
+            try:
+                return profile_from_spec(load_spec(path))
+            except (OSError, ValueError, KeyError, TypeError, RuntimeError) as e:
+                logger.debug('failed to load profile spec %s: %s', path, e)
+                return None
+        # executed from source so an edit is never shadowed by a stale .pyc;
+        # the package context keeps relative imports (from ..ecu_profiles) working
+        modname = f'vlinker.profiles.{key}'
+        module = types.ModuleType(modname)
+        module.__file__ = path
+        module.__package__ = 'vlinker.profiles'
+        try:
+            with open(path, 'rb') as f:
+                code = compile(f.read(), path, 'exec')
+            exec(code, module.__dict__)
+        except Exception as e:
+            logger.debug('failed to load profile %s: %s', path, e)
+            return None
+        profile = module.__dict__.get('PROFILE')
+        if not isinstance(profile, dict):
+            return None
+        sys.modules[modname] = module
+        return profile
+
+    def get(self, key: str) -> Optional[Dict]:
+        if key in self.builtins:
+            return self.builtins[key]
+        with self._lock:
+            meta = (self._index or {}).get(key)
+            if meta is None:
+                meta = self.refresh().get(key)
+                if meta is None:
+                    return None
+            try:
+                mtime = os.stat(meta['path']).st_mtime_ns
+            except OSError:
+                self._loaded.pop(key, None)
+                self.refresh()
+                return None
+            loaded = self._loaded.get(key)
+            if loaded is not None and loaded[0] == mtime:
+                return loaded[1]
+            profile = self._import(key, meta['path'])
+            if profile is None:
+                return None
+            self._loaded[key] = (mtime, profile)
+            return profile
+
+
+_REGISTRY = ProfileRegistry(_PROFILES)
+
+
 def list_profiles():
-    return list(_PROFILES.keys())
+    return _REGISTRY.names()
 
 
 def get_profile(name: str) -> Optional[Dict]:
-    return _PROFILES.get(name)
+    return _REGISTRY.get(name)
+
+
+def profile_index() -> Dict[str, Dict[str, Any]]:
+    """Metadata of the file-based profiles (no modules are imported)."""
+    return _REGISTRY.index()
@@ -0,0 +1,219 @@
+"""Simulated UDS ECU for tests and offline workflows.
+
+`SimulatedEcu` answers UDS requests from memory and can be used wherever a
+`UdsSession` expects a transport (it provides `send_hex`, `send_bytes` and
+`read_all`)::
+
+    ecu = SimulatedEcu(dids={0xF190: b'WVWZZZ...'}, memory_size=0x10000)
+    with UdsSession('sim', conn=ecu) as s:
+        ...
+
+Supported services: DiagnosticSessionControl (0x10), ECUReset (0x11),
+ReadDataByIdentifier (0x22; several DIDs per request are answered with the
+supported ones unless `multi_did` is off; `refuse` maps DIDs to the NRC
+they get), WriteDataByIdentifier
+(0x2E), ReadMemoryByAddress (0x23, at most `max_read` bytes; larger reads
+get `read_nrc`), CommunicationControl (0x28), TesterPresent (0x3E),
+ControlDTCSetting (0x85), and RequestDownload/RequestUpload with
+TransferData/RequestTransferExit (0x34/0x35/0x36/0x37) on `memory`.
+`pending` makes the transfer services answer with that many ``7F xx 78``
+(response pending) first; the final answer is returned by the following
+`read_all` calls.
+"""
+from typing import Any, Dict, List, Optional
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def _nrc(sid: int, code: int) -> bytes:
+    return bytes([0x7F, sid, code])
+
+
+class SimulatedEcu:
+    """In-memory ECU speaking a subset of UDS (see module docstring)."""
+
+    def __init__(self, dids: Optional[Dict[int, bytes]] = None, memory_size: int = 0,
+                 memory_base: int = 0, max_block_length: int = 0x402, max_read: int = 0x400,
+                 read_nrc: int = 0x31, pending: int = 0, refuse: Optional[Dict[int, int]] = None,
+                 multi_did: bool = True):
+        self.dids = {int(k): bytes(v) for k, v in (dids or {}).items()}
+        self.refuse = dict(refuse or {})
+        self.multi_did = multi_did
+        self.memory_base = memory_base
+        self.memory = bytearray(b'\xff' * memory_size)
+        self.max_block_length = max_block_length
+        self.max_read = max_read
+        self.read_nrc = read_nrc
+        self.pending = pending
+        self.session = 0x01
+        self.dtc_setting = True
+        self.communication = 0x00
+        self.requests: List[bytes] = []
+        self._queue: List[bytes] = []
+        self._transfer: Optional[Dict[str, Any]] = None
+
+    # transport interface -------------------------------------------------
+
+    def send_bytes(self, data: bytes) -> bytes:
+        req = bytes(data)
+        self.requests.append(req)
+        resp = self.handle(req)
+        if self.pending and req[:1] in (b'\x34', b'\x35', b'\x36', b'\x37'):
+            self._queue.extend([_nrc(req[0], 0x78)] * (self.pending - 1) + [resp])
+            return _nrc(req[0], 0x78)
+        return resp
+
+    def send_hex(self, hexstr: str) -> bytes:
+        return self.send_bytes(bytes.fromhex(hexstr))
+
+    def read_all(self) -> bytes:
+        return self._queue.pop(0) if self._queue else b''
+
+    def open(self):
+        return self
+
+    def close(self):
+        pass
+
+    # services ------------------------------------------------------------
+
+    def handle(self, req: bytes) -> bytes:
+        """Response to one request."""
+        if not req:
+            return b''
+        sid = req[0]
+        handler = getattr(self, f'_sid_{sid:02x}', None)
+        if handler is None:
+            return _nrc(sid, 0x11)
+        try:
+            return handler(req)
+        except IndexError:
+            return _nrc(sid, 0x13)
+
+    def _sid_10(self, req: bytes) -> bytes:
+        self.session = req[1]
+        self._transfer = None
+        # P2 = 50 ms, P2* = 5000 ms (in 10 ms units)
+        return bytes([0x50, req[1], 0x00, 0x32, 0x01, 0xF4])
+
+    def _sid_11(self, req: bytes) -> bytes:
+        self.session = 0x01
+        self.dtc_setting = True
+        self.communication = 0x00
+        self._transfer = None
+        return bytes([0x51, req[1]])
+
+    def _sid_22(self, req: bytes) -> bytes:
+        if len(req) < 3 or len(req) % 2 == 0 or (len(req) > 3 and not self.multi_did):
+            return _nrc(0x22, 0x13)
+        out = bytearray(b'\x62')
+        refused = None
+        for i in range(1, len(req), 2):
+            did = int.from_bytes(req[i:i + 2], 'big')
+            if did in self.refuse:
+                refused = self.refuse[did]
+            elif did in self.dids:
+                out += req[i:i + 2] + self.dids[did]
+        # only the supported DIDs are answered; an NRC when there are none
+        if len(out) > 1:
+            return bytes(out)
+        return _nrc(0x22, refused or 0x31)
+
+    def _sid_2e(self, req: bytes) -> bytes:
+        did = int.from_bytes(req[1:3], 'big')
+        if len(req) < 4:
+            return _nrc(0x2E, 0x13)
+        if did not in self.dids:
+            return _nrc(0x2E, 0x31)
+        self.dids[did] = bytes(req[3:])
+        return b'\x6e' + req[1:3]
+
+    def _sid_28(self, req: bytes) -> bytes:
+        self.communication = req[1] & 0x7F
+        return bytes([0x68, req[1]])
+
+    def _sid_3e(self, req: bytes) -> bytes:
+        return bytes([0x7E, req[1] & 0x7F])
+
+    def _sid_85(self, req: bytes) -> bytes:
+        self.dtc_setting = (req[1] & 0x7F) == 0x01
+        return bytes([0xC5, req[1]])
+
+    def _memory_range(self, req: bytes, fmt_pos: int):
+        fmt = req[fmt_pos]
+        alen, slen = fmt & 0x0F, fmt >> 4
+        pos = fmt_pos + 1
+        if not alen or not slen or len(req) != pos + alen + slen:
+            raise IndexError
+        address = int.from_bytes(req[pos:pos + alen], 'big')
+        size = int.from_bytes(req[pos + alen:], 'big')
+        offset = address - self.memory_base
+        if offset < 0 or size <= 0 or offset + size > len(self.memory):
+            return None
+        return offset, size
+
+    def _sid_23(self, req: bytes) -> bytes:
+        rng = self._memory_range(req, 1)
+        if rng is None:
+            return _nrc(0x23, 0x31)
+        offset, size = rng
+        if size > self.max_read:
+            return _nrc(0x23, self.read_nrc)
+        return b'\x63' + bytes(self.memory[offset:offset + size])
+
+    def _start_transfer(self, req: bytes, mode: str) -> bytes:
+        sid = req[0]
+        if self._transfer is not None:
+            return _nrc(sid, 0x70)
+        rng = self._memory_range(req, 2)
+        if rng is None:
+            return _nrc(sid, 0x31)
+        self._transfer = {'mode': mode, 'offset': rng[0], 'end': rng[0] + rng[1], 'seq': 1}
+        # lengthFormatIdentifier: 2-byte maxNumberOfBlockLength
+        return bytes([sid + 0x40, 0x20]) + self.max_block_length.to_bytes(2, 'big')
+
+    def _sid_34(self, req: bytes) -> bytes:
+        return self._start_transfer(req, 'download')
+
+    def _sid_35(self, req: bytes) -> bytes:
+        return self._start_transfer(req, 'upload')
+
+    def _sid_36(self, req: bytes) -> bytes:
+        tr = self._transfer
+        if tr is None:
+            return _nrc(0x36, 0x24)
+        seq = req[1]
+        if tr['mode'] == 'upload':
+            if seq != tr['seq'] or len(req) != 2:
+                return _nrc(0x36, 0x73 if len(req) == 2 else 0x13)
+            data = self.memory[tr['offset']:min(tr['end'], tr['offset'] + self.max_block_length - 2)]
+            if not data:
+                return _nrc(0x36, 0x24)
+            tr['offset'] += len(data)
+            tr['seq'] = (seq + 1) & 0xFF
+            return bytes([0x76, seq]) + bytes(data)
+        if len(req) > self.max_block_length:
+            return _nrc(0x36, 0x13)
+        if seq == (tr['seq'] - 1) & 0xFF and tr.get('last') == seq:
+            # repeated block: acknowledge without writing again
+            return bytes([0x76, seq])
+        if seq != tr['seq']:
+            return _nrc(0x36, 0x73)
+        data = req[2:]
+        if tr['offset'] + len(data) > tr['end']:
+            return _nrc(0x36, 0x71)
+        self.memory[tr['offset']:tr['offset'] + len(data)] = data
+        tr['offset'] += len(data)
+        tr['last'] = seq
+        tr['seq'] = (seq + 1) & 0xFF
+        return bytes([0x76, seq])
+
+    def _sid_37(self, req: bytes) -> bytes:
+        if self._transfer is None:
+            return _nrc(0x37, 0x24)
+        if self._transfer['offset'] != self._transfer['end']:
+            return _nrc(0x37, 0x24)
+        self._transfer = None
+        return b'\x77'
@@ -0,0 +1,231 @@
+"""ELM327/STN session with cached adapter state.
+
+`ElmSession` keeps track of the AT settings the adapter currently has and only
+sends the commands whose values differ. Init commands are written in one go
+(pipelined) and each answer is split on the `>` prompt. The OBD protocol found
+by the adapter's auto search (`ATDPN`) is remembered per device so later
+sessions can select it directly with `ATSPn` instead of searching again.
+"""
+import json
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from . import serial_comm
+from .cache import cache_dir
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+PROMPT = b'>'
+
+# settings applied to every session unless overridden
+DEFAULT_SETTINGS = {'E': '0', 'L': '0', 'H': '0'}
+
+# known adapter state after ATZ/ATD (linefeed default depends on a hardware pin)
+_RESET_STATE = {'E': '1', 'H': '0', 'S': '1'}
+
+# answers that mean the selected protocol did not reach the vehicle
+_NO_LINK = (b'UNABLE TO CONNECT', b'BUS INIT', b'CAN ERROR')
+
+# last known adapter settings per device; lives as long as the process
+_ADAPTER_STATE: Dict[str, Dict[str, str]] = {}
+
+
+def _memo_path() -> Path:
+    return cache_dir() / 'elm_protocols.json'
+
+
+def load_protocol_memo(path: Optional[Path] = None) -> Dict[str, str]:
+    """Return the stored device -> protocol number mapping (empty on error)."""
+    try:
+        p = Path(path) if path else _memo_path()
+        with p.open('r', encoding='utf-8') as f:
+            data = json.load(f)
+        return {str(k): str(v) for k, v in data.items()}
+    except Exception:
+        return {}
+
+
+def save_protocol_memo(device: str, protocol: Optional[str], path: Optional[Path] = None):
+    """Remember `protocol` for `device` (None forgets it). Best-effort."""
+    try:
+        p = Path(path) if path else _memo_path()
+        memo = load_protocol_memo(p)
+        if protocol:
+            memo[device] = protocol
+        else:
+            memo.pop(device, None)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_suffix('.tmp')
+        tmp.write_text(json.dumps(memo, indent=2))
+        tmp.replace(p)
+    except Exception as e:
+        logger.debug('could not store protocol memo: %s', e)
+
+
+def _strip_prompt(resp: bytes) -> bytes:
+    if resp.endswith(PROMPT):
+        resp = resp[:-1]
+    return resp.strip()
+
+
+class ElmSession:
+    """A held connection to an ELM327-compatible adapter.
+
+    `conn` may be passed to reuse an already open transport (anything with
+    `send_ascii_line`; transports that also provide `write` and `read_until`
+    get pipelined init commands). Otherwise a `SerialComm` is opened for
+    `device`.
+    """
+
+    def __init__(self, device: str, baud: int = 115200, timeout: float = 1.0, conn=None,
+                 settings: Optional[Dict[str, str]] = None, protocol: Optional[str] = None,
+                 memo_path: Optional[Path] = None):
+        self.device = device
+        self.baud = baud
+        self.timeout = timeout
+        self.memo_path = memo_path
+        self.settings = dict(DEFAULT_SETTINGS)
+        if settings:
+            self.settings.update({k.upper(): str(v) for k, v in settings.items()})
+        self._conn = conn
+        self._owns_conn = conn is None
+        self._state: Dict[str, str] = dict(_ADAPTER_STATE.get(device, {}))
+        # explicit protocol wins; otherwise use the memo, falling back to auto search
+        self._protocol_from_memo = False
+        if protocol is None:
+            protocol = load_protocol_memo(memo_path).get(device)
+            self._protocol_from_memo = protocol is not None
+        self.protocol = protocol
+        self._pending: List[str] = []
+        self.commands_sent = 0
+
+    # connection handling -------------------------------------------------
+
+    def open(self):
+        if self._conn is None:
+            self._conn = serial_comm.SerialComm(self.device, baud=self.baud, timeout=self.timeout)
+            opener = getattr(self._conn, 'open', None)
+            if opener:
+                opener()
+        self._pending = self._diff_settings()
+        return self
+
+    def close(self):
+        _ADAPTER_STATE[self.device] = dict(self._state)
+        if self._conn is not None and self._owns_conn:
+            closer = getattr(self._conn, 'close', None)
+            if closer:
+                try:
+                    closer()
+                except Exception as e:
+                    logger.debug('error closing ELM transport: %s', e)
+            self._conn = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # settings ------------------------------------------------------------
+
+    def _wanted(self) -> Dict[str, str]:
+        wanted = dict(self.settings)
+        wanted['SP'] = self.protocol or '0'
+        return wanted
+
+    def _diff_settings(self) -> List[str]:
+        cmds = []
+        for key, value in self._wanted().items():
+            if self._state.get(key) != value:
+                cmds.append(f'AT{key}{value}')
+        return cmds
+
+    def configure(self, **settings) -> List[str]:
+        """Change adapter settings (e.g. ``H='1'``). Returns the AT commands sent."""
+        self.settings.update({k.upper(): str(v) for k, v in settings.items()})
+        cmds = self._diff_settings()
+        if cmds:
+            self._exchange(cmds)
+        return cmds
+
+    def reset(self) -> bytes:
+        """Full adapter reset (`ATZ`). Only needed after adapter errors."""
+        resp = self._exchange(['ATZ'])[0]
+        self._state = dict(_RESET_STATE)
+        self._pending = self._diff_settings()
+        return resp
+
+    # command exchange ----------------------------------------------------
+
+    def _record(self, cmd: str, resp: bytes):
+        if not cmd.upper().startswith('AT'):
+            return
+        body = cmd[2:].upper()
+        if body in ('Z', 'D', 'WS'):
+            self._state = dict(_RESET_STATE)
+            return
+        if b'OK' not in resp.upper():
+            return
+        for key in sorted(self._wanted(), key=len, reverse=True):
+            if body.startswith(key):
+                self._state[key] = body[len(key):]
+                break
+
+    def _exchange(self, cmds: List[str]) -> List[bytes]:
+        """Send `cmds` and return one response per command (prompt stripped)."""
+        conn = self._conn
+        if conn is None:
+            raise RuntimeError('ELM session not open')
+        self.commands_sent += len(cmds)
+        if hasattr(conn, 'write') and hasattr(conn, 'read_until'):
+            # pipeline: write everything at once, then collect one prompt per command
+            conn.write(''.join(c + '\r' for c in cmds).encode('ascii'))
+            out = [_strip_prompt(conn.read_until(PROMPT)) for _ in cmds]
+        else:
+            out = [_strip_prompt(conn.send_ascii_line(c) or b'') for c in cmds]
+        for cmd, resp in zip(cmds, out):
+            self._record(cmd, resp)
+        return out
+
+    def _echo_seen(self, cmd: str, resp: bytes) -> bool:
+        if self._state.get('E') != '0':
+            return False
+        return resp.replace(b' ', b'').upper().startswith(cmd.replace(' ', '').upper().encode('ascii'))
+
+    def command(self, cmd: str) -> bytes:
+        """Send one OBD/UDS command and return the adapter response.
+
+        Outstanding setting changes are sent in the same pipelined write, so a
+        session that is already configured costs exactly one command.
+        """
+        cmds = self._pending + [cmd]
+        self._pending = []
+        resp = self._exchange(cmds)[-1]
+        if self._echo_seen(cmd, resp):
+            # adapter was reset behind our back: forget cached state and re-init
+            logger.debug('echo detected on %s; re-initialising adapter state', self.device)
+            self._state = {}
+            self._pending = self._diff_settings()
+        if self.protocol and self._protocol_from_memo and any(e in resp.upper() for e in _NO_LINK):
+            # remembered protocol no longer works (different car?): search again
+            logger.debug('memorised protocol %s failed; falling back to auto search', self.protocol)
+            save_protocol_memo(self.device, None, self.memo_path)
+            self.protocol = None
+            self._protocol_from_memo = False
+            resp = self._exchange(self._diff_settings() + [cmd])[-1]
+        if not self.protocol and not cmd.upper().startswith('AT'):
+            self._learn_protocol()
+        return resp
+
+    def _learn_protocol(self):
+        resp = self._exchange(['ATDPN'])[0].upper().replace(b' ', b'')
+        # answer is e.g. 'A6' (auto, protocol 6) or '6'
+        num = resp[1:] if resp.startswith(b'A') else resp
+        if len(num) == 1 and num in b'123456789ABC' and num != b'0':
+            self.protocol = num.decode('ascii')
+            self._protocol_from_memo = False
+            # the adapter already runs this protocol; no ATSP needed this session
+            self._state['SP'] = self.protocol
+            save_protocol_memo(self.device, self.protocol, self.memo_path)
@@ -0,0 +1,111 @@
+"""Streaming UDS download (RequestDownload / TransferData / RequestTransferExit).
+
+`download` writes a file image into ECU memory on an open `UdsSession`:
+
+- DTC setting (0x85) and non-diagnostic communication (0x28) are switched
+  off for the transfer, so the bus carries only the download, and are
+  switched back on afterwards (best-effort: ECUs that refuse either in the
+  current session are still programmed);
+- RequestDownload (0x34) announces the region; the block size is the
+  ``maxNumberOfBlockLength`` the ECU returns, so every TransferData (0x36)
+  carries as much data as the ECU accepts;
+- the image is memory-mapped and each block is sent from a slice of the
+  map with the wrapping block sequence counter; ``7F xx 78`` answers are
+  waited out by the session;
+- RequestTransferExit (0x37) closes the transfer.
+
+`progress` is called after every block as ``progress(done_bytes,
+total_bytes, bytes_per_s)`` (see `progress.progress_printer`).
+Entering the programming session and unlocking security is left to the
+caller, as is erasing/checking memory (ECU-specific routines).
+"""
+import mmap
+import os
+import time
+from typing import Any, Callable, Dict, Optional
+
+from .logger import get_logger
+from .uds import NegativeResponse, UdsSession, memory_address
+
+logger = get_logger(__name__)
+
+# 0x85 ControlDTCSetting / 0x28 CommunicationControl sub-functions
+DTC_SETTING_ON = 0x01
+DTC_SETTING_OFF = 0x02
+COMM_ENABLE_RX_TX = 0x00
+COMM_DISABLE_RX_TX = 0x03
+COMM_NORMAL_MESSAGES = 0x01
+
+
+def request_download(session: UdsSession, address: int, size: int, data_format: int = 0x00,
+                     address_bytes: Optional[int] = None, size_bytes: Optional[int] = None) -> int:
+    """Send RequestDownload (0x34); return the ECU's maxNumberOfBlockLength."""
+    req = bytes([0x34, data_format]) + memory_address(address, size, address_bytes, size_bytes)
+    resp = session.request(req)
+    n = resp[1] >> 4 if len(resp) > 1 else 0
+    if not n or len(resp) < 2 + n:
+        raise RuntimeError(f'malformed RequestDownload response: {resp.hex()}')
+    return int.from_bytes(resp[2:2 + n], 'big')
+
+
+def _quiet_bus(session: UdsSession, on: bool):
+    # best-effort: ECUs refuse these outside the programming/extended session
+    steps = ((0x28, COMM_ENABLE_RX_TX), (0x85, DTC_SETTING_ON)) if on else \
+        ((0x85, DTC_SETTING_OFF), (0x28, COMM_DISABLE_RX_TX))
+    for sid, sub in steps:
+        req = bytes([sid, sub, COMM_NORMAL_MESSAGES]) if sid == 0x28 else bytes([sid, sub])
+        try:
+            session.request(req)
+        except (NegativeResponse, RuntimeError) as e:
+            logger.debug('service 0x%02X %02X refused: %s', sid, sub, e)
+
+
+def download(session: UdsSession, path: str, address: int, data_format: int = 0x00,
+             max_block_length: Optional[int] = None, quiet_bus: bool = True,
+             progress: Optional[Callable[[int, int, float], None]] = None) -> Dict[str, Any]:
+    """Download the file at `path` to ECU memory at `address`.
+
+    `max_block_length` caps the negotiated TransferData length (SID and
+    counter included), as does the session's `max_payload` (4095 bytes over
+    ISO-TP). Returns ``{'bytes', 'blocks', 'block_length',
+    'seconds', 'rate'}`` (rate in bytes/s).
+    """
+    size = os.path.getsize(path)
+    if not size:
+        raise ValueError(f'{path} is empty')
+    if quiet_bus:
+        _quiet_bus(session, on=False)
+    try:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as image:
+            block_length = request_download(session, address, size, data_format=data_format)
+            for limit in (max_block_length, session.max_payload):
+                if limit:
+                    block_length = min(block_length, limit)
+            if block_length <= 2:
+                raise RuntimeError(f'ECU accepts no TransferData payload (block length {block_length})')
+            chunk = block_length - 2
+            view = memoryview(image)
+            seq = 1
+            blocks = 0
+            t0 = time.monotonic()
+            try:
+                for offset in range(0, size, chunk):
+                    resp = session.request(bytes((0x36, seq)) + view[offset:offset + chunk])
+                    if resp[1:2] != bytes((seq,)):
+                        raise RuntimeError(f'TransferData block {seq} acknowledged as {resp[1:2].hex()}')
+                    blocks += 1
+                    seq = (seq + 1) & 0xFF
+                    if progress:
+                        done = min(offset + chunk, size)
+                        elapsed = time.monotonic() - t0
+                        progress(done, size, done / elapsed if elapsed > 0 else 0.0)
+            finally:
+                view.release()
+            session.request(b'\x37')
+            seconds = time.monotonic() - t0
+    finally:
+        if quiet_bus:
+            _quiet_bus(session, on=True)
+    return {'bytes': size, 'blocks': blocks, 'block_length': block_length,
+            'seconds': seconds, 'rate': size / seconds if seconds > 0 else 0.0}
+
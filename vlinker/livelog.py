@@ -0,0 +1,283 @@
+"""High-rate live-data logger for OBD mode 01 PIDs.
+
+Each signal has its own target rate. A deadline scheduler picks the most
+overdue signals, packs up to six of them into one mode 01 request and skips
+PIDs the ECU does not report in its support bitmaps (0100/0120/...).
+
+Samples go to a compact columnar file: per signal, a float64 time column and
+a uint64 raw value column are buffered in `array` objects and written out in
+fixed-size chunks, so memory stays constant on hours-long drives.
+
+File layout (little endian)::
+
+    MAGIC, u32 header_len, JSON header
+    chunks: u16 signal_index, u32 count, count*f64 times, count*u64 values
+    stats:  u16 0xFFFF, u32 json_len, JSON stats (written on close)
+"""
+import json
+import struct
+import sys
+import time
+from array import array
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from .elm import ElmSession
+from .logger import get_logger
+from .obd_pids import SUPPORT_PIDS, PID_LENGTHS, parse_support_bitmap, split_mode01_payload
+from .protocols import elm_payloads
+
+logger = get_logger(__name__)
+
+MAGIC = b'VLLOG\x01'
+_STATS_INDEX = 0xFFFF
+_CHUNK_HDR = struct.Struct('<HI')
+_U32 = struct.Struct('<I')
+_SWAP = sys.byteorder == 'big'
+
+
+class ColumnarLogWriter:
+    """Chunked columnar writer used by `LiveLogger`."""
+
+    def __init__(self, path: str, signals: List[Dict[str, Any]], chunk_size: int = 4096):
+        self.path = path
+        self.chunk_size = int(chunk_size)
+        self._f = open(path, 'wb')
+        self._times = [array('d') for _ in signals]
+        self._values = [array('Q') for _ in signals]
+        self.samples = [0] * len(signals)
+        header = json.dumps({'signals': signals, 'start_wall': time.time(), 'chunk_size': self.chunk_size}).encode('utf-8')
+        self._f.write(MAGIC + _U32.pack(len(header)) + header)
+
+    def append(self, index: int, t: float, value: int):
+        times = self._times[index]
+        times.append(t)
+        self._values[index].append(value)
+        self.samples[index] += 1
+        if len(times) >= self.chunk_size:
+            self._flush(index)
+
+    def _flush(self, index: int):
+        times = self._times[index]
+        if not times:
+            return
+        values = self._values[index]
+        if _SWAP:
+            times.byteswap()
+            values.byteswap()
+        self._f.write(_CHUNK_HDR.pack(index, len(times)))
+        self._f.write(times.tobytes())
+        self._f.write(values.tobytes())
+        del times[:]
+        del values[:]
+
+    def close(self, stats: Optional[Dict[str, Any]] = None):
+        if self._f.closed:
+            return
+        for i in range(len(self._times)):
+            self._flush(i)
+        if stats is not None:
+            blob = json.dumps(stats).encode('utf-8')
+            self._f.write(_CHUNK_HDR.pack(_STATS_INDEX, len(blob)) + blob)
+        self._f.close()
+
+
+def iter_live_log_chunks(path: str) -> Iterator[Tuple[str, array, array]]:
+    """Yield (pid_hex, times, values) chunks from a columnar log file."""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError('not a vlinker live log')
+        (hlen,) = _U32.unpack(f.read(4))
+        header = json.loads(f.read(hlen))
+        names = [s['pid'] for s in header['signals']]
+        while True:
+            hdr = f.read(_CHUNK_HDR.size)
+            if len(hdr) < _CHUNK_HDR.size:
+                return
+            index, count = _CHUNK_HDR.unpack(hdr)
+            if index == _STATS_INDEX:
+                f.seek(count, 1)
+                continue
+            times = array('d')
+            values = array('Q')
+            times.frombytes(f.read(count * 8))
+            values.frombytes(f.read(count * 8))
+            if _SWAP:
+                times.byteswap()
+                values.byteswap()
+            yield names[index], times, values
+
+
+def read_live_log(path: str) -> Dict[str, Tuple[array, array]]:
+    """Load a whole columnar log as {pid_hex: (times, values)}."""
+    out: Dict[str, Tuple[array, array]] = {}
+    for pid, times, values in iter_live_log_chunks(path):
+        t, v = out.setdefault(pid, (array('d'), array('Q')))
+        t.extend(times)
+        v.extend(values)
+    return out
+
+
+def read_live_log_stats(path: str) -> Optional[Dict[str, Any]]:
+    """Return the stats block written when the log was closed, if any."""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError('not a vlinker live log')
+        (hlen,) = _U32.unpack(f.read(4))
+        f.seek(hlen, 1)
+        while True:
+            hdr = f.read(_CHUNK_HDR.size)
+            if len(hdr) < _CHUNK_HDR.size:
+                return None
+            index, count = _CHUNK_HDR.unpack(hdr)
+            if index == _STATS_INDEX:
+                return json.loads(f.read(count))
+            f.seek(count * 16, 1)
+
+
+class LiveLogger:
+    """Poll mode 01 PIDs at per-signal rates over an `ElmSession`-like object.
+
+    `session` needs a `command(cmd) -> bytes` method. `signals` maps PID (int
+    or hex string) to the target rate in Hz.
+    """
+
+    def __init__(self, session, signals: Dict[Any, float], out_path: str, max_pids: int = 6,
+                 chunk_size: int = 4096, check_support: bool = True, responses: Optional[int] = None):
+        if not signals:
+            raise ValueError('at least one signal required')
+        self.session = session
+        self.out_path = out_path
+        self.max_pids = max(1, min(int(max_pids), 6))
+        self.chunk_size = chunk_size
+        self.check_support = check_support
+        # appending the expected response count lets the ELM return without waiting for its timeout
+        self.responses = responses
+        self.rates: Dict[int, float] = {}
+        for pid, rate in signals.items():
+            p = int(pid, 16) if isinstance(pid, str) else int(pid)
+            if rate <= 0:
+                raise ValueError(f'rate for PID {p:02X} must be positive')
+            self.rates[p] = float(rate)
+        self.unsupported: Set[int] = set()
+
+    def query_supported(self) -> Set[int]:
+        """Walk the support bitmaps (0100, 0120, ...) and return supported PIDs."""
+        supported: Set[int] = set()
+        for base in SUPPORT_PIDS:
+            payloads = elm_payloads(self.session.command(f'01{base:02X}'))
+            bits: Set[int] = set()
+            for payload in payloads:
+                data = split_mode01_payload(payload).get(base)
+                if data:
+                    bits |= parse_support_bitmap(base, data)
+            supported |= bits
+            if base + 0x20 not in bits:
+                break
+        return supported
+
+    def _request(self, pids: List[int]) -> Dict[int, bytes]:
+        cmd = '01' + ''.join(f'{p:02X}' for p in pids)
+        if self.responses:
+            cmd += f'{int(self.responses):X}'
+        values: Dict[int, bytes] = {}
+        for payload in elm_payloads(self.session.command(cmd)):
+            for pid, data in split_mode01_payload(payload).items():
+                # first ECU to answer wins (engine ECU answers first on CAN)
+                values.setdefault(pid, data)
+        return values
+
+    def run(self, duration: Optional[float] = None, stop: Optional[Callable[[], bool]] = None) -> Dict[str, Any]:
+        """Log until `duration` seconds pass or `stop()` returns True. Returns stats."""
+        active = [p for p in self.rates if p in PID_LENGTHS]
+        self.unsupported = {p for p in self.rates if p not in PID_LENGTHS}
+        if self.check_support:
+            supported = self.query_supported()
+            if supported:
+                self.unsupported |= {p for p in active if p not in supported}
+                active = [p for p in active if p in supported]
+        if not active:
+            raise RuntimeError('none of the requested PIDs is supported')
+
+        signals = [{'pid': f'{p:02X}', 'rate': self.rates[p]} for p in active]
+        index = {p: i for i, p in enumerate(active)}
+        period = {p: 1.0 / self.rates[p] for p in active}
+        writer = ColumnarLogWriter(self.out_path, signals, chunk_size=self.chunk_size)
+        misses = {p: 0 for p in active}
+        requests = 0
+        start = time.monotonic()
+        due = {p: start for p in active}
+        now = start
+        try:
+            while active:
+                now = time.monotonic()
+                if duration is not None and now - start >= duration:
+                    break
+                if stop is not None and stop():
+                    break
+                ready = sorted((p for p in active if due[p] <= now), key=due.__getitem__)
+                if not ready:
+                    time.sleep(max(0.0, min(due[p] for p in active) - now))
+                    continue
+                batch = ready[:self.max_pids]
+                if len(batch) < self.max_pids:
+                    # fill free slots with signals that fall due within half a period
+                    soon = sorted((p for p in active if p not in batch and due[p] - now < period[p] / 2),
+                                  key=due.__getitem__)
+                    batch += soon[:self.max_pids - len(batch)]
+                t0 = time.monotonic()
+                values = self._request(batch)
+                t1 = time.monotonic()
+                requests += 1
+                ts = (t0 + t1) / 2 - start
+                for p in batch:
+                    data = values.get(p)
+                    if data is None:
+                        misses[p] += 1
+                        if misses[p] >= 3:
+                            # ECU stopped answering this PID; stop wasting request slots on it
+                            active.remove(p)
+                            self.unsupported.add(p)
+                        due[p] = t1 + period[p]
+                        continue
+                    misses[p] = 0
+                    writer.append(index[p], ts, int.from_bytes(data[:8], 'big'))
+                    due[p] += period[p]
+                    if due[p] < t1:
+                        # running behind: do not burst to catch up on missed deadlines
+                        due[p] = t1
+        finally:
+            elapsed = max(time.monotonic() - start, 1e-9)
+            stats = {
+                'duration': elapsed,
+                'requests': requests,
+                'request_rate': requests / elapsed,
+                'samples': sum(writer.samples),
+                'sample_rate': sum(writer.samples) / elapsed,
+                'unsupported': [f'{p:02X}' for p in sorted(self.unsupported)],
+                'signals': {
+                    s['pid']: {
+                        'target_hz': s['rate'],
+                        'achieved_hz': writer.samples[i] / elapsed,
+                        'samples': writer.samples[i],
+                    } for i, s in enumerate(signals)
+                },
+            }
+            writer.close(stats)
+        return stats
+
+
+def parse_signal_spec(spec: str) -> Tuple[str, float]:
+    """Parse a CLI signal spec like '0C:20' (PID 0C at 20 Hz); rate defaults to 1 Hz."""
+    pid, _sep, rate = spec.partition(':')
+    pid = pid.strip().upper()
+    if len(pid) != 2:
+        raise ValueError(f'invalid PID: {spec}')
+    int(pid, 16)
+    return pid, float(rate) if rate else 1.0
+
+
+def start_live_log(device: str, signals: Dict[Any, float], out_path: str, duration: Optional[float] = None,
+                   baud: int = 115200, timeout: float = 1.0, **kwargs) -> Dict[str, Any]:
+    """Open an ELM session on `device` and log `signals` into `out_path`."""
+    with ElmSession(device, baud=baud, timeout=timeout) as s:
+        return LiveLogger(s, signals, out_path, **kwargs).run(duration=duration)
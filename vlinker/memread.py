@@ -0,0 +1,164 @@
+"""Bulk ECU memory reads straight to disk.
+
+`read_memory` dumps a memory region on an open `UdsSession`, either with
+ReadMemoryByAddress (0x23, ``method='read'``) or with RequestUpload and
+TransferData (0x35/0x36/0x37, ``method='upload'``).
+
+With 0x23 the ECU's largest accepted read size is found on the fly: the
+block size doubles after every full block until the ECU refuses one with
+NRC 0x31/0x13/0x14, is then narrowed down between the largest accepted
+and the smallest refused size, and held from there. Every probe reads real
+data, so finding the limit costs no extra requests. With 0x35 the block
+size is the ``maxNumberOfBlockLength`` the ECU announces.
+
+Data is appended to the output file as it arrives. A ``<out>.part.json``
+file next to it records the region and the learned block size; running
+the same read again resumes at the end of the partial file. The state
+file is removed when the region is complete.
+"""
+import os
+import time
+from typing import Any, Callable, Dict, Optional
+
+from .logger import get_logger
+from .progress import load_checkpoint, save_checkpoint
+from .uds import NegativeResponse, UdsSession, memory_address
+
+logger = get_logger(__name__)
+
+STATE_SUFFIX = '.part.json'
+
+# answers meaning "this read is too long" rather than "no such memory"
+SIZE_NRCS = (0x31, 0x13, 0x14)
+
+
+class _BlockSizer:
+    """Doubling, then bisecting, search for the largest accepted read size."""
+
+    def __init__(self, start: int, max_block: int, learned: Optional[int] = None):
+        self.max_block = max_block
+        self.good = learned or 0
+        self.bad: Optional[int] = learned + 1 if learned else None
+        self.size = learned or min(start, max_block)
+
+    @property
+    def settled(self) -> bool:
+        return self.bad is not None and self.bad - self.good <= 1
+
+    def accepted(self, n: int):
+        if n < self.size or self.settled:
+            # short tail read or limit known: nothing new learned
+            return
+        self.good = n
+        if self.bad is None:
+            self.size = min(2 * n, self.max_block)
+            if self.size == n:
+                self.bad = n + 1
+        else:
+            self.size = (self.good + self.bad) // 2 if not self.settled else self.good
+
+    def refused(self, n: int) -> bool:
+        """Shrink after a refused read of `n` bytes; False when `n` was not too long."""
+        if n <= self.good or n <= 1:
+            return False
+        self.bad = n if self.bad is None else min(self.bad, n)
+        self.size = (self.good + self.bad) // 2 if self.good else n // 2
+        if self.settled:
+            self.size = self.good
+        return True
+
+
+def _open_output(out_path: str, done: int):
+    f = open(out_path, 'r+b' if os.path.exists(out_path) else 'wb')
+    f.seek(done)
+    f.truncate()
+    return f
+
+
+def read_memory(session: UdsSession, address: int, size: int, out_path: str, method: str = 'read',
+                start_block: int = 0x40, max_block: int = 0xFFF, address_bytes: int = 4,
+                size_bytes: int = 2, resume: bool = True,
+                progress: Optional[Callable[[int, int, float], None]] = None) -> Dict[str, Any]:
+    """Read `size` bytes at `address` into `out_path`.
+
+    `max_block` caps the 0x23 read size. `progress` is called as
+    ``progress(done_bytes, total_bytes, bytes_per_s)`` (see
+    `progress.progress_printer`). Returns ``{'bytes', 'read', 'resumed_at',
+    'block_size', 'requests', 'seconds', 'rate'}``.
+    """
+    if method not in ('read', 'upload'):
+        raise ValueError(f'unknown method: {method} (read or upload)')
+    if size <= 0:
+        raise ValueError('size must be positive')
+    job = {'address': address, 'size': size, 'method': method}
+    state_path = out_path + STATE_SUFFIX
+    state = load_checkpoint(state_path, job) if resume else None
+    done = 0
+    if state is not None and os.path.exists(out_path):
+        done = min(os.path.getsize(out_path), size)
+    state = state or {'job': job, 'block': None}
+    save_checkpoint(state_path, state)
+    resumed_at = done
+    requests = 0
+    t0 = time.monotonic()
+
+    def report():
+        if progress:
+            elapsed = time.monotonic() - t0
+            progress(done, size, (done - resumed_at) / elapsed if elapsed > 0 else 0.0)
+
+    with _open_output(out_path, done) as f:
+        if method == 'read':
+            sizer = _BlockSizer(start_block, max_block, learned=state.get('block'))
+            while done < size:
+                if sizer.settled and state['block'] != sizer.good:
+                    # remember the limit for a resumed read
+                    state['block'] = sizer.good
+                    save_checkpoint(state_path, state)
+                n = min(sizer.size, size - done)
+                req = b'\x23' + memory_address(address + done, n, address_bytes, size_bytes)
+                requests += 1
+                try:
+                    resp = session.request(req)
+                except NegativeResponse as e:
+                    if e.nrc in SIZE_NRCS and sizer.refused(n):
+                        logger.debug('read of %d bytes refused (0x%02X); trying %d', n, e.nrc, sizer.size)
+                        continue
+                    raise
+                data = resp[1:]
+                if len(data) != n:
+                    raise RuntimeError(f'read at 0x{address + done:X} returned {len(data)} of {n} bytes')
+                f.write(data)
+                done += n
+                sizer.accepted(n)
+                report()
+            block_size = sizer.good
+        else:
+            req = b'\x35\x00' + memory_address(address + done, size - done, address_bytes)
+            resp = session.request(req)
+            requests += 1
+            nlen = resp[1] >> 4 if len(resp) > 1 else 0
+            if not nlen or len(resp) < 2 + nlen:
+                raise RuntimeError(f'malformed RequestUpload response: {resp.hex()}')
+            block_size = int.from_bytes(resp[2:2 + nlen], 'big') - 2
+            seq = 1
+            while done < size:
+                resp = session.request(bytes((0x36, seq)))
+                requests += 1
+                if resp[1:2] != bytes((seq,)) or len(resp) < 3:
+                    raise RuntimeError(f'TransferData block {seq} answered with {resp[:2].hex()}')
+                data = resp[2:2 + size - done]
+                f.write(data)
+                done += len(data)
+                seq = (seq + 1) & 0xFF
+                report()
+            session.request(b'\x37')
+            requests += 1
+    seconds = time.monotonic() - t0
+    try:
+        os.remove(state_path)
+    except OSError:
+        pass
+    return {'bytes': size, 'read': size - resumed_at, 'resumed_at': resumed_at, 'block_size': block_size,
+            'requests': requests, 'seconds': seconds,
+            'rate': (size - resumed_at) / seconds if seconds > 0 else 0.0}
@@ -0,0 +1,288 @@
+"""SAE J1979 mode 01 PID helpers.
+
+Data lengths of the standard mode 01 PIDs, parsing of the PID-support
+bitmaps (PIDs 00, 20, 40, ...), splitting of multi-PID responses such as
+``41 0C 1A F8 0D 20`` and a formula table mapping raw bytes to physical
+units. Formulas also run vectorised over logged columns when NumPy is
+available.
+"""
+import ast
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+# number of data bytes returned for each mode 01 PID
+PID_LENGTHS: Dict[int, int] = {
+    0x00: 4, 0x01: 4, 0x02: 2, 0x03: 2, 0x04: 1, 0x05: 1, 0x06: 1, 0x07: 1,
+    0x08: 1, 0x09: 1, 0x0A: 1, 0x0B: 1, 0x0C: 2, 0x0D: 1, 0x0E: 1, 0x0F: 1,
+    0x10: 2, 0x11: 1, 0x12: 1, 0x13: 1, 0x14: 2, 0x15: 2, 0x16: 2, 0x17: 2,
+    0x18: 2, 0x19: 2, 0x1A: 2, 0x1B: 2, 0x1C: 1, 0x1D: 1, 0x1E: 1, 0x1F: 2,
+    0x20: 4, 0x21: 2, 0x22: 2, 0x23: 2, 0x24: 4, 0x25: 4, 0x26: 4, 0x27: 4,
+    0x28: 4, 0x29: 4, 0x2A: 4, 0x2B: 4, 0x2C: 1, 0x2D: 1, 0x2E: 1, 0x2F: 1,
+    0x30: 1, 0x31: 2, 0x32: 2, 0x33: 1, 0x34: 4, 0x35: 4, 0x36: 4, 0x37: 4,
+    0x38: 4, 0x39: 4, 0x3A: 4, 0x3B: 4, 0x3C: 2, 0x3D: 2, 0x3E: 2, 0x3F: 2,
+    0x40: 4, 0x41: 4, 0x42: 2, 0x43: 2, 0x44: 2, 0x45: 1, 0x46: 1, 0x47: 1,
+    0x48: 1, 0x49: 1, 0x4A: 1, 0x4B: 1, 0x4C: 1, 0x4D: 2, 0x4E: 2, 0x4F: 4,
+    0x50: 4, 0x51: 1, 0x52: 1, 0x53: 2, 0x54: 2, 0x55: 2, 0x56: 2, 0x57: 2,
+    0x58: 2, 0x59: 2, 0x5A: 1, 0x5B: 1, 0x5C: 1, 0x5D: 2, 0x5E: 2, 0x5F: 1,
+    0x60: 4, 0x61: 1, 0x62: 1, 0x63: 2, 0x64: 5, 0x65: 2, 0x66: 5, 0x67: 3,
+    0x80: 4, 0xA0: 4, 0xC0: 4,
+}
+
+SUPPORT_PIDS = (0x00, 0x20, 0x40, 0x60, 0x80, 0xA0, 0xC0, 0xE0)
+
+
+def parse_support_bitmap(base: int, data: bytes) -> Set[int]:
+    """Return the PIDs flagged in a 4-byte support bitmap returned for PID `base`.
+
+    Bit 7 of the first byte is PID base+1, bit 0 of the last byte is base+0x20.
+    """
+    supported = set()
+    bits = int.from_bytes(data[:4].ljust(4, b'\x00'), 'big')
+    for i in range(32):
+        if bits & (1 << (31 - i)):
+            supported.add(base + i + 1)
+    return supported
+
+
+def split_mode01_payload(payload: bytes) -> Dict[int, bytes]:
+    """Split a (multi-PID) mode 01 positive response into {pid: data}.
+
+    `payload` starts with 0x41. Parsing stops at the first PID whose length is
+    unknown or whose data is truncated.
+    """
+    out: Dict[int, bytes] = {}
+    if not payload or payload[0] != 0x41:
+        return out
+    i = 1
+    n = len(payload)
+    while i < n:
+        pid = payload[i]
+        length = PID_LENGTHS.get(pid)
+        if length is None or i + 1 + length > n:
+            break
+        out[pid] = bytes(payload[i + 1:i + 1 + length])
+        i += 1 + length
+    return out
+
+
+def chunk_pids(pids: Iterable[int], size: int = 6) -> List[List[int]]:
+    """Group PIDs for multi-PID requests (J1979 allows up to 6 per request)."""
+    pids = list(pids)
+    return [pids[i:i + size] for i in range(0, len(pids), size)]
+
+
+# --- formula engine -------------------------------------------------------
+
+# Formulas use the J1979 byte names A, B, C, D (A is the first data byte) and
+# only arithmetic/bit operators, so the same compiled expression evaluates a
+# single sample (ints) or whole NumPy columns at once. No operator may grow a
+# value without bound (no ** and shifts only by small constants), so a
+# profile formula cannot stall the logger.
+_FORMULA_NAMES = ('A', 'B', 'C', 'D')
+_MAX_SHIFT = 64
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Name, ast.Load,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod,
+    ast.BitAnd, ast.BitOr, ast.BitXor, ast.LShift, ast.RShift, ast.USub, ast.UAdd,
+)
+
+# pid -> (name, units, formula)
+PID_FORMULAS: Dict[int, Tuple[str, str, str]] = {
+    0x04: ('engine_load', '%', 'A*100/255'),
+    0x05: ('coolant_temp', 'C', 'A-40'),
+    0x06: ('short_fuel_trim_1', '%', 'A*100/128-100'),
+    0x07: ('long_fuel_trim_1', '%', 'A*100/128-100'),
+    0x08: ('short_fuel_trim_2', '%', 'A*100/128-100'),
+    0x09: ('long_fuel_trim_2', '%', 'A*100/128-100'),
+    0x0A: ('fuel_pressure', 'kPa', '3*A'),
+    0x0B: ('intake_map', 'kPa', 'A'),
+    0x0C: ('rpm', 'rpm', '(256*A+B)/4'),
+    0x0D: ('speed', 'km/h', 'A'),
+    0x0E: ('timing_advance', 'deg', 'A/2-64'),
+    0x0F: ('intake_temp', 'C', 'A-40'),
+    0x10: ('maf', 'g/s', '(256*A+B)/100'),
+    0x11: ('throttle', '%', 'A*100/255'),
+    0x14: ('o2_b1s1_voltage', 'V', 'A/200'),
+    0x15: ('o2_b1s2_voltage', 'V', 'A/200'),
+    0x1F: ('run_time', 's', '256*A+B'),
+    0x21: ('distance_with_mil', 'km', '256*A+B'),
+    0x22: ('fuel_rail_pressure_rel', 'kPa', '0.079*(256*A+B)'),
+    0x23: ('fuel_rail_pressure', 'kPa', '10*(256*A+B)'),
+    0x2C: ('commanded_egr', '%', 'A*100/255'),
+    0x2D: ('egr_error', '%', 'A*100/128-100'),
+    0x2E: ('evap_purge', '%', 'A*100/255'),
+    0x2F: ('fuel_level', '%', 'A*100/255'),
+    0x30: ('warmups_since_clear', 'count', 'A'),
+    0x31: ('distance_since_clear', 'km', '256*A+B'),
+    0x33: ('baro_pressure', 'kPa', 'A'),
+    0x3C: ('cat_temp_b1s1', 'C', '(256*A+B)/10-40'),
+    0x3D: ('cat_temp_b2s1', 'C', '(256*A+B)/10-40'),
+    0x3E: ('cat_temp_b1s2', 'C', '(256*A+B)/10-40'),
+    0x3F: ('cat_temp_b2s2', 'C', '(256*A+B)/10-40'),
+    0x42: ('module_voltage', 'V', '(256*A+B)/1000'),
+    0x43: ('absolute_load', '%', '(256*A+B)*100/255'),
+    0x44: ('commanded_equiv_ratio', 'ratio', '(256*A+B)*2/65536'),
+    0x45: ('relative_throttle', '%', 'A*100/255'),
+    0x46: ('ambient_temp', 'C', 'A-40'),
+    0x47: ('throttle_b', '%', 'A*100/255'),
+    0x49: ('pedal_d', '%', 'A*100/255'),
+    0x4A: ('pedal_e', '%', 'A*100/255'),
+    0x4C: ('commanded_throttle', '%', 'A*100/255'),
+    0x4D: ('time_with_mil', 'min', '256*A+B'),
+    0x4E: ('time_since_clear', 'min', '256*A+B'),
+    0x52: ('ethanol', '%', 'A*100/255'),
+    0x59: ('fuel_rail_pressure_abs', 'kPa', '10*(256*A+B)'),
+    0x5A: ('relative_pedal', '%', 'A*100/255'),
+    0x5B: ('hybrid_battery', '%', 'A*100/255'),
+    0x5C: ('oil_temp', 'C', 'A-40'),
+    0x5D: ('injection_timing', 'deg', '(256*A+B)/128-210'),
+    0x5E: ('fuel_rate', 'L/h', '(256*A+B)/20'),
+    0x61: ('demand_torque', '%', 'A-125'),
+    0x62: ('actual_torque', '%', 'A-125'),
+    0x63: ('reference_torque', 'Nm', '256*A+B'),
+}
+
+_COMPILED: Dict[str, Callable] = {}
+
+
+def compile_formula(expr: str) -> Callable:
+    """Compile a formula like '(256*A+B)/4' into a function f(A, B, C, D).
+
+    Only numbers, the names A-D and arithmetic/bit operators are accepted, so
+    formulas from profile files can be evaluated safely. Results are cached.
+    """
+    fn = _COMPILED.get(expr)
+    if fn is not None:
+        return fn
+    try:
+        tree = ast.parse(expr, mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f'invalid formula {expr!r}: {e}') from None
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f'unsupported element in formula {expr!r}: {type(node).__name__}')
+        if isinstance(node, ast.Name) and node.id not in _FORMULA_NAMES:
+            raise ValueError(f'unknown name {node.id!r} in formula {expr!r}')
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            raise ValueError(f'non-numeric constant in formula {expr!r}')
+        if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.LShift, ast.RShift)):
+            shift = node.right
+            if not (isinstance(shift, ast.Constant) and isinstance(shift.value, int)
+                    and 0 <= shift.value <= _MAX_SHIFT):
+                raise ValueError(f'shift in formula {expr!r} must be by a constant 0-{_MAX_SHIFT}')
+    code = compile(tree, f'<formula {expr}>', 'eval')
+
+    def _fn(A=0, B=0, C=0, D=0):
+        return eval(code, {'__builtins__': {}}, {'A': A, 'B': B, 'C': C, 'D': D})
+
+    _COMPILED[expr] = _fn
+    return _fn
+
+
+def _split_raw(raw, length: int):
+    """Split a packed big-endian value (int or integer array) into A..D."""
+    out = []
+    for i in range(min(length, 4)):
+        out.append((raw >> (8 * (length - 1 - i))) & 0xFF)
+    return out
+
+
+def _definition(pid: int) -> Tuple[str, str, str]:
+    defn = PID_FORMULAS.get(pid)
+    if defn is None:
+        raise KeyError(f'no formula for PID {pid:02X}')
+    return defn
+
+
+def _evaluate(fn: Callable, data: bytes):
+    """Apply a compiled formula to sample bytes; None if the arithmetic fails (e.g. A/B with B=0)."""
+    try:
+        return fn(*data[:4])
+    except ArithmeticError:
+        return None
+
+
+def decode_pid(pid: int, data: bytes) -> Dict[str, object]:
+    """Decode one mode 01 sample into {'name', 'value', 'units'}.
+
+    'value' is None when the formula cannot be evaluated for these bytes.
+    """
+    name, units, expr = _definition(pid)
+    return {'name': name, 'value': _evaluate(compile_formula(expr), data), 'units': units}
+
+
+def decode_raw(pid: int, raw: int) -> float:
+    """Decode a packed raw value (as stored by the live logger) for `pid`."""
+    _name, _units, expr = _definition(pid)
+    return compile_formula(expr)(*_split_raw(raw, PID_LENGTHS.get(pid, 1)))
+
+
+def decode_column(pid: int, values, length: Optional[int] = None):
+    """Decode a whole column of packed raw values for `pid`.
+
+    With NumPy installed this is a single vectorised evaluation returning a
+    float64 array (e.g. RPM over a million samples at once); without NumPy it
+    falls back to a list built sample by sample.
+    """
+    _name, _units, expr = _definition(pid)
+    return decode_column_formula(expr, values, length or PID_LENGTHS.get(pid, 1))
+
+
+def decode_column_formula(expr: str, values, length: int):
+    """Evaluate formula `expr` over a column of packed `length`-byte raw values."""
+    fn = compile_formula(expr)
+    try:
+        import numpy as np
+    except ImportError:
+        return [float(fn(*_split_raw(int(v), length))) for v in values]
+    if isinstance(values, np.ndarray):
+        raw = values
+    else:
+        try:
+            # zero-copy for array('Q') columns from the live logger
+            raw = np.frombuffer(values, dtype=np.uint64)
+        except (TypeError, ValueError):
+            raw = np.asarray(values, dtype=np.uint64)
+    # work in int64 so formulas like A-40 do not wrap around
+    parts = [p.astype(np.int64) for p in _split_raw(raw.astype(np.uint64, copy=False), length)]
+    result = fn(*parts)
+    return np.asarray(result, dtype=np.float64)
+
+
+def compile_measures(profile: Dict) -> Dict[str, Dict[str, object]]:
+    """Compile the `measures` section of a profile.
+
+    Each entry maps an identifier (e.g. a DID like 'F40C') to a dict with
+    'name', 'units', 'formula' and optionally 'length' (data bytes). Raises
+    ValueError for invalid formulas so bad profiles fail at load time.
+    """
+    out = {}
+    for ident, spec in (profile.get('measures') or {}).items():
+        expr = spec['formula']
+        out[str(ident).upper()] = {
+            'name': spec.get('name', str(ident)),
+            'units': spec.get('units', ''),
+            'formula': expr,
+            'length': int(spec.get('length', 2)),
+            'fn': compile_formula(expr),
+        }
+    return out
+
+
+def decode_measure(measure: Dict[str, object], data: bytes) -> Dict[str, object]:
+    """Decode a profile-defined measuring value (see `compile_measures`); 'value' may be None as in `decode_pid`."""
+    return {'name': measure['name'], 'value': _evaluate(measure['fn'], data), 'units': measure['units']}
+
+
+def decode_mode01_response(payload: bytes) -> Dict[str, Dict[str, object]]:
+    """Decode every PID with a known formula in a mode 01 response.
+
+    Returns {pid_hex: {'name', 'value', 'units'}}; PIDs without a formula are
+    returned with their raw hex only.
+    """
+    out: Dict[str, Dict[str, object]] = {}
+    for pid, data in split_mode01_payload(payload).items():
+        if pid in PID_FORMULAS:
+            out[f'{pid:02X}'] = decode_pid(pid, data)
+        else:
+            out[f'{pid:02X}'] = {'raw': data.hex()}
+    return out
@@ -5,7 +5,7 @@ to propose candidate algorithms from captured seed/response pairs. Results are
 suggestions only and must be validated on a vehicle.
 """
 from typing import List, Tuple, Optional
-from .capture_parser import parse_capture_file, find_seed_requests
+from .capture_parser import iter_capture, find_seed_requests
 from .ecu_profiles import _PROFILES
 import os
 
@@ -29,9 +29,21 @@ def _rotl(seed: bytes, n: int) -> bytes:
     return bytes(out)
 
 
-def analyze_capture(path: str) -> List[dict]:
-    parsed = parse_capture_file(path)
-    pairs = find_seed_requests(parsed)
+# bump when the suggestions produced by `analyze_capture` change
+ANALYZER_VERSION = '1'
+
+
+def analyze_capture(path: str, use_cache: bool = True) -> List[dict]:
+    """Seed suggestions for a capture, cached by capture content (`analysis_cache`)."""
+    if use_cache:
+        from .analysis_cache import cached_analysis
+        return cached_analysis(path, 'profile', ANALYZER_VERSION, _analyze_capture)
+    return _analyze_capture(path)
+
+
+def _analyze_capture(path: str) -> List[dict]:
+    # streamed: memory use does not grow with the capture size
+    pairs = find_seed_requests(iter_capture(path))
     suggestions = []
     for ts, req, resp in pairs:
         # attempt to extract seed bytes from response heuristically
@@ -141,13 +153,15 @@ def interactive_build(capture_path: str) -> str:
 
 
 def save_profile_from_suggestion(name: str, suggestion: dict, algo_name: str, out_dir: str = None) -> Optional[str]:
-    """Save a simple profile using the chosen algorithm name from suggestion.
+    """Save a profile spec using the chosen algorithm name from suggestion.
 
     algo_name should match one of the candidate names (e.g., 'reverse' or 'xor_5A').
-    This writes a new Python file under `vlinker/profiles/<name>.py` containing
-    a small profile that uses the chosen demo algorithm.
+    This writes a declarative spec (`profile_spec`) to
+    `vlinker/profiles/<name>.json`; the profile registry picks it up and
+    compiles the seed/key steps on first use.
     Returns path to saved file or None on error.
     """
+    from .profile_spec import steps_for_candidate, write_spec
     out_dir = out_dir or os.path.join(os.path.dirname(__file__), 'profiles')
     os.makedirs(out_dir, exist_ok=True)
     chosen = None
@@ -158,32 +172,17 @@ def save_profile_from_suggestion(name: str, suggestion: dict, algo_name: str, ou
     if not chosen:
         return None
 
-    # Map algo_name to a callable pattern
-    algo_code = ''
-    if algo_name == 'reverse':
-        algo_code = 'demo_reverse_seed_algo'
-        import_line = 'from ..ecu_profiles import demo_reverse_seed_algo'
-    elif algo_name.startswith('xor_'):
-        const = chosen.get('const', 0x5A)
-        algo_code = f"(lambda s: bytes([(b ^ {const}) & 0xFF for b in s]))"
-        import_line = ''
-    elif algo_name == 'identity':
-        algo_code = '(lambda s: bytes(s))'
-        import_line = ''
-    else:
+    steps = steps_for_candidate(algo_name, chosen)
+    if steps is None:
         # fallback to identity
-        algo_code = '(lambda s: bytes(s))'
-        import_line = ''
-
-    fname = os.path.join(out_dir, f"{name}.py")
-    with open(fname, 'w') as f:
-        f.write('"""Auto-generated ECU profile from capture analysis."""\n')
-        if import_line:
-            f.write(import_line + '\n')
-        f.write('\n')
-        f.write('PROFILE = {\n')
-        f.write(f"    'name': '{name}',\n")
-        f.write(f"    'seed_key_algo': {algo_code},\n")
-        f.write("    'notes': 'Auto-generated from capture. Validate before use.'\n")
-        f.write('}\n')
-    return fname
+        steps = []
+    spec = {
+        'name': name,
+        'seed_key': {'steps': steps},
+        'source': {'algo': algo_name, 'seed_hex': suggestion.get('seed_hex'), 'ts': suggestion.get('ts')},
+        'notes': 'Auto-generated from capture. Validate before use.',
+    }
+    try:
+        return write_spec(os.path.join(out_dir, f'{name}.json'), spec)
+    except OSError:
+        return None
@@ -0,0 +1,322 @@
+"""Declarative ECU profile specs.
+
+A spec is a JSON (or TOML) document describing a profile without code::
+
+    {
+      "name": "Test ECU",
+      "manufacturer": "ACME",
+      "ecu_ids": ["7E0"],
+      "seed_key": {"width": 4, "steps": [
+        {"op": "rotl", "bits": 7},
+        {"op": "xor", "value": "0x5EED1234"}
+      ]},
+      "dids": {"F190": {"name": "VIN", "type": "ascii"}},
+      "notes": "..."
+    }
+
+Seed/key steps use the operations of `seedkey_search`:
+
+- per byte: ``xorb``, ``addb``, ``rotlb`` (``value``/``bits``), ``not`` and
+  ``map`` (a 256-entry ``table``)
+- on the whole seed as a big-endian integer: ``rotl``, ``rotr``, ``xor``,
+  ``add``, ``sub`` (``value - x``), ``mul``
+- ``reverse`` (byte order, also spelt ``bswap``)
+
+`compile_seed_key` turns the steps into a `KeyPipeline` when the profile is
+loaded: runs of byte operations are fused into a single `bytes.translate`
+table and runs of integer operations into one ``int.from_bytes`` round trip.
+`KeyPipeline.compute_keys` computes many keys at once, vectorised with NumPy
+when it is installed. Loading a spec never executes code.
+"""
+import json
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+SPEC_SUFFIXES = ('.json', '.toml')
+
+BYTE_OPS = ('xorb', 'addb', 'rotlb', 'not', 'map')
+WORD_OPS = ('rotl', 'rotr', 'xor', 'add', 'sub', 'mul')
+
+# numpy dtype per seed width for the vectorised path
+_NP_DTYPES = {1: 'u1', 2: 'u2', 4: 'u4', 8: 'u8'}
+# below this many seeds the per-seed path is faster than setting up arrays
+_NP_MIN_BATCH = 64
+
+
+def _int(value: Any) -> int:
+    if isinstance(value, str):
+        return int(value, 0)
+    return int(value)
+
+
+def _byte_table(step: Dict[str, Any]) -> bytes:
+    op = step['op']
+    if op == 'xorb':
+        c = _int(step['value']) & 0xFF
+        return bytes(i ^ c for i in range(256))
+    if op == 'addb':
+        c = _int(step['value']) & 0xFF
+        return bytes((i + c) & 0xFF for i in range(256))
+    if op == 'rotlb':
+        n = _int(step['bits']) % 8
+        return bytes(((i << n) | (i >> (8 - n))) & 0xFF for i in range(256))
+    if op == 'not':
+        return bytes(i ^ 0xFF for i in range(256))
+    table = step['table']
+    table = bytes.fromhex(table) if isinstance(table, str) else bytes(_int(v) for v in table)
+    if len(table) != 256:
+        raise ValueError('map table must have 256 entries')
+    return table
+
+
+def _word_op(step: Dict[str, Any]) -> Tuple[str, int]:
+    op = step['op']
+    if op in ('rotl', 'rotr'):
+        return op, _int(step['bits'])
+    return op, _int(step['value'])
+
+
+def _stages(steps: Sequence[Dict[str, Any]]) -> List[Tuple[str, Any]]:
+    """Fuse steps into ('table', bytes), ('reverse', None) and ('word', [ops]) stages."""
+    stages: List[Tuple[str, Any]] = []
+    for step in steps:
+        op = step.get('op')
+        if op in BYTE_OPS:
+            table = _byte_table(step)
+            if stages and stages[-1][0] == 'table':
+                # apply the previous table first, then this one
+                table = stages[-1][1].translate(table)
+                stages[-1] = ('table', table)
+            else:
+                stages.append(('table', table))
+        elif op in ('reverse', 'bswap'):
+            if stages and stages[-1][0] == 'reverse':
+                stages.pop()
+            else:
+                stages.append(('reverse', None))
+        elif op in WORD_OPS:
+            if stages and stages[-1][0] == 'word':
+                stages[-1][1].append(_word_op(step))
+            else:
+                stages.append(('word', [_word_op(step)]))
+        else:
+            raise ValueError(f'unknown seed/key operation: {op}')
+    return stages
+
+
+def _word_fn(ops: List[Tuple[str, int]]) -> Callable[[bytes], bytes]:
+    def run(data: bytes) -> bytes:
+        n = len(data)
+        bits = 8 * n
+        mask = (1 << bits) - 1
+        x = int.from_bytes(data, 'big')
+        for op, v in ops:
+            if op == 'xor':
+                x ^= v
+            elif op == 'add':
+                x = (x + v) & mask
+            elif op == 'sub':
+                x = (v - x) & mask
+            elif op == 'mul':
+                x = (x * v) & mask
+            else:
+                r = (v if op == 'rotl' else -v) % bits
+                x = ((x << r) | (x >> (bits - r))) & mask
+        return (x & mask).to_bytes(n, 'big')
+    return run
+
+
+class KeyPipeline:
+    """Compiled seed -> key function (see module docstring)."""
+
+    def __init__(self, steps: Sequence[Dict[str, Any]], width: Optional[int] = None):
+        self.steps = [dict(s) for s in steps]
+        self.width = width
+        self._stages = _stages(self.steps)
+        fns: List[Callable[[bytes], bytes]] = []
+        for kind, arg in self._stages:
+            if kind == 'table':
+                fns.append(lambda d, t=arg: d.translate(t))
+            elif kind == 'reverse':
+                fns.append(lambda d: d[::-1])
+            else:
+                fns.append(_word_fn(arg))
+        self._fns = fns
+
+    def __call__(self, seed: bytes) -> bytes:
+        data = bytes(seed)
+        if self.width is not None and len(data) != self.width:
+            raise ValueError(f'seed must be {self.width} bytes')
+        for fn in self._fns:
+            data = fn(data)
+        return data
+
+    def compute_keys(self, seeds: Sequence[bytes]) -> List[bytes]:
+        """Keys for many seeds at once."""
+        seeds = [bytes(s) for s in seeds]
+        if not seeds:
+            return []
+        width = len(seeds[0])
+        same = all(len(s) == width for s in seeds)
+        if self.width is not None and (not same or width != self.width):
+            raise ValueError(f'seeds must be {self.width} bytes')
+        if same and all(kind == 'table' for kind, _a in self._stages):
+            # byte tables only: one translate over all seeds
+            blob = b''.join(seeds)
+            for _kind, table in self._stages:
+                blob = blob.translate(table)
+            return [blob[i:i + width] for i in range(0, len(blob), width)]
+        if same and len(seeds) >= _NP_MIN_BATCH and width in _NP_DTYPES:
+            keys = self._compute_numpy(seeds, width)
+            if keys is not None:
+                return keys
+        return [self(s) for s in seeds]
+
+    def _compute_numpy(self, seeds: List[bytes], width: int) -> Optional[List[bytes]]:
+        try:
+            import numpy as np
+        except ImportError:
+            return None
+        bits = 8 * width
+        dtype = np.dtype(_NP_DTYPES[width])
+        m = np.frombuffer(b''.join(seeds), dtype=np.uint8).reshape(-1, width)
+        with np.errstate(over='ignore'):
+            for kind, arg in self._stages:
+                if kind == 'table':
+                    m = np.frombuffer(arg, dtype=np.uint8)[m]
+                elif kind == 'reverse':
+                    m = m[:, ::-1]
+                else:
+                    x = np.ascontiguousarray(m).view(dtype.newbyteorder('>')).astype(dtype).ravel()
+                    for op, v in arg:
+                        c = dtype.type(v & ((1 << bits) - 1))
+                        if op == 'xor':
+                            x = x ^ c
+                        elif op == 'add':
+                            x = x + c
+                        elif op == 'sub':
+                            x = c - x
+                        elif op == 'mul':
+                            x = x * c
+                        else:
+                            r = (v if op == 'rotl' else -v) % bits
+                            if r:
+                                x = (x << dtype.type(r)) | (x >> dtype.type(bits - r))
+                    m = x.astype(dtype.newbyteorder('>')).view(np.uint8).reshape(-1, width)
+        blob = np.ascontiguousarray(m).tobytes()
+        return [blob[i:i + width] for i in range(0, len(blob), width)]
+
+
+def compile_seed_key(spec: Optional[Dict[str, Any]]) -> Optional[KeyPipeline]:
+    """`KeyPipeline` for a spec's ``seed_key`` section (None when absent)."""
+    if not spec:
+        return None
+    width = spec.get('width')
+    return KeyPipeline(spec.get('steps', []), width=int(width) if width else None)
+
+
+def load_spec(path: str) -> Dict[str, Any]:
+    """Read a JSON or TOML spec file."""
+    if str(path).endswith('.toml'):
+        try:
+            import tomllib
+        except ImportError:
+            raise RuntimeError('TOML profile specs need Python 3.11 or later')
+        with open(path, 'rb') as f:
+            spec = tomllib.load(f)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            spec = json.load(f)
+    if not isinstance(spec, dict):
+        raise ValueError(f'profile spec {path} is not an object')
+    return spec
+
+
+def spec_metadata(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Registry metadata of a spec (same fields as for Python profiles)."""
+    seed_key = spec.get('seed_key') or {}
+    steps = seed_key.get('steps') or []
+    return {
+        'name': spec.get('name'),
+        'manufacturer': spec.get('manufacturer'),
+        'year_range': spec.get('year_range'),
+        'ecu_ids': list(spec.get('ecu_ids') or []),
+        'notes': spec.get('notes'),
+        'algo': ('spec:' + '+'.join(s.get('op', '?') for s in steps)) if seed_key else None,
+    }
+
+
+def profile_from_spec(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Profile dict (as used by `ecu_profiles`) with the compiled seed/key functions."""
+    profile = {k: v for k, v in spec.items() if k != 'seed_key'}
+    pipeline = compile_seed_key(spec.get('seed_key'))
+    profile['seed_key_algo'] = pipeline
+    profile['compute_keys'] = pipeline.compute_keys if pipeline is not None else None
+    profile['seed_key'] = spec.get('seed_key')
+    return profile
+
+
+def write_spec(path: str, spec: Dict[str, Any]) -> str:
+    """Write `spec` as JSON atomically; return the path."""
+    tmp = f'{path}.{os.getpid()}.tmp'
+    Path(tmp).write_text(json.dumps(spec, indent=2) + '\n')
+    os.replace(tmp, path)
+    return str(path)
+
+
+def steps_from_search(ops: Sequence[Sequence], final: Sequence) -> List[Dict[str, Any]]:
+    """Spec steps for a `seedkey_search` result."""
+    steps: List[Dict[str, Any]] = []
+    for name, p in ops:
+        if name in ('not', 'bswap'):
+            steps.append({'op': 'not' if name == 'not' else 'reverse'})
+        elif name in ('rotl', 'rotlb'):
+            steps.append({'op': name, 'bits': int(p)})
+        else:
+            steps.append({'op': name, 'value': int(p)})
+    if final[0] != 'none':
+        steps.append({'op': final[0], 'value': hex(int(final[1]))})
+    return steps
+
+
+def steps_from_family(family: str, const: int, rotate: int = 0) -> List[Dict[str, Any]]:
+    """Spec steps for a `seedkey_bruteforce` family and constant."""
+    c = hex(const)
+    table = {
+        'xor': [{'op': 'xor', 'value': c}],
+        'add': [{'op': 'add', 'value': c}],
+        'mul_rotl': [{'op': 'mul', 'value': c}, {'op': 'rotl', 'bits': rotate}],
+        'mul_xor': [{'op': 'mul', 'value': c}, {'op': 'xor', 'value': c}],
+        'xor_rotl_add': [{'op': 'xor', 'value': c}, {'op': 'rotl', 'bits': rotate}, {'op': 'add', 'value': c}],
+        'add_rotl_xor': [{'op': 'add', 'value': c}, {'op': 'rotl', 'bits': rotate}, {'op': 'xor', 'value': c}],
+    }
+    if family not in table:
+        raise ValueError(f'unknown family: {family}')
+    return table[family]
+
+
+def steps_for_candidate(name: str, candidate: Optional[Dict[str, Any]] = None) -> Optional[List[Dict[str, Any]]]:
+    """Spec steps for a `profile_builder` candidate name ('reverse', 'xor_5A', 'rotl_3', ...).
+
+    Returns None for names that are unknown or do not parse (the name may
+    come from a user).
+    """
+    candidate = candidate or {}
+    try:
+        if name == 'identity':
+            return []
+        if name == 'reverse':
+            return [{'op': 'reverse'}]
+        if name.startswith('rotl_'):
+            bits = int(name[5:])
+            return [{'op': 'rotlb', 'bits': bits}] if 0 <= bits < 8 else None
+        if name.startswith('xor_'):
+            value = int(candidate['const']) if 'const' in candidate else int(name[4:], 16)
+            return [{'op': 'xorb', 'value': value}] if 0 <= value <= 0xFF else None
+        if name.startswith('rep_xor_') and candidate.get('key_bytes'):
+            # the proposal xors every byte with the first key byte
+            return [{'op': 'xorb', 'value': bytes.fromhex(candidate['key_bytes'])[0]}]
+    except (ValueError, TypeError, IndexError):
+        return None
+    return None
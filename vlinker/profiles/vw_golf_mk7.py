@@ -8,6 +8,7 @@ from ..ecu_profiles import demo_reverse_seed_algo
 
 PROFILE = {
     'name': 'VW Golf Mk7 (example)',
+    'manufacturer': 'VW',
     'year_range': (2013, 2019),
     'modules': {
         # Example identifier -> friendly name mapping
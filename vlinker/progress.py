@@ -0,0 +1,67 @@
+"""Progress display and resumable-job checkpoints for long-running commands.
+
+Long jobs (image downloads, memory dumps, DID scans, constant sweeps) report
+through a callback ``progress(done, total, rate)``; `progress_printer` draws
+it as a one-line bar with throughput and ETA.
+
+Jobs that can be interrupted keep their state in a small JSON file written
+atomically (temp file plus `os.replace`) by `save_checkpoint`. The state
+carries a `job` field describing what was started; `load_checkpoint` only
+returns a state whose `job` matches, so a different job never resumes from
+a stale file.
+"""
+import json
+import os
+from typing import Any, Callable, Dict, Optional
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def progress_printer(unit: str = '/s', scale: float = 1.0, stream=None) -> Callable[[int, int, float], None]:
+    """Progress callback drawing a one-line bar with rate and ETA.
+
+    The rate is shown divided by `scale` and followed by `unit`, e.g.
+    ``progress_printer('KiB/s', 1024)``.
+    """
+    import sys
+    out = stream or sys.stderr
+
+    def show(done: int, total: int, rate: float):
+        frac = done / total if total else 1.0
+        bar = '#' * int(frac * 30)
+        eta = (total - done) / rate if rate > 0 else 0.0
+        out.write(f'\r[{bar:<30}] {frac * 100:5.1f}% {rate / scale:8.1f} {unit}  '
+                  f'ETA {int(eta) // 60:d}m{int(eta) % 60:02d}s')
+        if done >= total:
+            out.write('\n')
+        out.flush()
+
+    return show
+
+
+def load_checkpoint(path: Optional[str], job: Any) -> Optional[Dict[str, Any]]:
+    """State stored at `path` if it belongs to `job`; None if missing, unreadable or another job's."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.debug('unreadable checkpoint %s: %s', path, e)
+        return None
+    if not isinstance(state, dict) or state.get('job') != job:
+        logger.debug('checkpoint %s belongs to another job; starting over', path)
+        return None
+    return state
+
+
+def save_checkpoint(path: Optional[str], state: Dict[str, Any]):
+    """Write `state` to `path` atomically (no-op without a path)."""
+    if not path:
+        return
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
@@ -3,8 +3,53 @@
 This module provides small, well-documented helpers for decoding OBD-II/ELM
 responses (service 03) into DTC codes, and utilities used by the diagnostics
 helpers.
+
+`ElmResponseParser` splits raw adapter output into per-ECU messages: it keeps
+CAN/legacy headers (``ATH1``), reassembles ISO-TP frames and the numbered
+``0:``/``1:`` multi-frame lines, and reports adapter errors such as
+``NO DATA``. All parsing works on bytes using `bytes.translate` tables
+instead of decoding to str and running regexes.
 """
-from typing import List, Tuple
+import binascii
+from typing import Any, Dict, List, Optional
+
+_HEX_DIGITS = b'0123456789ABCDEFabcdef'
+_ALL_BYTES = bytes(range(256))
+# translate(None, _NON_HEX) keeps only hex digits
+_NON_HEX = _ALL_BYTES.translate(None, _HEX_DIGITS)
+# translate(None, _HEX_LINE) is empty for lines made of hex digits and spaces
+_HEX_LINE = _HEX_DIGITS + b' '
+_TEXT_BYTES = bytes(range(32, 127)) + b'\r\n\t'
+_UPPER = bytes.maketrans(b'abcdefghijklmnopqrstuvwxyz', b'ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+
+# adapter error answers (ELM327 datasheet); matched on upper-cased lines
+ELM_ERRORS = (
+    b'NO DATA', b'BUFFER FULL', b'CAN ERROR', b'BUS BUSY', b'BUS ERROR', b'DATA ERROR',
+    b'FB ERROR', b'RX ERROR', b'UNABLE TO CONNECT', b'STOPPED', b'ACT ALERT', b'LV RESET',
+    b'LP ALERT', b'ERR', b'?',
+)
+
+
+def hex_to_bytes(data: bytes) -> bytes:
+    """Decode every hex digit in `data` (ignoring anything else) to bytes."""
+    digits = data.translate(None, _NON_HEX)
+    if len(digits) & 1:
+        digits = digits[:-1]
+    return binascii.unhexlify(digits)
+
+
+def is_ascii_text(data: bytes) -> bool:
+    """True if `data` only contains printable ASCII and line breaks."""
+    return not data.translate(None, _TEXT_BYTES)
+
+
+def is_elm_text(data: bytes, can_id: Optional[int] = None) -> bool:
+    """True if a captured payload is ELM327 text rather than a raw frame.
+
+    Raw frames can look like text (``7F 2E 33`` is all printable), but ELM
+    output always has spaces, line ends or the prompt and never a CAN ID.
+    """
+    return can_id is None and is_ascii_text(data) and (b'\r' in data or b' ' in data or b'>' in data)
 
 
 def _bytes_to_dtc(b1: int, b2: int) -> str:
@@ -27,22 +72,7 @@ def parse_obd_03_response(resp: bytes) -> List[str]:
     if not resp:
         return []
     # Some ELMs echo ASCII hex; accept either pure binary or ASCII hex
-    # If resp contains ASCII hex chars, strip whitespace and decode
-    try:
-        # If bytes look like ascii hex (only 0-9A-F and spaces/newlines)
-        if all((32 <= b <= 127) for b in resp):
-            s = ''.join(chr(b) for b in resp).strip()
-            # remove non-hex characters
-            import re
-            s2 = re.sub(r'[^0-9A-Fa-f]', '', s)
-            if len(s2) % 2 == 1:
-                # odd length, drop last
-                s2 = s2[:-1]
-            raw = bytes.fromhex(s2)
-        else:
-            raw = resp
-    except Exception:
-        raw = resp
+    raw = hex_to_bytes(resp) if is_ascii_text(resp) else resp
 
     # OBD 03 response format: first byte is header (0x43 for 03), then pairs
     # Some adapters include mode echo or length bytes; try to locate 0x43
@@ -68,13 +98,202 @@ def parse_elm_echo_strip(resp: bytes) -> bytes:
     if not resp:
         return b''
     try:
-        text = resp.decode('ascii', errors='ignore')
-        # Remove prompt '>' and whitespace
-        text = text.replace('>', '').replace('\r', '').replace('\n', ' ').strip()
-        import re
-        s2 = re.sub(r'[^0-9A-Fa-f]', '', text)
-        if len(s2) % 2 == 1:
-            s2 = s2[:-1]
-        return bytes.fromhex(s2)
+        return hex_to_bytes(resp)
     except Exception:
         return resp
+
+
+def normalize_response(resp: bytes) -> bytes:
+    """Return binary payload bytes for either ELM ASCII-hex output or raw binary."""
+    if not resp:
+        return b''
+    return hex_to_bytes(resp) if is_ascii_text(resp) else bytes(resp)
+
+
+class ElmResponseParser:
+    """Incremental parser for ELM327/STN text responses.
+
+    Feed raw adapter output with `feed`; each `>` prompt completes one
+    response, returned as a dict::
+
+        {'messages': {header: [payload, ...]}, 'errors': [...], 'lines': n}
+
+    `header` is the CAN ID ('7E8', '18DAF110') or legacy header ('486B10')
+    when headers are on (``ATH1``), or '' when they are off. With headers on,
+    CAN 11-bit lines are recognised by their 3-digit ID; set `can_29bit` to
+    read 4-byte CAN headers instead of 3-byte legacy (J1850/ISO 9141/KWP)
+    headers.
+    """
+
+    def __init__(self, headers: bool = False, can_29bit: bool = False):
+        self.headers = headers
+        self.can_29bit = can_29bit
+        self._buf = bytearray()
+        self._reset()
+
+    def _reset(self):
+        self._messages: Dict[str, List[bytes]] = {}
+        self._errors: List[str] = []
+        self._lines = 0
+        # ISO-TP / numbered multi-frame assembly: header -> [expected_len, bytearray]
+        self._pending: Dict[str, List[Any]] = {}
+
+    def feed(self, data: bytes) -> List[Dict[str, Any]]:
+        """Consume `data`; return the responses completed by `>` prompts in it."""
+        self._buf.extend(data)
+        done = []
+        start = 0
+        while True:
+            idx = self._buf.find(b'>', start)
+            if idx < 0:
+                break
+            self._parse_lines(bytes(self._buf[start:idx]))
+            done.append(self._finish())
+            start = idx + 1
+        if start:
+            del self._buf[:start]
+        return done
+
+    def flush(self) -> Dict[str, Any]:
+        """Parse whatever is buffered (no prompt seen) as one response."""
+        chunk = bytes(self._buf)
+        self._buf.clear()
+        self._parse_lines(chunk)
+        return self._finish()
+
+    def _finish(self) -> Dict[str, Any]:
+        for header, (length, data) in self._pending.items():
+            # incomplete multi-frame message: keep what arrived, flag it
+            if data:
+                self._messages.setdefault(header, []).append(bytes(data[:length]))
+                self._errors.append(f'INCOMPLETE {header}'.strip())
+        out = {'messages': self._messages, 'errors': self._errors, 'lines': self._lines}
+        self._reset()
+        return out
+
+    def _add(self, header: str, payload: bytes):
+        self._messages.setdefault(header, []).append(payload)
+
+    def _parse_lines(self, chunk: bytes):
+        for line in chunk.translate(_UPPER).replace(b'\n', b'\r').split(b'\r'):
+            line = line.strip()
+            if not line:
+                continue
+            self._lines += 1
+            if line.translate(None, _HEX_LINE):
+                self._parse_text(line)
+                continue
+            compact = line.replace(b' ', b'')
+            if self.headers:
+                self._parse_header_line(compact)
+            else:
+                self._parse_plain_line(compact)
+
+    def _parse_text(self, line: bytes):
+        head, sep, rest = line.partition(b':')
+        if sep and head and not head.translate(None, _HEX_DIGITS) and not rest.translate(None, _HEX_LINE):
+            # numbered multi-frame line '0: 49 02 01 ...'
+            self._append_pending('', binascii.unhexlify(rest.replace(b' ', b'')))
+            return
+        for err in ELM_ERRORS:
+            if err in line:
+                self._errors.append(err.decode('ascii'))
+                return
+        # status text such as 'SEARCHING...' or 'OK' carries no payload
+
+    def _parse_plain_line(self, compact: bytes):
+        if len(compact) == 3:
+            # total length announcing a numbered multi-frame message
+            self._pending[''] = [int(compact, 16), bytearray()]
+            return
+        if len(compact) & 1:
+            return
+        self._add('', binascii.unhexlify(compact))
+
+    def _parse_header_line(self, compact: bytes):
+        if len(compact) & 1:
+            # CAN 11-bit: 3 hex digit ID then PCI + data
+            header = compact[:3].decode('ascii')
+            self._parse_iso_tp(header, binascii.unhexlify(compact[3:]))
+        elif self.can_29bit:
+            header = compact[:8].decode('ascii')
+            self._parse_iso_tp(header, binascii.unhexlify(compact[8:]))
+        else:
+            # legacy protocols: 3 header bytes, data, checksum
+            raw = binascii.unhexlify(compact)
+            if len(raw) > 4:
+                self._add(raw[:3].hex().upper(), raw[3:-1])
+
+    def _parse_iso_tp(self, header: str, frame: bytes):
+        if not frame:
+            return
+        kind = frame[0] >> 4
+        if kind == 0:
+            self._add(header, frame[1:1 + (frame[0] & 0x0F)])
+        elif kind == 1 and len(frame) >= 2:
+            length = ((frame[0] & 0x0F) << 8) | frame[1]
+            self._pending[header] = [length, bytearray()]
+            self._append_pending(header, frame[2:])
+        elif kind == 2:
+            self._append_pending(header, frame[1:])
+        # kind 3 (flow control) carries no payload
+
+    def _append_pending(self, header: str, data: bytes):
+        entry = self._pending.get(header)
+        if entry is None:
+            return
+        length, buf = entry
+        buf.extend(data)
+        if len(buf) >= length:
+            del self._pending[header]
+            self._add(header, bytes(buf[:length]))
+
+
+def parse_elm_response(resp: bytes, headers: bool = False, can_29bit: bool = False) -> Dict[str, Any]:
+    """Parse one complete ELM response (see `ElmResponseParser`)."""
+    parser = ElmResponseParser(headers=headers, can_29bit=can_29bit)
+    done = parser.feed(resp)
+    tail = parser.flush()
+    if not done:
+        return tail
+    result = done[0]
+    for extra in done[1:] + [tail]:
+        for header, payloads in extra['messages'].items():
+            result['messages'].setdefault(header, []).extend(payloads)
+        result['errors'].extend(extra['errors'])
+        result['lines'] += extra['lines']
+    return result
+
+
+def elm_payloads(resp: bytes, headers: bool = False, can_29bit: bool = False) -> List[bytes]:
+    """All message payloads in an ELM response, in arrival order per header."""
+    parsed = parse_elm_response(resp, headers=headers, can_29bit=can_29bit)
+    return [p for payloads in parsed['messages'].values() for p in payloads]
+
+
+def _dtcs_from_payload(payload: bytes, can: bool) -> List[str]:
+    # mode 03/07/0A positive response: 0x43/0x47/0x4A, on CAN followed by a DTC count
+    if not payload or payload[0] not in (0x43, 0x47, 0x4A):
+        return []
+    i = 2 if can else 1
+    dtcs = []
+    while i + 1 < len(payload):
+        if payload[i] or payload[i + 1]:
+            dtcs.append(_bytes_to_dtc(payload[i], payload[i + 1]))
+        i += 2
+    return dtcs
+
+
+def parse_obd_dtcs_by_ecu(resp: bytes, can_29bit: bool = False) -> Dict[str, List[str]]:
+    """Parse a functional mode 03 response captured with headers on (``ATH1``).
+
+    Returns {header: [dtc, ...]} so answers from several ECUs stay apart.
+    """
+    parsed = parse_elm_response(resp, headers=True, can_29bit=can_29bit)
+    out: Dict[str, List[str]] = {}
+    for header, payloads in parsed['messages'].items():
+        can = len(header) in (3, 8)
+        codes = out.setdefault(header, [])
+        for payload in payloads:
+            codes.extend(_dtcs_from_payload(payload, can))
+    return out
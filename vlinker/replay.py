@@ -0,0 +1,193 @@
+"""Capture replay.
+
+`ReplayPort` plays a capture back through the pyserial interface that
+`SerialComm` uses, so the library, ELM sessions and the webapp can run
+against a recorded field session. Open it with a device string::
+
+    replay:/path/trip.vlcap              original timing
+    replay:/path/trip.vlcap?speed=10     ten times faster
+    replay:/path/trip.vlcap?speed=max    as fast as possible
+    replay:/path/trip.vlcap?free=1       ignore writes, just play the RX side
+
+Received frames are released at their original offsets divided by `speed`.
+When the capture also recorded what was sent (TX), the port waits for the
+library to write before releasing the answers that followed, and re-anchors
+the clock at each write, so slow or fast clients stay in step. Writes that
+differ from the recorded request are counted in `mismatches`.
+
+`replay_records` yields records paced the same way for feeding parsers or
+load tests directly.
+"""
+import time
+from typing import Iterator, Optional
+from urllib.parse import parse_qs
+
+from .capture_format import CaptureRecord
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+REPLAY_PREFIX = 'replay:'
+
+
+def _parse_speed(value) -> float:
+    if value in (None, ''):
+        return 1.0
+    if str(value).lower() in ('max', 'inf'):
+        return float('inf')
+    speed = float(value)
+    if speed <= 0:
+        raise ValueError('replay speed must be positive')
+    return speed
+
+
+def parse_replay_device(device: str):
+    """Split 'replay:PATH?speed=N&free=1' into (path, speed, follow_writes)."""
+    if not device.startswith(REPLAY_PREFIX):
+        raise ValueError(f'not a replay device: {device}')
+    path, _sep, query = device[len(REPLAY_PREFIX):].partition('?')
+    opts = {k: v[-1] for k, v in parse_qs(query).items()}
+    follow = opts.get('free', '0') in ('0', 'false', 'no')
+    return path, _parse_speed(opts.get('speed')), follow
+
+
+class ReplayPort:
+    """pyserial-compatible port that replays a capture (see module docstring)."""
+
+    def __init__(self, path: str, speed: float = 1.0, timeout: float = 1.0, follow_writes: bool = True):
+        from .capture_parser import iter_capture_records
+        self.path = path
+        self.speed = _parse_speed(speed)
+        self.timeout = timeout
+        self.follow_writes = follow_writes
+        self.is_open = True
+        self.writes = 0
+        self.mismatches = 0
+        self._records = iter_capture_records(path)
+        self._next: Optional[CaptureRecord] = next(self._records, None)
+        self._buf = bytearray()
+        self._base_real = time.monotonic()
+        self._base_ts = self._next.ts_ns if self._next is not None else 0
+
+    def _advance(self):
+        self._next = next(self._records, None)
+
+    def _due(self, rec: CaptureRecord) -> float:
+        if self.speed == float('inf'):
+            return 0.0
+        return self._base_real + (rec.ts_ns - self._base_ts) / 1e9 / self.speed
+
+    def _pump(self) -> Optional[float]:
+        """Release due RX records; return when the next one is due (None: nothing can arrive)."""
+        now = time.monotonic()
+        while self._next is not None:
+            rec = self._next
+            if rec.direction == 'T':
+                if self.follow_writes:
+                    return None
+                self._advance()
+                continue
+            due = self._due(rec)
+            if due > now:
+                return due
+            self._buf.extend(rec.data)
+            self._advance()
+        return None
+
+    @property
+    def in_waiting(self) -> int:
+        self._pump()
+        return len(self._buf)
+
+    def write(self, data: bytes) -> int:
+        if not self.is_open:
+            raise OSError('replay port closed')
+        self.writes += 1
+        self._pump()
+        rec = self._next
+        if self.follow_writes and rec is not None and rec.direction == 'T':
+            if bytes(rec.data) != bytes(data):
+                self.mismatches += 1
+                logger.debug('replay write mismatch: sent %r, recorded %r', bytes(data), rec.data)
+            # answers to this request are timed relative to when it was actually sent
+            self._base_real = time.monotonic()
+            self._base_ts = rec.ts_ns
+            self._advance()
+        return len(data)
+
+    def _take(self, n: int) -> bytes:
+        out = bytes(self._buf[:n])
+        del self._buf[:n]
+        return out
+
+    def _wait(self, deadline: float) -> bool:
+        """Sleep until more data may be due; False when nothing more can arrive before `deadline`."""
+        due = self._pump()
+        now = time.monotonic()
+        if due is None:
+            if self._next is None:
+                return False  # end of capture
+            # waiting for a write: behave like an idle line until the timeout
+            time.sleep(max(0.0, deadline - now))
+            return False
+        if due >= deadline:
+            time.sleep(max(0.0, deadline - now))
+            self._pump()
+            return False
+        time.sleep(max(0.0, due - now))
+        return True
+
+    def read(self, size: int = 1) -> bytes:
+        deadline = time.monotonic() + (self.timeout or 0.0)
+        self._pump()
+        while len(self._buf) < size:
+            if not self._wait(deadline):
+                break
+        return self._take(min(size, len(self._buf)))
+
+    def read_until(self, expected: bytes = b'\n', size: Optional[int] = None) -> bytes:
+        deadline = time.monotonic() + (self.timeout or 0.0)
+        self._pump()
+        while True:
+            idx = self._buf.find(expected)
+            if idx >= 0:
+                return self._take(idx + len(expected))
+            if size is not None and len(self._buf) >= size:
+                return self._take(size)
+            if not self._wait(deadline):
+                idx = self._buf.find(expected)
+                return self._take(idx + len(expected) if idx >= 0 else len(self._buf))
+
+    def reset_input_buffer(self):
+        self._buf.clear()
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.is_open = False
+        close = getattr(self._records, 'close', None)
+        if close:
+            close()
+
+
+def open_replay(device: str, timeout: float = 1.0) -> ReplayPort:
+    """Open a `ReplayPort` from a 'replay:...' device string."""
+    path, speed, follow = parse_replay_device(device)
+    return ReplayPort(path, speed=speed, timeout=timeout, follow_writes=follow)
+
+
+def replay_records(path: str, speed: float = 1.0) -> Iterator[CaptureRecord]:
+    """Yield the records of `path` at their original pace divided by `speed`."""
+    from .capture_parser import iter_capture_records
+    speed = _parse_speed(speed)
+    start = time.monotonic()
+    base_ts = None
+    for rec in iter_capture_records(path):
+        if base_ts is None:
+            base_ts = rec.ts_ns
+        if speed != float('inf'):
+            delay = start + (rec.ts_ns - base_ts) / 1e9 / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        yield rec
@@ -0,0 +1,198 @@
+"""Exhaustive 32-bit constant search for seed/key algorithm families.
+
+Many seed/key algorithms mix the seed with a secret 32-bit constant ``C``.
+`bruteforce` evaluates one algorithm family for every ``C`` in
+``[0, 2**32)`` with NumPy ``uint32`` arithmetic: the constant space is cut
+into chunks that run on a process pool, each chunk is compared against the
+first seed/key pair in vectorised blocks, and the few survivors are checked
+against every pair. A full sweep is a few minutes of CPU time.
+
+Progress is checkpointed to a JSON file after every chunk, so an
+interrupted sweep resumes where it stopped (the checkpoint is tied to the
+family, rotation and pairs it was started with).
+
+Families (``s`` seed, ``C`` constant, ``r`` rotation, all modulo 2**32):
+
+    xor            s ^ C
+    add            s + C
+    mul_rotl       rotl(s * C, r)
+    mul_xor        (s * C) ^ C
+    xor_rotl_add   rotl(s ^ C, r) + C
+    add_rotl_xor   rotl(s + C, r) ^ C
+
+Requires NumPy (``pip install vlinker[analysis]``).
+"""
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .logger import get_logger
+from .progress import load_checkpoint, save_checkpoint
+
+logger = get_logger(__name__)
+
+SPACE = 1 << 32
+CHUNK = 1 << 26
+_BLOCK = 1 << 22
+
+# families whose rotation parameter matters
+ROTATING = ('mul_rotl', 'xor_rotl_add', 'add_rotl_xor')
+FAMILIES = ('xor', 'add', 'mul_rotl', 'mul_xor', 'xor_rotl_add', 'add_rotl_xor')
+
+
+def _numpy():
+    try:
+        import numpy as np
+    except ImportError:
+        raise RuntimeError('brute-force search needs NumPy: pip install vlinker[analysis]')
+    return np
+
+
+def _rotl(np, x, r: int):
+    if not r:
+        return x
+    return (x << np.uint32(r)) | (x >> np.uint32(32 - r))
+
+
+def _evaluate(np, family: str, s, c, r: int):
+    """Key for seed `s` under every constant in array `c` (uint32 arrays)."""
+    if family == 'xor':
+        return c ^ s
+    if family == 'add':
+        return c + s
+    if family == 'mul_rotl':
+        return _rotl(np, c * s, r)
+    if family == 'mul_xor':
+        return (c * s) ^ c
+    if family == 'xor_rotl_add':
+        return _rotl(np, c ^ s, r) + c
+    if family == 'add_rotl_xor':
+        return _rotl(np, c + s, r) ^ c
+    raise ValueError(f'unknown family: {family}')
+
+
+def key_for(family: str, seed: int, const: int, rotate: int = 0) -> int:
+    """Scalar evaluation of a family (for verification and profiles)."""
+    np = _numpy()
+    return int(_evaluate(np, family, np.uint32(seed), np.array([const], dtype=np.uint32), rotate)[0])
+
+
+def _sweep_chunk(args) -> Tuple[int, List[int]]:
+    """Constants in [start, start + count) that map every seed to its key."""
+    family, rotate, pairs, start, count = args
+    np = _numpy()
+    s0, k0 = np.uint32(pairs[0][0]), np.uint32(pairs[0][1])
+    offsets = np.arange(min(_BLOCK, count), dtype=np.uint32)
+    found: List[int] = []
+    with np.errstate(over='ignore'):
+        for base in range(start, start + count, _BLOCK):
+            n = min(_BLOCK, start + count - base)
+            c = offsets[:n] + np.uint32(base)
+            hits = c[_evaluate(np, family, s0, c, rotate) == k0]
+            for seed, key in pairs[1:]:
+                if not len(hits):
+                    break
+                hits = hits[_evaluate(np, family, np.uint32(seed), hits, rotate) == np.uint32(key)]
+            found.extend(int(h) for h in hits)
+    return start, found
+
+
+def _pairs_u32(pairs: Iterable) -> List[Tuple[int, int]]:
+    out = []
+    for p in pairs:
+        if isinstance(p, dict):
+            seed, key = bytes.fromhex(p['seed_hex']), bytes.fromhex(p.get('key_hex') or '')
+        else:
+            seed, key = bytes(p[0]), bytes(p[1])
+        if len(seed) == 4 and len(key) == 4:
+            out.append((int.from_bytes(seed, 'big'), int.from_bytes(key, 'big')))
+    # distinct pairs; order kept so the first pair stays the pruning pair
+    return list(dict.fromkeys(out))
+
+
+def _job_id(family: str, rotate: int, pairs: List[Tuple[int, int]], chunk: int, space: int) -> str:
+    blob = json.dumps([family, rotate, pairs, chunk, space]).encode('utf-8')
+    return hashlib.blake2b(blob, digest_size=12).hexdigest()
+
+
+def bruteforce(pairs: Iterable, family: str, rotate: int = 0, workers: Optional[int] = None,
+               checkpoint: Optional[str] = None, chunk: int = CHUNK, space: int = SPACE,
+               progress: Optional[Callable[[int, int, float], None]] = None) -> Dict[str, Any]:
+    """Sweep every 32-bit constant of `family` against 4-byte (seed, key) `pairs`.
+
+    `pairs` are byte pairs or dicts with ``seed_hex``/``key_hex``. `progress`
+    is called as ``progress(done_constants, total_constants, constants_per_s)``.
+    Returns ``{'family', 'rotate', 'pairs', 'constants', 'searched', 'complete'}``;
+    `constants` are sorted and consistent with every pair.
+    """
+    if family not in FAMILIES:
+        raise ValueError(f'unknown family: {family} (choose from {", ".join(FAMILIES)})')
+    if not 0 <= rotate < 32:
+        raise ValueError('rotate must be in 0..31')
+    _numpy()
+    ints = _pairs_u32(pairs)
+    if not ints:
+        raise ValueError('brute force needs at least one 4-byte seed/key pair')
+    job = _job_id(family, rotate, ints, chunk, space)
+    state = load_checkpoint(checkpoint, job) or {'job': job, 'done': [], 'found': []}
+    done = set(state['done'])
+    found = set(state['found'])
+    starts = [s for s in range(0, space, chunk) if s not in done]
+    total = space
+    searched = sum(min(chunk, space - s) for s in done)
+    t0 = time.monotonic()
+    base_searched = searched
+
+    def report():
+        if progress:
+            elapsed = time.monotonic() - t0
+            progress(searched, total, (searched - base_searched) / elapsed if elapsed > 0 else 0.0)
+
+    report()
+    args = [(family, rotate, ints, s, min(chunk, space - s)) for s in starts]
+    try:
+        if workers == 1:
+            results = map(_sweep_chunk, args)
+            for start, hits in results:
+                done.add(start)
+                found.update(hits)
+                searched += min(chunk, space - start)
+                save_checkpoint(checkpoint, {'job': job, 'done': sorted(done), 'found': sorted(found)})
+                report()
+        else:
+            n = workers or os.cpu_count() or 1
+            with ProcessPoolExecutor(max_workers=n) as pool:
+                pending = set()
+                queue = iter(args)
+                # a few chunks in flight per worker keeps memory flat
+                for a in queue:
+                    pending.add(pool.submit(_sweep_chunk, a))
+                    if len(pending) >= 2 * n:
+                        break
+                while pending:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in finished:
+                        start, hits = fut.result()
+                        done.add(start)
+                        found.update(hits)
+                        searched += min(chunk, space - start)
+                        nxt = next(queue, None)
+                        if nxt is not None:
+                            pending.add(pool.submit(_sweep_chunk, nxt))
+                    save_checkpoint(checkpoint, {'job': job, 'done': sorted(done), 'found': sorted(found)})
+                    report()
+    except KeyboardInterrupt:
+        save_checkpoint(checkpoint, {'job': job, 'done': sorted(done), 'found': sorted(found)})
+        raise
+    return {
+        'family': family,
+        'rotate': rotate,
+        'pairs': len(ints),
+        'constants': sorted(found),
+        'searched': searched,
+        'complete': searched >= total,
+    }
+
@@ -0,0 +1,265 @@
+"""Seed/key algorithm search over a composable transform grammar.
+
+An algorithm is a chain of up to `max_depth` unary operations on the seed
+(taken as one big-endian integer of the seed's width) followed by a final
+operation with a free constant:
+
+    unary:  not, bswap, rotl(n), rotlb(n) (per byte), xorb(c), addb(c) (per byte)
+    final:  none, xor(C), add(C), sub(C) (key = C - x), mul(C)
+
+The final constant is never enumerated: it is solved from the first observed
+seed/key pair, checked against the second pair to prune, and candidates that
+survive are verified on every pair. Only algorithms consistent with all
+observations are returned. The search is split by the first operation across
+a process pool.
+
+`pairs_from_capture` extracts accepted (seed, key) pairs from a capture
+(SecurityAccess ``27 odd`` / ``67`` seeds and the ``27 even`` key requests
+that got a positive answer) and `compile_algorithm` turns a result back into a
+``seed -> key`` callable usable as a profile's ``seed_key_algo``.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+FINALS = ('none', 'xor', 'add', 'sub', 'mul')
+
+# operations that are linear over GF(2); a final xor absorbs xorb/not behind them
+_LINEAR = {'not', 'xorb', 'rotl', 'rotlb', 'bswap'}
+_XOR_LIKE = {'not', 'xorb'}
+
+Op = Tuple[str, int]
+
+
+def unary_ops(width: int) -> List[Op]:
+    """Every unary operation of the grammar for a `width`-byte seed."""
+    ops: List[Op] = [('not', 0)]
+    if width > 1:
+        ops.append(('bswap', 0))
+        # on 2-byte seeds rotl(8) is bswap
+        ops.extend(('rotl', n) for n in range(1, 8 * width) if n % 8 or width > 2)
+    ops.extend(('rotlb', n) for n in range(1, 8))
+    ops.extend(('xorb', c) for c in range(1, 256))
+    # addb(0x80) flips the top bits exactly like xorb(0x80)
+    ops.extend(('addb', c) for c in range(1, 256) if c != 0x80)
+    return ops
+
+
+def _apply(op: Op, x: int, bits: int, mask: int, rep: int) -> int:
+    name, p = op
+    if name == 'rotl':
+        return ((x << p) | (x >> (bits - p))) & mask
+    if name == 'xorb':
+        return x ^ (p * rep)
+    if name == 'addb':
+        # per-byte add without carries between bytes
+        low = rep * 0x7F
+        c = p * rep
+        return ((x & low) + (c & low)) ^ ((x ^ c) & (rep * 0x80))
+    if name == 'rotlb':
+        return ((x << p) & (rep * ((0xFF << p) & 0xFF))) | ((x >> (8 - p)) & (rep * (0xFF >> (8 - p))))
+    if name == 'not':
+        return x ^ mask
+    if name == 'bswap':
+        return int.from_bytes(x.to_bytes(bits // 8, 'big')[::-1], 'big')
+    raise ValueError(f'unknown operation: {name}')
+
+
+def _final(name: str, x: int, c: int, mask: int) -> int:
+    if name == 'xor':
+        return x ^ c
+    if name == 'add':
+        return (x + c) & mask
+    if name == 'sub':
+        return (c - x) & mask
+    if name == 'mul':
+        return (x * c) & mask
+    return x
+
+
+def _solve(name: str, x: int, key: int, mask: int) -> Optional[int]:
+    """Constant making final `name` map `x` to `key` (None if there is none/many)."""
+    if name == 'none':
+        return 0 if x == key else None
+    if name == 'xor':
+        return x ^ key
+    if name == 'add':
+        return (key - x) & mask
+    if name == 'sub':
+        return (key + x) & mask
+    if name == 'mul':
+        # unique only for odd x (invertible modulo 2^bits)
+        return key * pow(x, -1, mask + 1) & mask if x & 1 else None
+    raise ValueError(f'unknown final operation: {name}')
+
+
+def describe(ops: Sequence[Op], final: Tuple[str, int], width: int) -> str:
+    """Readable form, e.g. 'rotl(7) -> xor(0x5EED1234)'."""
+    parts = [name if name in ('not', 'bswap') else
+             f'{name}({p})' if name.startswith('rot') else f'{name}(0x{p:02X})' for name, p in ops]
+    name, c = final
+    if name != 'none':
+        parts.append(f'{name}(0x{c:0{2 * width}X})')
+    return ' -> '.join(parts) or 'identity'
+
+
+def compile_algorithm(ops: Sequence[Sequence], final: Sequence, width: int) -> Callable[[bytes], bytes]:
+    """seed -> key function for a search result (`ops`/`final` as returned by `search`)."""
+    ops = [(str(n), int(p)) for n, p in ops]
+    fname, c = str(final[0]), int(final[1])
+    bits = 8 * width
+    mask = (1 << bits) - 1
+    rep = int.from_bytes(b'\x01' * width, 'big')
+
+    def algo(seed: bytes) -> bytes:
+        if len(seed) != width:
+            raise ValueError(f'seed must be {width} bytes')
+        x = int.from_bytes(seed, 'big')
+        for op in ops:
+            x = _apply(op, x, bits, mask, rep)
+        return _final(fname, x, c, mask).to_bytes(width, 'big')
+
+    return algo
+
+
+def _redundant(ops: Sequence[Op], final: str) -> bool:
+    return final == 'xor' and all(n in _LINEAR for n, _p in ops) and any(n in _XOR_LIKE for n, _p in ops)
+
+
+def _search_branch(args) -> List[Dict[str, Any]]:
+    """Depth-first search below one first operation (or the empty chain for None)."""
+    first, pairs, width, max_depth, limit = args
+    bits = 8 * width
+    mask = (1 << bits) - 1
+    rep = int.from_bytes(b'\x01' * width, 'big')
+    ops_all = unary_ops(width)
+    seeds = [s for s, _k in pairs]
+    keys = [k for _s, k in pairs]
+    out: List[Dict[str, Any]] = []
+
+    def run(chain: List[Op], x: int) -> int:
+        for op in chain:
+            x = _apply(op, x, bits, mask, rep)
+        return x
+
+    def check(chain: List[Op], x0: int, x1: Optional[int]):
+        for fname in FINALS:
+            if _redundant(chain, fname):
+                continue
+            c = _solve(fname, x0, keys[0], mask)
+            if c is None and fname == 'mul':
+                # even x0: solve from the first pair with an odd value instead
+                xs = [x0] + ([] if x1 is None else [x1]) + [run(chain, s) for s in seeds[2:]]
+                odd = next((i for i, x in enumerate(xs) if x & 1), None)
+                if odd is None:
+                    continue
+                c = _solve(fname, xs[odd], keys[odd], mask)
+                if all(_final(fname, x, c, mask) == k for x, k in zip(xs, keys)):
+                    add(chain, fname, c)
+                continue
+            if c is None or (x1 is not None and _final(fname, x1, c, mask) != keys[1]):
+                continue
+            # survivor: verify on every remaining pair
+            if all(_final(fname, run(chain, s), c, mask) == k for s, k in zip(seeds[2:], keys[2:])):
+                add(chain, fname, c)
+        return len(out) >= limit
+
+    def add(chain: List[Op], fname: str, c: int):
+        if len(out) < limit:
+            out.append({'ops': [list(op) for op in chain], 'final': [fname, c], 'width': width,
+                        'name': describe(chain, (fname, c), width)})
+
+    def walk(chain: List[Op], x0: int, x1: Optional[int]) -> bool:
+        if check(chain, x0, x1):
+            return True
+        if len(chain) >= max_depth:
+            return False
+        for op in ops_all:
+            # same operation twice in a row folds into one
+            if op[0] == chain[-1][0]:
+                continue
+            chain.append(op)
+            stop = walk(chain, _apply(op, x0, bits, mask, rep),
+                        None if x1 is None else _apply(op, x1, bits, mask, rep))
+            chain.pop()
+            if stop:
+                return True
+        return False
+
+    x0 = seeds[0]
+    x1 = seeds[1] if len(seeds) > 1 else None
+    if first is None:
+        check([], x0, x1)
+        return out
+    op = tuple(first)
+    walk([op], _apply(op, x0, bits, mask, rep), None if x1 is None else _apply(op, x1, bits, mask, rep))
+    return out
+
+
+def _normalise_pairs(pairs: Iterable) -> Tuple[List[Tuple[bytes, bytes]], int]:
+    out = []
+    for p in pairs:
+        if isinstance(p, dict):
+            seed, key = bytes.fromhex(p['seed_hex']), bytes.fromhex(p.get('key_hex') or '')
+        else:
+            seed, key = bytes(p[0]), bytes(p[1])
+        if seed and len(seed) == len(key):
+            out.append((seed, key))
+    if not out:
+        return [], 0
+    # all pairs must share one seed width; use the most common one
+    widths: Dict[int, int] = {}
+    for s, _k in out:
+        widths[len(s)] = widths.get(len(s), 0) + 1
+    width = max(widths, key=widths.get)
+    # distinct pairs only; the first two drive the pruning
+    seen = {}
+    for s, k in out:
+        if len(s) == width:
+            seen.setdefault(s, k)
+    return list(seen.items()), width
+
+
+def search(pairs: Iterable, max_depth: int = 2, workers: Optional[int] = None,
+           limit: int = 50) -> Dict[str, Any]:
+    """Find algorithms mapping every seed to its key.
+
+    `pairs` are (seed, key) byte pairs or dicts with ``seed_hex``/``key_hex``
+    (as in the batch analysis report). Returns ``{'width', 'pairs',
+    'algorithms', 'truncated'}``; algorithms are ordered simplest first and
+    capped at `limit` per search branch.
+    """
+    raw, width = _normalise_pairs(pairs)
+    if not raw:
+        return {'width': 0, 'pairs': 0, 'algorithms': [], 'truncated': False}
+    if len(raw) < 2:
+        logger.debug('only one distinct seed/key pair: every solvable chain will match')
+    ints = [(int.from_bytes(s, 'big'), int.from_bytes(k, 'big')) for s, k in raw]
+    branches = [None] + [list(op) for op in unary_ops(width)] if max_depth > 0 else [None]
+    args = [(b, ints, width, max_depth, limit) for b in branches]
+    if workers == 1:
+        results = [_search_branch(a) for a in args]
+    else:
+        n = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_search_branch, args, chunksize=max(1, len(args) // (4 * n))))
+    found = [r for res in results for r in res]
+    found.sort(key=lambda r: len(r['ops']))
+    return {'width': width, 'pairs': len(raw), 'algorithms': found[:limit], 'truncated': len(found) > limit}
+
+
+def pairs_from_capture(path: str, headers: bool = False) -> List[Tuple[bytes, bytes]]:
+    """(seed, key) pairs whose key the ECU accepted in capture `path`."""
+    from .capture_parser import iter_capture_records
+    from .transactions import iter_transactions, seed_key_pairs
+    txs = (t for t in iter_transactions(iter_capture_records(path), headers=headers) if t.sid == 0x27)
+    return [(p['seed'], p['key']) for p in seed_key_pairs(txs) if p.get('accepted')]
+
+
+def search_capture(path: str, **kwargs) -> Dict[str, Any]:
+    """`search` over the accepted seed/key pairs of a capture."""
+    return search(pairs_from_capture(path, headers=kwargs.pop('headers', False)), **kwargs)
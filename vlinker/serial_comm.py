@@ -14,8 +14,23 @@ class SerialComm:
         self.retries = int(retries)
         self.backoff = float(backoff)
         self._ser = None
+        # optional traffic hook: tap(direction, data) with direction 'T' or 'R'
+        self.tap = None
+
+    def _tap(self, direction: str, data: bytes):
+        if self.tap is not None and data:
+            try:
+                self.tap(direction, data)
+            except Exception as e:
+                logger.debug('capture tap failed: %s', e)
 
     def open(self):
+        if str(self.device).startswith('replay:'):
+            # recorded session played back through the same interface
+            from .replay import open_replay
+            logger.debug('Opening replay %s', self.device)
+            self._ser = open_replay(self.device, timeout=self.timeout)
+            return self._ser
         logger.debug('Opening serial %s @%d', self.device, self.baud)
         self._ser = serial.Serial(self.device, self.baud, timeout=self.timeout)
         return self._ser
@@ -37,6 +52,7 @@ class SerialComm:
                     self.open()
                 logger.debug('Sending %d bytes to %s', len(data), self.device)
                 self._ser.write(data)
+                self._tap('T', data)
                 # small pause to allow device to respond
                 time.sleep(0.05)
                 resp = self.read_all()
@@ -59,6 +75,57 @@ class SerialComm:
             line = line + '\r'
         return self.send_bytes(line.encode('ascii'))
 
+    def write(self, data: bytes):
+        """Write `data` without waiting for a response."""
+        if not self._ser or not getattr(self._ser, 'is_open', False):
+            self.open()
+        logger.debug('Writing %d bytes to %s', len(data), self.device)
+        self._ser.write(data)
+        self._tap('T', data)
+
+    def read_until(self, terminator: bytes = b'>', timeout=None):
+        """Read until `terminator` is seen or `timeout` expires.
+
+        Unlike `read_all` this returns as soon as the terminator (e.g. the ELM
+        prompt) arrives instead of waiting for the line to go quiet. Bytes after
+        the terminator stay buffered for the next call.
+        """
+        if not self._ser or not getattr(self._ser, 'is_open', False):
+            return b''
+        limit = self.timeout if timeout is None else float(timeout)
+        out = bytearray()
+        deadline = time.time() + limit
+        while time.time() < deadline:
+            try:
+                chunk = self._ser.read_until(terminator)
+            except Exception as e:
+                logger.debug('read_until read error: %s', e)
+                break
+            if chunk:
+                out.extend(chunk)
+                if out.endswith(terminator):
+                    break
+        data = bytes(out)
+        self._tap('R', data)
+        return data
+
+    def read_chunk(self, size: int = 4096) -> bytes:
+        """Return whatever is buffered (waiting up to `timeout` for the first byte).
+
+        Used by capture: every chunk is timestamped as soon as it arrives
+        instead of being merged until the line goes quiet like `read_all`.
+        """
+        if not self._ser or not getattr(self._ser, 'is_open', False):
+            return b''
+        try:
+            waiting = getattr(self._ser, 'in_waiting', 0) or 1
+            data = self._ser.read(min(max(waiting, 1), size))
+        except Exception as e:
+            logger.debug('read_chunk read error: %s', e)
+            return b''
+        self._tap('R', data)
+        return data
+
     def read_all(self):
         if not self._ser or not getattr(self._ser, 'is_open', False):
             return b''
@@ -78,7 +145,9 @@ class SerialComm:
                 if time.time() - start > self.timeout:
                     break
         logger.debug('Read %d bytes from %s', len(out), self.device)
-        return bytes(out)
+        data = bytes(out)
+        self._tap('R', data)
+        return data
 
     def __enter__(self):
         self.open()
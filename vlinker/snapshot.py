@@ -0,0 +1,171 @@
+"""ECU configuration snapshots: take, diff and restore.
+
+A snapshot holds the values of an ECU's coding/adaptation DIDs in one small
+versioned JSON file (gzip-compressed when the name ends in ``.gz``)::
+
+    {"format": "vlinker-snapshot", "version": 1, "ecu": "...", "profile": "...",
+     "ts": 1700000000.0, "dids": {"0600": "0102A0..."}, "errors": {"F1A0": "0x31"}}
+
+`take_snapshot` reads the DIDs with batched multi-DID
+ReadDataByIdentifier requests (`uds.read_dids`). A multi-DID answer can
+only be split when the value lengths are known, so the lengths seen per
+ECU are remembered in the cache dir: the first snapshot of an ECU reads
+DID by DID, later ones need a handful of requests. `diff_snapshots` compares two snapshots down to the bit
+(`vw_helpers.get_longcoding_bit`) and `restore_snapshot` writes back only
+the DIDs that differ from the ECU, as one `coding` transaction.
+"""
+import gzip
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from .cache import cache_dir
+from .coding import apply_coding, parse_did
+from .logger import get_logger
+from .uds import UdsSession, read_dids
+from .vw_helpers import get_longcoding_bit
+
+logger = get_logger(__name__)
+
+FORMAT = 'vlinker-snapshot'
+VERSION = 1
+
+
+def profile_dids(profile: Dict[str, Any]) -> List[int]:
+    """DIDs a profile names in `coding_dids` (or, failing that, `modules`)."""
+    out = []
+    for key in profile.get('coding_dids') or profile.get('modules') or {}:
+        try:
+            out.append(parse_did(key))
+        except ValueError:
+            logger.debug('profile entry %r is not a DID', key)
+    return out
+
+
+def _lengths_path() -> Path:
+    return cache_dir() / 'did_lengths.json'
+
+
+def load_did_lengths(ecu: str, path: Optional[Path] = None) -> Dict[int, int]:
+    """DID value lengths seen on `ecu` (empty on error)."""
+    try:
+        p = Path(path) if path else _lengths_path()
+        with p.open('r', encoding='utf-8') as f:
+            data = json.load(f)
+        return {int(k, 16): int(v) for k, v in data.get(ecu, {}).items()}
+    except Exception:
+        return {}
+
+
+def save_did_lengths(ecu: str, lengths: Dict[int, int], path: Optional[Path] = None):
+    """Merge `lengths` into the stored lengths of `ecu`. Best-effort."""
+    try:
+        p = Path(path) if path else _lengths_path()
+        try:
+            data = json.loads(p.read_text())
+        except (OSError, ValueError):
+            data = {}
+        entry = data.setdefault(ecu, {})
+        entry.update({f'{d:04X}': n for d, n in lengths.items()})
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_suffix('.tmp')
+        tmp.write_text(json.dumps(data))
+        tmp.replace(p)
+    except Exception as e:
+        logger.debug('could not store DID lengths: %s', e)
+
+
+def take_snapshot(session: UdsSession, dids: Iterable[Any], profile: Optional[str] = None,
+                  batch: int = 16, lengths_path: Optional[Path] = None) -> Dict[str, Any]:
+    """Read `dids` (ints or hex strings) into a snapshot dict.
+
+    DIDs the ECU refuses are listed under `errors` with their NRC.
+    """
+    wanted = [parse_did(d) for d in dids]
+    errors: Dict[int, int] = {}
+    values = read_dids(session, wanted, lengths=load_did_lengths(session.ecu, lengths_path),
+                       batch=batch, errors=errors)
+    save_did_lengths(session.ecu, {d: len(v) for d, v in values.items()}, lengths_path)
+    return {
+        'format': FORMAT,
+        'version': VERSION,
+        'ecu': session.ecu,
+        'profile': profile,
+        'ts': time.time(),
+        'dids': {f'{d:04X}': v.hex().upper() for d, v in sorted(values.items())},
+        'errors': {f'{d:04X}': f'0x{nrc:02X}' for d, nrc in sorted(errors.items())},
+    }
+
+
+def save_snapshot(snapshot: Dict[str, Any], path: str) -> str:
+    """Write `snapshot` to `path` (gzip when it ends in .gz)."""
+    blob = json.dumps(snapshot, separators=(',', ':')).encode('utf-8')
+    if str(path).endswith('.gz'):
+        blob = gzip.compress(blob)
+    tmp = Path(f'{path}.tmp')
+    tmp.write_bytes(blob)
+    tmp.replace(path)
+    return str(path)
+
+
+def load_snapshot(path: str) -> Dict[str, Any]:
+    """Read a snapshot file; ValueError if it is not one this version understands."""
+    blob = Path(path).read_bytes()
+    if blob[:2] == b'\x1f\x8b':
+        blob = gzip.decompress(blob)
+    snap = json.loads(blob.decode('utf-8'))
+    if not isinstance(snap, dict) or snap.get('format') != FORMAT:
+        raise ValueError(f'{path} is not a snapshot')
+    if int(snap.get('version', 0)) > VERSION:
+        raise ValueError(f'{path} has snapshot version {snap["version"]}; this vlinker reads up to {VERSION}')
+    return snap
+
+
+def _byte_diff(a: bytes, b: bytes) -> List[Dict[str, Any]]:
+    out = []
+    for i in range(min(len(a), len(b))):
+        if a[i] != b[i]:
+            bits = [bit for bit in range(8) if get_longcoding_bit(a, i, bit) != get_longcoding_bit(b, i, bit)]
+            out.append({'index': i, 'a': f'{a[i]:02X}', 'b': f'{b[i]:02X}', 'bits': bits})
+    return out
+
+
+def diff_snapshots(a: Dict[str, Any], b: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Differences between snapshots `a` and `b`, one entry per DID.
+
+    Each entry has `did`, the hex values `a`/`b` (None when the DID is
+    missing on that side) and, when both exist, `bytes`: the differing
+    byte indices with the flipped bit numbers (0 = LSB). Values of
+    different length also get `length`.
+    """
+    da, db = a.get('dids', {}), b.get('dids', {})
+    out = []
+    for did in sorted(set(da) | set(db)):
+        va, vb = da.get(did), db.get(did)
+        if va == vb:
+            continue
+        entry: Dict[str, Any] = {'did': did, 'a': va, 'b': vb}
+        if va is not None and vb is not None:
+            ba, bb = bytes.fromhex(va), bytes.fromhex(vb)
+            entry['bytes'] = _byte_diff(ba, bb)
+            if len(ba) != len(bb):
+                entry['length'] = [len(ba), len(bb)]
+        out.append(entry)
+    return out
+
+
+def restore_snapshot(session: UdsSession, snapshot: Dict[str, Any], dids: Optional[Iterable[Any]] = None,
+                     **kwargs) -> Dict[str, Any]:
+    """Write the snapshot's values back where the ECU differs (`coding.apply_coding`).
+
+    `dids` limits the restore to some DIDs; extra keyword arguments (e.g.
+    `dry_run`) go to `apply_coding`.
+    """
+    values = {parse_did(d): bytes.fromhex(v) for d, v in snapshot.get('dids', {}).items()}
+    if dids is not None:
+        keep = {parse_did(d) for d in dids}
+        values = {d: v for d, v in values.items() if d in keep}
+    if not values:
+        raise ValueError('snapshot has no DID values to restore')
+    return apply_coding(session, values, **kwargs)
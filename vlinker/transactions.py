@@ -0,0 +1,256 @@
+"""Request/response correlation for captures.
+
+`iter_transactions` walks capture records once and pairs every UDS/OBD
+request with its answers: positive response (SID + 0x40), negative response
+(``7F SID NRC``) or a chain of ``7F SID 78`` (response pending) followed by
+the final answer. A request stays open for further ECUs (functional OBD
+requests get one answer per ECU) until the same service is requested again
+or `timeout` seconds pass, so memory only holds the open requests.
+
+Records may carry raw bytes or ELM text; text answers are split with
+`ElmResponseParser`, so with ``ATH1`` captures each ECU header is kept apart.
+A text write may hold several commands (`elm.ElmSession` pipelines pending
+AT settings with the request); every line is queued and matched, in order,
+to the prompt-terminated answers, and adapter commands (AT/ST) only use up
+their answer.
+`latency_stats` turns the transaction table into per-service and per-ECU
+latency percentiles.
+"""
+import math
+from collections import deque, namedtuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .protocols import ElmResponseParser, hex_to_bytes, is_elm_text
+
+NRC_RESPONSE_PENDING = 0x78
+
+# status: 'positive', 'negative' or 'timeout'; latency_ns is None for timeouts
+Transaction = namedtuple('Transaction', 'ts_ns ecu sid request response status nrc latency_ns pending')
+
+
+class _Open:
+    __slots__ = ('ts_ns', 'sid', 'request', 'answered', 'pending')
+
+    def __init__(self, ts_ns: int, sid: int, request: bytes):
+        self.ts_ns = ts_ns
+        self.sid = sid
+        self.request = request
+        self.answered = set()
+        # ecu -> number of 0x78 answers seen so far
+        self.pending: Dict[str, int] = {}
+
+
+class TransactionCorrelator:
+    """Incremental correlator; feed records with `add`, then call `finish`."""
+
+    def __init__(self, timeout: float = 5.0, headers: bool = False, can_29bit: bool = False):
+        self.timeout_ns = int(timeout * 1e9)
+        self._parser = ElmResponseParser(headers=headers, can_29bit=can_29bit)
+        self._open: Dict[int, _Open] = {}
+        # text commands waiting for their prompt: (ts_ns, payload or None for adapter commands)
+        self._text_queue: deque = deque()
+        self.unmatched = 0
+
+    def _expire(self, req: _Open) -> List[Transaction]:
+        out = []
+        for ecu, count in req.pending.items():
+            if ecu not in req.answered:
+                out.append(Transaction(req.ts_ns, ecu, req.sid, req.request, b'', 'timeout', NRC_RESPONSE_PENDING,
+                                       None, count))
+        if not req.answered and not req.pending:
+            out.append(Transaction(req.ts_ns, '', req.sid, req.request, b'', 'timeout', None, None, 0))
+        return out
+
+    def _request(self, ts_ns: int, payload: bytes) -> List[Transaction]:
+        out = self._sweep(ts_ns)
+        sid = payload[0]
+        prev = self._open.pop(sid, None)
+        if prev is not None:
+            out.extend(self._expire(prev))
+        self._open[sid] = _Open(ts_ns, sid, payload)
+        return out
+
+    def _response(self, ts_ns: int, ecu: str, payload: bytes) -> List[Transaction]:
+        if payload[0] == 0x7F and len(payload) >= 3:
+            sid, nrc = payload[1], payload[2]
+        elif payload[0] >= 0x40:
+            sid, nrc = payload[0] - 0x40, None
+        else:
+            self.unmatched += 1
+            return []
+        req = self._open.get(sid)
+        if req is None or ecu in req.answered:
+            self.unmatched += 1
+            return []
+        if nrc == NRC_RESPONSE_PENDING:
+            req.pending[ecu] = req.pending.get(ecu, 0) + 1
+            return []
+        req.answered.add(ecu)
+        return [Transaction(req.ts_ns, ecu, sid, req.request, payload,
+                            'positive' if nrc is None else 'negative', nrc, ts_ns - req.ts_ns,
+                            req.pending.get(ecu, 0))]
+
+    def _sweep(self, now_ns: int) -> List[Transaction]:
+        out = []
+        for sid in [s for s, r in self._open.items() if now_ns - r.ts_ns > self.timeout_ns]:
+            out.extend(self._expire(self._open.pop(sid)))
+        return out
+
+    def _queue_text(self, ts_ns: int, data: bytes) -> List[Transaction]:
+        out = []
+        # commands whose prompt never came (capture started mid-answer, aborted command)
+        queue = self._text_queue
+        while queue and ts_ns - queue[0][0] > self.timeout_ns:
+            old_ts, payload = queue.popleft()
+            if payload:
+                out.append(Transaction(old_ts, '', payload[0], payload, b'', 'timeout', None, None, 0))
+        for line in data.split(b'\r'):
+            line = line.strip()
+            if not line:
+                continue
+            if line[:2].upper() in (b'AT', b'ST'):
+                queue.append((ts_ns, None))  # adapter command, not a vehicle request
+            else:
+                queue.append((ts_ns, hex_to_bytes(line) or None))
+        return out
+
+    def _text_answer(self, ts_ns: int, resp: Dict[str, Any]) -> List[Transaction]:
+        out: List[Transaction] = []
+        entry = self._text_queue.popleft() if self._text_queue else None
+        if entry is not None:
+            if entry[1] is None:
+                return out
+            out.extend(self._request(entry[0], entry[1]))
+        for header, payloads in resp['messages'].items():
+            for payload in payloads:
+                if payload:
+                    out.extend(self._response(ts_ns, header, payload))
+        if entry is not None:
+            # the prompt ends the answer: ECUs that did not answer by now never will
+            req = self._open.pop(entry[1][0], None)
+            if req is not None:
+                out.extend(self._expire(req))
+        return out
+
+    def add(self, ts_ns: int, direction: str, data: bytes, can_id: Optional[int] = None) -> List[Transaction]:
+        """Consume one capture record; return the transactions it completed."""
+        if not data:
+            return []
+        text = is_elm_text(data, can_id)
+        if direction[:1].upper() == 'T':
+            if text:
+                return self._queue_text(ts_ns, data)
+            return self._request(ts_ns, data)
+        out: List[Transaction] = []
+        if text:
+            for resp in self._parser.feed(data):
+                out.extend(self._text_answer(ts_ns, resp))
+            return out
+        ecu = f'{can_id:X}' if can_id is not None else ''
+        return self._response(ts_ns, ecu, data)
+
+    def finish(self) -> List[Transaction]:
+        """Close all open requests (end of capture)."""
+        out = []
+        for req in self._open.values():
+            out.extend(self._expire(req))
+        self._open.clear()
+        for ts_ns, payload in self._text_queue:
+            if payload:
+                out.append(Transaction(ts_ns, '', payload[0], payload, b'', 'timeout', None, None, 0))
+        self._text_queue.clear()
+        return out
+
+
+def iter_transactions(records: Iterable, timeout: float = 5.0, headers: bool = False,
+                      can_29bit: bool = False) -> Iterator[Transaction]:
+    """Correlate `CaptureRecord`-like records (ts_ns, direction, channel, can_id, data)."""
+    corr = TransactionCorrelator(timeout=timeout, headers=headers, can_29bit=can_29bit)
+    for rec in records:
+        yield from corr.add(rec[0], rec[1], rec[4], rec[3])
+    yield from corr.finish()
+
+
+def correlate_capture(path: str, **kwargs) -> List[Transaction]:
+    """Transaction table of a capture file (binary or text)."""
+    from .capture_parser import iter_capture_records
+    return list(iter_transactions(iter_capture_records(path), **kwargs))
+
+
+def _percentile(sorted_values: List[int], q: float) -> float:
+    # nearest-rank percentile
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(q / 100.0 * len(sorted_values)) - 1))
+    return float(sorted_values[k])
+
+
+def _summary(rows: List[Transaction]) -> Dict[str, Any]:
+    lat = sorted(t.latency_ns for t in rows if t.latency_ns is not None)
+    ms = 1e-6
+    return {
+        'count': len(rows),
+        'positive': sum(1 for t in rows if t.status == 'positive'),
+        'negative': sum(1 for t in rows if t.status == 'negative'),
+        'timeout': sum(1 for t in rows if t.status == 'timeout'),
+        'pending': sum(t.pending for t in rows),
+        'p50_ms': _percentile(lat, 50) * ms,
+        'p90_ms': _percentile(lat, 90) * ms,
+        'p99_ms': _percentile(lat, 99) * ms,
+        'max_ms': (lat[-1] if lat else 0) * ms,
+    }
+
+
+def latency_stats(transactions: Iterable[Transaction]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """Per-service ('22') and per-ECU ('7E8') counts and latency percentiles."""
+    by_sid: Dict[str, List[Transaction]] = {}
+    by_ecu: Dict[str, List[Transaction]] = {}
+    for t in transactions:
+        by_sid.setdefault(f'{t.sid:02X}', []).append(t)
+        by_ecu.setdefault(t.ecu, []).append(t)
+    return {
+        'by_service': {k: _summary(v) for k, v in sorted(by_sid.items())},
+        'by_ecu': {k: _summary(v) for k, v in sorted(by_ecu.items())},
+    }
+
+
+def seed_pairs(transactions: Iterable[Transaction]) -> List[Tuple[int, bytes, bytes]]:
+    """(ts_ns, request, seed) for positive SecurityAccess seed answers (odd sub-functions)."""
+    out = []
+    for t in transactions:
+        if t.sid == 0x27 and t.status == 'positive' and len(t.request) >= 2 and t.request[1] & 1:
+            out.append((t.ts_ns, t.request, t.response[2:]))
+    return out
+
+
+def seed_key_pairs(transactions: Iterable[Transaction]) -> List[Dict[str, Any]]:
+    """Pair SecurityAccess seeds with the keys sent for them.
+
+    A seed comes from a positive answer to ``27 <odd level>``; the key is the
+    next ``27 <level+1>`` request to the same ECU. `accepted` is True for a
+    positive ``67`` answer, False for a negative one and None if the key was
+    never answered. Already-unlocked ECUs (all-zero seed) are skipped.
+    """
+    out: List[Dict[str, Any]] = []
+    open_seeds: Dict[Tuple[str, int], Dict[str, Any]] = {}
+    for t in transactions:
+        if t.sid != 0x27 or len(t.request) < 2:
+            continue
+        level = t.request[1]
+        if level & 1:
+            seed = t.response[2:] if t.status == 'positive' else b''
+            if seed and any(seed):
+                open_seeds[(t.ecu, level)] = {'ts_ns': t.ts_ns, 'ecu': t.ecu, 'level': level, 'seed': seed}
+            continue
+        # key requests go out before the ECU answers; match on the seed's level
+        key = (t.ecu, level - 1)
+        if key not in open_seeds:
+            # unanswered key (no ECU) or seed seen without headers: take any seed of that level
+            key = next((k for k in open_seeds if k[1] == level - 1), None)
+        if key is None:
+            continue
+        entry = open_seeds.pop(key)
+        entry['key'] = t.request[2:]
+        entry['accepted'] = {'positive': True, 'negative': False}.get(t.status)
+        out.append(entry)
+    return out
@@ -1,13 +1,268 @@
 import time
 import binascii
-from typing import Optional
+from typing import Dict, Iterable, List, Optional, Set
 
+from . import serial_comm
 from .serial_comm import SerialComm
 from .logger import get_logger
-from .iso_tp import send_iso_tp
+from .iso_tp import MAX_PAYLOAD as ISO_TP_MAX_PAYLOAD, iso_tp_exchange, iso_tp_receive, send_iso_tp
+from .protocols import _bytes_to_dtc, hex_to_bytes, is_ascii_text
 
 logger = get_logger(__name__)
 
+# negative response codes (ISO 14229-1 annex A)
+NRC_NAMES = {
+    0x10: 'generalReject',
+    0x11: 'serviceNotSupported',
+    0x12: 'subFunctionNotSupported',
+    0x13: 'incorrectMessageLengthOrInvalidFormat',
+    0x14: 'responseTooLong',
+    0x21: 'busyRepeatRequest',
+    0x22: 'conditionsNotCorrect',
+    0x24: 'requestSequenceError',
+    0x31: 'requestOutOfRange',
+    0x33: 'securityAccessDenied',
+    0x35: 'invalidKey',
+    0x36: 'exceededNumberOfAttempts',
+    0x37: 'requiredTimeDelayNotExpired',
+    0x70: 'uploadDownloadNotAccepted',
+    0x71: 'transferDataSuspended',
+    0x72: 'generalProgrammingFailure',
+    0x73: 'wrongBlockSequenceCounter',
+    0x78: 'requestCorrectlyReceivedResponsePending',
+    0x7E: 'subFunctionNotSupportedInActiveSession',
+    0x7F: 'serviceNotSupportedInActiveSession',
+}
+NRC_RESPONSE_PENDING = 0x78
+
+# adapter answers that carry no ECU response
+_NO_RESPONSE = (b'NO DATA', b'?', b'CAN ERROR', b'BUFFER FULL', b'STOPPED')
+
+# characters of an ELM ASCII-hex answer (which ends with a line break or the
+# prompt); anything else is a binary response
+_ELM_TEXT = frozenset(b'0123456789ABCDEFabcdef \r\n>')
+
+
+class NegativeResponse(RuntimeError):
+    """The ECU answered a request with ``7F <sid> <nrc>``."""
+
+    def __init__(self, sid: int, nrc: int):
+        self.sid = sid
+        self.nrc = nrc
+        super().__init__(f'negative response to service 0x{sid:02X}: '
+                         f'0x{nrc:02X} ({NRC_NAMES.get(nrc, "unknown")})')
+
+
+class UdsSession:
+    """A held connection for a sequence of UDS requests to one ECU.
+
+    Opening the port once keeps the ECU's diagnostic session (and any
+    security unlock) alive between requests, and avoids the adapter setup
+    per request. `conn` may be an already open transport (anything with
+    `send_bytes` or `send_hex`, optionally `read_all`); otherwise a
+    `SerialComm` is opened for `device`. `ecu` names the ECU for state kept across sessions
+    (security delay timers); it defaults to the device.
+
+    ``7F xx 78`` (response pending) answers are waited out for up to
+    `p2_star` seconds. Levels unlocked through SecurityAccess are kept in
+    `unlocked` until the diagnostic session changes or the ECU resets.
+
+    With `iso_tp` requests and answers are ISO-TP framed (see
+    `iso_tp.iso_tp_exchange`): a payload longer than one CAN frame (7 bytes)
+    is sent segmented under flow control, and `max_payload` is the longest
+    request the path carries.
+    By default this applies when the session opens its own `SerialComm`
+    (a raw-byte CAN adapter), not to a passed `conn`.
+    """
+
+    def __init__(self, device: str, baud: int = 115200, timeout: float = 2.0, conn=None,
+                 ecu: Optional[str] = None, p2_star: float = 5.0, iso_tp: Optional[bool] = None):
+        self.device = device
+        self.baud = baud
+        self.timeout = timeout
+        self.ecu = ecu or str(device)
+        self.p2_star = p2_star
+        self._conn = conn
+        self._owns_conn = conn is None
+        self.iso_tp = self._owns_conn if iso_tp is None else iso_tp
+        self.max_payload = ISO_TP_MAX_PAYLOAD if self.iso_tp else None
+        self.unlocked: Set[int] = set()
+        self.requests_sent = 0
+        # cleared when the ECU refuses several DIDs in one ReadDataByIdentifier
+        self.multi_did = True
+
+    def open(self):
+        if self._conn is None:
+            self._conn = serial_comm.SerialComm(self.device, baud=self.baud, timeout=self.timeout)
+            self._conn.open()
+        return self
+
+    def close(self):
+        if self._conn is not None and self._owns_conn:
+            try:
+                self._conn.close()
+            except Exception as e:
+                logger.debug('error closing UDS transport: %s', e)
+            self._conn = None
+        self.unlocked.clear()
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _read(self, raw: bytes, payload: bytes) -> bytes:
+        if not raw:
+            return b''
+        text = raw[-1:] in (b'>', b'\r', b'\n') and is_ascii_text(raw)
+        if text and any(m in raw.upper() for m in _NO_RESPONSE):
+            return b''
+        resp = hex_to_bytes(raw) if text and set(raw) <= _ELM_TEXT else bytes(raw)
+        # adapter echo of the request (a response never starts with the request SID)
+        if resp[:len(payload)] == payload and len(resp) > len(payload):
+            resp = resp[len(payload):]
+        return resp
+
+    def exchange(self, payload: bytes) -> bytes:
+        """Send `payload` and return the final response (positive or ``7F``).
+
+        Response-pending answers are skipped; returns b'' when the ECU does
+        not answer.
+        """
+        conn = self._conn
+        if conn is None:
+            raise RuntimeError('UDS session not open')
+        payload = bytes(payload)
+        self.requests_sent += 1
+        framed = self.iso_tp
+        if framed:
+            resp = iso_tp_exchange(conn, payload, timeout=self.timeout)
+        else:
+            # binary transports take the payload as is; others get the hex form
+            send_bytes = getattr(conn, 'send_bytes', None)
+            raw = send_bytes(payload) if send_bytes else conn.send_hex(payload.hex().upper())
+            resp = self._read(raw, payload)
+        pending = bytes([0x7F, payload[0], NRC_RESPONSE_PENDING])
+        deadline = time.monotonic() + self.p2_star
+        while resp.startswith(pending):
+            # the final answer may already be in the same read
+            resp = resp[3:]
+            if resp:
+                continue
+            if time.monotonic() > deadline or not hasattr(conn, 'read_all'):
+                raise TimeoutError(f'no final response to service 0x{payload[0]:02X} after response pending')
+            resp = iso_tp_receive(conn, self.timeout) if framed else self._read(conn.read_all(), payload)
+            if resp:
+                deadline = time.monotonic() + self.p2_star
+        self._track(payload, resp)
+        return resp
+
+    def _track(self, payload: bytes, resp: bytes):
+        # a new diagnostic session or an ECU reset drops security access
+        if resp[:1] in (b'\x50', b'\x51'):
+            self.unlocked.clear()
+        elif payload[0] == 0x27 and resp[:1] == b'\x67' and len(payload) > 1 and len(resp) > 1 \
+                and payload[1] % 2 == 0 and resp[1] == payload[1]:
+            self.unlocked.add(payload[1] - 1)
+
+    def request(self, payload: bytes) -> bytes:
+        """`exchange` that raises `NegativeResponse` for a ``7F`` answer and
+        RuntimeError for a missing or mismatched one."""
+        payload = bytes(payload)
+        resp = self.exchange(payload)
+        if len(resp) >= 3 and resp[0] == 0x7F and resp[1] == payload[0]:
+            raise NegativeResponse(resp[1], resp[2])
+        if not resp or resp[0] != (payload[0] + 0x40) & 0xFF:
+            raise RuntimeError(f'unexpected response to service 0x{payload[0]:02X}: {_hexdump(resp)!r}')
+        return resp
+
+    def diagnostic_session(self, kind: int = 0x03) -> bytes:
+        """DiagnosticSessionControl (0x10); 0x03 is the extended session."""
+        return self.request(bytes([0x10, kind]))
+
+
+def memory_address(address: int, size: int, address_bytes: Optional[int] = None,
+                   size_bytes: Optional[int] = None) -> bytes:
+    """addressAndLengthFormatIdentifier + memoryAddress + memorySize (0x23/0x34/0x35)."""
+    alen = address_bytes or max(4, (address.bit_length() + 7) // 8)
+    slen = size_bytes or max(4, (size.bit_length() + 7) // 8)
+    return bytes([(slen << 4) | alen]) + address.to_bytes(alen, 'big') + size.to_bytes(slen, 'big')
+
+
+def _did_batches(dids: List[int], lengths: Dict[int, int], batch: int) -> List[List[int]]:
+    # a multi-DID answer can only be split when every length but the last is known
+    known = [d for d in dids if d in lengths]
+    unknown = [d for d in dids if d not in lengths]
+    out = []
+    while known or unknown:
+        group = known[:batch - 1] if unknown else known[:batch]
+        known = known[len(group):]
+        if unknown:
+            group.append(unknown.pop(0))
+        out.append(group)
+    return out
+
+
+def _split_dids(resp: bytes, group: List[int], lengths: Dict[int, int]) -> Dict[int, bytes]:
+    out = {}
+    pos = 1
+    for i, did in enumerate(group):
+        if resp[pos:pos + 2] != did.to_bytes(2, 'big'):
+            raise RuntimeError(f'DID 0x{did:04X} missing from the response')
+        pos += 2
+        end = len(resp) if i == len(group) - 1 else pos + lengths[did]
+        out[did] = resp[pos:end]
+        pos = end
+    if pos != len(resp):
+        raise RuntimeError('ReadDataByIdentifier response longer than expected')
+    return out
+
+
+def read_dids(session: UdsSession, dids: Iterable[int], lengths: Optional[Dict[int, int]] = None,
+              batch: int = 8, errors: Optional[Dict[int, int]] = None) -> Dict[int, bytes]:
+    """Read several DIDs with as few ReadDataByIdentifier (0x22) requests as possible.
+
+    UDS allows one outstanding request per ECU, so requests cannot be
+    pipelined; putting several DIDs into one request is how round trips are
+    saved instead. Up to `batch` DIDs go into one request when their data
+    `lengths` are known (one DID of unknown length may close each request).
+    ECUs that refuse multi-DID requests are read one DID at a time. Raises
+    `NegativeResponse` when a single DID cannot be read, unless an `errors`
+    dict is given, which then collects DID -> NRC.
+    """
+    dids = list(dict.fromkeys(int(d) for d in dids))
+    lengths = dict(lengths or {})
+    out: Dict[int, bytes] = {}
+    for group in _did_batches(dids, lengths, batch if session.multi_did else 1):
+        if len(group) > 1 and session.multi_did:
+            try:
+                resp = session.request(b'\x22' + b''.join(d.to_bytes(2, 'big') for d in group))
+                out.update(_split_dids(resp, group, lengths))
+                continue
+            except NegativeResponse as e:
+                if e.nrc in (0x13, 0x14):
+                    session.multi_did = False
+                logger.debug('multi-DID read refused (%s); reading singly', e)
+            except RuntimeError as e:
+                logger.debug('multi-DID read unusable (%s); reading singly', e)
+        for did in group:
+            try:
+                out.update(_split_dids(session.request(b'\x22' + did.to_bytes(2, 'big')), [did], lengths))
+            except NegativeResponse as e:
+                if errors is None:
+                    raise
+                errors[did] = e.nrc
+    return out
+
+
+def write_did(session: UdsSession, did: int, data: bytes) -> bytes:
+    """WriteDataByIdentifier (0x2E); returns the positive response."""
+    resp = session.request(b'\x2e' + int(did).to_bytes(2, 'big') + bytes(data))
+    if resp[1:3] != int(did).to_bytes(2, 'big'):
+        raise RuntimeError(f'write of DID 0x{did:04X} answered for another DID')
+    return resp
+
 
 def _hexdump(b: bytes) -> str:
     return binascii.hexlify(b).decode('ascii')
@@ -94,15 +349,19 @@ def read_measure_uds(device: str, pid_hex: str, baud: int = 115200, timeout: flo
     return _hexdump(resp)
 
 
-def parse_dtc_bytes(resp: bytes):
+def parse_dtc_bytes(resp: bytes, describe: bool = True, manufacturer: Optional[str] = None,
+                    profile: Optional[Dict] = None):
     """Parse a raw UDS positive response payload (bytes after 0x59) into DTC entries.
 
     This performs minimal, robust parsing and returns a list of dicts with
     - raw: hex string of the 3-byte DTC
     - status: optional status byte (if present after the DTC)
-    - code: best-effort human string (falls back to raw)
+    - code: J2012 code (e.g. P0123) from the first two bytes
+    - ftb: failure type byte (third byte) as hex
+    - description: text from the DTC database when `describe` is set
 
-    The function is non-destructive and tolerant of variable-length payloads.
+    Descriptions are looked up for the whole report in one batch; lookup
+    errors are ignored. The function is tolerant of variable-length payloads.
     """
     out = []
     if not resp:
@@ -112,9 +371,7 @@ def parse_dtc_bytes(resp: bytes):
     while i + 2 < L:
         dtc_bytes = resp[i:i+3]
         raw = ''.join(f"{b:02X}" for b in dtc_bytes)
-        # best-effort code: present the bytes and a short hex label
-        code = f"DTC_{raw}"
-        entry = {'raw': raw, 'code': code}
+        entry = {'raw': raw, 'code': _bytes_to_dtc(dtc_bytes[0], dtc_bytes[1]), 'ftb': f"{dtc_bytes[2]:02X}"}
         i += 3
         # optional status byte: if available and looks like a status (0x00-0xFF)
         if i < L:
@@ -122,6 +379,14 @@ def parse_dtc_bytes(resp: bytes):
             entry['status'] = f"0x{status:02X}"
             i += 1
         out.append(entry)
+    if describe and out:
+        try:
+            from .dtc_db import describe_dtcs
+            found = describe_dtcs([e['code'] for e in out], manufacturer=manufacturer, profile=profile)
+            for e in out:
+                e['description'] = found.get(e['code'], {}).get('description', '')
+        except Exception as e:
+            logger.debug('DTC description lookup failed: %s', e)
     return out
 
 
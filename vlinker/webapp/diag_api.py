@@ -117,6 +117,12 @@ class _SerialManager:
 
 _mgr = _SerialManager()
 
+# simulated raw PID data, decoded through the same formula table as live values
+_SIM_RAW = {
+    0x04: b'\x33', 0x05: b'\x70', 0x0B: b'\x21', 0x0C: b'\x0c\x80', 0x0D: b'\x00',
+    0x0F: b'\x3c', 0x10: b'\x01\x90', 0x11: b'\x24', 0x2F: b'\x99', 0x42: b'\x36\xb0',
+}
+
 
 @router.post('/api/serial/connect')
 def api_connect(req: ConnectRequest):
@@ -188,10 +194,8 @@ def api_discover(use_simulator: bool = False):
 @router.get('/api/diag/read_dtcs')
 def api_read_dtcs(ecu: str, use_simulator: bool = False):
     if use_simulator:
-        return {'ecu': ecu, 'dtcs': [
-            {'raw': '010203', 'code': 'DTC_010203', 'status': '0x10'},
-            {'raw': 'AABBCC', 'code': 'DTC_AABBCC', 'status': '0x00'},
-        ]}
+        from vlinker.uds import parse_dtc_bytes
+        return {'ecu': ecu, 'dtcs': parse_dtc_bytes(bytes.fromhex('0301001004200000'))}
 
     status = _mgr.status()
     if status.get('connected'):
@@ -275,10 +279,15 @@ def api_read_measures(body: Dict[str, Any]):
     if not ecu:
         raise HTTPException(status_code=400, detail='ecu required')
     if use_sim:
-        measures = {pid: {'value': 123.4, 'units': 'u'} for pid in pids} if pids else {
-            'rpm': {'value': 800, 'units': 'rpm'},
-            'temp': {'value': 72, 'units': 'C'},
-        }
+        from vlinker.obd_pids import PID_FORMULAS, decode_pid
+        measures = {}
+        for pid in (pids or ['0C', '05']):
+            try:
+                p = int(pid, 16)
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f'invalid pid: {pid}')
+            raw = _SIM_RAW.get(p, b'\x80\x00\x00\x00')
+            measures[pid] = decode_pid(p, raw) if p in PID_FORMULAS else {'raw': raw.hex()}
         return {'ecu': ecu, 'measures': measures}
 
     status = _mgr.status()
@@ -1,6 +1,7 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
+import os
 import shutil
 import tempfile
 from pathlib import Path
@@ -25,6 +26,7 @@ async def api_profile_analyze(path: str | None = None, upload: UploadFile | None
             result = analyze_capture(tmp.name)
         finally:
             tmp.close()
+            os.unlink(tmp.name)
         return {'suggestions': result}
     if not path:
         raise HTTPException(status_code=400, detail='path or upload required')
@@ -32,6 +34,25 @@ async def api_profile_analyze(path: str | None = None, upload: UploadFile | None
     return {'suggestions': res}
 
 
+@app.post('/api/profile/analyze_batch')
+async def api_profile_analyze_batch(sources: list[str], workers: int | None = None) -> Any:
+    from fastapi.concurrency import run_in_threadpool
+    from vlinker.batch_analysis import analyze_corpus
+    if not sources:
+        raise HTTPException(status_code=400, detail='sources required')
+    return await run_in_threadpool(analyze_corpus, sources, workers=workers)
+
+
+@app.post('/api/profile/search')
+async def api_profile_search(path: str, depth: int = 2, workers: int | None = None) -> Any:
+    from fastapi.concurrency import run_in_threadpool
+    from vlinker.seedkey_search import search_capture
+    res = await run_in_threadpool(search_capture, path, max_depth=depth, workers=workers)
+    if not res['pairs']:
+        raise HTTPException(status_code=404, detail='no accepted seed/key pairs found')
+    return res
+
+
 @app.post('/api/profile/build')
 async def api_profile_build(path: str, name: str, algo: str) -> Any:
     from vlinker.profile_builder import analyze_capture, save_profile_from_suggestion
@@ -67,6 +88,21 @@ async def api_adv_send_key(device: str, key_hex: str, baud: int = 115200, timeou
     return {'response_hex': resp.hex() if resp else None}
 
 
+@app.post('/api/adv/unlock')
+async def api_adv_unlock(device: str, profile: str, level: int = 1, baud: int = 115200,
+                         timeout: float = 1.0, force: bool = False) -> Any:
+    from vlinker.advanced import security_access_with_profile
+    from vlinker.uds import NegativeResponse
+    try:
+        res = security_access_with_profile(device, profile, sub_function=level, baud=baud,
+                                           timeout=timeout, force=force)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except (NegativeResponse, RuntimeError) as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {k: v.hex() if isinstance(v, bytes) else v for k, v in res.items()}
+
+
 @app.post('/api/capture/upload')
 async def api_capture_upload(file: UploadFile = File(...)) -> Any:
     tmpdir = tempfile.mkdtemp(prefix='vlinker-upload-')
@@ -1,10 +1,10 @@
 from pathlib import Path
-import json
 import re
 from fastapi import APIRouter, HTTPException, UploadFile, File
 from pydantic import BaseModel
 
 from vlinker import profile_builder
+from vlinker.profile_spec import SPEC_SUFFIXES, steps_for_candidate, write_spec
 
 router = APIRouter()
 
@@ -54,10 +54,13 @@ async def upload_capture(upload: UploadFile = File(...)):
 
 @router.get('/api/profile/list')
 def list_profiles():
-    pdir = _profiles_dir()
+    # served from the registry's metadata index; profile modules are not imported
+    from vlinker.ecu_profiles import profile_index
     profiles = []
-    for f in pdir.glob('*.py'):
-        profiles.append({'name': f.stem, 'path': str(f)})
+    for key, meta in profile_index().items():
+        profiles.append({'name': key, 'path': meta['path'], 'title': meta.get('name'),
+                         'manufacturer': meta.get('manufacturer'), 'ecu_ids': meta.get('ecu_ids', []),
+                         'algo': meta.get('algo'), 'mtime_ns': meta['mtime_ns']})
     return {'profiles': profiles}
 
 
@@ -67,8 +70,8 @@ def preview_profile(name: str):
         name = _safe_name(name)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
-    p = _profiles_dir() / f'{name}.py'
-    if not p.exists():
+    p = next((f for f in (_profiles_dir() / f'{name}{ext}' for ext in SPEC_SUFFIXES + ('.py',)) if f.exists()), None)
+    if p is None:
         raise HTTPException(status_code=404, detail='profile not found')
     try:
         txt = p.read_text()
@@ -98,30 +101,21 @@ def build_profile(req: BuildRequest):
     if not cap.exists():
         raise HTTPException(status_code=404, detail='capture file not found')
 
-    # build a richer preview using profile_builder if available
-    preview = None
+    # preview: the capture's seed suggestions (served from the analysis cache)
     try:
-        # prefer an explicit preview API if present
-        if hasattr(profile_builder, 'save_profile_from_suggestion'):
-            preview = profile_builder.save_profile_from_suggestion(
-                capture_path=str(cap), name=name, algo=req.algo, dry_run=True
-            )
-        # also include analysis suggestions when available
-        if hasattr(profile_builder, 'analyze_capture'):
-            try:
-                analysis = profile_builder.analyze_capture(str(cap))
-            except Exception:
-                analysis = None
-            if isinstance(preview, dict):
-                preview.setdefault('analysis', analysis)
-            else:
-                preview = {'name': name, 'algo': req.algo, 'analysis': analysis}
+        analysis = profile_builder.analyze_capture(str(cap))
     except Exception:
-        # non-fatal: produce a minimal preview
-        preview = {'name': name, 'algo': req.algo, 'notes': 'preview generated (fallback)'}
+        analysis = None
+    preview = {'name': name, 'algo': req.algo, 'analysis': analysis}
+    candidate = next((c for sug in (analysis or []) for c in sug.get('candidates', [])
+                      if c.get('name') == req.algo), None)
+    steps = steps_for_candidate(req.algo, candidate)
+    if steps is None:
+        raise HTTPException(status_code=400, detail=f'unknown or malformed algorithm: {req.algo}')
+    preview['seed_key'] = {'steps': steps}
 
     profiles_dir = _profiles_dir()
-    profile_path = profiles_dir / f'{name}.py'
+    profile_path = profiles_dir / f'{name}.json'
 
     if req.dry_run:
         return {'preview': preview, 'profile_path': str(profile_path), 'written': False}
@@ -129,18 +123,9 @@ def build_profile(req: BuildRequest):
     if not req.force:
         raise HTTPException(status_code=403, detail='force flag required to write profile')
 
-    # write the profile file atomically
+    # write the declarative profile spec atomically
     try:
-        # If preview is a dict, produce a Python profile file template
-        if isinstance(preview, dict):
-            header = f"# Generated profile: {name}\n# algo: {req.algo}\n\n"
-            body = f"PROFILE = {json.dumps(preview, indent=2)}\n"
-            content = header + body
-        else:
-            content = str(preview)
-        tmp = profile_path.with_suffix('.tmp')
-        tmp.write_text(content)
-        tmp.replace(profile_path)
+        write_spec(str(profile_path), preview)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'failed to write profile: {e}')
 
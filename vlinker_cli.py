@@ -90,6 +90,7 @@ def main():
     sub.add_parser('adv')
     sub.add_parser('capture')
     sub.add_parser('profile')
+    sub.add_parser('snapshot')
 
     sp = sub.add_parser('serial')
     ssub = sp.add_subparsers(dest='sact')
@@ -135,12 +136,21 @@ def main():
     elif cmd == 'diag':
         import argparse as _arg
         dp = _arg.ArgumentParser(prog='vlinker diag')
-        dp.add_argument('diag_cmd', choices=['scan', 'read-dtc', 'send-hex', 'clear-dtc', 'measure'])
+        dp.add_argument('diag_cmd', choices=['scan', 'scan-dids', 'read-dtc', 'send-hex', 'clear-dtc', 'measure', 'log'])
         dp.add_argument('device')
         dp.add_argument('--mode', choices=['elm', 'raw'], default='elm')
         dp.add_argument('--baud', type=int, default=115200)
         dp.add_argument('--timeout', type=float, default=1.0)
         dp.add_argument('--hex', dest='hex', default=None)
+        dp.add_argument('--pid', action='append', default=[], help='PID[:RATE_HZ] to log, e.g. 0C:20 (repeatable)')
+        dp.add_argument('--out', '-o', default='live.vll', help='Output file for log')
+        dp.add_argument('--duration', type=float, default=None, help='Stop logging after N seconds')
+        dp.add_argument('--by-ecu', action='store_true', help='read-dtc: keep answers from several ECUs apart')
+        dp.add_argument('--manufacturer', default=None, help='read-dtc: use manufacturer DTC descriptions (e.g. VW)')
+        dp.add_argument('--range', dest='did_range', default='0000-FFFF',
+                        help='scan-dids: DID ranges, e.g. F180-F1FF,0600-06FF')
+        dp.add_argument('--state', default='did_scan.json',
+                        help='scan-dids: results/progress file; an interrupted scan resumes from it')
         dargs = dp.parse_args(sys.argv[2:])
         from vlinker.diag import scan_ecus, read_dtc, send_raw_hex
         if dargs.diag_cmd == 'scan':
@@ -149,12 +159,46 @@ def main():
                 print('Scan response:', r.hex())
             else:
                 print('No response')
+        elif dargs.diag_cmd == 'scan-dids':
+            from vlinker.did_scan import parse_ranges, scan_dids
+            from vlinker.progress import progress_printer
+            from vlinker.uds import UdsSession
+            try:
+                ranges = parse_ranges(dargs.did_range)
+            except ValueError as e:
+                dp.error(str(e))
+            try:
+                with UdsSession(dargs.device, baud=dargs.baud, timeout=dargs.timeout) as session:
+                    state = scan_dids(session, ranges, state_path=dargs.state, progress=progress_printer('DIDs/s'))
+            except KeyboardInterrupt:
+                print('\nInterrupted; run the same command again to resume from', dargs.state)
+                sys.exit(1)
+            print(f"Scanned {state['done']} DIDs with {state['requests']} requests"
+                  + (' (batched)' if state['multi'] else ''), '; results in', dargs.state)
+            for cls, n in sorted(state['counts'].items()):
+                print(f'  {cls}: {n}')
+            for did, entry in sorted(state['results'].items()):
+                print(f" - {did} {entry['class']}" + (f" {entry['value']}" if 'value' in entry else '')
+                      + (f" {entry['nrc']}" if 'nrc' in entry else ''))
+        elif dargs.diag_cmd == 'read-dtc' and dargs.by_ecu:
+            from vlinker.diag import read_dtc_by_ecu
+            per_ecu = read_dtc_by_ecu(dargs.device, baud=dargs.baud, timeout=dargs.timeout)
+            if not per_ecu:
+                print('No DTCs or no response')
+            from vlinker.dtc_db import describe_dtcs
+            found = describe_dtcs([d for dtcs in per_ecu.values() for d in dtcs], manufacturer=dargs.manufacturer)
+            for header, dtcs in per_ecu.items():
+                print(f'ECU {header}:', 'no DTCs' if not dtcs else '')
+                for dtc in dtcs:
+                    print(' -', dtc, found.get(dtc, {}).get('description', ''))
         elif dargs.diag_cmd == 'read-dtc':
             r = read_dtc(dargs.device, mode=dargs.mode, baud=dargs.baud, timeout=dargs.timeout)
             if r:
+                from vlinker.dtc_db import describe_dtcs
+                found = describe_dtcs(r, manufacturer=dargs.manufacturer)
                 print('DTCs:')
                 for dtc in r:
-                    print(' -', dtc)
+                    print(' -', dtc, found.get(dtc, {}).get('description', ''))
             else:
                 print('No DTCs or no response')
         elif dargs.diag_cmd == 'send-hex':
@@ -176,8 +220,36 @@ def main():
             raw = read_measure(dargs.device, dargs.hex, baud=dargs.baud, timeout=dargs.timeout)
             if raw:
                 print('Measure raw:', raw.hex())
+                from vlinker.obd_pids import decode_mode01_response
+                start = raw.find(b'\x41')
+                decoded = decode_mode01_response(raw[start:]) if start >= 0 else {}
+                for pid, val in decoded.items():
+                    if val.get('value') is not None:
+                        print(f"PID {pid} {val['name']}: {val['value']:g} {val['units']}")
             else:
                 print('No response')
+        elif dargs.diag_cmd == 'log':
+            if not dargs.pid:
+                dp.error('log requires at least one --pid PID[:RATE_HZ]')
+            from vlinker.livelog import parse_signal_spec, start_live_log
+            try:
+                signals = dict(parse_signal_spec(spec) for spec in dargs.pid)
+            except ValueError as e:
+                dp.error(str(e))
+            print('Logging to', dargs.out, '; press Ctrl-C to stop')
+            try:
+                stats = start_live_log(dargs.device, signals, dargs.out, duration=dargs.duration,
+                                       baud=dargs.baud, timeout=dargs.timeout)
+            except KeyboardInterrupt:
+                from vlinker.livelog import read_live_log_stats
+                stats = read_live_log_stats(dargs.out)
+            if stats:
+                print(f"{stats['samples']} samples in {stats['duration']:.1f}s "
+                      f"({stats['sample_rate']:.1f} samples/s, {stats['request_rate']:.1f} requests/s)")
+                for pid, st in stats['signals'].items():
+                    print(f" - {pid}: {st['achieved_hz']:.2f} Hz (target {st['target_hz']:g} Hz)")
+                if stats['unsupported']:
+                    print('Unsupported PIDs skipped:', ','.join(stats['unsupported']))
     elif cmd == 'can':
         import argparse as _arg
         cp = _arg.ArgumentParser(prog='vlinker can')
@@ -196,7 +268,7 @@ def main():
     elif cmd == 'adv':
         import argparse as _arg
         ap = _arg.ArgumentParser(prog='vlinker adv')
-        ap.add_argument('adv_cmd', choices=['req-seed', 'send-key', 'uds', 'coding', 'sec-access'])
+        ap.add_argument('adv_cmd', choices=['req-seed', 'send-key', 'uds', 'coding', 'code', 'flash', 'dump', 'sec-access'])
         ap.add_argument('device')
         ap.add_argument('--hex', default=None, help='Hex payload or identifier')
         ap.add_argument('--key', default=None, help='Key as hex string for send-key')
@@ -205,6 +277,14 @@ def main():
         ap.add_argument('--timeout', type=float, default=1.0)
         ap.add_argument('--dry-run', action='store_true', help='Prepare payload but do not send')
         ap.add_argument('--force', action='store_true', help='Force send even without dry-run')
+        ap.add_argument('--set', action='append', default=[], metavar='DID=HEX',
+                        help='code: wanted DID value, e.g. 0600=0102A0 (repeatable)')
+        ap.add_argument('--file', default=None, help='flash: image file to download')
+        ap.add_argument('--address', default=None, help='flash/dump: memory address, e.g. 0x80000')
+        ap.add_argument('--size', default=None, help='dump: number of bytes to read, e.g. 0x10000')
+        ap.add_argument('--method', choices=['read', 'upload'], default='read',
+                        help='dump: ReadMemoryByAddress (read) or RequestUpload (upload)')
+        ap.add_argument('--out', '-o', default='memory.bin', help='dump: output file (resumed if interrupted)')
         aargs = ap.parse_args(sys.argv[2:])
         from vlinker.advanced import request_seed, send_key, send_uds_raw, perform_coding_write
         from vlinker.ecu_profiles import list_profiles, get_profile
@@ -237,14 +317,90 @@ def main():
             else:
                 r = perform_coding_write(aargs.device, aargs.hex, data, baud=aargs.baud, timeout=aargs.timeout, dry_run=False)
                 print('Coding response:', r.hex() if r else None)
+        elif aargs.adv_cmd == 'code':
+            if not aargs.set:
+                ap.error('code requires at least one --set DID=HEX')
+            if not aargs.dry_run and not aargs.force:
+                ap.error('To perform coding write you must pass --force (or use --dry-run to preview).')
+            from vlinker.coding import CodingError, code_ecu
+            from vlinker.uds import NegativeResponse
+            try:
+                changes = {did: bytes.fromhex(val) for did, val in (x.split('=', 1) for x in aargs.set)}
+            except ValueError:
+                ap.error('--set expects DID=HEX, e.g. 0600=0102A0')
+            try:
+                rep = code_ecu(aargs.device, changes, profile=aargs.profile if aargs.profile != 'manual' else None,
+                               baud=aargs.baud, timeout=aargs.timeout, dry_run=aargs.dry_run)
+            except CodingError as e:
+                print('Coding failed:', e)
+                rb = e.report.get('rollback')
+                if rb:
+                    print('Restored:', ','.join(rb['restored']) or '-', 'Restore failed:', ','.join(rb['failed']) or '-')
+                sys.exit(1)
+            except (NegativeResponse, RuntimeError, OSError) as e:
+                print('Coding failed:', e)
+                sys.exit(1)
+            print('Unchanged:', ','.join(rep['unchanged']) or '-')
+            print('Would write:' if aargs.dry_run else 'Written:', ','.join(rep['changed']) or '-')
+            if not aargs.dry_run and rep['changed']:
+                print('Read-back verified' if rep['verified'] else 'Not verified')
+        elif aargs.adv_cmd == 'flash':
+            if not aargs.file or aargs.address is None:
+                ap.error('flash requires --file IMAGE and --address ADDR')
+            if not aargs.force:
+                ap.error('To download an image you must pass --force.')
+            from vlinker.advanced import security_access_with_profile
+            from vlinker.flash import download
+            from vlinker.progress import progress_printer
+            from vlinker.uds import UdsSession
+            try:
+                with UdsSession(aargs.device, baud=aargs.baud, timeout=aargs.timeout,
+                                ecu=f'{aargs.device}/{aargs.profile}') as session:
+                    session.diagnostic_session(0x02)
+                    if aargs.profile != 'manual':
+                        security_access_with_profile(aargs.device, aargs.profile, session=session)
+                    res = download(session, aargs.file, int(aargs.address, 0), progress=progress_printer('KiB/s', 1024))
+            except (RuntimeError, ValueError, OSError) as e:
+                print('Download failed:', e)
+                sys.exit(1)
+            print(f"Downloaded {res['bytes']} bytes in {res['blocks']} blocks of {res['block_length']} "
+                  f"({res['seconds']:.1f}s, {res['rate'] / 1024:.1f} KiB/s)")
+        elif aargs.adv_cmd == 'dump':
+            if aargs.address is None or aargs.size is None:
+                ap.error('dump requires --address ADDR and --size N')
+            from vlinker.advanced import security_access_with_profile
+            from vlinker.memread import read_memory
+            from vlinker.progress import progress_printer
+            from vlinker.uds import NegativeResponse, UdsSession
+            try:
+                with UdsSession(aargs.device, baud=aargs.baud, timeout=aargs.timeout,
+                                ecu=f'{aargs.device}/{aargs.profile}') as session:
+                    session.diagnostic_session(0x03)
+                    if aargs.profile != 'manual':
+                        security_access_with_profile(aargs.device, aargs.profile, session=session)
+                    res = read_memory(session, int(aargs.address, 0), int(aargs.size, 0), aargs.out,
+                                      method=aargs.method, progress=progress_printer('KiB/s', 1024))
+            except (NegativeResponse, RuntimeError, ValueError, OSError) as e:
+                print('Dump failed:', e)
+                sys.exit(1)
+            except KeyboardInterrupt:
+                print('\nInterrupted; run the same command again to resume')
+                sys.exit(1)
+            print(f"Wrote {res['bytes']} bytes to {aargs.out} ({res['block_size']} bytes per request, "
+                  f"{res['rate'] / 1024:.1f} KiB/s" + (f", resumed at {res['resumed_at']}" if res['resumed_at'] else '') + ')')
         elif aargs.adv_cmd == 'sec-access':
             from vlinker.advanced import security_access_with_profile
+            from vlinker.uds import NegativeResponse
             prof = get_profile(aargs.profile)
             if not prof:
                 print('Unknown profile:', aargs.profile)
                 print('Available:', ','.join(list_profiles()))
                 sys.exit(2)
-            res = security_access_with_profile(aargs.device, aargs.profile, baud=aargs.baud, timeout=aargs.timeout)
+            try:
+                res = security_access_with_profile(aargs.device, aargs.profile, baud=aargs.baud, timeout=aargs.timeout)
+            except (NegativeResponse, RuntimeError, OSError) as e:
+                print('Security access failed:', e)
+                sys.exit(1)
             print('Mode:', res.get('mode'))
             print('Seed:', res.get('seed').hex() if res.get('seed') else None)
             if res.get('key'):
@@ -254,36 +410,164 @@ def main():
     elif cmd == 'capture':
         import argparse as _arg
         cp = _arg.ArgumentParser(prog='vlinker capture')
-        cp.add_argument('cap_cmd', choices=['start', 'parse'])
+        cp.add_argument('cap_cmd', choices=['start', 'parse', 'stats', 'convert'])
         cp.add_argument('device_or_file')
-        cp.add_argument('--out', '-o', default='capture.log')
+        cp.add_argument('--out', '-o', default='capture.vlcap')
         cp.add_argument('--duration', type=float, default=None)
+        cp.add_argument('--format', choices=['binary', 'text'], default='binary',
+                        help='binary: indexed format with ns timestamps; text: legacy hex lines')
+        cp.add_argument('--rotate-mb', type=float, default=None, help='start a new segment after this many MB')
+        cp.add_argument('--rotate-seconds', type=float, default=None, help='start a new segment after this many seconds')
+        cp.add_argument('--compress', choices=['gzip', 'lzma'], default=None, help='compress closed segments')
+        cp.add_argument('--trigger', action='append', default=[],
+                        help='only keep incidents matching e.g. sid=27, nrc=35, can=7E8 or pattern=7F2735')
+        cp.add_argument('--pre', type=float, default=10.0, help='seconds kept before a trigger')
+        cp.add_argument('--post', type=float, default=5.0, help='seconds kept after a trigger')
+        cp.add_argument('--pre-mb', type=float, default=None, help='cap the pre-trigger buffer at this many MB')
+        cp.add_argument('--start', type=float, default=None, help='parse: only records at/after this Unix time')
+        cp.add_argument('--end', type=float, default=None, help='parse: only records before this Unix time')
+        cp.add_argument('--headers', action='store_true', help='stats: ELM answers were captured with ATH1')
+        cp.add_argument('--from', dest='from_format', default=None,
+                        help='convert: source format (vlcap, text, candump, asc, pcap, pcapng; default: detect)')
+        cp.add_argument('--to', dest='to_format', default=None,
+                        help='convert: target format (default: from the --out extension)')
         cargs = cp.parse_args(sys.argv[2:])
         if cargs.cap_cmd == 'start':
             from vlinker.capture import start_capture
             print('Starting capture; press Ctrl-C to stop')
-            start_capture(cargs.device_or_file, cargs.out, duration=cargs.duration)
-            print('Capture saved to', cargs.out)
+            triggers = None
+            if cargs.trigger:
+                from vlinker.capture_trigger import parse_trigger_spec
+                try:
+                    triggers = [parse_trigger_spec(t) for t in cargs.trigger]
+                except ValueError as e:
+                    cp.error(str(e))
+            try:
+                stats = start_capture(cargs.device_or_file, cargs.out, duration=cargs.duration, fmt=cargs.format,
+                                      max_bytes=int(cargs.rotate_mb * 1024 * 1024) if cargs.rotate_mb else None,
+                                      max_seconds=cargs.rotate_seconds, compression=cargs.compress,
+                                      triggers=triggers, pre_seconds=cargs.pre, post_seconds=cargs.post,
+                                      pre_bytes=int(cargs.pre_mb * 1024 * 1024) if cargs.pre_mb else None)
+            except ValueError as e:
+                cp.error(str(e))
+            if stats and triggers:
+                print(f"Saw {stats['records']} records, {len(stats['incidents'])} incident(s)")
+                for inc in stats['incidents']:
+                    print('Incident saved to', inc['path'])
+            elif stats:
+                print(f"Captured {stats['records']} records (peak queue {stats['max_queue']})")
+                for seg in stats['segments']:
+                    print('Capture saved to', seg)
+            else:
+                print('Capture saved to', cargs.out)
         elif cargs.cap_cmd == 'parse':
-            from vlinker.capture_parser import parse_capture_file, find_seed_requests
-            parsed = parse_capture_file(cargs.device_or_file)
-            seeds = find_seed_requests(parsed)
+            from vlinker.capture_parser import iter_capture, find_seed_requests
+            seeds = find_seed_requests(iter_capture(cargs.device_or_file, start=cargs.start, end=cargs.end))
             if not seeds:
                 print('No seed requests found in', cargs.device_or_file)
             else:
                 for ts, req, resp in seeds:
                     print(f'Request at {ts}: {req.hex()} -> Response: {resp.hex()}')
+        elif cargs.cap_cmd == 'stats':
+            from vlinker.capture_parser import iter_capture_records
+            from vlinker.transactions import iter_transactions, latency_stats
+            records = iter_capture_records(cargs.device_or_file, start=cargs.start, end=cargs.end)
+            stats = latency_stats(iter_transactions(records, headers=cargs.headers))
+            for group, title in (('by_service', 'Service'), ('by_ecu', 'ECU')):
+                print(f'{title:>8} {"count":>7} {"pos":>6} {"neg":>5} {"t/o":>5} {"p50ms":>8} {"p90ms":>8} {"p99ms":>8} {"maxms":>8}')
+                for key, st in stats[group].items():
+                    print(f"{key or '-':>8} {st['count']:>7} {st['positive']:>6} {st['negative']:>5} {st['timeout']:>5} "
+                          f"{st['p50_ms']:>8.1f} {st['p90_ms']:>8.1f} {st['p99_ms']:>8.1f} {st['max_ms']:>8.1f}")
+        elif cargs.cap_cmd == 'convert':
+            from vlinker.capture_convert import convert
+            try:
+                res = convert(cargs.device_or_file, cargs.out, src_format=cargs.from_format,
+                              dst_format=cargs.to_format)
+            except ValueError as e:
+                cp.error(str(e))
+            print(f"Wrote {res['records']} records to {cargs.out}"
+                  + (f" ({res['skipped']} non-frame records skipped)" if res['skipped'] else ''))
+    elif cmd == 'snapshot':
+        import argparse as _arg
+        snp = _arg.ArgumentParser(prog='vlinker snapshot')
+        snp.add_argument('snap_cmd', choices=['take', 'diff', 'restore'])
+        snp.add_argument('args', nargs='+', help='take: DEVICE; diff: A B; restore: DEVICE SNAPSHOT')
+        snp.add_argument('--out', '-o', default='snapshot.json.gz', help='take: snapshot file')
+        snp.add_argument('--did', action='append', default=[], help='DID to include, e.g. 0600 (repeatable)')
+        snp.add_argument('--profile', default=None, help='ECU profile: DID list and security unlock')
+        snp.add_argument('--baud', type=int, default=115200)
+        snp.add_argument('--timeout', type=float, default=2.0)
+        snp.add_argument('--dry-run', action='store_true', help='restore: only show what would be written')
+        snp.add_argument('--force', action='store_true', help='restore: required to write')
+        sargs = snp.parse_args(sys.argv[2:])
+        from vlinker import snapshot as _snap
+        if sargs.snap_cmd == 'diff':
+            if len(sargs.args) != 2:
+                snp.error('diff requires two snapshot files')
+            diff = _snap.diff_snapshots(_snap.load_snapshot(sargs.args[0]), _snap.load_snapshot(sargs.args[1]))
+            if not diff:
+                print('Snapshots are identical')
+            for d in diff:
+                print(f"DID {d['did']}: {d['a'] or '-'} -> {d['b'] or '-'}")
+                for b in d.get('bytes', []):
+                    print(f"  byte {b['index']}: {b['a']} -> {b['b']} (bits {','.join(map(str, b['bits']))})")
+        else:
+            if len(sargs.args) != (1 if sargs.snap_cmd == 'take' else 2):
+                snp.error('take requires DEVICE; restore requires DEVICE SNAPSHOT')
+            if sargs.snap_cmd == 'restore' and not sargs.dry_run and not sargs.force:
+                snp.error('To restore you must pass --force (or use --dry-run to preview).')
+            from vlinker.coding import CodingError
+            from vlinker.ecu_profiles import get_profile
+            from vlinker.uds import NegativeResponse, UdsSession
+            device = sargs.args[0]
+            prof = get_profile(sargs.profile) if sargs.profile else None
+            if sargs.profile and not prof:
+                snp.error('Unknown profile: ' + sargs.profile)
+            try:
+                with UdsSession(device, baud=sargs.baud, timeout=sargs.timeout,
+                                ecu=f'{device}/{sargs.profile}' if sargs.profile else None) as session:
+                    session.diagnostic_session(0x03)
+                    if sargs.snap_cmd == 'take':
+                        dids = sargs.did or (_snap.profile_dids(prof) if prof else [])
+                        if not dids:
+                            snp.error('take requires --did or a --profile listing coding DIDs')
+                        snap = _snap.take_snapshot(session, dids, profile=sargs.profile)
+                        _snap.save_snapshot(snap, sargs.out)
+                        print(f"Saved {len(snap['dids'])} DID(s) to {sargs.out}"
+                              + (f" ({len(snap['errors'])} unreadable: {','.join(snap['errors'])})" if snap['errors'] else ''))
+                    else:
+                        if prof and prof.get('seed_key_algo') and not sargs.dry_run:
+                            from vlinker.advanced import security_access_with_profile
+                            security_access_with_profile(device, sargs.profile, session=session)
+                        rep = _snap.restore_snapshot(session, _snap.load_snapshot(sargs.args[1]),
+                                                     dids=sargs.did or None, dry_run=sargs.dry_run)
+                        print('Unchanged:', ','.join(rep['unchanged']) or '-')
+                        print('Would write:' if sargs.dry_run else 'Restored:', ','.join(rep['changed']) or '-')
+            except CodingError as e:
+                print('Restore failed:', e)
+                sys.exit(1)
+            except (NegativeResponse, RuntimeError, ValueError, OSError) as e:
+                print('Snapshot failed:', e)
+                sys.exit(1)
     elif cmd == 'profile':
         import argparse as _arg
         pp = _arg.ArgumentParser(prog='vlinker profile')
-        pp.add_argument('prof_cmd', choices=['analyze', 'build', 'interactive'])
+        pp.add_argument('prof_cmd', choices=['analyze', 'build', 'interactive', 'batch', 'search', 'bruteforce'])
         pp.add_argument('path', nargs='?')
+        pp.add_argument('more_paths', nargs='*', help='batch: further capture files, directories or globs')
+        pp.add_argument('--workers', type=int, default=None, help='batch: worker processes (default: all cores)')
+        pp.add_argument('--no-cache', action='store_true', help='analyze/build/batch: ignore cached analysis results')
+        pp.add_argument('--json', action='store_true', help='batch: print the full report as JSON')
+        pp.add_argument('--depth', type=int, default=2, help='search: operations before the final constant')
+        pp.add_argument('--family', default='xor_rotl_add', help='bruteforce: algorithm family (see seedkey_bruteforce)')
+        pp.add_argument('--rotate', type=int, default=0, help='bruteforce: rotation for rotating families')
+        pp.add_argument('--checkpoint', help='bruteforce: checkpoint file to resume an interrupted sweep')
         pp.add_argument('--name', help='Name for generated profile (when building)')
         pp.add_argument('--algo', help='Algorithm name to use when building (e.g., reverse, xor_5A)')
         pargs = pp.parse_args(sys.argv[2:])
         if pargs.prof_cmd == 'analyze':
             from vlinker.profile_builder import analyze_capture
-            res = analyze_capture(pargs.path)
+            res = analyze_capture(pargs.path, use_cache=not pargs.no_cache)
             if not res:
                 print('No seed suggestions found')
             else:
@@ -295,7 +579,7 @@ def main():
             if not pargs.name or not pargs.algo:
                 pp.error('build requires --name and --algo')
             from vlinker.profile_builder import analyze_capture, save_profile_from_suggestion
-            res = analyze_capture(pargs.path)
+            res = analyze_capture(pargs.path, use_cache=not pargs.no_cache)
             if not res:
                 print('No suggestions found; nothing to build')
             else:
@@ -305,6 +589,54 @@ def main():
                     print('Profile written to', path)
                 else:
                     print('Failed to write profile; check algo name')
+        elif pargs.prof_cmd == 'search':
+            if not pargs.path:
+                pp.error('search requires a capture file')
+            from vlinker.seedkey_search import search_capture
+            res = search_capture(pargs.path, max_depth=pargs.depth, workers=pargs.workers)
+            if not res['pairs']:
+                print('No accepted seed/key pairs found in', pargs.path)
+            elif not res['algorithms']:
+                print(f"No algorithm up to depth {pargs.depth} matches all {res['pairs']} pair(s)")
+            else:
+                print(f"{len(res['algorithms'])} algorithm(s) match all {res['pairs']} pair(s)"
+                      + (' (truncated)' if res['truncated'] else ''))
+                for a in res['algorithms']:
+                    print(' -', a['name'])
+        elif pargs.prof_cmd == 'bruteforce':
+            if not pargs.path:
+                pp.error('bruteforce requires a capture file')
+            from vlinker.progress import progress_printer
+            from vlinker.seedkey_bruteforce import bruteforce
+            from vlinker.seedkey_search import pairs_from_capture
+            try:
+                res = bruteforce(pairs_from_capture(pargs.path), pargs.family, rotate=pargs.rotate,
+                                 workers=pargs.workers, checkpoint=pargs.checkpoint, progress=progress_printer('M/s', 1e6))
+            except (ValueError, RuntimeError) as e:
+                pp.error(str(e))
+            except KeyboardInterrupt:
+                print('\nInterrupted' + (f'; resume with --checkpoint {pargs.checkpoint}' if pargs.checkpoint else ''))
+                sys.exit(1)
+            if not res['constants']:
+                print(f"No {res['family']} constant matches all {res['pairs']} pair(s)")
+            for c in res['constants']:
+                print(f"{res['family']} C=0x{c:08X}" + (f" r={res['rotate']}" if res['rotate'] else ''))
+        elif pargs.prof_cmd == 'batch':
+            if not pargs.path:
+                pp.error('batch requires at least one capture file, directory or glob')
+            from vlinker.batch_analysis import analyze_corpus
+            rep = analyze_corpus([pargs.path] + pargs.more_paths, workers=pargs.workers, use_cache=not pargs.no_cache)
+            if pargs.json:
+                import json as _json
+                print(_json.dumps(rep, indent=2))
+            else:
+                print(f"{rep['files']} file(s), {rep['units']} unit(s) ({rep['cached_units']} cached), "
+                      f"{rep['transactions']} transactions, {len(rep['seed_pairs'])} seed/key pair(s)")
+                for sid, st in rep['by_service'].items():
+                    print(f"  service {sid}: {st['count']} (neg {st['negative']}, t/o {st['timeout']}) "
+                          f"p50 {st['p50_ms']:.1f} ms p99 {st['p99_ms']:.1f} ms")
+                for c in rep['candidates']:
+                    print(f"  candidate {c['name']}: {c['matches']}/{c['pairs']} pairs")
         elif pargs.prof_cmd == 'interactive':
             from vlinker.profile_builder import interactive_build
             cap = pargs.path or input('Path to capture file (or Enter to cancel): ').strip()
@@ -410,6 +742,7 @@ def main():
     sub.add_parser('adv')
     sub.add_parser('capture')
     sub.add_parser('profile')
+    sub.add_parser('snapshot')
 
     sp = sub.add_parser('serial')
     ssub = sp.add_subparsers(dest='sact')
@@ -455,12 +788,21 @@ def main():
     elif cmd == 'diag':
         import argparse as _arg
         dp = _arg.ArgumentParser(prog='vlinker diag')
-        dp.add_argument('diag_cmd', choices=['scan', 'read-dtc', 'send-hex', 'clear-dtc', 'measure'])
+        dp.add_argument('diag_cmd', choices=['scan', 'scan-dids', 'read-dtc', 'send-hex', 'clear-dtc', 'measure', 'log'])
         dp.add_argument('device')
         dp.add_argument('--mode', choices=['elm', 'raw'], default='elm')
         dp.add_argument('--baud', type=int, default=115200)
         dp.add_argument('--timeout', type=float, default=1.0)
         dp.add_argument('--hex', dest='hex', default=None)
+        dp.add_argument('--pid', action='append', default=[], help='PID[:RATE_HZ] to log, e.g. 0C:20 (repeatable)')
+        dp.add_argument('--out', '-o', default='live.vll', help='Output file for log')
+        dp.add_argument('--duration', type=float, default=None, help='Stop logging after N seconds')
+        dp.add_argument('--by-ecu', action='store_true', help='read-dtc: keep answers from several ECUs apart')
+        dp.add_argument('--manufacturer', default=None, help='read-dtc: use manufacturer DTC descriptions (e.g. VW)')
+        dp.add_argument('--range', dest='did_range', default='0000-FFFF',
+                        help='scan-dids: DID ranges, e.g. F180-F1FF,0600-06FF')
+        dp.add_argument('--state', default='did_scan.json',
+                        help='scan-dids: results/progress file; an interrupted scan resumes from it')
         dargs = dp.parse_args(sys.argv[2:])
         from vlinker.diag import scan_ecus, read_dtc, send_raw_hex
         if dargs.diag_cmd == 'scan':
@@ -469,12 +811,46 @@ def main():
                 print('Scan response:', r.hex())
             else:
                 print('No response')
+        elif dargs.diag_cmd == 'scan-dids':
+            from vlinker.did_scan import parse_ranges, scan_dids
+            from vlinker.progress import progress_printer
+            from vlinker.uds import UdsSession
+            try:
+                ranges = parse_ranges(dargs.did_range)
+            except ValueError as e:
+                dp.error(str(e))
+            try:
+                with UdsSession(dargs.device, baud=dargs.baud, timeout=dargs.timeout) as session:
+                    state = scan_dids(session, ranges, state_path=dargs.state, progress=progress_printer('DIDs/s'))
+            except KeyboardInterrupt:
+                print('\nInterrupted; run the same command again to resume from', dargs.state)
+                sys.exit(1)
+            print(f"Scanned {state['done']} DIDs with {state['requests']} requests"
+                  + (' (batched)' if state['multi'] else ''), '; results in', dargs.state)
+            for cls, n in sorted(state['counts'].items()):
+                print(f'  {cls}: {n}')
+            for did, entry in sorted(state['results'].items()):
+                print(f" - {did} {entry['class']}" + (f" {entry['value']}" if 'value' in entry else '')
+                      + (f" {entry['nrc']}" if 'nrc' in entry else ''))
+        elif dargs.diag_cmd == 'read-dtc' and dargs.by_ecu:
+            from vlinker.diag import read_dtc_by_ecu
+            per_ecu = read_dtc_by_ecu(dargs.device, baud=dargs.baud, timeout=dargs.timeout)
+            if not per_ecu:
+                print('No DTCs or no response')
+            from vlinker.dtc_db import describe_dtcs
+            found = describe_dtcs([d for dtcs in per_ecu.values() for d in dtcs], manufacturer=dargs.manufacturer)
+            for header, dtcs in per_ecu.items():
+                print(f'ECU {header}:', 'no DTCs' if not dtcs else '')
+                for dtc in dtcs:
+                    print(' -', dtc, found.get(dtc, {}).get('description', ''))
         elif dargs.diag_cmd == 'read-dtc':
             r = read_dtc(dargs.device, mode=dargs.mode, baud=dargs.baud, timeout=dargs.timeout)
             if r:
+                from vlinker.dtc_db import describe_dtcs
+                found = describe_dtcs(r, manufacturer=dargs.manufacturer)
                 print('DTCs:')
                 for dtc in r:
-                    print(' -', dtc)
+                    print(' -', dtc, found.get(dtc, {}).get('description', ''))
             else:
                 print('No DTCs or no response')
         elif dargs.diag_cmd == 'send-hex':
@@ -496,8 +872,36 @@ def main():
             raw = read_measure(dargs.device, dargs.hex, baud=dargs.baud, timeout=dargs.timeout)
             if raw:
                 print('Measure raw:', raw.hex())
+                from vlinker.obd_pids import decode_mode01_response
+                start = raw.find(b'\x41')
+                decoded = decode_mode01_response(raw[start:]) if start >= 0 else {}
+                for pid, val in decoded.items():
+                    if val.get('value') is not None:
+                        print(f"PID {pid} {val['name']}: {val['value']:g} {val['units']}")
             else:
                 print('No response')
+        elif dargs.diag_cmd == 'log':
+            if not dargs.pid:
+                dp.error('log requires at least one --pid PID[:RATE_HZ]')
+            from vlinker.livelog import parse_signal_spec, start_live_log
+            try:
+                signals = dict(parse_signal_spec(spec) for spec in dargs.pid)
+            except ValueError as e:
+                dp.error(str(e))
+            print('Logging to', dargs.out, '; press Ctrl-C to stop')
+            try:
+                stats = start_live_log(dargs.device, signals, dargs.out, duration=dargs.duration,
+                                       baud=dargs.baud, timeout=dargs.timeout)
+            except KeyboardInterrupt:
+                from vlinker.livelog import read_live_log_stats
+                stats = read_live_log_stats(dargs.out)
+            if stats:
+                print(f"{stats['samples']} samples in {stats['duration']:.1f}s "
+                      f"({stats['sample_rate']:.1f} samples/s, {stats['request_rate']:.1f} requests/s)")
+                for pid, st in stats['signals'].items():
+                    print(f" - {pid}: {st['achieved_hz']:.2f} Hz (target {st['target_hz']:g} Hz)")
+                if stats['unsupported']:
+                    print('Unsupported PIDs skipped:', ','.join(stats['unsupported']))
     elif cmd == 'can':
         import argparse as _arg
         cp = _arg.ArgumentParser(prog='vlinker can')
@@ -516,7 +920,7 @@ def main():
     elif cmd == 'adv':
         import argparse as _arg
         ap = _arg.ArgumentParser(prog='vlinker adv')
-        ap.add_argument('adv_cmd', choices=['req-seed', 'send-key', 'uds', 'coding', 'sec-access'])
+        ap.add_argument('adv_cmd', choices=['req-seed', 'send-key', 'uds', 'coding', 'code', 'flash', 'dump', 'sec-access'])
         ap.add_argument('device')
         ap.add_argument('--hex', default=None, help='Hex payload or identifier')
         ap.add_argument('--key', default=None, help='Key as hex string for send-key')
@@ -525,6 +929,14 @@ def main():
         ap.add_argument('--timeout', type=float, default=1.0)
         ap.add_argument('--dry-run', action='store_true', help='Prepare payload but do not send')
         ap.add_argument('--force', action='store_true', help='Force send even without dry-run')
+        ap.add_argument('--set', action='append', default=[], metavar='DID=HEX',
+                        help='code: wanted DID value, e.g. 0600=0102A0 (repeatable)')
+        ap.add_argument('--file', default=None, help='flash: image file to download')
+        ap.add_argument('--address', default=None, help='flash/dump: memory address, e.g. 0x80000')
+        ap.add_argument('--size', default=None, help='dump: number of bytes to read, e.g. 0x10000')
+        ap.add_argument('--method', choices=['read', 'upload'], default='read',
+                        help='dump: ReadMemoryByAddress (read) or RequestUpload (upload)')
+        ap.add_argument('--out', '-o', default='memory.bin', help='dump: output file (resumed if interrupted)')
         aargs = ap.parse_args(sys.argv[2:])
         from vlinker.advanced import request_seed, send_key, send_uds_raw, perform_coding_write
         from vlinker.ecu_profiles import list_profiles, get_profile
@@ -557,14 +969,90 @@ def main():
             else:
                 r = perform_coding_write(aargs.device, aargs.hex, data, baud=aargs.baud, timeout=aargs.timeout, dry_run=False)
                 print('Coding response:', r.hex() if r else None)
+        elif aargs.adv_cmd == 'code':
+            if not aargs.set:
+                ap.error('code requires at least one --set DID=HEX')
+            if not aargs.dry_run and not aargs.force:
+                ap.error('To perform coding write you must pass --force (or use --dry-run to preview).')
+            from vlinker.coding import CodingError, code_ecu
+            from vlinker.uds import NegativeResponse
+            try:
+                changes = {did: bytes.fromhex(val) for did, val in (x.split('=', 1) for x in aargs.set)}
+            except ValueError:
+                ap.error('--set expects DID=HEX, e.g. 0600=0102A0')
+            try:
+                rep = code_ecu(aargs.device, changes, profile=aargs.profile if aargs.profile != 'manual' else None,
+                               baud=aargs.baud, timeout=aargs.timeout, dry_run=aargs.dry_run)
+            except CodingError as e:
+                print('Coding failed:', e)
+                rb = e.report.get('rollback')
+                if rb:
+                    print('Restored:', ','.join(rb['restored']) or '-', 'Restore failed:', ','.join(rb['failed']) or '-')
+                sys.exit(1)
+            except (NegativeResponse, RuntimeError, OSError) as e:
+                print('Coding failed:', e)
+                sys.exit(1)
+            print('Unchanged:', ','.join(rep['unchanged']) or '-')
+            print('Would write:' if aargs.dry_run else 'Written:', ','.join(rep['changed']) or '-')
+            if not aargs.dry_run and rep['changed']:
+                print('Read-back verified' if rep['verified'] else 'Not verified')
+        elif aargs.adv_cmd == 'flash':
+            if not aargs.file or aargs.address is None:
+                ap.error('flash requires --file IMAGE and --address ADDR')
+            if not aargs.force:
+                ap.error('To download an image you must pass --force.')
+            from vlinker.advanced import security_access_with_profile
+            from vlinker.flash import download
+            from vlinker.progress import progress_printer
+            from vlinker.uds import UdsSession
+            try:
+                with UdsSession(aargs.device, baud=aargs.baud, timeout=aargs.timeout,
+                                ecu=f'{aargs.device}/{aargs.profile}') as session:
+                    session.diagnostic_session(0x02)
+                    if aargs.profile != 'manual':
+                        security_access_with_profile(aargs.device, aargs.profile, session=session)
+                    res = download(session, aargs.file, int(aargs.address, 0), progress=progress_printer('KiB/s', 1024))
+            except (RuntimeError, ValueError, OSError) as e:
+                print('Download failed:', e)
+                sys.exit(1)
+            print(f"Downloaded {res['bytes']} bytes in {res['blocks']} blocks of {res['block_length']} "
+                  f"({res['seconds']:.1f}s, {res['rate'] / 1024:.1f} KiB/s)")
+        elif aargs.adv_cmd == 'dump':
+            if aargs.address is None or aargs.size is None:
+                ap.error('dump requires --address ADDR and --size N')
+            from vlinker.advanced import security_access_with_profile
+            from vlinker.memread import read_memory
+            from vlinker.progress import progress_printer
+            from vlinker.uds import NegativeResponse, UdsSession
+            try:
+                with UdsSession(aargs.device, baud=aargs.baud, timeout=aargs.timeout,
+                                ecu=f'{aargs.device}/{aargs.profile}') as session:
+                    session.diagnostic_session(0x03)
+                    if aargs.profile != 'manual':
+                        security_access_with_profile(aargs.device, aargs.profile, session=session)
+                    res = read_memory(session, int(aargs.address, 0), int(aargs.size, 0), aargs.out,
+                                      method=aargs.method, progress=progress_printer('KiB/s', 1024))
+            except (NegativeResponse, RuntimeError, ValueError, OSError) as e:
+                print('Dump failed:', e)
+                sys.exit(1)
+            except KeyboardInterrupt:
+                print('\nInterrupted; run the same command again to resume')
+                sys.exit(1)
+            print(f"Wrote {res['bytes']} bytes to {aargs.out} ({res['block_size']} bytes per request, "
+                  f"{res['rate'] / 1024:.1f} KiB/s" + (f", resumed at {res['resumed_at']}" if res['resumed_at'] else '') + ')')
         elif aargs.adv_cmd == 'sec-access':
             from vlinker.advanced import security_access_with_profile
+            from vlinker.uds import NegativeResponse
             prof = get_profile(aargs.profile)
             if not prof:
                 print('Unknown profile:', aargs.profile)
                 print('Available:', ','.join(list_profiles()))
                 sys.exit(2)
-            res = security_access_with_profile(aargs.device, aargs.profile, baud=aargs.baud, timeout=aargs.timeout)
+            try:
+                res = security_access_with_profile(aargs.device, aargs.profile, baud=aargs.baud, timeout=aargs.timeout)
+            except (NegativeResponse, RuntimeError, OSError) as e:
+                print('Security access failed:', e)
+                sys.exit(1)
             print('Mode:', res.get('mode'))
             print('Seed:', res.get('seed').hex() if res.get('seed') else None)
             if res.get('key'):
@@ -574,36 +1062,164 @@ def main():
     elif cmd == 'capture':
         import argparse as _arg
         cp = _arg.ArgumentParser(prog='vlinker capture')
-        cp.add_argument('cap_cmd', choices=['start', 'parse'])
+        cp.add_argument('cap_cmd', choices=['start', 'parse', 'stats', 'convert'])
         cp.add_argument('device_or_file')
-        cp.add_argument('--out', '-o', default='capture.log')
+        cp.add_argument('--out', '-o', default='capture.vlcap')
         cp.add_argument('--duration', type=float, default=None)
+        cp.add_argument('--format', choices=['binary', 'text'], default='binary',
+                        help='binary: indexed format with ns timestamps; text: legacy hex lines')
+        cp.add_argument('--rotate-mb', type=float, default=None, help='start a new segment after this many MB')
+        cp.add_argument('--rotate-seconds', type=float, default=None, help='start a new segment after this many seconds')
+        cp.add_argument('--compress', choices=['gzip', 'lzma'], default=None, help='compress closed segments')
+        cp.add_argument('--trigger', action='append', default=[],
+                        help='only keep incidents matching e.g. sid=27, nrc=35, can=7E8 or pattern=7F2735')
+        cp.add_argument('--pre', type=float, default=10.0, help='seconds kept before a trigger')
+        cp.add_argument('--post', type=float, default=5.0, help='seconds kept after a trigger')
+        cp.add_argument('--pre-mb', type=float, default=None, help='cap the pre-trigger buffer at this many MB')
+        cp.add_argument('--start', type=float, default=None, help='parse: only records at/after this Unix time')
+        cp.add_argument('--end', type=float, default=None, help='parse: only records before this Unix time')
+        cp.add_argument('--headers', action='store_true', help='stats: ELM answers were captured with ATH1')
+        cp.add_argument('--from', dest='from_format', default=None,
+                        help='convert: source format (vlcap, text, candump, asc, pcap, pcapng; default: detect)')
+        cp.add_argument('--to', dest='to_format', default=None,
+                        help='convert: target format (default: from the --out extension)')
         cargs = cp.parse_args(sys.argv[2:])
         if cargs.cap_cmd == 'start':
             from vlinker.capture import start_capture
             print('Starting capture; press Ctrl-C to stop')
-            start_capture(cargs.device_or_file, cargs.out, duration=cargs.duration)
-            print('Capture saved to', cargs.out)
+            triggers = None
+            if cargs.trigger:
+                from vlinker.capture_trigger import parse_trigger_spec
+                try:
+                    triggers = [parse_trigger_spec(t) for t in cargs.trigger]
+                except ValueError as e:
+                    cp.error(str(e))
+            try:
+                stats = start_capture(cargs.device_or_file, cargs.out, duration=cargs.duration, fmt=cargs.format,
+                                      max_bytes=int(cargs.rotate_mb * 1024 * 1024) if cargs.rotate_mb else None,
+                                      max_seconds=cargs.rotate_seconds, compression=cargs.compress,
+                                      triggers=triggers, pre_seconds=cargs.pre, post_seconds=cargs.post,
+                                      pre_bytes=int(cargs.pre_mb * 1024 * 1024) if cargs.pre_mb else None)
+            except ValueError as e:
+                cp.error(str(e))
+            if stats and triggers:
+                print(f"Saw {stats['records']} records, {len(stats['incidents'])} incident(s)")
+                for inc in stats['incidents']:
+                    print('Incident saved to', inc['path'])
+            elif stats:
+                print(f"Captured {stats['records']} records (peak queue {stats['max_queue']})")
+                for seg in stats['segments']:
+                    print('Capture saved to', seg)
+            else:
+                print('Capture saved to', cargs.out)
         elif cargs.cap_cmd == 'parse':
-            from vlinker.capture_parser import parse_capture_file, find_seed_requests
-            parsed = parse_capture_file(cargs.device_or_file)
-            seeds = find_seed_requests(parsed)
+            from vlinker.capture_parser import iter_capture, find_seed_requests
+            seeds = find_seed_requests(iter_capture(cargs.device_or_file, start=cargs.start, end=cargs.end))
             if not seeds:
                 print('No seed requests found in', cargs.device_or_file)
             else:
                 for ts, req, resp in seeds:
                     print(f'Request at {ts}: {req.hex()} -> Response: {resp.hex()}')
+        elif cargs.cap_cmd == 'stats':
+            from vlinker.capture_parser import iter_capture_records
+            from vlinker.transactions import iter_transactions, latency_stats
+            records = iter_capture_records(cargs.device_or_file, start=cargs.start, end=cargs.end)
+            stats = latency_stats(iter_transactions(records, headers=cargs.headers))
+            for group, title in (('by_service', 'Service'), ('by_ecu', 'ECU')):
+                print(f'{title:>8} {"count":>7} {"pos":>6} {"neg":>5} {"t/o":>5} {"p50ms":>8} {"p90ms":>8} {"p99ms":>8} {"maxms":>8}')
+                for key, st in stats[group].items():
+                    print(f"{key or '-':>8} {st['count']:>7} {st['positive']:>6} {st['negative']:>5} {st['timeout']:>5} "
+                          f"{st['p50_ms']:>8.1f} {st['p90_ms']:>8.1f} {st['p99_ms']:>8.1f} {st['max_ms']:>8.1f}")
+        elif cargs.cap_cmd == 'convert':
+            from vlinker.capture_convert import convert
+            try:
+                res = convert(cargs.device_or_file, cargs.out, src_format=cargs.from_format,
+                              dst_format=cargs.to_format)
+            except ValueError as e:
+                cp.error(str(e))
+            print(f"Wrote {res['records']} records to {cargs.out}"
+                  + (f" ({res['skipped']} non-frame records skipped)" if res['skipped'] else ''))
+    elif cmd == 'snapshot':
+        import argparse as _arg
+        snp = _arg.ArgumentParser(prog='vlinker snapshot')
+        snp.add_argument('snap_cmd', choices=['take', 'diff', 'restore'])
+        snp.add_argument('args', nargs='+', help='take: DEVICE; diff: A B; restore: DEVICE SNAPSHOT')
+        snp.add_argument('--out', '-o', default='snapshot.json.gz', help='take: snapshot file')
+        snp.add_argument('--did', action='append', default=[], help='DID to include, e.g. 0600 (repeatable)')
+        snp.add_argument('--profile', default=None, help='ECU profile: DID list and security unlock')
+        snp.add_argument('--baud', type=int, default=115200)
+        snp.add_argument('--timeout', type=float, default=2.0)
+        snp.add_argument('--dry-run', action='store_true', help='restore: only show what would be written')
+        snp.add_argument('--force', action='store_true', help='restore: required to write')
+        sargs = snp.parse_args(sys.argv[2:])
+        from vlinker import snapshot as _snap
+        if sargs.snap_cmd == 'diff':
+            if len(sargs.args) != 2:
+                snp.error('diff requires two snapshot files')
+            diff = _snap.diff_snapshots(_snap.load_snapshot(sargs.args[0]), _snap.load_snapshot(sargs.args[1]))
+            if not diff:
+                print('Snapshots are identical')
+            for d in diff:
+                print(f"DID {d['did']}: {d['a'] or '-'} -> {d['b'] or '-'}")
+                for b in d.get('bytes', []):
+                    print(f"  byte {b['index']}: {b['a']} -> {b['b']} (bits {','.join(map(str, b['bits']))})")
+        else:
+            if len(sargs.args) != (1 if sargs.snap_cmd == 'take' else 2):
+                snp.error('take requires DEVICE; restore requires DEVICE SNAPSHOT')
+            if sargs.snap_cmd == 'restore' and not sargs.dry_run and not sargs.force:
+                snp.error('To restore you must pass --force (or use --dry-run to preview).')
+            from vlinker.coding import CodingError
+            from vlinker.ecu_profiles import get_profile
+            from vlinker.uds import NegativeResponse, UdsSession
+            device = sargs.args[0]
+            prof = get_profile(sargs.profile) if sargs.profile else None
+            if sargs.profile and not prof:
+                snp.error('Unknown profile: ' + sargs.profile)
+            try:
+                with UdsSession(device, baud=sargs.baud, timeout=sargs.timeout,
+                                ecu=f'{device}/{sargs.profile}' if sargs.profile else None) as session:
+                    session.diagnostic_session(0x03)
+                    if sargs.snap_cmd == 'take':
+                        dids = sargs.did or (_snap.profile_dids(prof) if prof else [])
+                        if not dids:
+                            snp.error('take requires --did or a --profile listing coding DIDs')
+                        snap = _snap.take_snapshot(session, dids, profile=sargs.profile)
+                        _snap.save_snapshot(snap, sargs.out)
+                        print(f"Saved {len(snap['dids'])} DID(s) to {sargs.out}"
+                              + (f" ({len(snap['errors'])} unreadable: {','.join(snap['errors'])})" if snap['errors'] else ''))
+                    else:
+                        if prof and prof.get('seed_key_algo') and not sargs.dry_run:
+                            from vlinker.advanced import security_access_with_profile
+                            security_access_with_profile(device, sargs.profile, session=session)
+                        rep = _snap.restore_snapshot(session, _snap.load_snapshot(sargs.args[1]),
+                                                     dids=sargs.did or None, dry_run=sargs.dry_run)
+                        print('Unchanged:', ','.join(rep['unchanged']) or '-')
+                        print('Would write:' if sargs.dry_run else 'Restored:', ','.join(rep['changed']) or '-')
+            except CodingError as e:
+                print('Restore failed:', e)
+                sys.exit(1)
+            except (NegativeResponse, RuntimeError, ValueError, OSError) as e:
+                print('Snapshot failed:', e)
+                sys.exit(1)
     elif cmd == 'profile':
         import argparse as _arg
         pp = _arg.ArgumentParser(prog='vlinker profile')
-        pp.add_argument('prof_cmd', choices=['analyze', 'build', 'interactive'])
+        pp.add_argument('prof_cmd', choices=['analyze', 'build', 'interactive', 'batch', 'search', 'bruteforce'])
         pp.add_argument('path', nargs='?')
+        pp.add_argument('more_paths', nargs='*', help='batch: further capture files, directories or globs')
+        pp.add_argument('--workers', type=int, default=None, help='batch: worker processes (default: all cores)')
+        pp.add_argument('--no-cache', action='store_true', help='analyze/build/batch: ignore cached analysis results')
+        pp.add_argument('--json', action='store_true', help='batch: print the full report as JSON')
+        pp.add_argument('--depth', type=int, default=2, help='search: operations before the final constant')
+        pp.add_argument('--family', default='xor_rotl_add', help='bruteforce: algorithm family (see seedkey_bruteforce)')
+        pp.add_argument('--rotate', type=int, default=0, help='bruteforce: rotation for rotating families')
+        pp.add_argument('--checkpoint', help='bruteforce: checkpoint file to resume an interrupted sweep')
         pp.add_argument('--name', help='Name for generated profile (when building)')
         pp.add_argument('--algo', help='Algorithm name to use when building (e.g., reverse, xor_5A)')
         pargs = pp.parse_args(sys.argv[2:])
         if pargs.prof_cmd == 'analyze':
             from vlinker.profile_builder import analyze_capture
-            res = analyze_capture(pargs.path)
+            res = analyze_capture(pargs.path, use_cache=not pargs.no_cache)
             if not res:
                 print('No seed suggestions found')
             else:
@@ -615,7 +1231,7 @@ def main():
             if not pargs.name or not pargs.algo:
                 pp.error('build requires --name and --algo')
             from vlinker.profile_builder import analyze_capture, save_profile_from_suggestion
-            res = analyze_capture(pargs.path)
+            res = analyze_capture(pargs.path, use_cache=not pargs.no_cache)
             if not res:
                 print('No suggestions found; nothing to build')
             else:
@@ -625,6 +1241,54 @@ def main():
                     print('Profile written to', path)
                 else:
                     print('Failed to write profile; check algo name')
+        elif pargs.prof_cmd == 'search':
+            if not pargs.path:
+                pp.error('search requires a capture file')
+            from vlinker.seedkey_search import search_capture
+            res = search_capture(pargs.path, max_depth=pargs.depth, workers=pargs.workers)
+            if not res['pairs']:
+                print('No accepted seed/key pairs found in', pargs.path)
+            elif not res['algorithms']:
+                print(f"No algorithm up to depth {pargs.depth} matches all {res['pairs']} pair(s)")
+            else:
+                print(f"{len(res['algorithms'])} algorithm(s) match all {res['pairs']} pair(s)"
+                      + (' (truncated)' if res['truncated'] else ''))
+                for a in res['algorithms']:
+                    print(' -', a['name'])
+        elif pargs.prof_cmd == 'bruteforce':
+            if not pargs.path:
+                pp.error('bruteforce requires a capture file')
+            from vlinker.progress import progress_printer
+            from vlinker.seedkey_bruteforce import bruteforce
+            from vlinker.seedkey_search import pairs_from_capture
+            try:
+                res = bruteforce(pairs_from_capture(pargs.path), pargs.family, rotate=pargs.rotate,
+                                 workers=pargs.workers, checkpoint=pargs.checkpoint, progress=progress_printer('M/s', 1e6))
+            except (ValueError, RuntimeError) as e:
+                pp.error(str(e))
+            except KeyboardInterrupt:
+                print('\nInterrupted' + (f'; resume with --checkpoint {pargs.checkpoint}' if pargs.checkpoint else ''))
+                sys.exit(1)
+            if not res['constants']:
+                print(f"No {res['family']} constant matches all {res['pairs']} pair(s)")
+            for c in res['constants']:
+                print(f"{res['family']} C=0x{c:08X}" + (f" r={res['rotate']}" if res['rotate'] else ''))
+        elif pargs.prof_cmd == 'batch':
+            if not pargs.path:
+                pp.error('batch requires at least one capture file, directory or glob')
+            from vlinker.batch_analysis import analyze_corpus
+            rep = analyze_corpus([pargs.path] + pargs.more_paths, workers=pargs.workers, use_cache=not pargs.no_cache)
+            if pargs.json:
+                import json as _json
+                print(_json.dumps(rep, indent=2))
+            else:
+                print(f"{rep['files']} file(s), {rep['units']} unit(s) ({rep['cached_units']} cached), "
+                      f"{rep['transactions']} transactions, {len(rep['seed_pairs'])} seed/key pair(s)")
+                for sid, st in rep['by_service'].items():
+                    print(f"  service {sid}: {st['count']} (neg {st['negative']}, t/o {st['timeout']}) "
+                          f"p50 {st['p50_ms']:.1f} ms p99 {st['p99_ms']:.1f} ms")
+                for c in rep['candidates']:
+                    print(f"  candidate {c['name']}: {c['matches']}/{c['pairs']} pairs")
         elif pargs.prof_cmd == 'interactive':
             from vlinker.profile_builder import interactive_build
             cap = pargs.path or input('Path to capture file (or Enter to cancel): ').strip()